@@ -59,7 +59,7 @@ def receiver_thread(sock, rx_queue, stats, enable_timing):
     while True:
         try:
             data, addr = sock.recvfrom(4096)
-            t2_rx_ns = time.clock_gettime_ns(time.CLOCK_MONOTONIC_RAW) if enable_timing else 0
+            t2_rx_ns = time.clock_gettime_ns(time.CLOCK_MONOTONIC_RAW)  # also PING t_rx, so always taken
             rx_queue.put((data, addr, time.time(), t2_rx_ns))
             stats['rx_pkts'] += 1
         except Exception as e:
@@ -70,6 +70,11 @@ def sender_thread(sock, tx_queue, stats, enable_timing):
     while True:
         try:
             reply, addr, timing_data = tx_queue.get()
+            if timing_data and 'ping_rx' in timing_data:
+                # lob_v1_ping_ts_t: server rx/tx for host clock sync (NTP-style)
+                reply = reply + struct.pack('>QQ', timing_data['ping_rx'],
+                                            time.clock_gettime_ns(time.CLOCK_MONOTONIC_RAW))
+                timing_data = None
             if enable_timing and timing_data:
                 t6_tx_ns = time.clock_gettime_ns(time.CLOCK_MONOTONIC_RAW)
                 timing_payload = struct.pack('>QQQQQQII', 
@@ -132,7 +137,7 @@ def processor_thread(rx_queue, tx_queue, stats, args, dma_info, dma_lock):
             if msg_type == 0:
                 t_now = now_ns()
                 reply = struct.pack(HDR_FMT, b'LOB1', 1, 0, flags_be, HDR_LEN, seq_be, t_send_be, t_now, 0)
-                tx_queue.put((reply, addr, None))
+                tx_queue.put((reply, addr, {'ping_rx': t2_rx_ns}))  # sender appends t_tx
                 continue
             
             if msg_type != 1: continue # Only handle Delta
@@ -2,20 +2,63 @@
 """
 Multi-threaded feature echo server for high-throughput LOB processing.
 Decouples network I/O from PL/DMA processing for better performance.
+
+Counters, per-stage latency histograms and queue depths are served live by
+host/telemetry/metrics.py (--metrics-http / --metrics-udp, both off by
+default); each thread owns its counters, so the hot path takes no lock. The
+per-packet stage timings are only recorded while an endpoint is up.
+
+--gc-mode latency (host/telemetry/gcmode.py) freezes everything allocated at
+startup, disables the cyclic GC and collects only while the processor queue
+is empty; GC pause counts and durations are on the metrics endpoint either
+way. --pin / --fifo / --mlockall (host/telemetry/rt.py) place the rx, proc
+and tx threads; the effective placement is printed and served as `info.rt`
+in the UDP snapshot. The processor keeps the book in flat int lists and parses/builds
+packets with precompiled structs, so a packet allocates little.
 """
 import argparse
 import socket
 import struct
+import sys
 import time
 import numpy as np
 import threading
 import queue
+from pathlib import Path
+
+# In a repo checkout host/ is found via REPO_ROOT; on the board metrics.py,
+# histogram.py, gcmode.py, rt.py, writer.py and pcap.py can simply be copied next to this script.
+REPO_ROOT = Path(__file__).resolve().parents[2]
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+try:
+    from host.telemetry.metrics import MetricsRegistry, MetricsServer, parse_addr  # noqa: E402
+    from host.telemetry.gcmode import GC_COUNTERS, MODES as GC_MODES, GcControl, GcMonitor  # noqa: E402
+    from host.telemetry.rt import add_rt_args, rt_from_args  # noqa: E402
+    from host.telemetry.pcap import wall_offset_ns  # noqa: E402
+    from host.telemetry.writer import AsyncPcapLog  # noqa: E402
+except ImportError:
+    from metrics import MetricsRegistry, MetricsServer, parse_addr  # noqa: E402
+    from gcmode import GC_COUNTERS, MODES as GC_MODES, GcControl, GcMonitor  # noqa: E402
+    from rt import add_rt_args, rt_from_args  # noqa: E402
+    from pcap import wall_offset_ns  # noqa: E402
+    from writer import AsyncPcapLog  # noqa: E402
 
 HDR_FMT = ">4sBBHHIQQH"
 HDR_LEN = 32
 FEAT_LEN = 16
 DELTA_FMT = ">iiHBBI"
 DELTA_LEN = 16
+FEAT_FMT = ">ihHII"
+
+# Precompiled for the hot loop: unpack_from reads in place instead of slicing
+HDR = struct.Struct(HDR_FMT)
+DELTA = struct.Struct(DELTA_FMT)
+FEAT = struct.Struct(FEAT_FMT)
+REPLY = struct.Struct(HDR_FMT + FEAT_FMT[1:])   # header + features in one bytes object
+T_SEND_LE = struct.Struct("<Q")                  # t_send is little-endian on the wire
+T_SEND_OFF = 14
+SCORE = struct.Struct(">I")
 
 def find_ip(ol, key_substr):
     matches = [k for k in ol.ip_dict.keys() if key_substr in k]
@@ -26,6 +69,42 @@ def find_ip(ol, key_substr):
             return getattr(ol, k)
     return getattr(ol, matches[0])
 
+class FabricCounters:
+    """
+    Per-packet snapshot of the fabric cycle counters for msg_type 5
+    (lob_v1_fabric_t): latency_timer_0 (hw_start -> MLP done),
+    latency_timer_1 (hw_start -> feature done) and feature_pipeline's
+    feat_dbg_cycles. Missing IPs read as 0 with their valid bit clear.
+    """
+    CYC_REG = 0x10      # latency_timer cycle count / feature_pipeline feat_dbg_cycles
+    RESET_REG = 0x20
+
+    def __init__(self, ol):
+        self.ips = []
+        for name in ('latency_timer_0', 'latency_timer_1', 'feature_pipeline'):
+            try:
+                self.ips.append(find_ip(ol, name))
+            except Exception:
+                self.ips.append(None)
+        self.timers = [ip for ip in self.ips[:2] if ip is not None]
+
+    def arm(self):
+        """Reset and re-arm both timers (as soc_latency_diag.reset_timers_and_start)."""
+        for t in self.timers:
+            t.write(self.RESET_REG, 1)
+            t.write(self.RESET_REG, 0)
+            t.write(0x00, 0x81)
+
+    def read(self):
+        vals, valid = [], 0
+        for i, ip in enumerate(self.ips):
+            if ip is None:
+                vals.append(0)
+                continue
+            vals.append(ip.read(self.CYC_REG) & 0xFFFFFFFF)
+            valid |= 1 << i
+        return (*vals, valid)
+
 def now_ns():
     try:
         return time.clock_gettime_ns(time.CLOCK_TAI)
@@ -35,24 +114,42 @@ def now_ns():
         except Exception:
             return time.time_ns()
 
-def receiver_thread(sock, rx_queue, stats, enable_timing):
+def mono_ns():
+    return time.clock_gettime_ns(time.CLOCK_MONOTONIC_RAW)
+
+def receiver_thread(sock, rx_queue, metrics, enable_timing, capture=None):
     """Continuously drain UDP socket and push to processing queue."""
+    stats = metrics.counts
+    if capture is not None:
+        cap, wall_off, local = capture   # --pcap: requests as received, stamped at T2
     while True:
         try:
             data, addr = sock.recvfrom(4096)
             # T2: PYNQ RX timestamp (immediately after recvfrom)
-            t2_rx_ns = time.clock_gettime_ns(time.CLOCK_MONOTONIC_RAW) if enable_timing else 0
+            t2_rx_ns = time.clock_gettime_ns(time.CLOCK_MONOTONIC_RAW)  # also PING t_rx, so always taken
             rx_queue.put((data, addr, time.time(), t2_rx_ns))
+            if capture is not None:
+                cap.append((t2_rx_ns + wall_off, data, addr, local))
             stats['rx_pkts'] += 1
         except Exception as e:
             print(f"Receiver error: {e}")
             break
 
-def sender_thread(sock, tx_queue, stats, enable_timing):
+def sender_thread(sock, tx_queue, metrics, enable_timing):
     """Continuously send replies from output queue."""
+    stats = metrics.counts
+    timed = bool(metrics.stages)
     while True:
         try:
-            reply, addr, timing_data = tx_queue.get()
+            reply, addr, timing_data, t_enq = tx_queue.get()
+            t_deq = mono_ns()
+            if timed:
+                metrics.observe('tx_queue', t_deq - t_enq, t_deq)
+            if timing_data and 'ping_rx' in timing_data:
+                # lob_v1_ping_ts_t: server rx/tx for host clock sync (NTP-style)
+                reply = reply + struct.pack('>QQ', timing_data['ping_rx'],
+                                            time.clock_gettime_ns(time.CLOCK_MONOTONIC_RAW))
+                timing_data = None
             # T6: PYNQ TX timestamp (immediately before sendto)
             if enable_timing and timing_data:
                 t6_tx_ns = time.clock_gettime_ns(time.CLOCK_MONOTONIC_RAW)
@@ -70,19 +167,26 @@ def sender_thread(sock, tx_queue, stats, enable_timing):
                     timing_data.get('mlp_score', 0)
                 )
                 reply = reply + timing_payload
+                # msg_type 5: lob_v1_fabric_t after the telemetry block
+                if 'fabric' in timing_data:
+                    reply = reply + struct.pack('>IIII', *timing_data['fabric'])
             sock.sendto(reply, addr)
             stats['tx_pkts'] += 1
+            if timed:
+                metrics.observe('tx', mono_ns() - t_deq, t_deq)
         except Exception as e:
             print(f"Sender error: {e}")
             break
 
-def processor_thread(rx_queue, tx_queue, stats, args, dma_in, dma_out, in_buf, out_buf, dma_score, score_buf, dma_lock):
+def processor_thread(rx_queue, tx_queue, metrics, args, dma_in, dma_out, in_buf, out_buf, dma_score, score_buf, dma_lock,
+                     fabric=None, gcc=None):
     """Process packets through PL/DMA or PS fallback."""
     print("Processor thread started")
-    # State for feature computation
+    stats = metrics.counts
+    timed = bool(metrics.stages)
+    # State for feature computation: price / qty per level, updated in place
     N = 16
-    bid = [{'p': 0, 'q': 0} for _ in range(N)]
-    ask = [{'p': 0, 'q': 0} for _ in range(N)]
+    bid_p, bid_q, ask_p, ask_q = [0] * N, [0] * N, [0] * N, [0] * N
     ofi = 0
     burst = 0
     vol = 0
@@ -95,7 +199,12 @@ def processor_thread(rx_queue, tx_queue, stats, args, dma_in, dma_out, in_buf, o
     
     while True:
         try:
+            if gcc is not None and rx_queue.empty():
+                gcc.idle()
             data, addr, rx_time, t2_rx_ns = rx_queue.get(timeout=1.0)
+            t_deq = mono_ns()
+            if timed:
+                metrics.observe('rx_to_proc', t_deq - t2_rx_ns, t_deq)
             
             # Initialize timing data
             timing_data = None
@@ -106,7 +215,7 @@ def processor_thread(rx_queue, tx_queue, stats, args, dma_in, dma_out, in_buf, o
                 continue
             
             # Parse header
-            magic, ver, msg_type, flags_be, hdr_len_be, seq_be, t_send_be, t_ing_be, rsv2 = struct.unpack(HDR_FMT, data[:HDR_LEN])
+            magic, ver, msg_type, flags_be, hdr_len_be, seq_be, t_send_be, t_ing_be, rsv2 = HDR.unpack_from(data)
             
             if magic != b'LOB1':
                 continue
@@ -114,8 +223,8 @@ def processor_thread(rx_queue, tx_queue, stats, args, dma_in, dma_out, in_buf, o
             # Handle PING
             if msg_type == 0:
                 t_now = now_ns()
-                reply = struct.pack(HDR_FMT, b'LOB1', 1, 0, flags_be, HDR_LEN, seq_be, t_send_be, t_now, 0)
-                tx_queue.put((reply, addr, None))  # No timing for PING
+                reply = HDR.pack(b'LOB1', 1, 0, flags_be, HDR_LEN, seq_be, t_send_be, t_now, 0)
+                tx_queue.put((reply, addr, {'ping_rx': t2_rx_ns}, mono_ns()))  # sender appends t_tx
                 continue
             
             # Handle DELTAS
@@ -127,8 +236,8 @@ def processor_thread(rx_queue, tx_queue, stats, args, dma_in, dma_out, in_buf, o
             cnt = flags & 0x7FFF
             
             if reset:
-                bid = [{'p': 0, 'q': 0} for _ in range(N)]
-                ask = [{'p': 0, 'q': 0} for _ in range(N)]
+                for book in (bid_p, bid_q, ask_p, ask_q):
+                    book[:] = [0] * N
                 ofi = 0
                 burst = 0
                 vol = 0
@@ -140,32 +249,34 @@ def processor_thread(rx_queue, tx_queue, stats, args, dma_in, dma_out, in_buf, o
             for _ in range(min(cnt, (len(data) - HDR_LEN) // DELTA_LEN)):
                 if offset + DELTA_LEN > len(data):
                     break
-                delta_bytes = data[offset:offset + DELTA_LEN]
-                price_ticks, qty, level, side, action, _ = struct.unpack(DELTA_FMT, delta_bytes)
+                price_ticks, qty, level, side, action, _ = DELTA.unpack_from(data, offset)
                 offset += DELTA_LEN
                 
-                book = ask if side else bid
+                if side:
+                    book_p, book_q = ask_p, ask_q
+                else:
+                    book_p, book_q = bid_p, bid_q
                 if level < N:
                     if action == 0:
-                        book[level] = {'p': price_ticks, 'q': qty}
+                        book_p[level] = price_ticks
+                        book_q[level] = qty
                     elif action == 1 or action == 2:
-                        book[level]['q'] += qty
-                        if action == 1 or action == 2:
-                            ofi += qty if side == 0 else -qty
+                        book_q[level] += qty
+                        ofi += qty if side == 0 else -qty
                     elif action == 3:
-                        book[level]['q'] = 0
-                    if book[level]['q'] < 0:
-                        book[level]['q'] = 0
+                        book_q[level] = 0
+                    if book_q[level] < 0:
+                        book_q[level] = 0
             
             # --- REFLEX LANE START (ARM) ---
             # Simple Reflex Logic: Check for Crossed Book or Wide Spread
-            # bid[0] is best bid, ask[0] is best ask
+            # bid_p[0] / ask_p[0] are the best bid / ask
             reflex_act = 0 # NONE
             
-            best_bid_p = bid[0]['p']
-            best_ask_p = ask[0]['p']
-            best_bid_q = bid[0]['q']
-            best_ask_q = ask[0]['q']
+            best_bid_p = bid_p[0]
+            best_ask_p = ask_p[0]
+            best_bid_q = bid_q[0]
+            best_ask_q = ask_q[0]
             
             if best_bid_q > 0 and best_ask_q > 0:
                 if best_bid_p >= best_ask_p:
@@ -181,16 +292,11 @@ def processor_thread(rx_queue, tx_queue, stats, args, dma_in, dma_out, in_buf, o
             # --- REFLEX LANE END ---
             
             # Compute features
-            t_send_ns = (t_send_be >> 56) | ((t_send_be >> 40) & 0xFF00) | ((t_send_be >> 24) & 0xFF0000) | \
-                        ((t_send_be >> 8) & 0xFF000000) | ((t_send_be << 8) & 0xFF00000000) | \
-                        ((t_send_be << 24) & 0xFF0000000000) | ((t_send_be << 40) & 0xFF000000000000) | \
-                        ((t_send_be << 56) & 0xFF00000000000000)
+            t_send_ns = T_SEND_LE.unpack_from(data, T_SEND_OFF)[0]
             
             dt_ns = 0 if last_t is None else max(0, t_send_ns - last_t)
             last_t = t_send_ns
             
-            best_bid_q = bid[0]['q']
-            best_ask_q = ask[0]['q']
             denom = best_bid_q + best_ask_q
             imb_q1_15 = 0
             if denom > 0:
@@ -203,7 +309,7 @@ def processor_thread(rx_queue, tx_queue, stats, args, dma_in, dma_out, in_buf, o
                 if burst > 0xFFFFFFFF:
                     burst = 0xFFFFFFFF
                 
-                mid = (bid[0]['p'] + ask[0]['p']) // 2
+                mid = (best_bid_p + best_ask_p) // 2
                 dp = abs(mid - mid_prev)
                 mid_prev = mid
                 delta_v = ((dp * 65536 - vol) * dt_ns) // tau_vol_ns
@@ -237,9 +343,15 @@ def processor_thread(rx_queue, tx_queue, stats, args, dma_in, dma_out, in_buf, o
                         MM2S_SA = 0x18         # Source Address
                         MM2S_LENGTH = 0x28     # Length (triggers transfer)
                         
+                        if fabric is not None and timing_data:
+                            fabric.arm()
+
                         # T3: DMA start timestamp (before writing LENGTH register)
+                        t_dma = mono_ns()
+                        if timed:
+                            metrics.observe('proc_to_dma', t_dma - t_deq, t_dma)
                         if timing_data:
-                            timing_data['t3'] = time.clock_gettime_ns(time.CLOCK_MONOTONIC_RAW)
+                            timing_data['t3'] = t_dma
                         
                         # Start S2MM: set RS=1 (run)
                         dma_out._mmio.write(S2MM_DMACR, 0x0001)
@@ -289,20 +401,19 @@ def processor_thread(rx_queue, tx_queue, stats, args, dma_in, dma_out, in_buf, o
                                 
                                 # Read result
                                 out_buf.invalidate()
-                                ofi = int.from_bytes(out_buf[0:4].tobytes(), 'big', signed=True)
-                                imb_q1_15 = int.from_bytes(out_buf[4:6].tobytes(), 'big', signed=True)
-                                burst = int.from_bytes(out_buf[8:12].tobytes(), 'big')
-                                vol = int.from_bytes(out_buf[12:16].tobytes(), 'big')
+                                ofi, imb_q1_15, _, burst, vol = FEAT.unpack_from(out_buf)
                                 use_pl_result = True
                                 
                                 # Read Score
                                 mlp_score = 0
                                 if dma_score is not None:
                                     score_buf.invalidate()
-                                    mlp_score = int.from_bytes(score_buf[0:4].tobytes(), 'big')
+                                    mlp_score = SCORE.unpack_from(score_buf)[0]
                                 
                                 if timing_data:
                                     timing_data['mlp_score'] = mlp_score
+                                    if fabric is not None:
+                                        timing_data['fabric'] = fabric.read()
                                     
                                 stats['pl_done'] += 1
                                 if stats['pl_done'] <= 5:
@@ -326,6 +437,8 @@ def processor_thread(rx_queue, tx_queue, stats, args, dma_in, dma_out, in_buf, o
                             
                             time.sleep(0.00001)  # 10us poll interval
                         
+                        if timed:
+                            metrics.observe('dma_wait', mono_ns() - t_dma)
                         if not use_pl_result:
                             stats['pl_fallbacks'] += 1
                             
@@ -337,12 +450,22 @@ def processor_thread(rx_queue, tx_queue, stats, args, dma_in, dma_out, in_buf, o
                             traceback.print_exc()
             
             # Build reply
-            feat_payload = struct.pack(">ihHII", ofi, imb_q1_15, 0, burst & 0xFFFFFFFF, vol & 0xFFFFFFFF)
             t_now = now_ns()
-            # Use msg_type=4 (FEATURES_WITH_TIMING) when timing is enabled, otherwise msg_type=2 (FEATURES)
-            msg_type_reply = 4 if args.enable_timing else 2
-            reply = struct.pack(HDR_FMT, b'LOB1', 1, msg_type_reply, flags_be, HDR_LEN, seq_be, t_send_be, t_now, 0) + feat_payload
-            tx_queue.put((reply, addr, timing_data))
+            # msg_type=4 (FEATURES_WITH_TIMING) when timing is enabled, 5 (FEATURES_WITH_FABRIC)
+            # with --fabric-counters, otherwise msg_type=2 (FEATURES)
+            msg_type_reply = 2
+            if args.enable_timing:
+                msg_type_reply = 5 if fabric is not None else 4
+                if fabric is not None and 'fabric' not in timing_data:
+                    timing_data['fabric'] = (0, 0, 0, 0)  # PS fallback: no valid counters
+            reply = REPLY.pack(b'LOB1', 1, msg_type_reply, flags_be, HDR_LEN, seq_be, t_send_be, t_now, 0,
+                               ofi, imb_q1_15, 0, burst & 0xFFFFFFFF, vol & 0xFFFFFFFF)
+            t_enq = mono_ns()
+            if timed:
+                metrics.observe('proc', t_enq - t_deq, t_enq)
+            tx_queue.put((reply, addr, timing_data, t_enq))
+            if gcc is not None:
+                gcc.check()
         except queue.Empty:
             continue
         except Exception as e:
@@ -357,18 +480,38 @@ def main():
     ap.add_argument("--bit", default="feature_overlay.bit")
     ap.add_argument("--dummy", action="store_true")
     ap.add_argument("--dma-timeout-us", type=int, default=2000)
-    ap.add_argument("--log-interval", type=float, default=1.0)
+    ap.add_argument("--log-interval", type=float, default=1.0, help="KPI line every N s (0 = off; use the metrics endpoint)")
+    ap.add_argument("--metrics-http", default="", help="Prometheus text endpoint HOST:PORT, e.g. 127.0.0.1:9100 (default off)")
+    ap.add_argument("--metrics-udp", default="", help="JSON snapshot on any datagram, HOST:PORT, e.g. 192.168.10.2:9101 (default off)")
+    ap.add_argument("--metrics-window", type=float, default=10.0, help="Rolling histogram window (s)")
     ap.add_argument("--dma", default="axi_dma_0")
     ap.add_argument("--rx-queue-size", type=int, default=1000)
     ap.add_argument("--tx-queue-size", type=int, default=1000)
     ap.add_argument("--enable-timing", action="store_true", help="Include timing metadata in replies")
+    ap.add_argument("--fabric-counters", action="store_true",
+                    help="With --enable-timing: snapshot latency_timer_0/1 + feat_dbg_cycles per packet (msg_type 5)")
+    ap.add_argument("--gc-mode", choices=GC_MODES, default="default",
+                    help="freeze: gc.freeze() startup objects; latency: freeze + disable GC, collect when idle")
+    ap.add_argument("--gc-idle-allocs", type=int, default=700, help="latency: idle collect once this many allocations pend")
+    ap.add_argument("--gc-hard-cap", type=int, default=100_000, help="latency: force a collection past this many pending")
+    ap.add_argument("--gc-full-interval", type=float, default=10.0, help="latency: full collection at most every N s (idle)")
+    ap.add_argument("--pcap", help="Capture received LOB1 requests to this nanosecond pcap (background writer)")
+    add_rt_args(ap)
     args = ap.parse_args()
+
+    # Before the overlay and buffers are allocated, so --mlockall covers them
+    rtc = rt_from_args(args)
+    try:
+        rtc.apply_process()
+    except RuntimeError as e:
+        print(f"CPU isolation check failed: {e}")
+        return
     
     host, port = args.bind.rsplit(":", 1)
     port = int(port)
     
     # Initialize PL if not dummy
-    dma_in = dma_out = in_buf = out_buf = dma_score = score_buf = None
+    dma_in = dma_out = in_buf = out_buf = dma_score = score_buf = fabric = None
     if not args.dummy and args.bit:
         try:
             from pynq import Overlay, allocate
@@ -399,6 +542,10 @@ def main():
                 print("MLP score drain enabled (axi_dma_1)")
             except:
                 print("Warning: Could not find axi_dma_1 for MLP scores")
+
+            if args.fabric_counters and args.enable_timing:
+                fabric = FabricCounters(ol)
+                print(f"Fabric counters: valid mask 0x{fabric.read()[3]:x} (msg_type 5 replies)")
                 
         except Exception as e:
             print(f"PL init failed: {e}, using PS-only mode")
@@ -414,58 +561,81 @@ def main():
     s.bind((host, port))
     print(f"Listening on {host}:{port}")
     
-    # Shared stats
-    stats = {
-        'rx_pkts': 0,
-        'tx_pkts': 0,
-        'pl_used': 0,
-        'pl_done': 0,
-        'pl_fallbacks': 0,
-        'pl_timeouts': 0,
-        'pl_errors': 0
-    }
-    
     # Create queues and locks
     rx_queue = queue.Queue(maxsize=args.rx_queue_size)
     tx_queue = queue.Queue(maxsize=args.tx_queue_size)
     dma_lock = threading.Lock()
+
+    # Per-thread metrics: each thread is the only writer of its own counters
+    registry = MetricsRegistry(prefix='lob_echo')
+    w = args.metrics_window
+    # Stage histograms cost a record() per stage per packet; keep them off the path unless served
+    server = None
+    if args.metrics_http or args.metrics_udp:
+        try:
+            server = MetricsServer(registry,
+                                   http_addr=parse_addr(args.metrics_http) if args.metrics_http else None,
+                                   udp_addr=parse_addr(args.metrics_udp) if args.metrics_udp else None)
+            for kind, addr in server.addresses().items():
+                print(f"Metrics ({kind}) on {addr[0]}:{addr[1]}")
+        except OSError as e:   # port taken (node_exporter owns 9100) or address not local
+            print(f"Metrics endpoint disabled: {e}")
+    timed = server is not None
+    rx_m = registry.thread('rx', ['rx_pkts'], window_s=w)
+    tx_m = registry.thread('tx', ['tx_pkts'], ['tx_queue', 'tx'] if timed else (), window_s=w)
+    proc_m = registry.thread('proc', ['pl_used', 'pl_done', 'pl_fallbacks', 'pl_timeouts', 'pl_errors'],
+                             ['rx_to_proc', 'proc_to_dma', 'dma_wait', 'proc'] if timed else (), window_s=w)
+    registry.gauge('rx_queue_depth', rx_queue.qsize)
+    registry.gauge('tx_queue_depth', tx_queue.qsize)
+    gc_m = registry.thread('gc', GC_COUNTERS, ['gc_pause'], window_s=w)   # written by gc.callbacks
+    gc_mon = GcMonitor(gc_m)
+    gcc = GcControl(args.gc_mode, gc_mon, idle_allocs=args.gc_idle_allocs, hard_cap=args.gc_hard_cap,
+                    full_interval_s=args.gc_full_interval)
+    registry.gauge('gc_pending_allocs', gcc.pending)
+    registry.gauge('gc_max_pause_ns', lambda: gc_mon.max_pause_ns)
     
+    capture = None
+    if args.pcap:
+        capture = (AsyncPcapLog(args.pcap), wall_offset_ns(), (host, port))
+        print(f"Capturing requests to {args.pcap}")
+
     # Start threads
-    rx_thread = threading.Thread(target=receiver_thread, args=(s, rx_queue, stats, args.enable_timing), daemon=True)
-    tx_thread = threading.Thread(target=sender_thread, args=(s, tx_queue, stats, args.enable_timing), daemon=True)
-    proc_thread = threading.Thread(target=processor_thread, args=(rx_queue, tx_queue, stats, args, dma_in, dma_out, in_buf, out_buf, dma_score, score_buf, dma_lock), daemon=True)
+    rx_thread = threading.Thread(target=rtc.target('rx', receiver_thread), args=(s, rx_queue, rx_m, args.enable_timing, capture), daemon=True)
+    tx_thread = threading.Thread(target=rtc.target('tx', sender_thread), args=(s, tx_queue, tx_m, args.enable_timing), daemon=True)
+    proc_thread = threading.Thread(target=rtc.target('proc', processor_thread), args=(rx_queue, tx_queue, proc_m, args, dma_in, dma_out, in_buf, out_buf, dma_score, score_buf, dma_lock, fabric, gcc), daemon=True)
     
+    # Last step before the threads start: everything alive now is frozen out of GC
+    gcc.enter()
+    print(f"GC mode '{args.gc_mode}' ({gcc.frozen} objects frozen)")
     rx_thread.start()
     tx_thread.start()
     proc_thread.start()
+    rtc.wait(['rx', 'proc', 'tx'])
+    registry.info['rt'] = rtc.summary()
+    print(rtc.describe())
     
     print("Multi-threaded server started")
     
-    # Stats reporting
-    last_log = time.time()
-    last_stats = dict(stats)
-    
+    # Console KPI line (format parsed by host/udp/sweep.py --kpi-cmd); same counters as the endpoint
     try:
         while True:
-            time.sleep(0.1)
-            now = time.time()
-            if now - last_log >= args.log_interval:
-                rx_delta = stats['rx_pkts'] - last_stats['rx_pkts']
-                tx_delta = stats['tx_pkts'] - last_stats['tx_pkts']
-                pl_used = stats['pl_used'] - last_stats['pl_used']
-                pl_done = stats['pl_done'] - last_stats['pl_done']
-                pl_fb = stats['pl_fallbacks'] - last_stats['pl_fallbacks']
-                
-                print(f"KPI rx={stats['rx_pkts']} tx={stats['tx_pkts']} "
-                      f"pl_used={stats['pl_used']} pl_done={stats['pl_done']} "
-                      f"fallbacks={stats['pl_fallbacks']} timeouts={stats['pl_timeouts']} "
-                      f"errors={stats['pl_errors']} "
-                      f"rx_q={rx_queue.qsize()} tx_q={tx_queue.qsize()}")
-                
-                last_log = now
-                last_stats = dict(stats)
+            time.sleep(args.log_interval if args.log_interval > 0 else 1.0)
+            if args.log_interval > 0:
+                c = registry.counters()
+                print(f"KPI rx={c['rx_pkts']} tx={c['tx_pkts']} "
+                      f"pl_used={c['pl_used']} pl_done={c['pl_done']} "
+                      f"fallbacks={c['pl_fallbacks']} timeouts={c['pl_timeouts']} "
+                      f"errors={c['pl_errors']} "
+                      f"rx_q={rx_queue.qsize()} tx_q={tx_queue.qsize()} "
+                      f"gc_pauses={c['gc_pauses']} gc_max_us={gc_mon.max_pause_ns // 1000}")
     except KeyboardInterrupt:
         print("\nShutting down...")
+        gcc.exit()
+        if server is not None:
+            server.close()
+        if capture is not None:
+            capture[0].close()
+            print(f"pcap {args.pcap}: {capture[0].summary()}")
 
 if __name__ == '__main__':
     main()
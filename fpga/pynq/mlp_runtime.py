@@ -3,7 +3,7 @@
 MLP Score Capture Tool - Standalone utility for capturing raw MLP inference scores.
 
 This script:
-1. Programs MLP quantization scales from mlp_int8.json
+1. Programs MLP quantization scales from mlp_int8.json (or a binary model.bin bundle)
 2. Starts the MLP in auto-restart mode
 3. Continuously drains scores from axi_dma_1 S2MM channel
 4. Saves raw Q16.16 fixed-point scores to binary file
@@ -18,11 +18,25 @@ For integrated feature+score workflow, use feature_echo_mt.py instead.
 import argparse
 import json
 import struct
+import sys
 import time
 from pathlib import Path
 
 import numpy as np
 
+# Binary model bundle (models/exports/model_bundle.py). In a repo checkout it is
+# found via REPO_ROOT; on the board it can simply be copied next to this script.
+REPO_ROOT = Path(__file__).resolve().parents[2]
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+try:
+    from models.exports.model_bundle import load_bundle  # noqa: E402
+except ImportError:
+    try:
+        from model_bundle import load_bundle  # noqa: E402
+    except ImportError:
+        load_bundle = None
+
 
 def f32_to_u32(x: float) -> int:
     return struct.unpack("<I", struct.pack("<f", float(x)))[0]
@@ -40,8 +54,44 @@ def find_ip(ol, key_substr: str):
     return getattr(ol, matches[0])
 
 
+def read_spec_scales(spec_path: Path) -> dict:
+    """Scales from either an int8 JSON export or a binary bundle (.bin)."""
+    spec_path = Path(spec_path)
+    if spec_path.suffix == ".bin":
+        if load_bundle is None:
+            raise RuntimeError("model_bundle.py not importable; copy it next to this script or pass the JSON spec")
+        return load_bundle(spec_path).scales
+    return json.loads(spec_path.read_text())
+
+
+def stage_bundle(bundle_path: Path):
+    """
+    Copy a model bundle into one contiguous pynq buffer for weight_loader.
+
+    Returns (buf, bundle, args) where args are the physical pointers and sizes
+    in program_weight_loader() order. Sections are 64B aligned in the bundle, so
+    each pointer is just buf.physical_address + section offset.
+    """
+    from pynq import allocate
+    if load_bundle is None:
+        raise RuntimeError("model_bundle.py not importable; copy it next to this script")
+    bundle = load_bundle(Path(bundle_path))
+    if bundle.model_type != "mlp":
+        raise ValueError(f"weight_loader expects an mlp bundle, got {bundle.model_type}")
+    buf = allocate(shape=(bundle.nbytes,), dtype=np.uint8)
+    buf[:] = bundle.raw
+    buf.flush()
+    base = buf.physical_address
+    sec = bundle.sections
+    args = (
+        base + sec["w0"][0], base + sec["b0"][0], base + sec["w1"][0], base + sec["b1"][0],
+        sec["w0"][1], sec["b0"][1] // 4, sec["w1"][1], sec["b1"][1] // 4,
+    )
+    return buf, bundle, args
+
+
 def program_scales(mlp_ip, spec_path: Path):
-    spec = json.loads(Path(spec_path).read_text())
+    spec = read_spec_scales(spec_path)
     # Expect fields: in_scale, w0_scale, act0_scale, w1_scale
     rm = mlp_ip.register_map
     vals = {
@@ -154,7 +204,7 @@ def capture_scores(ol, dma_name: str, count_words: int, timeout_s: float, out_pa
 def main():
     ap = argparse.ArgumentParser(description="Configure MLP scales and capture scores via DMA on Pynq.")
     ap.add_argument("--bit", default="feature_overlay.bit", help="Bitstream to attach (will not reprogram if already loaded)")
-    ap.add_argument("--spec", default="mlp_int8.json", help="Quantized model spec with scales")
+    ap.add_argument("--spec", default="mlp_int8.json", help="Quantized model spec with scales (mlp_int8.json or model.bin bundle)")
     ap.add_argument("--count", type=int, default=65536, help="Number of 32-bit score words to capture")
     ap.add_argument("--timeout", type=float, default=5.0, help="Timeout (s) waiting for DMA capture")
     ap.add_argument("--out", default="scores.bin", help="Output binary of Q16.16 scores")
@@ -3,16 +3,43 @@
 Cycle-accurate benchmark for the simulated full datapath.
 Compares FPGA Hardware Latency vs CPU Reflex Latency.
 Also generates a 'Jitter Kill Shot' CDF plot.
+
+--pin / --fifo / --mlockall (host/telemetry/rt.py) place the benchmark loop;
+the effective placement goes into the .tlog metadata and
+latency_comparison.rt.json.
+
+CPU lane samples are single calls after a warmup, minus the median
+clock_gettime_ns pair; --cpu-suite adds the batched, per-component
+breakdown from host/strategy/microbench.py.
 """
+import argparse
 import struct
 import time
 import numpy as np
 import statistics
 import csv
+import sys
 from pathlib import Path
 
 from pynq import Overlay, allocate, MMIO
 
+# Binary copy of the raw samples (host/telemetry/binlog.py) when the repo is checked out on the board
+REPO_ROOT = Path(__file__).resolve().parents[2]
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+try:
+    from host.telemetry.binlog import COMPARISON_DTYPE, COMPARISON_SCHEMA, BinLogWriter, clock_metadata  # noqa: E402
+except ImportError:
+    BinLogWriter = None
+try:
+    from host.strategy import microbench  # noqa: E402
+except ImportError:
+    microbench = None
+try:
+    from host.telemetry import rt  # noqa: E402
+except ImportError:   # copied next to this script on the board
+    import rt  # noqa: E402
+
 # Default addresses (override via .hwh resolver when possible)
 # NOTE: Based on Vivado Address Editor, traffic_gen_const_0/s_axi_control is at 0x4003_0000.
 TGEN_CTRL_ADDR  = 0x40030000   # traffic_gen_const_0 s_axi_control
@@ -372,13 +399,18 @@ def cpu_reflex_task(packet_data):
         decision = 3
     return decision
 
-def run_cpu_benchmark(packet_data, iterations=1000):
+def run_cpu_benchmark(packet_data, iterations=1000, warmup=1000):
+    for _ in range(warmup):
+        cpu_reflex_task(packet_data)
+    overhead = int(round(microbench.timer_overhead().pair_ns)) if microbench is not None else 0
+    if overhead:
+        print(f"CPU lane: clock_gettime_ns pair overhead {overhead} ns subtracted")
     latencies = []
     for _ in range(iterations):
         t0 = time.clock_gettime_ns(time.CLOCK_MONOTONIC_RAW)
         _ = cpu_reflex_task(packet_data)
         t1 = time.clock_gettime_ns(time.CLOCK_MONOTONIC_RAW)
-        latencies.append(t1 - t0)
+        latencies.append(t1 - t0 - overhead)
     return latencies
 
 def run_fpga_benchmark(ol, buf, pkt_phys, num_words, iterations=1000):
@@ -436,6 +468,21 @@ def run_fpga_benchmark(ol, buf, pkt_phys, num_words, iterations=1000):
     return latencies_ns
 
 def main():
+    ap = argparse.ArgumentParser(description="CPU reflex vs FPGA hardware latency benchmark")
+    ap.add_argument("--iterations", type=int, default=100, help="Samples per lane")
+    ap.add_argument("--cpu-suite", action="store_true",
+                    help="Also run the per-component CPU micro-benchmarks (host/strategy/microbench.py)")
+    rt.add_rt_args(ap)
+    args = ap.parse_args()
+    rtc = rt.rt_from_args(args)
+    try:
+        rtc.apply_process()
+    except RuntimeError as e:
+        print(f"CPU isolation check failed: {e}")
+        return
+    rtc.apply_thread('main')
+    print(rtc.describe())
+
     print("Loading Overlay...")
     ol = Overlay("/home/xilinx/feature_overlay.bit")
     
@@ -551,7 +598,7 @@ def main():
     program_traffic_gen_const(header_words)
     dump_regs("Before benchmark loop")
 
-    N = 100
+    N = args.iterations
     print(f"\n--- RUNNING BENCHMARKS (N={N}) ---")
     
     # 1. CPU Reflex
@@ -583,6 +630,12 @@ def main():
     report("FPGA Neuro Lane", fpga_stats)
     print("="*80)
     
+    if args.cpu_suite and microbench is not None:
+        timer = microbench.timer_overhead()
+        results = [microbench.bench(name, make(), timer) for name, make in microbench.CASES.items()]
+        print("\nCPU lane components:")
+        print(microbench.format_results(results, timer))
+
     # Ratio
     if cpu_stats and fpga_stats:
         cpu_avg = statistics.mean(cpu_stats)
@@ -602,6 +655,18 @@ def main():
             f = fpga_stats[i] if i < len(fpga_stats) else ''
             writer.writerow([c, f])
     
+    if BinLogWriter is not None:
+        n = max(len(cpu_stats), len(fpga_stats))
+        rec = np.full(n, -1, dtype=COMPARISON_DTYPE)
+        rec['cpu_ns'][:len(cpu_stats)] = cpu_stats
+        rec['fpga_ns'][:len(fpga_stats)] = fpga_stats
+        with BinLogWriter('latency_comparison.tlog', COMPARISON_DTYPE, COMPARISON_SCHEMA,
+                          clocks=clock_metadata(remote_clock=None),
+                          meta={'fabric_mhz': 125, 'rt': rtc.summary()}) as w:
+            w.append_many(rec)
+        print("Binary copy saved to 'latency_comparison.tlog' (preferred by analyze_soc.py).")
+
+    rt.save(rt.sidecar_path('latency_comparison.csv'), rtc)
     print("Data saved. Now copy 'latency_comparison.csv' to host and run the plotter.")
 
 if __name__ == "__main__":
@@ -0,0 +1,63 @@
+import json
+import os
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.dirname(__file__)))
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from models.exports.model_bundle import write_bundle
+from weight_reload import SimBackend, WeightReloader
+
+MLP_JSON = Path(__file__).resolve().parents[2] / "models" / "exports" / "int8" / "mlp_int8.json"
+
+
+class TestWeightReload(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        spec = json.loads(MLP_JSON.read_text())
+        self.spec_a = spec
+        self.spec_b = dict(spec, w0_int8=(-np.array(spec["w0_int8"], dtype=np.int16)).clip(-128, 127).tolist())
+        self.path_a = write_bundle(Path(self.tmp.name) / "a.bin", self.spec_a)
+        self.path_b = write_bundle(Path(self.tmp.name) / "b.bin", self.spec_b)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_swap_loads_staged_weights(self):
+        be = SimBackend()
+        rl = WeightReloader(be)
+        for path, spec in ((self.path_a, self.spec_a), (self.path_b, self.spec_b)):
+            be.feed(4)
+            rl.stage(path)
+            rl.swap()
+            w0 = np.frombuffer(be.mlp.weights["w0"], dtype=np.int8).reshape(32, 4)
+            np.testing.assert_array_equal(w0, np.array(spec["w0_int8"], dtype=np.int8))
+            np.testing.assert_array_equal(be.mlp.weights["b0"], np.array(spec["b0_int32"], dtype=np.int32))
+        self.assertEqual(rl.active, 1)
+        self.assertEqual(be.mlp.generation, 2)
+
+    def test_swap_does_not_drop_scores(self):
+        be = SimBackend()
+        rl = WeightReloader(be)
+        be.feed(100)
+        be.mlp.write(0x00, 0x81)
+        be.run(10)
+        rl.stage(self.path_a)
+        st = rl.swap()
+        be.run(200)
+        seqs = [s for s, _ in be.mlp.scores]
+        gens = [g for _, g in be.mlp.scores]
+        self.assertEqual(seqs, list(range(100)))
+        # Weights switch exactly once, at a packet boundary
+        self.assertEqual(gens, sorted(gens))
+        self.assertEqual(set(gens), {0, 1})
+        self.assertTrue(st.loader_done)
+
+
+if __name__ == '__main__':
+    unittest.main()
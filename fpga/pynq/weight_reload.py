@@ -0,0 +1,399 @@
+#!/usr/bin/env python3
+"""
+Hot weight reload for mlp_infer_stream.
+
+The bench path in run_cycle_bench.py (ENABLE_WEIGHT_LOAD) stops the core,
+streams weights and waits, which is fine at init but stalls scoring for the
+whole DDR fetch. This keeps two bundle slots in DDR (see
+models/exports/model_bundle.py) and swaps the inactive one in at a packet
+boundary:
+
+  1. stage():  copy the next bundle into the inactive slot (off the hot path)
+  2. swap():
+       - program weight_loader pointers/sizes and start it early; it fills the
+         s_axis_wload FIFO and then back-pressures until the MLP drains it
+       - clear auto-restart; the current invocation finishes its packet and the
+         core goes idle (the packet boundary)
+       - reload=1 + scales + ap_start; MLP consumes the stream and returns
+       - reload=0, ap_start|auto_restart (0x81)
+     Features arriving during the blackout queue in the AXIS FIFOs upstream,
+     they are scored late rather than dropped.
+
+Blackout = idle observed -> auto-restart re-armed. Measured on the ARM clock.
+
+A register-level simulation (SimBackend) mirrors the AP_CTRL handshake and the
+weight_loader word packing, so swap() can be exercised off-board:
+
+  python3 weight_reload.py --sim --bundle model.bin --swaps 50
+"""
+import argparse
+import statistics
+import time
+from collections import deque
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+
+from mlp_runtime import f32_to_u32, load_bundle
+
+# Default addresses (same as run_cycle_bench.py; override from .hwh when possible)
+MLP_ADDR        = 0x40000000   # mlp_infer_stream_0 s_axi_control
+WLOAD_CTRL_ADDR = 0x40050000   # weight_loader_0 s_axi_control
+WLOAD_PTR_ADDR  = 0x40010000   # weight_loader_0 s_axi_control_r (pointers)
+
+# mlp_infer_stream CTRL map
+AP_CTRL = 0x00
+MLP_ISR = 0x0C
+MLP_SCALES = {"in_scale": 0x10, "w0_scale": 0x18, "act0_scale": 0x20, "w1_scale": 0x28}
+MLP_RELOAD = 0x30
+MLP_SIZES = (0x40, 0x48, 0x50, 0x58)  # w0_bytes, b0_words, w1_bytes, b1_words
+
+# weight_loader maps
+WL_SIZES = (0x10, 0x18, 0x20, 0x28)
+WL_START = 0x30
+WL_PTRS = (0x10, 0x1C, 0x28, 0x34)   # low word; high word at +4
+
+AP_START = 0x01
+AP_DONE = 0x02
+AP_IDLE = 0x04
+AP_AUTO_RESTART = 0x80
+
+
+@dataclass
+class ReloadStats:
+    generation: int
+    slot: int
+    drain_ns: int      # clear auto-restart -> idle (waiting for the packet boundary)
+    blackout_ns: int   # idle -> auto-restart re-armed (no scoring)
+    loader_done: bool
+
+
+class PynqBackend:
+    def __init__(self, mlp_addr=MLP_ADDR, wl_ctrl_addr=WLOAD_CTRL_ADDR, wl_ptr_addr=WLOAD_PTR_ADDR):
+        from pynq import MMIO
+        self.mlp = MMIO(mlp_addr, 65536)
+        self.wl_ctrl = MMIO(wl_ctrl_addr, 65536)
+        self.wl_ptr = MMIO(wl_ptr_addr, 65536)
+
+    def allocate(self, nbytes: int):
+        from pynq import allocate
+        return allocate(shape=(nbytes,), dtype=np.uint8)
+
+
+class WeightReloader:
+    def __init__(self, backend, timeout_s: float = 0.2):
+        self.be = backend
+        self.timeout_s = timeout_s
+        self.slots = [None, None]     # (buffer, bundle)
+        self.active = None            # slot index currently loaded in the MLP
+        self.generation = 0
+
+    def _inactive(self) -> int:
+        return 0 if self.active != 0 else 1
+
+    def stage(self, bundle_path: Path) -> int:
+        """Copy a bundle into the inactive slot. Returns the slot index."""
+        bundle = load_bundle(Path(bundle_path))
+        if bundle.model_type != "mlp":
+            raise ValueError(f"weight_loader expects an mlp bundle, got {bundle.model_type}")
+        slot = self._inactive()
+        buf = self.slots[slot][0] if self.slots[slot] else None
+        if buf is None or buf.shape[0] < bundle.nbytes:
+            if buf is not None and hasattr(buf, "freebuffer"):
+                buf.freebuffer()
+            buf = self.be.allocate(bundle.nbytes)
+        buf[:bundle.nbytes] = bundle.raw
+        buf.flush()
+        self.slots[slot] = (buf, bundle)
+        return slot
+
+    def _program_loader(self, slot: int):
+        buf, bundle = self.slots[slot]
+        base = buf.physical_address
+        sizes = (
+            bundle.sections["w0"][1], bundle.sections["b0"][1] // 4,
+            bundle.sections["w1"][1], bundle.sections["b1"][1] // 4,
+        )
+        for off, name in zip(WL_PTRS, ("w0", "b0", "w1", "b1")):
+            addr = base + bundle.sections[name][0]
+            self.be.wl_ptr.write(off, addr & 0xFFFFFFFF)
+            self.be.wl_ptr.write(off + 4, (addr >> 32) & 0xFFFFFFFF)
+        for off, v in zip(WL_SIZES, sizes):
+            self.be.wl_ctrl.write(off, int(v))
+        for off, v in zip(MLP_SIZES, sizes):
+            self.be.mlp.write(off, int(v))   # latched at the next ap_start only
+        return bundle
+
+    def _wait(self, mmio, off: int, mask: int) -> bool:
+        t0 = time.perf_counter()
+        while time.perf_counter() - t0 < self.timeout_s:
+            if mmio.read(off) & mask:
+                return True
+        return False
+
+    def swap(self, slot: int = None) -> ReloadStats:
+        """Swap the staged slot into the MLP at the next packet boundary."""
+        slot = self._inactive() if slot is None else slot
+        if self.slots[slot] is None:
+            raise RuntimeError(f"slot {slot} not staged")
+        mlp = self.be.mlp
+        bundle = self._program_loader(slot)
+
+        # Prefetch: loader fills the wload FIFO while the MLP is still scoring
+        self.be.wl_ctrl.write(WL_START, 1)
+        self.be.wl_ctrl.write(AP_CTRL, AP_START)
+
+        t0 = time.perf_counter_ns()
+        mlp.write(AP_CTRL, 0x00)  # clear auto-restart; current invocation runs to completion
+        if not self._wait(mlp, AP_CTRL, AP_IDLE):
+            mlp.write(AP_CTRL, AP_START | AP_AUTO_RESTART)
+            raise RuntimeError("MLP did not reach a packet boundary (no traffic?); auto-restart re-armed")
+        t1 = time.perf_counter_ns()
+
+        mlp.write(MLP_ISR, mlp.read(MLP_ISR))  # drop stale done from the last inference
+        for name, off in MLP_SCALES.items():
+            mlp.write(off, f32_to_u32(bundle.scales[name]))
+        mlp.write(MLP_RELOAD, 1)
+        mlp.write(AP_CTRL, AP_START)
+        if not self._wait(mlp, MLP_ISR, 0x1):
+            mlp.write(MLP_RELOAD, 0)
+            mlp.write(AP_CTRL, AP_START | AP_AUTO_RESTART)
+            raise RuntimeError("MLP reload did not signal done (weight stream short?)")
+        mlp.write(MLP_ISR, 0x1)
+        mlp.write(MLP_RELOAD, 0)
+        mlp.write(AP_CTRL, AP_START | AP_AUTO_RESTART)
+        t2 = time.perf_counter_ns()
+
+        loader_done = self._wait(self.be.wl_ctrl, AP_CTRL, AP_DONE | AP_IDLE)
+        self.be.wl_ctrl.write(WL_START, 0)
+        self.active = slot
+        self.generation += 1
+        return ReloadStats(self.generation, slot, t1 - t0, t2 - t1, loader_done)
+
+
+# ---------------------------------------------------------------------------
+# Register-level simulation
+# ---------------------------------------------------------------------------
+
+class SimBuffer:
+    def __init__(self, nbytes: int, phys: int):
+        self.data = np.zeros(nbytes, dtype=np.uint8)
+        self.shape = self.data.shape
+        self.physical_address = phys
+
+    def __setitem__(self, key, value):
+        self.data[key] = value
+
+    def flush(self):
+        pass
+
+
+class SimMLP:
+    """
+    AP_CTRL/ISR model of mlp_infer_stream. One step per register access:
+    in inference mode a step scores one queued feature (blocks if none),
+    in reload mode it consumes the full weight stream or stays busy.
+    """
+    def __init__(self, wload: deque):
+        self.regs = {}
+        self.wload = wload
+        self.features = deque()
+        self.scores = []          # (seq, generation of the weights used)
+        self.weights = None
+        self.generation = 0
+        self.busy = False
+        self.auto_restart = False
+        self.isr = 0
+
+    def write(self, off, val):
+        if off == AP_CTRL:
+            self.auto_restart = bool(val & AP_AUTO_RESTART)
+            if val & AP_START:
+                self.busy = True
+        elif off == MLP_ISR:
+            self.isr &= ~val
+        else:
+            self.regs[off] = val
+
+    def read(self, off):
+        self.step()
+        if off == AP_CTRL:
+            return (AP_START if self.busy else AP_IDLE) | (AP_AUTO_RESTART if self.auto_restart else 0)
+        if off == MLP_ISR:
+            return self.isr
+        return self.regs.get(off, 0)
+
+    def step(self):
+        if not self.busy:
+            return
+        if self.regs.get(MLP_RELOAD, 0) == 1:
+            w0b, b0w, w1b, b1w = (self.regs.get(o, 0) for o in MLP_SIZES)
+            need = (w0b + 3) // 4 + b0w + (w1b + 3) // 4 + b1w
+            if len(self.wload) < need:
+                return
+            words = np.array([self.wload.popleft() for _ in range(need)], dtype=">u4")
+            n0, n1 = (w0b + 3) // 4, (w1b + 3) // 4
+            self.weights = {
+                "w0": words[:n0].tobytes()[:w0b],
+                "b0": words[n0:n0 + b0w].astype(np.uint32).view(np.int32).copy(),
+                "w1": words[n0 + b0w:n0 + b0w + n1].tobytes()[:w1b],
+                "b1": words[n0 + b0w + n1:].astype(np.uint32).view(np.int32).copy(),
+            }
+            self.generation += 1
+            self.isr |= 0x1
+            self.busy = False     # reload returns without output
+            return
+        if not self.features:
+            return                # blocked on s_axis_feat
+        self.scores.append((self.features.popleft(), self.generation))
+        self.isr |= 0x1
+        self.busy = self.auto_restart
+
+
+class SimWeightLoader:
+    """CTRL + pointer windows of weight_loader; streams words on ap_start."""
+    def __init__(self, backend, wload: deque):
+        self.be = backend
+        self.wload = wload
+        self.ctrl = {}
+        self.ptr = {}
+        self.done = False
+        outer = self
+
+        class Window:
+            def __init__(self, regs, is_ctrl):
+                self.regs = regs
+                self.is_ctrl = is_ctrl
+
+            def write(self, off, val):
+                if self.is_ctrl and off == AP_CTRL:
+                    if val & AP_START:
+                        outer.run()
+                    return
+                self.regs[off] = val
+
+            def read(self, off):
+                if self.is_ctrl and off == AP_CTRL:
+                    return AP_IDLE | (AP_DONE if outer.done else 0)
+                return self.regs.get(off, 0)
+
+        self.ctrl_window = Window(self.ctrl, True)
+        self.ptr_window = Window(self.ptr, False)
+
+    def run(self):
+        self.done = False
+        if not self.ctrl.get(WL_START, 0):
+            self.done = True
+            return
+        w0b, b0w, w1b, b1w = (self.ctrl.get(o, 0) for o in WL_SIZES)
+        ptrs = [self.ptr.get(o, 0) | (self.ptr.get(o + 4, 0) << 32) for o in WL_PTRS]
+
+        def pack_bytes(raw):
+            pad = (-len(raw)) % 4
+            return np.frombuffer(raw + b"\x00" * pad, dtype=">u4").tolist()
+
+        self.wload.extend(pack_bytes(self.be.read_ddr(ptrs[0], w0b)))
+        self.wload.extend(np.frombuffer(self.be.read_ddr(ptrs[1], 4 * b0w), dtype="<u4").tolist())
+        self.wload.extend(pack_bytes(self.be.read_ddr(ptrs[2], w1b)))
+        self.wload.extend(np.frombuffer(self.be.read_ddr(ptrs[3], 4 * b1w), dtype="<u4").tolist())
+        self.done = True
+
+
+class SimBackend:
+    def __init__(self):
+        self.wload = deque()
+        self.mlp = SimMLP(self.wload)
+        self.loader = SimWeightLoader(self, self.wload)
+        self.wl_ctrl = self.loader.ctrl_window
+        self.wl_ptr = self.loader.ptr_window
+        self.buffers = []
+        self.next_phys = 0x1000_0000
+
+    def allocate(self, nbytes: int) -> SimBuffer:
+        buf = SimBuffer(nbytes, self.next_phys)
+        self.next_phys += (nbytes + 0xFFF) & ~0xFFF
+        self.buffers.append(buf)
+        return buf
+
+    def read_ddr(self, addr: int, nbytes: int) -> bytes:
+        for buf in self.buffers:
+            off = addr - buf.physical_address
+            if 0 <= off and off + nbytes <= buf.data.size:
+                return buf.data[off:off + nbytes].tobytes()
+        raise RuntimeError(f"sim DDR read outside any buffer: 0x{addr:x}+{nbytes}")
+
+    def feed(self, n: int, start_seq: int = 0):
+        self.mlp.features.extend(range(start_seq, start_seq + n))
+
+    def run(self, steps: int):
+        for _ in range(steps):
+            self.mlp.step()
+
+
+def summarize_ns(label: str, samples: list):
+    if not samples:
+        print(f"{label}: NO DATA")
+        return
+    print(f"\n[{label}]")
+    print(f"  Samples        : {len(samples)}")
+    print(f"  ns (avg)       : {statistics.mean(samples):.1f}")
+    print(f"     median      : {statistics.median(samples):.1f}")
+    print(f"     min/max     : {min(samples)} / {max(samples)}")
+    print(f"     stdev       : {statistics.stdev(samples) if len(samples) > 1 else 0.0:.1f}")
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Double-buffered hot weight reload for mlp_infer_stream.")
+    ap.add_argument("--bundle", action="append", required=True, help="model.bin bundle(s); alternated across swaps")
+    ap.add_argument("--swaps", type=int, default=10)
+    ap.add_argument("--interval", type=float, default=0.1, help="Seconds between swaps on hardware")
+    ap.add_argument("--sim", action="store_true", help="Use the register-level simulation instead of MMIO")
+    ap.add_argument("--bit", default="feature_overlay.bit", help="Overlay to attach (not reprogrammed)")
+    args = ap.parse_args()
+
+    if args.sim:
+        be = SimBackend()
+    else:
+        from pynq import Overlay
+        ol = Overlay(args.bit, download=False)
+        addrs = {"mlp": MLP_ADDR, "ctrl": WLOAD_CTRL_ADDR, "ptr": WLOAD_PTR_ADDR}
+        for k, v in ol.ip_dict.items():
+            name = k.lower()
+            if "mlp_infer_stream" in name and "s_axi_control" in name and "phys_addr" in v:
+                addrs["mlp"] = v["phys_addr"]
+            if "weight_loader" in name and "/s_axi_control" in name and "phys_addr" in v:
+                addrs["ctrl"] = v["phys_addr"]
+            if "weight_loader" in name and ("/s_axi_ctrl" in name or "control_r" in name) and "phys_addr" in v:
+                addrs["ptr"] = v["phys_addr"]
+        be = PynqBackend(addrs["mlp"], addrs["ctrl"], addrs["ptr"])
+
+    rl = WeightReloader(be)
+    drain, blackout = [], []
+    seq = 0
+    for i in range(args.swaps):
+        rl.stage(Path(args.bundle[i % len(args.bundle)]))
+        if args.sim:
+            be.feed(64, seq)
+            seq += 64
+            be.run(16)
+        st = rl.swap()
+        drain.append(st.drain_ns)
+        blackout.append(st.blackout_ns)
+        if not st.loader_done:
+            print(f"warning: weight_loader not done after swap {st.generation}")
+        if args.sim:
+            be.run(64)
+        else:
+            time.sleep(args.interval)
+
+    summarize_ns("Drain to packet boundary", drain)
+    summarize_ns("Reload blackout", blackout)
+    if args.sim:
+        seqs = [s for s, _ in be.mlp.scores]
+        print(f"\nsim: scored {len(seqs)}/{seq} features, in order={seqs == list(range(len(seqs)))}, "
+              f"weight generation={be.mlp.generation}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,266 @@
+"""
+asyncio client core for the LOB1 UDP echo.
+
+One DatagramProtocol socket carries both directions. A pacing task pulls
+packets from a source (sources.py) and sends each at its scheduled offset;
+the core owns the header seq and t_send fields. Replies are matched to
+in-flight requests by seq, decoded by the configured decoders (decoders.py)
+and handed to sinks (sinks.py). Every request ends exactly once in
+Sink.on_reply or Sink.on_timeout; timeouts are event-loop timers, so an idle
+client sleeps instead of spinning on BlockingIOError. Requests still in
+flight when the run stops (Ctrl+C, a source error) end in on_timeout.
+
+Event-loop timers are only ~1 ms granular. With spin_ns (--spin-us) the
+pacing task sleeps until that close to a send and then spins on
+asyncio.sleep(0), which keeps reading replies while it waits; that buys
+sub-ms send times for a core that is busy in the spin, so it is off by
+default. Sustained high rates belong to the --gen path (generator.py).
+
+max_inflight bounds outstanding requests (1 = the old closed-loop runners).
+"""
+import asyncio
+import socket
+import struct
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterable, Optional, Sequence, Tuple
+
+from host.telemetry.histogram import LatencyHistogram
+
+HDR_FMT = '>4sBBHHIQQH'
+HDR_LEN = 32
+DELTA_FMT = '>iiHBBI'
+MAGIC = b'LOB1'
+SEQ_OFF = 10
+T_SEND_OFF = 14
+
+
+def now_ns() -> int:
+    return time.clock_gettime_ns(time.CLOCK_MONOTONIC_RAW)
+
+
+def deltas_packet(deltas: Sequence[Tuple[int, int, int, int, int]], flags: Optional[int] = None) -> bytes:
+    """MSG_DELTAS packet; seq and t_send are filled in by the client at send time."""
+    if flags is None:
+        flags = 0x8000 | len(deltas)  # reset + count, as the existing runners send
+    hdr = struct.pack(HDR_FMT, MAGIC, 1, 1, flags, HDR_LEN, 0, 0, 0, 0)
+    return hdr + b''.join(struct.pack(DELTA_FMT, p, q, lvl, side, act, 0) for p, q, lvl, side, act in deltas)
+
+
+@dataclass
+class Outgoing:
+    """One packet from a source: send at offset_ns after the run starts."""
+    offset_ns: int
+    payload: bytes
+    meta: dict = field(default_factory=dict)
+
+
+@dataclass
+class Request:
+    seq: int
+    t_send: int             # CLOCK_MONOTONIC_RAW right before sendto
+    t_send_wall: int        # value written into the header
+    payload: bytes
+    meta: dict = field(default_factory=dict)
+    timer: Optional[asyncio.TimerHandle] = None
+
+
+@dataclass
+class Reply:
+    seq: int
+    t_recv: int
+    data: bytes
+    fields: dict
+
+
+class Sink:
+    def on_send(self, req: Request) -> None:
+        pass
+
+    def on_reply(self, req: Request, reply: Reply) -> None:
+        pass
+
+    def on_timeout(self, req: Request) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+
+@dataclass
+class ClientStats:
+    sent: int = 0
+    replies: int = 0
+    timeouts: int = 0
+    unmatched: int = 0      # replies after their timeout, or for a seq never sent
+    ignored: int = 0        # non-LOB1 or short datagrams
+    errors: int = 0
+    t_start: int = 0
+    t_end: int = 0
+    rtt: LatencyHistogram = field(default_factory=LatencyHistogram)
+
+    def summary(self) -> str:
+        dur = max(self.t_end - self.t_start, 1) / 1e9
+        s = (f"sent={self.sent} replies={self.replies} timeouts={self.timeouts} unmatched={self.unmatched} "
+             f"rate={self.sent / dur:.1f} pps")
+        if self.rtt.total:
+            p50, p99 = self.rtt.percentiles([50, 99])
+            s += f" rtt_us p50={p50 / 1e3:.1f} p99={p99 / 1e3:.1f} max={self.rtt.max / 1e3:.1f}"
+        return s
+
+
+class _Protocol(asyncio.DatagramProtocol):
+    def __init__(self, client: 'LobClient'):
+        self.client = client
+
+    def datagram_received(self, data, addr):
+        self.client._on_datagram(data, now_ns())
+
+    def error_received(self, exc):
+        self.client.stats.errors += 1
+
+
+Decoder = Callable[[bytes], dict]
+
+
+class LobClient:
+    def __init__(self, dst: Tuple[str, int], bind: Optional[Tuple[str, int]] = None,
+                 decoders: Iterable[Decoder] = (), sinks: Iterable[Sink] = (),
+                 timeout_s: float = 0.02, max_inflight: int = 64, rcvbuf: int = 8 << 20,
+                 spin_ns: int = 0):
+        self.dst = dst
+        self.bind = bind
+        self.decoders = list(decoders)
+        self.sinks = list(sinks)
+        self.timeout_s = timeout_s
+        self.max_inflight = max(1, int(max_inflight))
+        self.rcvbuf = rcvbuf
+        self.spin_ns = max(0, int(spin_ns))
+        self.inflight: Dict[int, Request] = {}
+        self.stats = ClientStats()
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._idle: Optional[asyncio.Event] = None
+        self._loop = None
+
+    def _finish(self, req: Request) -> None:
+        if req.timer is not None:
+            req.timer.cancel()
+        self._slots.release()
+        if not self.inflight:
+            self._idle.set()
+
+    def _on_timeout(self, seq: int) -> None:
+        req = self.inflight.pop(seq, None)
+        if req is None:
+            return
+        req.timer = None
+        self.stats.timeouts += 1
+        for s in self.sinks:
+            s.on_timeout(req)
+        self._finish(req)
+
+    def _on_datagram(self, data: bytes, t_recv: int) -> None:
+        if len(data) < HDR_LEN or data[:4] != MAGIC:
+            self.stats.ignored += 1
+            return
+        seq = struct.unpack_from('>I', data, SEQ_OFF)[0]
+        req = self.inflight.pop(seq, None)
+        if req is None:
+            self.stats.unmatched += 1
+            return
+        fields = {'msg_type': data[5]}
+        for dec in self.decoders:
+            fields.update(dec(data))
+        reply = Reply(seq, t_recv, data, fields)
+        self.stats.replies += 1
+        self.stats.rtt.record(t_recv - req.t_send)
+        for s in self.sinks:
+            s.on_reply(req, reply)
+        self._finish(req)
+
+    async def run(self, source: Iterable[Outgoing]) -> ClientStats:
+        loop = asyncio.get_running_loop()
+        self._loop = loop
+        self._slots = asyncio.Semaphore(self.max_inflight)
+        self._idle = asyncio.Event()
+        self._idle.set()
+        transport, _ = await loop.create_datagram_endpoint(lambda: _Protocol(self), local_addr=self.bind)
+        sock = transport.get_extra_info('socket')
+        if sock is not None and self.rcvbuf:
+            try:
+                sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, self.rcvbuf)
+            except OSError:
+                pass
+        wall0 = time.time_ns() - now_ns()
+        start = now_ns()
+        self.stats.t_start = start
+        seq = 0
+        try:
+            for out in source:
+                due = start + out.offset_ns
+                wait = due - now_ns()
+                if wait > self.spin_ns:
+                    await asyncio.sleep((wait - self.spin_ns) / 1e9)
+                while now_ns() < due:
+                    await asyncio.sleep(0)
+                await self._slots.acquire()
+                pkt = bytearray(out.payload)
+                t = now_ns()
+                struct.pack_into('>IQ', pkt, SEQ_OFF, seq, t + wall0)
+                req = Request(seq, t, t + wall0, bytes(pkt), dict(out.meta))
+                transport.sendto(pkt, self.dst)
+                self.inflight[seq] = req
+                self._idle.clear()
+                req.timer = loop.call_later(self.timeout_s, self._on_timeout, seq)
+                self.stats.sent += 1
+                for s in self.sinks:
+                    s.on_send(req)
+                seq = (seq + 1) & 0xFFFFFFFF
+            await self._idle.wait()
+        finally:
+            self.stats.t_end = now_ns()
+            for req in self.inflight.values():
+                if req.timer is not None:
+                    req.timer.cancel()
+                    req.timer = None
+            for seq in list(self.inflight):
+                self._on_timeout(seq)
+            transport.close()
+            for s in self.sinks:
+                s.close()
+        return self.stats
+
+
+def run_client(client: LobClient, source: Iterable[Outgoing]) -> ClientStats:
+    """Blocking entry point for scripts; Ctrl+C stops sending and returns what was collected."""
+    try:
+        return asyncio.run(client.run(source))
+    except KeyboardInterrupt:
+        print("Stopping...")
+        return client.stats
+
+
+def add_net_args(parser, port: int, timeout_ms: float, max_inflight: int = 1) -> None:
+    """Network/flow-control options shared by the host scripts (defaults keep their old ports)."""
+    parser.add_argument('--bind', type=str, default='192.168.10.1', help='Local IP')
+    parser.add_argument('--port', type=int, default=port, help='Local UDP port')
+    parser.add_argument('--ip', type=str, default='192.168.10.2', help='Echo server IP')
+    parser.add_argument('--dst-port', type=int, default=4000)
+    parser.add_argument('--timeout-ms', type=float, default=timeout_ms, help='Reply timeout per request')
+    parser.add_argument('--max-inflight', type=int, default=max_inflight,
+                        help='Outstanding requests (1 = wait for each reply before the next send)')
+    parser.add_argument('--spin-us', type=float, default=0.0,
+                        help='Spin this long before each send for sub-ms pacing (costs a core while spinning)')
+    parser.add_argument('--pcap', type=str,
+                        help='Capture requests and replies to this nanosecond pcap (replay: open_loop_replay.py)')
+
+
+def client_from_args(args, decoders=(), sinks=()) -> LobClient:
+    sinks = list(sinks)
+    if getattr(args, 'pcap', None):
+        from host.client.sinks import PcapSink   # sinks imports this module
+        sinks.append(PcapSink(args.pcap, (args.bind, args.port), (args.ip, args.dst_port)))
+        print(f"Capturing LOB1 traffic to {args.pcap}")
+    return LobClient((args.ip, args.dst_port), bind=(args.bind, args.port), decoders=decoders, sinks=sinks,
+                     timeout_s=args.timeout_ms / 1e3, max_inflight=args.max_inflight,
+                     spin_ns=int(getattr(args, 'spin_us', 0.0) * 1e3))
@@ -0,0 +1,108 @@
+"""
+Reply decoders: bytes -> dict of named fields, merged by the client core.
+Layouts follow protocol/lob_v1.h; each decoder leaves fields out when the
+reply is too short to carry them.
+"""
+import struct
+
+FEAT_OFF = 32
+FEAT_FMT = '>ihHII'
+SCORE_OFF = 48          # lob_v1_feat_score_t.score_q16_16
+TIMING_OFF = 48         # lob_v1_timing_t (t2..t6), superseded by the SoC telemetry block
+TIMING_FMT = '>QQQQQ'
+MSG_FEATURES = 2
+MSG_FEATURES_WITH_TIMING = 4
+MSG_FEATURES_WITH_FABRIC = 5
+FEATURE_REPLIES = (MSG_FEATURES, MSG_FEATURES_WITH_TIMING, MSG_FEATURES_WITH_FABRIC)
+
+# PYNQ SoC telemetry tail: T2, T3, T4, T5, T_Reflex, T6, Reflex_Act, MLP_Score
+TELEM_FMT = '>QQQQQQII'
+TELEM_LEN = 56
+REFLEX_ACTIONS = {0: 'NONE', 1: 'CANCEL', 2: 'TAKE', 3: 'WIDEN'}
+PING_TS_OFF = 32        # lob_v1_ping_ts_t: server rx/tx, PYNQ CLOCK_MONOTONIC_RAW
+
+# MSG_FEATURES_WITH_FABRIC: features, SoC telemetry at 48, then lob_v1_fabric_t
+TELEM_OFF = 48
+FABRIC_OFF = TELEM_OFF + TELEM_LEN
+FABRIC_FMT = '>IIII'    # mlp_cycles, feat_cycles, feat_dbg_cycles, valid
+FABRIC_NS_PER_CYCLE = 8  # 125 MHz fabric clock
+
+
+def features(data: bytes) -> dict:
+    if len(data) < FEAT_OFF + 16:
+        return {}
+    ofi, imb, _, burst, vol = struct.unpack_from(FEAT_FMT, data, FEAT_OFF)
+    return {'ofi': ofi, 'imb': imb, 'burst': burst, 'vol': vol}
+
+
+def score(data: bytes) -> dict:
+    if len(data) < SCORE_OFF + 4:
+        return {}
+    return {'score': struct.unpack_from('>I', data, SCORE_OFF)[0] / 65536.0}
+
+
+def timing(data: bytes) -> dict:
+    """
+    PYNQ stamps of a FEATURES_WITH_TIMING or FEATURES_WITH_FABRIC reply. The
+    echo servers put the 56-byte SoC telemetry block (T2, T3, T4, T5,
+    T_Reflex, T6, ...) at TELEM_OFF; a msg_type 4 reply with only the older
+    40-byte lob_v1_timing_t trailer is read as t2..t6.
+    """
+    if data[5] not in (MSG_FEATURES_WITH_TIMING, MSG_FEATURES_WITH_FABRIC):
+        return {}
+    if len(data) >= TELEM_OFF + TELEM_LEN:
+        t2, t3, t4, t5, t_reflex, t6 = struct.unpack_from(TELEM_FMT[:7], data, TELEM_OFF)
+        return {'t2': t2, 't3': t3, 't4': t4, 't5': t5, 't_reflex': t_reflex, 't6': t6}
+    if data[5] != MSG_FEATURES_WITH_TIMING or len(data) < TIMING_OFF + 40:
+        return {}
+    t2, t3, t4, t5, t6 = struct.unpack_from(TIMING_FMT, data, TIMING_OFF)
+    return {'t2': t2, 't3': t3, 't4': t4, 't5': t5, 't6': t6}
+
+
+def ping(data: bytes) -> dict:
+    if data[5] != 0 or len(data) < PING_TS_OFF + 16:
+        return {}
+    t_rx, t_tx = struct.unpack_from('>QQ', data, PING_TS_OFF)
+    return {'ping_t_rx': t_rx, 'ping_t_tx': t_tx}
+
+
+def telemetry(data: bytes) -> dict:
+    if len(data) < FEAT_OFF + 16 + TELEM_LEN:
+        return {}
+    if data[5] == MSG_FEATURES_WITH_FABRIC:
+        t2, t3, t4, t5, t_reflex, t6, act, mlp = struct.unpack_from(TELEM_FMT, data, TELEM_OFF)
+    else:
+        t2, t3, t4, t5, t_reflex, t6, act, mlp = struct.unpack(TELEM_FMT, data[-TELEM_LEN:])
+    return {'t2': t2, 't3': t3, 't4': t4, 't5': t5, 't_reflex': t_reflex, 't6': t6,
+            'reflex_act': REFLEX_ACTIONS.get(act, str(act)), 'mlp_score': mlp / 65536.0}
+
+
+def fabric(data: bytes) -> dict:
+    """
+    Fabric cycle counters (msg_type 5) and the split they give of the PYNQ
+    time: fabric_ns = hw_start -> MLP done, of which fabric_math_ns is the
+    feature pipeline (feat_dbg_cycles) plus the MLP after the features and
+    fabric_shell_ns the DMA/stream plumbing; ps_glue_ns is t2 -> t5 minus the
+    fabric time (Python, DMA setup, polling). Invalid counters are left out.
+    """
+    if data[5] != MSG_FEATURES_WITH_FABRIC or len(data) < FABRIC_OFF + 16:
+        return {}
+    mlp, feat, dbg, valid = struct.unpack_from(FABRIC_FMT, data, FABRIC_OFF)
+    out = {'fabric_valid': valid}
+    if valid & 1:
+        out['mlp_cycles'] = mlp
+    if valid & 2:
+        out['feat_cycles'] = feat
+    if valid & 4:
+        out['feat_dbg_cycles'] = dbg
+    if valid & 7 != 7:
+        return out
+    fabric_ns = mlp * FABRIC_NS_PER_CYCLE
+    math_ns = (dbg + max(0, mlp - feat)) * FABRIC_NS_PER_CYCLE
+    t2, _, t4, t5 = struct.unpack_from('>QQQQ', data, TELEM_OFF)
+    out.update(fabric_ns=fabric_ns, fabric_math_ns=math_ns, fabric_shell_ns=fabric_ns - math_ns)
+    if t2 and t5:
+        out['ps_glue_ns'] = (t5 - t2) - fabric_ns
+    elif t2 and t4:     # features only: no score DMA
+        out['ps_glue_ns'] = (t4 - t2) - feat * FABRIC_NS_PER_CYCLE
+    return out
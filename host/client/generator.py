@@ -0,0 +1,316 @@
+"""
+High-rate LOB1 traffic generator for saturation / knee-of-the-curve runs.
+
+The asyncio client (core.py) builds and tracks every request; that costs
+microseconds per packet. Here the send path does almost nothing:
+
+  - PacketPool pre-encodes N packets into one contiguous ctypes buffer; only
+    seq and t_send_ns are patched in place (struct.pack_into) before a burst.
+  - MmsgSender hands a whole burst to the kernel with one sendmmsg(2) call
+    over prebuilt mmsghdr/iovec arrays pointing into the pool (plain sendto
+    loop where libc has no sendmmsg).
+  - Bursts leave on absolute deadlines: sleep until ~SPIN_NS before, then
+    busy-wait on CLOCK_MONOTONIC_RAW (vDSO, the closest Python gets to TSC).
+    Packet j of a burst is stamped j times the last burst's per-packet
+    sendmmsg cost after the burst start, so RTTs inside a burst are not
+    biased by the packets queued ahead of them.
+  - Send stamps go into a fixed ring shared with a receiver process, indexed
+    by seq % ring; the receiver drains replies and joins them to the ring
+    every MATCH_EVERY replies (a quarter ring at most) into an HDR histogram, so a long max-rate run
+    holds neither per-packet lists nor per-reply arrays. A reply that comes
+    back more than `ring` packets late counts as lost.
+"""
+import ctypes
+import errno
+import multiprocessing as mp
+import os
+import socket
+import struct
+import time
+from array import array
+from dataclasses import dataclass, field
+from typing import Optional, Sequence, Tuple
+
+from host.client.core import HDR_LEN, MAGIC, SEQ_OFF, now_ns
+from host.telemetry.histogram import LatencyHistogram
+
+try:
+    import numpy as np
+except ImportError:   # the receiver joins replies in a Python loop instead
+    np = None
+
+SPIN_NS = 200_000
+RING = 1 << 20          # send stamps kept for matching (16 B each)
+MATCH_EVERY = 4096      # receiver joins buffered replies to the ring this often
+_STAMP = struct.Struct('>IQ')   # seq, t_send_ns (contiguous in lob_v1_hdr_t)
+
+
+class _IoVec(ctypes.Structure):
+    _fields_ = [('iov_base', ctypes.c_void_p), ('iov_len', ctypes.c_size_t)]
+
+
+class _MsgHdr(ctypes.Structure):
+    _fields_ = [('msg_name', ctypes.c_void_p), ('msg_namelen', ctypes.c_uint32),
+                ('msg_iov', ctypes.POINTER(_IoVec)), ('msg_iovlen', ctypes.c_size_t),
+                ('msg_control', ctypes.c_void_p), ('msg_controllen', ctypes.c_size_t),
+                ('msg_flags', ctypes.c_int)]
+
+
+class _MMsgHdr(ctypes.Structure):
+    _fields_ = [('msg_hdr', _MsgHdr), ('msg_len', ctypes.c_uint)]
+
+
+class _SockAddrIn(ctypes.Structure):
+    _fields_ = [('sin_family', ctypes.c_ushort), ('sin_port', ctypes.c_uint16),
+                ('sin_addr', ctypes.c_uint8 * 4), ('sin_zero', ctypes.c_uint8 * 8)]
+
+
+try:
+    _libc = ctypes.CDLL(None, use_errno=True)
+    _sendmmsg = _libc.sendmmsg
+    _sendmmsg.argtypes = [ctypes.c_int, ctypes.POINTER(_MMsgHdr), ctypes.c_uint, ctypes.c_int]
+    _sendmmsg.restype = ctypes.c_int
+except (OSError, AttributeError):
+    _sendmmsg = None
+
+
+class PacketPool:
+    """N pre-encoded packets at a fixed stride in one buffer."""
+
+    def __init__(self, payloads: Sequence[bytes]):
+        if not payloads:
+            raise ValueError("empty packet pool")
+        self.n = len(payloads)
+        self.lengths = [len(p) for p in payloads]
+        self.stride = max(self.lengths)
+        self.buf = (ctypes.c_char * (self.n * self.stride))()
+        self.view = memoryview(self.buf).cast('B')
+        for i, p in enumerate(payloads):
+            if len(p) < HDR_LEN or p[:4] != MAGIC:
+                raise ValueError(f"pool packet {i} is not a LOB1 packet")
+            self.view[i * self.stride:i * self.stride + len(p)] = p
+        self.base = ctypes.addressof(self.buf)
+
+    def stamp(self, first: int, count: int, seq0: int, t_send_wall: int, step_ns: int = 0) -> None:
+        """Patch seq/t_send for slots first..first+count (no wrap); slot k gets t_send_wall + k * step_ns."""
+        pack = _STAMP.pack_into
+        view, stride = self.view, self.stride
+        for k in range(count):
+            pack(view, (first + k) * stride + SEQ_OFF, (seq0 + k) & 0xFFFFFFFF, t_send_wall + k * step_ns)
+
+    def slot(self, i: int) -> memoryview:
+        return self.view[i * self.stride:i * self.stride + self.lengths[i]]
+
+
+class MmsgSender:
+    def __init__(self, sock: socket.socket, dst: Tuple[str, int], pool: PacketPool):
+        self.sock = sock
+        self.dst = dst
+        self.pool = pool
+        self.fd = sock.fileno()
+        self.use_mmsg = _sendmmsg is not None and sock.family == socket.AF_INET
+        if not self.use_mmsg:
+            return
+        self.addr = _SockAddrIn(socket.AF_INET, socket.htons(dst[1]),
+                                (ctypes.c_uint8 * 4)(*socket.inet_aton(dst[0])))
+        self.iov = (_IoVec * pool.n)()
+        self.msgs = (_MMsgHdr * pool.n)()
+        for i in range(pool.n):
+            self.iov[i].iov_base = pool.base + i * pool.stride
+            self.iov[i].iov_len = pool.lengths[i]
+            h = self.msgs[i].msg_hdr
+            h.msg_name = ctypes.addressof(self.addr)
+            h.msg_namelen = ctypes.sizeof(self.addr)
+            h.msg_iov = ctypes.pointer(self.iov[i])
+            h.msg_iovlen = 1
+        self.msg_size = ctypes.sizeof(_MMsgHdr)
+        self.msgs_base = ctypes.addressof(self.msgs)
+
+    def send(self, first: int, count: int) -> int:
+        """Send slots first..first+count; returns packets the kernel accepted."""
+        if not self.use_mmsg:
+            sent = 0
+            for i in range(first, first + count):
+                try:
+                    self.sock.sendto(self.pool.slot(i), self.dst)
+                except (BlockingIOError, OSError):
+                    break
+                sent += 1
+            return sent
+        done = 0
+        while done < count:
+            ptr = ctypes.cast(self.msgs_base + (first + done) * self.msg_size, ctypes.POINTER(_MMsgHdr))
+            r = _sendmmsg(self.fd, ptr, count - done, 0)
+            if r < 0:
+                e = ctypes.get_errno()
+                if e in (errno.EAGAIN, errno.ENOBUFS):
+                    break
+                if e == errno.EINTR:
+                    continue
+                raise OSError(e, os.strerror(e))
+            done += r
+        return done
+
+
+def spin_until(deadline_ns: int) -> int:
+    while True:
+        t = now_ns()
+        left = deadline_ns - t
+        if left <= 0:
+            return t
+        if left > SPIN_NS:
+            time.sleep((left - SPIN_NS) / 1e9)
+
+
+def _ring_put(ring_t, ring_tag, first: int, t_send: Sequence[int], tags: Sequence[int]) -> None:
+    """Publish send stamps at ring index first.. (wrapping): tag 0 while the stamp is rewritten."""
+    cap = len(ring_t)
+    a = first % cap
+    parts = [(a, 0, min(len(tags), cap - a))]
+    if parts[0][2] < len(tags):
+        parts.append((0, parts[0][2], len(tags)))
+    for at, lo, hi in parts:
+        ring_tag[at:at + hi - lo] = [0] * (hi - lo)
+        ring_t[at:at + hi - lo] = list(t_send[lo:hi])
+        ring_tag[at:at + hi - lo] = list(tags[lo:hi])
+
+
+def _match(seqs, t_rx, ring_t, ring_tag, seq0: int, hist: LatencyHistogram) -> None:
+    """RTT of every reply whose seq still owns its ring slot; the slot is then cleared (duplicates ignored)."""
+    cap = len(ring_t)
+    if np is None:
+        for s, t in zip(seqs, t_rx):
+            i = ((s - seq0) & 0xFFFFFFFF) % cap
+            if ring_tag[i] == s + 1:
+                ring_tag[i] = 0
+                hist.record(t - ring_t[i])
+        return
+    s = np.frombuffer(seqs, dtype=np.uint32).astype(np.int64)
+    t = np.frombuffer(t_rx, dtype=np.int64)
+    tags = np.frombuffer(ring_tag, dtype=np.int64)
+    idx = ((s - seq0) & 0xFFFFFFFF) % cap
+    ok = tags[idx] == s + 1
+    idx, first = np.unique(idx[ok], return_index=True)   # first reply per slot
+    hist.record_many(t[ok][first] - np.frombuffer(ring_t, dtype=np.int64)[idx])
+    tags[idx] = 0
+
+
+def _receiver(sock, ready, stop_at, ring_t, ring_tag, seq0, conn):
+    sock.settimeout(0.01)
+    seqs = array('I')
+    t_rx = array('q')
+    hist = LatencyHistogram()
+    every = max(1, min(MATCH_EVERY, len(ring_t) // 4))   # join well before the ring laps
+    buf = bytearray(2048)
+    ready.set()
+    while True:
+        try:
+            n = sock.recv_into(buf)
+        except socket.timeout:
+            if stop_at.value and now_ns() > stop_at.value:
+                break
+            continue
+        t = now_ns()
+        if n >= HDR_LEN:
+            seqs.append(struct.unpack_from('>I', buf, SEQ_OFF)[0])
+            t_rx.append(t)
+            if len(seqs) >= every:
+                _match(seqs, t_rx, ring_t, ring_tag, seq0, hist)
+                seqs, t_rx = array('I'), array('q')
+    _match(seqs, t_rx, ring_t, ring_tag, seq0, hist)
+    conn.send_bytes(hist.to_bytes())
+    conn.close()
+
+
+@dataclass
+class GenResult:
+    offered_pps: float
+    sent: int
+    dropped_local: int          # EAGAIN/ENOBUFS at sendmmsg
+    duration_s: float
+    replies: int
+    lost: int
+    late_bursts: int            # bursts that started after their deadline + one burst interval
+    rtt: LatencyHistogram = field(default_factory=LatencyHistogram)
+
+    @property
+    def achieved_pps(self) -> float:
+        return self.sent / self.duration_s if self.duration_s > 0 else 0.0
+
+    def pct(self, q: float) -> int:
+        return self.rtt.percentile(100.0 * q) if self.rtt.total else 0
+
+    def summary(self) -> str:
+        s = (f"offered={self.offered_pps:.0f} pps achieved={self.achieved_pps:.0f} pps sent={self.sent} "
+             f"replies={self.replies} lost={self.lost} ({100.0 * self.lost / max(self.sent, 1):.2f}%) "
+             f"local_drops={self.dropped_local} late_bursts={self.late_bursts}")
+        if self.rtt.total:
+            s += (f" rtt_us p50={self.pct(.5) / 1e3:.1f} p99={self.pct(.99) / 1e3:.1f} "
+                  f"p99.9={self.pct(.999) / 1e3:.1f} max={self.rtt.max / 1e3:.1f}")
+        return s
+
+
+def run_generator(sock: socket.socket, dst: Tuple[str, int], pool: PacketPool, pps: float,
+                  count: Optional[int], batch: int = 32, drain_s: float = 0.2, seq0: int = 0,
+                  duration_s: float = 0.0, ring: int = RING) -> GenResult:
+    """
+    Send count packets (cycling through the pool) in bursts of batch at an
+    average of pps (pps <= 0: as fast as possible), then collect replies for
+    drain_s. With duration_s > 0 sending also stops once that much time has
+    passed, and count may be None (bounded by time only). Sequence numbers run
+    seq0..seq0+sent-1 (mod 2^32), so back-to-back runs on one socket can give
+    stragglers from the previous run a disjoint range. Memory is bounded by
+    ring (at most count) send stamps whatever the run length.
+    """
+    if count is None and duration_s <= 0:
+        raise ValueError("run_generator needs a count or a duration")
+    batch = max(1, min(int(batch), pool.n))
+    sender = MmsgSender(sock, dst, pool)
+    ready = mp.Event()
+    stop_at = mp.Value('q', 0, lock=False)
+    cap = max(batch, min(ring, count) if count is not None else ring)
+    ring_t = mp.Array('q', cap, lock=False)       # send stamp per seq % cap
+    ring_tag = mp.Array('q', cap, lock=False)     # wire seq + 1 owning the slot, 0 = none
+    rx_conn, tx_conn = mp.Pipe(duplex=False)
+    rx = mp.Process(target=_receiver, args=(sock, ready, stop_at, ring_t, ring_tag, seq0, tx_conn))
+    rx.start()
+    ready.wait()
+
+    burst_ns = int(batch * 1e9 / pps) if pps > 0 else 0
+    wall0 = time.time_ns() - now_ns()
+    sent = dropped = late = 0
+    per_pkt = 0     # ns per packet of the last sendmmsg: offset of packet j in a burst
+    seq = 0
+    slot = 0
+    start = now_ns() + 1_000_000
+    stop_ns = start + int(duration_s * 1e9) if duration_s > 0 else None
+    deadline = start
+    while count is None or seq < count:
+        k = min(batch, pool.n - slot) if count is None else min(batch, count - seq, pool.n - slot)
+        t = spin_until(deadline) if burst_ns else now_ns()
+        if stop_ns is not None and t >= stop_ns:
+            break
+        if burst_ns and t - deadline > burst_ns:
+            late += 1
+        pool.stamp(slot, k, seq0 + seq, t + wall0, per_pkt)
+        _ring_put(ring_t, ring_tag, seq, [t + j * per_pkt for j in range(k)],
+                  [((seq0 + seq + j) & 0xFFFFFFFF) + 1 for j in range(k)])
+        t_tx = now_ns()
+        ok = sender.send(slot, k)
+        if ok:
+            per_pkt = (now_ns() - t_tx) // ok
+        if ok < k:
+            _ring_put(ring_t, ring_tag, seq + ok, [0] * (k - ok), [0] * (k - ok))   # never sent
+        sent += ok
+        dropped += k - ok
+        seq += k
+        slot = (slot + k) % pool.n
+        deadline += burst_ns * k // batch
+    t_end = now_ns()
+    stop_at.value = t_end + int(drain_s * 1e9)
+
+    rtt = LatencyHistogram.from_bytes(rx_conn.recv_bytes())
+    rx.join()
+    replies = rtt.total
+    return GenResult(pps, sent, dropped, (t_end - start) / 1e9 if sent else 0.0, replies,
+                     sent - replies, late, rtt)
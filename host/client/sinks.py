@@ -0,0 +1,247 @@
+"""
+Reply sinks. A sink sees every request three ways: on_send right after
+sendto, then exactly one of on_reply / on_timeout.
+
+CsvSink, BinLogSink and PcapSink only store the row into a preallocated
+buffer on the reply path; a background thread serializes full buffers
+(host/telemetry/writer.py). summary() reports rows written and dropped.
+"""
+import csv
+import os
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence
+
+from host.client.core import Reply, Request, Sink
+from host.client.decoders import REFLEX_ACTIONS
+from host.telemetry.histogram import LatencyRecorder
+from host.telemetry.writer import AsyncBinLog, AsyncCsvLog, AsyncPcapLog
+
+try:
+    from host.telemetry import binlog
+except Exception:
+    binlog = None
+
+RowFn = Callable[[Request, Optional[Reply]], Optional[list]]
+
+
+class CsvSink(Sink):
+    """One row per finished request; row_fn returns None to skip (reply=None on timeout)."""
+
+    def __init__(self, path: str, header: List[str], row_fn: RowFn, log_timeouts: bool = True,
+                 background: bool = True):
+        self.path = path
+        self.row_fn = row_fn
+        self.log_timeouts = log_timeouts
+        self.log = None
+        if background:
+            self.log = AsyncCsvLog(path, header)
+            self._put = self.log.append
+            return
+        d = os.path.dirname(path)
+        if d:
+            os.makedirs(d, exist_ok=True)
+        self.f = open(path, 'w', newline='')
+        self.w = csv.writer(self.f)
+        self.w.writerow(header)
+        self._put = self.w.writerow
+
+    def on_reply(self, req, reply):
+        row = self.row_fn(req, reply)
+        if row is not None:
+            self._put(row)
+
+    def on_timeout(self, req):
+        if self.log_timeouts:
+            row = self.row_fn(req, None)
+            if row is not None:
+                self._put(row)
+
+    def close(self):
+        if self.log is not None:
+            self.log.close()
+        else:
+            self.f.close()
+
+    def summary(self) -> str:
+        return self.log.summary() if self.log is not None else f"log: {self.path} (inline)"
+
+
+class HistogramSink(Sink):
+    """
+    Same row_fn as CsvSink, but the named integer columns go into constant-size
+    HDR histograms (host/telemetry/histogram.py) and only every sample_every-th
+    row is kept raw. The .hist file is written on close.
+    """
+
+    def __init__(self, path: str, header: List[str], row_fn: RowFn, fields: Sequence[str],
+                 sample_columns: Sequence[str] = ('seq',), sample_every: int = 0,
+                 log_timeouts: bool = True, meta: Optional[dict] = None):
+        d = os.path.dirname(path)
+        if d:
+            os.makedirs(d, exist_ok=True)
+        self.path = path
+        self.header = list(header)
+        self.row_fn = row_fn
+        self.log_timeouts = log_timeouts
+        self.rec = LatencyRecorder(fields, sample_every, sample_columns, meta=meta)
+        self.timeouts = 0
+
+    def on_reply(self, req, reply):
+        row = self.row_fn(req, reply)
+        if row is not None:
+            self.rec.record(dict(zip(self.header, row)))
+
+    def on_timeout(self, req):
+        self.timeouts += 1
+        if self.log_timeouts:
+            self.on_reply(req, None)
+
+    def close(self):
+        self.rec.meta['timeouts'] = self.timeouts
+        self.rec.save(self.path)
+
+    def summary(self) -> str:
+        return f"log: {self.rec.n_rows} rows in histograms, {len(self.rec.samples)} sampled values"
+
+
+class BinLogSink(Sink):
+    """
+    Same row_fn as CsvSink, written as fixed-size TIMING_DTYPE records
+    (host/telemetry/binlog.py). columns maps record fields to header names;
+    unmapped or None values are stored as 0.
+    """
+
+    def __init__(self, path: str, header: List[str], row_fn: RowFn, columns: Dict[str, str],
+                 log_timeouts: bool = True, meta: Optional[dict] = None, background: bool = True):
+        if binlog is None:
+            raise RuntimeError("binary telemetry logs need numpy")
+        self.path = path
+        self.row_fn = row_fn
+        self.log_timeouts = log_timeouts
+        self.reflex_codes = {name: code for code, name in REFLEX_ACTIONS.items()}
+        pos = {h: i for i, h in enumerate(header)}
+        # record fields after seq/flags, in dtype order
+        self.idx = [pos.get(columns.get(f)) for f in binlog.TIMING_DTYPE.names[2:]]
+        self.w = AsyncBinLog(path, meta=meta) if background else binlog.BinLogWriter(path, meta=meta)
+
+    def _write(self, req, reply, row):
+        flags = binlog.FLAG_TIMEOUT if reply is None else binlog.FLAG_REPLY
+        if reply is not None and reply.fields.get('t2'):
+            flags |= binlog.FLAG_TIMING
+        vals = [0 if i is None or row[i] is None else row[i] for i in self.idx]
+        if isinstance(vals[0], str):   # reflex_act as decoded by decoders.telemetry
+            vals[0] = self.reflex_codes.get(vals[0], -1)
+        self.w.append((req.seq & 0xFFFFFFFF, flags, *vals))
+
+    def on_reply(self, req, reply):
+        row = self.row_fn(req, reply)
+        if row is not None:
+            self._write(req, reply, row)
+
+    def on_timeout(self, req):
+        if self.log_timeouts:
+            row = self.row_fn(req, None)
+            if row is not None:
+                self._write(req, None, row)
+
+    def close(self):
+        self.w.close()
+
+    def summary(self) -> str:
+        return self.w.summary() if isinstance(self.w, AsyncBinLog) else f"log: {self.w.written} records (inline)"
+
+
+class PcapSink(Sink):
+    """
+    Every request and reply as a nanosecond pcap (host/telemetry/pcap.py),
+    replayable with open_loop_replay.py. Timestamps are the client's send /
+    receive CLOCK_MONOTONIC_RAW stamps moved to wall clock.
+    """
+
+    def __init__(self, path: str, local, remote):
+        self.path = path
+        self.local, self.remote = tuple(local), tuple(remote)
+        self.wall_off = None
+        self.w = AsyncPcapLog(path)
+
+    def on_send(self, req):
+        if self.wall_off is None:
+            self.wall_off = req.t_send_wall - req.t_send
+        self.w.append((req.t_send_wall, req.payload, self.local, self.remote))
+
+    def on_reply(self, req, reply):
+        self.w.append((reply.t_recv + self.wall_off, reply.data, self.remote, self.local))
+
+    def close(self):
+        self.w.close()
+
+    def summary(self) -> str:
+        return f"pcap {self.path}: " + self.w.summary()
+
+
+def add_log_args(parser) -> None:
+    parser.add_argument('--log-format', choices=('csv', 'hist', 'bin'), default='csv',
+                        help='csv: one row per packet; hist: HDR histograms + sampled rows in <out>.hist; '
+                             'bin: fixed-size T1..T6 records in <out>.tlog')
+    parser.add_argument('--sample-every', type=int, default=100,
+                        help='--log-format hist: keep every Nth row raw (0 = none)')
+
+
+def log_sink(args, path: str, header: List[str], row_fn: RowFn, fields: Sequence[str],
+             sample_columns: Sequence[str] = ('seq',), bin_columns: Optional[Dict[str, str]] = None) -> Sink:
+    """CsvSink, HistogramSink (.hist) or BinLogSink (.tlog) at path, per --log-format."""
+    if args.log_format == 'bin':
+        return BinLogSink(str(Path(path).with_suffix('.tlog')), header, row_fn, bin_columns or {})
+    if args.log_format == 'hist':
+        return HistogramSink(str(Path(path).with_suffix('.hist')), header, row_fn, fields,
+                             sample_columns, args.sample_every)
+    return CsvSink(path, header, row_fn)
+
+
+class ProgressSink(Sink):
+    """Prints a rate line every interval_s."""
+
+    def __init__(self, interval_s: float = 1.0):
+        self.interval_s = interval_s
+        self.sent = self.replies = self.timeouts = 0
+        self.t0 = self.last = time.time()
+
+    def _tick(self):
+        now = time.time()
+        if now - self.last >= self.interval_s:
+            el = now - self.t0
+            print(f"sent={self.sent} recv={self.replies} timeouts={self.timeouts} "
+                  f"rate={self.sent / el:.1f} pps reply_rate={self.replies / el:.1f} pps")
+            self.last = now
+
+    def on_send(self, req):
+        self.sent += 1
+        self._tick()
+
+    def on_reply(self, req, reply):
+        self.replies += 1
+        self._tick()
+
+    def on_timeout(self, req):
+        self.timeouts += 1
+        self._tick()
+
+
+class CallbackSink(Sink):
+    """Adapter for scripts that only need plain functions."""
+
+    def __init__(self, on_send=None, on_reply=None, on_timeout=None):
+        self._send, self._reply, self._timeout = on_send, on_reply, on_timeout
+
+    def on_send(self, req):
+        if self._send:
+            self._send(req)
+
+    def on_reply(self, req, reply):
+        if self._reply:
+            self._reply(req, reply)
+
+    def on_timeout(self, req):
+        if self._timeout:
+            self._timeout(req)
@@ -0,0 +1,128 @@
+"""
+Packet sources: iterables of core.Outgoing (send offset, payload, meta).
+
+  synthetic  fixed-rate packets from a deltas function
+  lobster    LOBSTER message CSV, at a fixed rate or at the file's timestamps
+  pcap       LOB1 request packets from a capture, at the capture timestamps
+
+Payload seq and t_send are placeholders; the client core fills them in.
+"""
+import struct
+from typing import Callable, Iterator, List, Optional, Tuple
+
+from host.client.core import MAGIC, Outgoing, deltas_packet
+from host.strategy.lobster_loader import lobster_to_lob_packet, parse_lobster_message
+
+Delta = Tuple[int, int, int, int, int]   # price_ticks, qty, level, side, action
+
+
+def synthetic(count: Optional[int], pps: float,
+              make_deltas: Callable[[int], List[Delta]]) -> Iterator[Outgoing]:
+    """count=None runs until the caller stops; pps <= 0 sends back to back."""
+    step = int(1e9 / pps) if pps > 0 else 0
+    i = 0
+    while count is None or i < count:
+        yield Outgoing(i * step, deltas_packet(make_deltas(i)), {'i': i})
+        i += 1
+
+
+def lobster(csv_path: str, limit: Optional[int] = None, pps: float = 0.0,
+            speed: float = 0.0) -> Iterator[Outgoing]:
+    """
+    One packet per LOBSTER message (lobster_loader mapping). pps > 0 paces at a
+    fixed rate; otherwise speed > 0 scales the file's time column and 0 sends
+    back to back. meta['msg'] carries the parsed message.
+    """
+    step = int(1e9 / pps) if pps > 0 else 0
+    t0 = None
+    last = 0
+    n = 0
+    with open(csv_path, 'r') as f:
+        for line in f:
+            if limit is not None and n >= limit:
+                break
+            try:
+                msg = parse_lobster_message(line)
+            except ValueError:
+                continue
+            if not msg:
+                continue
+            if t0 is None:
+                t0 = msg['time']
+            if step:
+                off = n * step
+            elif speed > 0:
+                last = max(last, int(round((msg['time'] - t0) / speed * 1e9)))
+                off = last
+            else:
+                off = 0
+            yield Outgoing(off, lobster_to_lob_packet(msg, 0, 0), {'msg': msg})
+            n += 1
+
+
+# --- pcap -------------------------------------------------------------------
+
+_PCAP_MAGIC = {0xa1b2c3d4: ('<', 1000), 0xd4c3b2a1: ('>', 1000),   # usec
+               0xa1b23c4d: ('<', 1), 0x4d3cb2a1: ('>', 1)}         # nsec
+LINKTYPE_ETHERNET = 1
+LINKTYPE_RAW = 101
+LINKTYPE_LINUX_SLL = 113
+
+
+def _ip_offset(linktype: int, frame: bytes) -> Optional[int]:
+    if linktype == LINKTYPE_RAW:
+        return 0
+    if linktype == LINKTYPE_LINUX_SLL:
+        return 16 if frame[14:16] == b'\x08\x00' else None
+    if linktype == LINKTYPE_ETHERNET:
+        off, etype = 14, frame[12:14]
+        while etype in (b'\x81\x00', b'\x88\xa8'):  # VLAN tags
+            etype = frame[off + 2:off + 4]
+            off += 4
+        return off if etype == b'\x08\x00' else None
+    raise ValueError(f"unsupported pcap linktype {linktype}")
+
+
+def read_pcap_udp(path: str) -> Iterator[Tuple[int, int, int, bytes]]:
+    """(ts_ns, src_port, dst_port, payload) for every unfragmented IPv4/UDP packet in a classic pcap."""
+    with open(path, 'rb') as f:
+        gh = f.read(24)
+        if len(gh) < 24:
+            raise ValueError(f"{path}: not a pcap file")
+        magic = struct.unpack('<I', gh[:4])[0]
+        if magic not in _PCAP_MAGIC:
+            raise ValueError(f"{path}: unknown pcap magic 0x{magic:08x} (pcapng is not supported)")
+        end, frac_ns = _PCAP_MAGIC[magic]
+        linktype = struct.unpack(end + 'I', gh[20:24])[0] & 0x0FFFFFFF
+        rec = struct.Struct(end + 'IIII')
+        while True:
+            rh = f.read(16)
+            if len(rh) < 16:
+                return
+            sec, frac, incl, _ = rec.unpack(rh)
+            frame = f.read(incl)
+            ip = _ip_offset(linktype, frame)
+            if ip is None or len(frame) < ip + 20 or frame[ip] >> 4 != 4 or frame[ip + 9] != 17:
+                continue
+            if struct.unpack_from('>H', frame, ip + 6)[0] & 0x3FFF:
+                continue  # fragment
+            udp = ip + (frame[ip] & 0x0F) * 4
+            sport, dport, ulen = struct.unpack_from('>HHH', frame, udp)
+            yield sec * 1_000_000_000 + frac * frac_ns, sport, dport, frame[udp + 8:udp + ulen]
+
+
+def pcap(path: str, dst_port: int = 4000, speed: float = 1.0,
+         limit: Optional[int] = None) -> Iterator[Outgoing]:
+    """Replay captured LOB1 requests (msg_type 0/1 to dst_port) with their original spacing / speed."""
+    t0 = None
+    n = 0
+    for ts, _, dport, payload in read_pcap_udp(path):
+        if limit is not None and n >= limit:
+            return
+        if dport != dst_port or len(payload) < 32 or payload[:4] != MAGIC or payload[5] not in (0, 1):
+            continue
+        if t0 is None:
+            t0 = ts
+        off = int((ts - t0) / speed) if speed > 0 else 0
+        yield Outgoing(off, payload, {'orig_seq': struct.unpack_from('>I', payload, 10)[0], 'ts_ns': ts})
+        n += 1
@@ -0,0 +1,302 @@
+import asyncio
+import os
+import queue
+import socket
+import struct
+import sys
+import tempfile
+import threading
+import time
+import unittest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from host.client import decoders, sources
+from host.client.core import LobClient, Sink, deltas_packet
+from host.client.generator import MmsgSender, PacketPool, run_generator
+from host.client.sinks import PcapSink
+
+
+class _Echo(asyncio.DatagramProtocol):
+    """Loopback stand-in for the PYNQ echo: features reply, drops every 5th seq."""
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, addr):
+        seq = struct.unpack_from('>I', data, 10)[0]
+        if seq % 5 == 2:
+            return
+        hdr = bytearray(data[:32])
+        hdr[5] = 2
+        self.transport.sendto(bytes(hdr) + struct.pack('>ihHII', seq, 1, 0, 2, 3), addr)
+
+
+class _Record(Sink):
+    def __init__(self, client=None):
+        self.client = client
+        self.sent, self.done, self.ofi, self.t_send = [], [], {}, []
+        self.max_inflight = 0
+
+    def on_send(self, req):
+        self.sent.append(req.seq)
+        self.t_send.append(req.t_send)
+        self.max_inflight = max(self.max_inflight, len(self.client.inflight))
+
+    def on_reply(self, req, reply):
+        self.done.append(req.seq)
+        self.ofi[req.seq] = reply.fields['ofi']
+
+    def on_timeout(self, req):
+        self.done.append(req.seq)
+
+
+class TestClient(unittest.TestCase):
+    def _run(self, max_inflight):
+        async def go():
+            loop = asyncio.get_running_loop()
+            server, _ = await loop.create_datagram_endpoint(_Echo, local_addr=('127.0.0.1', 0))
+            port = server.get_extra_info('sockname')[1]
+            rec = _Record()
+            client = LobClient(('127.0.0.1', port), bind=('127.0.0.1', 0), decoders=[decoders.features],
+                               sinks=[rec], timeout_s=0.05, max_inflight=max_inflight)
+            rec.client = client
+            stats = await client.run(sources.synthetic(50, 0, lambda i: [(100, 1, 0, 0, 1)]))
+            server.close()
+            return stats, rec
+        return asyncio.run(go())
+
+    def test_every_request_finishes_once(self):
+        stats, rec = self._run(max_inflight=8)
+        self.assertEqual(rec.sent, list(range(50)))
+        self.assertEqual(sorted(rec.done), list(range(50)))
+        self.assertEqual((stats.replies, stats.timeouts), (40, 10))
+        self.assertEqual(stats.rtt.total, 40)
+        self.assertIn('rtt_us p50=', stats.summary())
+        self.assertTrue(all(rec.ofi[s] == s for s in rec.ofi))
+        self.assertLessEqual(rec.max_inflight, 8)
+
+    def test_closed_loop(self):
+        stats, rec = self._run(max_inflight=1)
+        self.assertEqual(rec.max_inflight, 1)
+        self.assertEqual(stats.sent, 50)
+
+    def test_stop_flushes_inflight_to_on_timeout(self):
+        def source():
+            yield from sources.synthetic(5, 0, lambda i: [(100, 1, 0, 0, 1)])
+            raise KeyboardInterrupt
+
+        async def go():
+            silent = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)   # never replies
+            silent.bind(('127.0.0.1', 0))
+            rec = _Record()
+            client = LobClient(silent.getsockname(), bind=('127.0.0.1', 0), sinks=[rec],
+                               timeout_s=10.0, max_inflight=8)
+            rec.client = client
+            try:
+                with self.assertRaises(KeyboardInterrupt):
+                    await client.run(source())
+            finally:
+                silent.close()
+            return client, rec
+        client, rec = asyncio.run(go())
+        self.assertEqual(sorted(rec.done), list(range(5)))
+        self.assertEqual((client.stats.timeouts, len(client.inflight)), (5, 0))
+
+    def _paced(self, spin_ns):
+        async def go():
+            loop = asyncio.get_running_loop()
+            server, _ = await loop.create_datagram_endpoint(_Echo, local_addr=('127.0.0.1', 0))
+            port = server.get_extra_info('sockname')[1]
+            rec = _Record()
+            client = LobClient(('127.0.0.1', port), bind=('127.0.0.1', 0), decoders=[decoders.features],
+                               sinks=[rec], timeout_s=0.05, max_inflight=8, spin_ns=spin_ns)
+            rec.client = client
+            stats = await client.run(sources.synthetic(20, 1e9 / 3_000_000, lambda i: [(100, 1, 0, 0, 1)]))
+            server.close()
+            return stats, rec
+        cpu = time.process_time()
+        stats, rec = asyncio.run(go())
+        cpu = time.process_time() - cpu
+        late = sorted(t - stats.t_start - i * 3_000_000 for i, t in enumerate(rec.t_send))
+        return late, cpu / ((stats.t_end - stats.t_start) / 1e9)
+
+    def test_pacing_is_sub_millisecond(self):
+        late, _ = self._paced(spin_ns=2_000_000)
+        self.assertGreaterEqual(late[0], 0)
+        self.assertLess(late[len(late) // 2], 300_000)   # an event-loop timer alone is ~1 ms late
+
+    def test_pacing_sleeps_by_default(self):
+        late, busy = self._paced(spin_ns=0)
+        self.assertGreaterEqual(late[0], 0)
+        self.assertLess(busy, 0.25)   # spinning 2 ms of every 3 ms measures ~0.4 here
+
+    def test_pcap_source(self):
+        pkt = b'LOB1' + bytes([1, 1]) + b'\x80\x01' + struct.pack('>HIQQH', 32, 7, 0, 0, 0) + bytes(16)
+        udp = struct.pack('>HHHH', 4001, 4000, 8 + len(pkt), 0) + pkt
+        ip = struct.pack('>BBHHHBBH4s4s', 0x45, 0, 20 + len(udp), 0, 0, 64, 17, 0,
+                         bytes([192, 168, 10, 1]), bytes([192, 168, 10, 2])) + udp
+        eth = bytes(12) + b'\x08\x00' + ip
+        with tempfile.TemporaryDirectory() as d:
+            path = os.path.join(d, 'cap.pcap')
+            with open(path, 'wb') as f:
+                f.write(struct.pack('<IHHiIII', 0xa1b2c3d4, 2, 4, 0, 0, 65535, 1))
+                for usec in (0, 250):
+                    f.write(struct.pack('<IIII', 100, usec, len(eth), len(eth)) + eth)
+            out = list(sources.pcap(path, speed=1.0))
+        self.assertEqual([o.offset_ns for o in out], [0, 250_000])
+        self.assertEqual(out[0].payload, pkt)
+        self.assertEqual(out[0].meta['orig_seq'], 7)
+
+    def test_pcap_capture_round_trip(self):
+        async def go(path):
+            loop = asyncio.get_running_loop()
+            server, _ = await loop.create_datagram_endpoint(_Echo, local_addr=('127.0.0.1', 0))
+            port = server.get_extra_info('sockname')[1]
+            rec = _Record()
+            client = LobClient(('127.0.0.1', port), bind=('127.0.0.1', 0), decoders=[decoders.features],
+                               sinks=[rec, PcapSink(path, ('127.0.0.1', 4001), ('127.0.0.1', port))],
+                               timeout_s=0.05, max_inflight=8)
+            rec.client = client
+            await client.run(sources.synthetic(20, 0, lambda i: [(100 + i, 1, 0, 0, 1)]))
+            server.close()
+            return port
+        with tempfile.TemporaryDirectory() as d:
+            path = os.path.join(d, 'cap.pcap')
+            port = asyncio.run(go(path))
+            pkts = list(sources.read_pcap_udp(path))
+            replayed = list(sources.pcap(path, dst_port=port, speed=1.0))
+        self.assertEqual(len(pkts), 20 + 16)   # every 5th seq gets no reply
+        reqs = [p for p in pkts if p[2] == port]
+        reps = {struct.unpack_from('>I', p[3], 10)[0]: p[0] for p in pkts if p[1] == port}
+        self.assertEqual([struct.unpack_from('>i', p[3], 32)[0] for p in reqs], [100 + i for i in range(20)])
+        for ts, _, _, payload in reqs:
+            seq = struct.unpack_from('>I', payload, 10)[0]
+            self.assertEqual(ts, struct.unpack_from('>Q', payload, 14)[0])   # t_send as written into the header
+            if seq in reps:
+                self.assertGreater(reps[seq], ts)
+        self.assertEqual([o.payload for o in replayed], [p[3] for p in reqs])
+        self.assertEqual(replayed[0].offset_ns, 0)
+        self.assertTrue(all(a.offset_ns <= b.offset_ns for a, b in zip(replayed, replayed[1:])))
+
+    def test_pool_burst_send(self):
+        pool = PacketPool([deltas_packet([(100 + i, 1, 0, 0, 1)]) for i in range(8)])
+        rx = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        rx.bind(('127.0.0.1', 0))
+        rx.settimeout(1.0)
+        tx = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        try:
+            pool.stamp(2, 5, 1000, 123456789)
+            self.assertEqual(MmsgSender(tx, rx.getsockname(), pool).send(2, 5), 5)
+            got = [rx.recv(2048) for _ in range(5)]
+        finally:
+            rx.close()
+            tx.close()
+        self.assertEqual([struct.unpack_from('>IQ', g, 10) for g in got], [(1000 + k, 123456789) for k in range(5)])
+        self.assertEqual([struct.unpack_from('>i', g, 32)[0] for g in got], [102, 103, 104, 105, 106])
+
+    def test_generator_max_rate_runs_for_duration(self):
+        pool = PacketPool([deltas_packet([(100 + i, 1, 0, 0, 1)]) for i in range(64)])
+        rx = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        rx.bind(('127.0.0.1', 0))
+        rx.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 1 << 16)   # no reader: the kernel drops
+        tx = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        tx.bind(('127.0.0.1', 0))
+        try:
+            res = run_generator(tx, rx.getsockname(), pool, 0, None, batch=16, drain_s=0.05, duration_s=0.2)
+        finally:
+            rx.close()
+            tx.close()
+        self.assertGreater(res.sent, 16)   # not just the first burst
+        self.assertAlmostEqual(res.duration_s, 0.2, delta=0.15)
+        with self.assertRaises(ValueError):
+            run_generator(tx, ('127.0.0.1', 9), pool, 0, None)
+
+    def test_generator_ring_bounds_memory_and_stamps_each_packet(self):
+        pool = PacketPool([deltas_packet([(100 + i, 1, 0, 0, 1)]) for i in range(64)])
+        echo = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        echo.bind(('127.0.0.1', 0))
+        echo.settimeout(0.05)
+        tx = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        tx.bind(('127.0.0.1', 0))
+        stamps, stop = [], threading.Event()
+
+        def serve():
+            while not stop.is_set():
+                try:
+                    data, addr = echo.recvfrom(2048)
+                except socket.timeout:
+                    continue
+                stamps.append(struct.unpack_from('>IQ', data, 10))
+                echo.sendto(data, addr)
+
+        th = threading.Thread(target=serve)
+        th.start()
+        try:
+            res = run_generator(tx, echo.getsockname(), pool, 20_000, None, batch=8, drain_s=0.1,
+                                duration_s=0.3, ring=512)
+        finally:
+            stop.set()
+            th.join()
+            echo.close()
+            tx.close()
+        self.assertGreater(res.sent, 512 * 4)   # the 512-slot ring wrapped several times
+        self.assertEqual(res.rtt.total, res.replies)
+        self.assertGreater(res.replies, res.sent // 2)
+        self.assertGreater(res.pct(.5), 0)
+        self.assertLessEqual(res.pct(.5), res.rtt.max)
+        bursts = {}
+        for seq, t in stamps:
+            bursts.setdefault(seq // 8, []).append(t)
+        # after the first burst, packets in a burst carry increasing send stamps
+        self.assertTrue(any(len(set(ts)) > 1 for b, ts in bursts.items() if b))
+
+    def test_timing_reply_from_echo_server(self):
+        try:
+            from fpga.pynq import feature_echo_mt as echo
+        except ImportError as e:
+            self.skipTest(f"feature_echo_mt not importable: {e}")
+        from host.telemetry.metrics import MetricsRegistry
+        rx = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        rx.bind(('127.0.0.1', 0))
+        rx.settimeout(2.0)
+        tx = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        tx_q = queue.Queue()
+        threading.Thread(target=echo.sender_thread, daemon=True,
+                         args=(tx, tx_q, MetricsRegistry().thread('tx', ['tx_pkts']), True)).start()
+        got = {}
+        try:
+            for msg_type in (4, 5):   # --enable-timing, --fabric-counters
+                reply = echo.REPLY.pack(b'LOB1', 1, msg_type, 0, echo.HDR_LEN, 7, 0, 0, 0, 11, 2, 0, 3, 4)
+                stamps = {'t2': 1000, 't3': 3000, 't4': 5000, 't5': 7000, 't_reflex': 1500, 'reflex_act': 1}
+                if msg_type == 5:
+                    stamps['fabric'] = (500, 300, 200, 7)
+                tx_q.put((reply, rx.getsockname(), stamps, 0))
+                got[msg_type] = rx.recv(2048)
+        finally:
+            rx.close()
+            tx.close()
+        for msg_type, data in got.items():
+            self.assertIn(data[5], decoders.FEATURE_REPLIES)
+            f = decoders.timing(data)
+            self.assertEqual((f['t2'], f['t3'], f['t4'], f['t5'], f['t_reflex']), (1000, 3000, 5000, 7000, 1500))
+            self.assertGreater(f['t6'], 7000)   # stamped by the server right before sendto
+            self.assertEqual(decoders.features(data)['ofi'], 11)
+        self.assertEqual(decoders.fabric(got[5])['mlp_cycles'], 500)
+
+    def test_fabric_reply(self):
+        hdr = struct.pack('>4sBBHHIQQH', b'LOB1', 1, 5, 0, 32, 7, 0, 0, 0) + bytes(16)
+        telem = struct.pack('>QQQQQQII', 1000, 3000, 9000, 41000, 2000, 45000, 1, 1 << 16)
+        data = hdr + telem + struct.pack('>IIII', 500, 300, 200, 7)
+        f = {**decoders.telemetry(data), **decoders.fabric(data)}
+        self.assertEqual((f['t2'], f['t6'], f['reflex_act'], f['mlp_score']), (1000, 45000, 'CANCEL', 1.0))
+        self.assertEqual(f['fabric_math_ns'], (200 + 200) * 8)
+        self.assertEqual(f['fabric_shell_ns'], 500 * 8 - 400 * 8)
+        self.assertEqual(f['ps_glue_ns'], 40000 - 4000)
+        part = decoders.fabric(hdr + telem + struct.pack('>IIII', 500, 0, 0, 1))
+        self.assertEqual(part, {'fabric_valid': 1, 'mlp_cycles': 500})
+        self.assertEqual(decoders.fabric(data[:5] + b'\x04' + data[6:]), {})
+
+
+if __name__ == '__main__':
+    unittest.main()
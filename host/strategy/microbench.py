@@ -0,0 +1,367 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmarks for the CPU reflex lane, one component at a time.
+
+Timing a single call with two clock_gettime_ns() reads measures mostly the
+clock: on the PYNQ's A9 a back-to-back pair costs about as much as the work.
+Each case here is measured two ways, both corrected for that:
+
+  batched   time K calls per clock pair (K grows until a batch is well above
+            the timer overhead); per-call cost = (batch - timer) / K minus the
+            same loop running the case's harness alone (input cycling, call)
+  single    one call per clock pair, minus the median single-call harness
+            time; keeps the per-call tail the batches average away
+
+Batches run first as warmup until the median of the last window stops
+moving (steady state) or the warmup budget runs out; a case that never
+settles is flagged. Quantiles come with distribution-free confidence
+intervals from binomial order statistics. Cases:
+
+  book.apply_update   SimpleBook add / reduce around the BBO (with recalcs)
+  reflex.evaluate     ReflexEngine on normal, crossed and wide books
+  arbiter.decide      Arbiter over reflex actions and scores
+  header.parse        LOB1 header unpack + flags byteswap (feature_echo_mt)
+  feature.update      FeatureState.step, the PS feature recurrence
+  reflex_lane         apply_update + evaluate + decide, as runner.py does per packet
+
+  python3 host/strategy/microbench.py
+  python3 host/strategy/microbench.py --cases book.apply_update header.parse --pin 3 --json mb.json
+"""
+import gc
+import itertools
+import json
+import math
+import os
+import struct
+import sys
+import time
+from dataclasses import asdict, dataclass, field
+from statistics import NormalDist, median
+from typing import Callable, Dict, List, Sequence, Tuple
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from host.client.core import HDR_FMT, deltas_packet
+from host.strategy.arbiter import Arbiter
+from host.strategy.book import SimpleBook
+from host.strategy.reflex import ReflexAction, ReflexEngine
+from models.feature_state import FeatureState
+
+CLOCK = time.CLOCK_MONOTONIC_RAW
+QUANTILES = (50, 90, 99, 99.9)
+
+# case factory -> (fn, harness): both zero-arg; harness does everything fn does except the work
+Case = Tuple[Callable[[], object], Callable[[], object]]
+
+
+@dataclass
+class TimerOverhead:
+    pair_ns: float          # median back-to-back clock_gettime_ns pair
+    resolution_ns: int      # smallest nonzero step seen (clock_getres may report 1)
+    getres_ns: int
+
+
+def timer_overhead(n: int = 20_000) -> TimerOverhead:
+    clk, c = time.clock_gettime_ns, CLOCK
+    d = [0] * n
+    for i in range(n):
+        t0 = clk(c)
+        t1 = clk(c)
+        d[i] = t1 - t0
+    nz = [x for x in d if x > 0]
+    return TimerOverhead(median(d), min(nz) if nz else 0, int(time.clock_getres(c) * 1e9))
+
+
+def quantile_ci(sorted_x: Sequence[float], q: float, alpha: float = 0.05) -> Tuple[float, float, float]:
+    """
+    (estimate, lo, hi) for the q-th percentile: order statistics whose ranks
+    bound a Binomial(n, q/100) count at 1 - alpha. NaN bounds when n is too
+    small to reach them.
+    """
+    n = len(sorted_x)
+    if n == 0:
+        return (math.nan, math.nan, math.nan)
+    p = q / 100.0
+    est = sorted_x[min(n - 1, int(p * n))]
+    half = NormalDist().inv_cdf(1 - alpha / 2) * math.sqrt(n * p * (1 - p))
+    lo, hi = math.floor(n * p - half), math.ceil(n * p + half)
+    return (est, sorted_x[lo] if lo >= 0 else math.nan, sorted_x[hi] if hi < n else math.nan)
+
+
+def _batch(fn, k: int) -> int:
+    clk, c, r = time.clock_gettime_ns, CLOCK, range(k)
+    t0 = clk(c)
+    for _ in r:
+        fn()
+    return clk(c) - t0
+
+
+def _singles(fn, n: int) -> List[int]:
+    clk, c = time.clock_gettime_ns, CLOCK
+    out = [0] * n
+    for i in range(n):
+        t0 = clk(c)
+        fn()
+        out[i] = clk(c) - t0
+    return out
+
+
+def calibrate_k(fn, timer: TimerOverhead, min_batch_ns: float, k_max: int = 1 << 20) -> int:
+    """Smallest power of two K whose batch takes min_batch_ns (and >= 100x the timer pair)."""
+    target = max(min_batch_ns, 100 * timer.pair_ns)
+    k = 1
+    while k < k_max and median(_batch(fn, k) for _ in range(5)) < target:
+        k *= 2
+    return k
+
+
+def warm_up(fn, k: int, timer: TimerOverhead, window: int = 10, tol: float = 0.02,
+            max_batches: int = 500) -> Tuple[int, bool]:
+    """Run batches until two consecutive window medians agree within tol; (batches run, steady)."""
+    prev = None
+    done = 0
+    while done < max_batches:
+        cur = median((_batch(fn, k) - timer.pair_ns) / k for _ in range(window))
+        done += window
+        if prev is not None and abs(cur - prev) <= tol * max(abs(prev), 1e-9):
+            return done, True
+        prev = cur
+    return done, False
+
+
+@dataclass
+class BenchResult:
+    name: str
+    k: int
+    warmup_batches: int
+    steady: bool
+    harness_ns: float                       # per call, batched
+    batched_ns: List[float] = field(repr=False, default_factory=list)    # per-call cost of each batch
+    single_ns: List[float] = field(repr=False, default_factory=list)     # per-call, single shot
+    batched_q: Dict[str, Tuple[float, float, float]] = field(default_factory=dict)
+    single_q: Dict[str, Tuple[float, float, float]] = field(default_factory=dict)
+
+    def summary(self) -> dict:
+        d = asdict(self)
+        d.pop('batched_ns')
+        d.pop('single_ns')
+        return d
+
+
+def bench(name: str, case: Case, timer: TimerOverhead, batches: int = 200, singles: int = 5000,
+          min_batch_ns: float = 200_000, alpha: float = 0.05, quantiles: Sequence[float] = QUANTILES,
+          max_warmup: int = 500) -> BenchResult:
+    fn, harness = case
+    k = calibrate_k(fn, timer, min_batch_ns)
+    warm, steady = warm_up(fn, k, timer, max_batches=max_warmup)
+    warm_up(harness, k, timer, max_batches=max_warmup)
+    gc_was = gc.isenabled()
+    gc.disable()   # collections would land in whichever case happens to allocate
+    try:
+        base = median((_batch(harness, k) - timer.pair_ns) / k for _ in range(max(20, batches // 4)))
+        per_call = sorted((_batch(fn, k) - timer.pair_ns) / k - base for _ in range(batches))
+        base_single = median(_singles(harness, max(200, singles // 4)))
+        single = sorted(t - base_single for t in _singles(fn, singles))
+    finally:
+        if gc_was:
+            gc.enable()
+    res = BenchResult(name, k, warm, steady, base, per_call, single)
+    for q in quantiles:
+        res.batched_q[f"p{q:g}"] = quantile_ci(per_call, q, alpha)
+        res.single_q[f"p{q:g}"] = quantile_ci(single, q, alpha)
+    return res
+
+
+# --- cases ----------------------------------------------------------------
+
+def _noop(*a):
+    return None
+
+
+def _book(levels: int = 10, mid: int = 100_000, spread: int = 10) -> SimpleBook:
+    b = SimpleBook()
+    b.load_snapshot([(mid + spread // 2 + i, 100) for i in range(levels)],
+                    [(mid - spread // 2 - i, 100) for i in range(levels)])
+    return b
+
+
+def case_book_update() -> Case:
+    book = _book()
+    # add then remove the same quantity, so the book returns to its start every cycle;
+    # the adds inside the spread make a new best level whose removal forces a rescan
+    ups = []
+    for i in range(64):
+        side = i & 1
+        p = (100_000 - 5 + (i % 8) - 4) if side == 0 else (100_000 + 5 - (i % 8) + 4)
+        ups.append((side, p, 10, 1))
+    ups += [(s, p, q, 3) for s, p, q, _ in ups]
+    nxt = itertools.cycle(ups).__next__
+    apply = book.apply_update
+
+    def fn():
+        apply(*nxt())
+
+    def harness():
+        _noop(*nxt())
+    return fn, harness
+
+
+def case_reflex_evaluate() -> Case:
+    crossed, wide = _book(), _book()
+    crossed.apply_update(0, 100_010, 10, 1)
+    wide.load_snapshot([(101_000 + i, 100) for i in range(10)], [(99_000 - i, 100) for i in range(10)])
+    args = [(_book(), 100_000, 0)] * 6 + [(crossed, 100_010, 0), (wide, 99_000, 1)]
+    nxt = itertools.cycle(args).__next__
+    evaluate = ReflexEngine().evaluate
+
+    def fn():
+        evaluate(*nxt())
+
+    def harness():
+        _noop(*nxt())
+    return fn, harness
+
+
+def case_arbiter_decide() -> Case:
+    acts = list(ReflexAction)
+    args = [(acts[i % len(acts)], s, {}) for i, s in enumerate((0.0, 250.0, -250.0, 10.0, 199.0))]
+    nxt = itertools.cycle(args).__next__
+    decide = Arbiter().decide
+
+    def fn():
+        decide(*nxt())
+
+    def harness():
+        _noop(*nxt())
+    return fn, harness
+
+
+def case_header_parse() -> Case:
+    hdr = struct.Struct(HDR_FMT)
+    pkts = []
+    for i in range(64):
+        p = bytearray(deltas_packet([(100_000 + i, 10, 0, i & 1, 1)] * (1 + i % 4)))
+        struct.pack_into('>IQ', p, 10, i, 1_700_000_000_000_000_000 + i)
+        pkts.append(bytes(p))
+    nxt = itertools.cycle(pkts).__next__
+    unpack_from = hdr.unpack_from
+
+    def fn():
+        # as feature_echo_mt's processor: unpack, check magic, byteswap flags, split reset / count
+        magic, ver, msg_type, flags_be, hdr_len, seq, t_send, t_ing, rsv = unpack_from(nxt())
+        if magic != b'LOB1':
+            return None
+        flags = (flags_be >> 8) | ((flags_be & 0xFF) << 8)
+        return flags & 0x8000, flags & 0x7FFF
+
+    def harness():
+        return nxt()
+    return fn, harness
+
+
+def case_feature_update() -> Case:
+    st = FeatureState()
+    deltas = [(1_000 * i, 100_000 + (i % 8) - 4, 10 if i % 3 else -5, i % 4, i & 1, 1 + (i % 3))
+              for i in range(256)]
+    nxt = itertools.cycle(deltas).__next__
+    step = st.step
+
+    def fn():
+        step(nxt())
+
+    def harness():
+        _noop(nxt())
+    return fn, harness
+
+
+def case_reflex_lane() -> Case:
+    book, engine, arb = _book(), ReflexEngine(), Arbiter()
+    ups = [(0, 100_000 - 5 + (i % 8) - 4, 10, 1 if i < 8 else 3) for i in range(16)]
+    args = [(u, 150.0 * ((i % 5) - 2)) for i, u in enumerate(ups)]
+    nxt = itertools.cycle(args).__next__
+    apply, evaluate, decide = book.apply_update, engine.evaluate, arb.decide
+
+    def fn():
+        (side, price, qty, action), score = nxt()
+        apply(side, price, qty, action)
+        decide(evaluate(book, price, side), score, {})
+
+    def harness():
+        (side, price, qty, action), score = nxt()
+        _noop(side, price, qty, action)
+        _noop(_noop(book, price, side), score, {})
+    return fn, harness
+
+
+CASES: Dict[str, Callable[[], Case]] = {
+    'book.apply_update': case_book_update,
+    'reflex.evaluate': case_reflex_evaluate,
+    'arbiter.decide': case_arbiter_decide,
+    'header.parse': case_header_parse,
+    'feature.update': case_feature_update,
+    'reflex_lane': case_reflex_lane,
+}
+
+
+def format_results(results: Sequence[BenchResult], timer: TimerOverhead, alpha: float = 0.05) -> str:
+    ci = f"{int(round((1 - alpha) * 100))}% CI"
+    lines = [f"timer: clock_gettime_ns pair {timer.pair_ns:.0f} ns, step {timer.resolution_ns} ns "
+             f"(clock_getres {timer.getres_ns} ns); all times ns per call, overhead-corrected",
+             "",
+             f"{'case':<19}{'K':>7}{'warmup':>9}  {'batched p50 [' + ci + ']':<28}{'p99':>8}  "
+             f"{'single p50 [' + ci + ']':<28}{'p99':>8}{'p99.9':>9}{'harness':>9}"]
+
+    def cell(q):
+        est, lo, hi = q
+        return f"{est:>7.0f} [{lo:.0f}, {hi:.0f}]"
+    for r in results:
+        warm = f"{r.warmup_batches}{'' if r.steady else '!'}"
+        lines.append(f"{r.name:<19}{r.k:>7}{warm:>9}  {cell(r.batched_q['p50']):<28}{r.batched_q['p99'][0]:>8.0f}  "
+                     f"{cell(r.single_q['p50']):<28}{r.single_q['p99'][0]:>8.0f}"
+                     f"{r.single_q['p99.9'][0]:>9.0f}{r.harness_ns:>9.0f}")
+    if any(not r.steady for r in results):
+        lines.append("! no steady state within the warmup budget (raise --max-warmup or pin the CPU)")
+    return "\n".join(lines)
+
+
+def main():
+    import argparse
+    try:
+        from host.telemetry import rt
+    except ImportError:
+        rt = None
+    ap = argparse.ArgumentParser(description='Overhead-corrected micro-benchmarks of the CPU reflex lane')
+    ap.add_argument('--cases', nargs='+', choices=list(CASES), default=list(CASES))
+    ap.add_argument('--batches', type=int, default=200, help='Measured batches per case')
+    ap.add_argument('--singles', type=int, default=5000, help='Measured single-call samples per case')
+    ap.add_argument('--min-batch-us', type=float, default=200.0, help='Grow K until a batch takes this long')
+    ap.add_argument('--max-warmup', type=int, default=500, help='Warmup budget in batches')
+    ap.add_argument('--alpha', type=float, default=0.05, help='1 - confidence level of the quantile CIs')
+    ap.add_argument('--json', type=str, help='Write summaries (no raw samples) here')
+    if rt is not None:
+        rt.add_rt_args(ap)
+    args = ap.parse_args()
+    if rt is not None:
+        try:
+            rt.apply_from_args(args)
+        except RuntimeError as e:
+            sys.exit(f"CPU isolation check failed: {e}")
+
+    timer = timer_overhead()
+    results = []
+    for name in args.cases:
+        res = bench(name, CASES[name](), timer, args.batches, args.singles, args.min_batch_us * 1e3, args.alpha,
+                    max_warmup=args.max_warmup)
+        results.append(res)
+        print(f"{name}: K={res.k} p50={res.batched_q['p50'][0]:.0f} ns/call", flush=True)
+    print()
+    print(format_results(results, timer, args.alpha))
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'timer': asdict(timer), 'alpha': args.alpha,
+                       'cases': [r.summary() for r in results]}, f, indent=2)
+        print(f"\nSaved {args.json}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,315 @@
+#!/usr/bin/env python3
+"""
+Open-loop, timestamp-faithful LOBSTER replayer.
+
+replay_runner.py is closed-loop: it sends one packet, waits for the reply and
+then sleeps to a fixed --pps, so throughput is bounded by RTT and the
+original burstiness is lost. Here the sender never waits. Each packet leaves
+at its LOBSTER time (scaled by --speed, or back to back with --speed max), so
+events sharing a timestamp still go out as a microburst. A separate receiver
+process matches replies to requests by header seq; both sides stamp
+CLOCK_MONOTONIC_RAW, which is system-wide.
+
+Per seq the CSV records the scheduled and actual send time, the reply time
+and a status:
+  ok    reply within --late-us
+  late  reply after --late-us, before the drain window closed
+  lost  no reply
+plus an out-of-order flag (the reply arrived after one for a higher seq) and
+a duplicate count.
+
+  python3 host/strategy/open_loop_replay.py msgs.csv --speed 10 --limit 100000
+
+A .pcap input (any host client's --pcap capture, or feature_echo_mt.py
+--pcap) replays the captured LOB1 requests at their capture timing instead:
+the payloads go out unchanged apart from seq / t_send, or byte for byte
+with --verbatim (replies are then matched by the captured seq).
+
+  python3 host/strategy/open_loop_replay.py burst.pcap --speed 1 --limit 1000000
+
+--pin main=2 --pin rx=3 --fifo 80 keeps sender and receiver on their own
+cores (host/telemetry/rt.py); the placement is saved as <out>.rt.json.
+"""
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+import argparse
+import csv
+import multiprocessing as mp
+import socket
+import struct
+import time
+from host.client.sources import pcap as pcap_source
+from host.strategy.lobster_loader import parse_lobster_message, lobster_to_lob_packet
+from host.telemetry import rt
+
+SEQ_OFF = 10         # lob_v1_hdr_t.seq (big-endian u32)
+T_SEND_OFF = 14      # lob_v1_hdr_t.t_send_ns
+SCORE_OFF = 48       # lob_v1_feat_score_t.score_q16_16 after the 32B header + 16B features
+SPIN_NS = 200_000    # sleep until this close to a deadline, then spin
+
+
+def now_ns() -> int:
+    return time.clock_gettime_ns(time.CLOCK_MONOTONIC_RAW)
+
+
+def parse_speed(s: str) -> float:
+    """'1', '2x', '10x' -> factor; 'max' -> 0 (no pacing)."""
+    s = s.strip().lower()
+    if s == 'max':
+        return 0.0
+    speed = float(s[:-1] if s.endswith('x') else s)
+    if speed <= 0:
+        raise ValueError(f"speed must be > 0 or 'max', got {s!r}")
+    return speed
+
+
+def load_schedule(csv_path: str, limit: int, speed: float):
+    """(messages, send offsets in ns from the first message) for up to limit rows."""
+    msgs = []
+    with open(csv_path, 'r') as f:
+        for line in f:
+            if len(msgs) >= limit:
+                break
+            try:
+                msg = parse_lobster_message(line)
+            except ValueError:
+                continue
+            if msg:
+                msgs.append(msg)
+    if not msgs:
+        return [], []
+    t0 = msgs[0]['time']
+    if speed == 0:
+        return msgs, [0] * len(msgs)
+    # LOBSTER time is not guaranteed monotonic across files; never schedule backwards
+    offsets = []
+    last = 0
+    for m in msgs:
+        last = max(last, int(round((m['time'] - t0) / speed * 1e9)))
+        offsets.append(last)
+    return msgs, offsets
+
+
+def load_pcap_schedule(pcap_path: str, limit: int, speed: float, dst_port: int):
+    """(per-packet {'time', 'orig_seq'}, send offsets, payloads) for the LOB1 requests to dst_port in a capture."""
+    msgs, offsets, payloads = [], [], []
+    t0 = None
+    last = 0
+    for out in pcap_source(pcap_path, dst_port=dst_port, limit=limit):
+        ts = out.meta['ts_ns']
+        if t0 is None:
+            t0 = ts
+        if speed > 0:   # never schedule backwards (merged captures)
+            last = max(last, int(round((ts - t0) / speed)))
+        msgs.append({'time': ts / 1e9, 'orig_seq': out.meta['orig_seq']})
+        offsets.append(last)
+        payloads.append(out.payload)
+    return msgs, offsets, payloads
+
+
+def pace_until(deadline_ns: int) -> int:
+    while True:
+        t = now_ns()
+        left = deadline_ns - t
+        if left <= 0:
+            return t
+        if left > SPIN_NS:
+            time.sleep((left - SPIN_NS) / 1e9)
+
+
+def _receiver(sock, ready, last_send_ns, drain_ns, conn, rtc=None):
+    placed = None
+    if rtc is not None:
+        rtc.lock_child()
+        placed = (rtc.apply_thread('rx'), rtc.errors, rtc.locked)
+    sock.settimeout(0.01)
+    seqs, t_rx, scores = [], [], []
+    ready.set()
+    while True:
+        try:
+            data = sock.recv(4096)
+        except socket.timeout:
+            last = last_send_ns.value
+            if last and now_ns() > last + drain_ns:
+                break
+            continue
+        t = now_ns()
+        if len(data) < SEQ_OFF + 4:
+            continue
+        seqs.append(struct.unpack_from('>I', data, SEQ_OFF)[0])
+        t_rx.append(t)
+        scores.append(struct.unpack_from('>I', data, SCORE_OFF)[0] / 65536.0 if len(data) >= SCORE_OFF + 4 else None)
+    conn.send((seqs, t_rx, scores, placed))
+    conn.close()
+
+
+def classify(t_send, rx_seq, rx_t, late_ns: int, seq_base: int = 0):
+    """
+    Match replies to requests. Returns per-request (t_rx, status, ooo, dups)
+    lists plus the number of replies whose seq was never sent.
+    """
+    n = len(t_send)
+    t_rx = [None] * n
+    ooo = [False] * n
+    dups = [0] * n
+    stray = 0
+    max_seen = -1
+    for s, t in zip(rx_seq, rx_t):
+        i = s - seq_base
+        if not 0 <= i < n:
+            stray += 1
+            continue
+        if t_rx[i] is not None:
+            dups[i] += 1
+            continue
+        t_rx[i] = t
+        if i < max_seen:
+            ooo[i] = True
+        else:
+            max_seen = i
+    status = []
+    for ts, tr in zip(t_send, t_rx):
+        if tr is None:
+            status.append('lost')
+        elif tr - ts > late_ns:
+            status.append('late')
+        else:
+            status.append('ok')
+    return t_rx, status, ooo, dups, stray
+
+
+def pct(sorted_vals, q: float):
+    if not sorted_vals:
+        return 0
+    return sorted_vals[min(len(sorted_vals) - 1, int(q * len(sorted_vals)))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Open-loop LOBSTER replay paced by message timestamps")
+    parser.add_argument('csv_file', type=str, help='LOBSTER message CSV, or a .pcap of LOB1 requests')
+    parser.add_argument('--limit', type=int, default=10000, help='Max packets')
+    parser.add_argument('--speed', type=str, default='1', help="Time scale: 1, 2x, 10x ... or 'max' (no pacing)")
+    parser.add_argument('--bind', type=str, default='192.168.10.1')
+    parser.add_argument('--port', type=int, default=4006, help='Local port (4001-4005 are taken by the other runners)')
+    parser.add_argument('--dst', type=str, default='192.168.10.2')
+    parser.add_argument('--dst-port', type=int, default=4000)
+    parser.add_argument('--late-us', type=float, default=1000.0, help='Replies slower than this count as late')
+    parser.add_argument('--drain-ms', type=float, default=200.0, help='Keep receiving this long after the last send')
+    parser.add_argument('--seq-base', type=int, default=0)
+    parser.add_argument('--out', type=str, default='docs/experiments/exp_phase4_two_lane_brain/data/open_loop.csv')
+    parser.add_argument('--pcap-port', type=int,
+                        help='.pcap input: replay requests captured to this UDP port (default --dst-port)')
+    parser.add_argument('--verbatim', action='store_true',
+                        help='.pcap input: send the captured bytes unchanged (original seq and t_send)')
+    rt.add_rt_args(parser)
+    args = parser.parse_args()
+    try:
+        rtc = rt.rt_from_args(args).apply_process()
+    except RuntimeError as e:
+        sys.exit(f"CPU isolation check failed: {e}")
+
+    speed = parse_speed(args.speed)
+    from_pcap = args.csv_file.endswith('.pcap')
+    if from_pcap:
+        msgs, offsets, payloads = load_pcap_schedule(args.csv_file, args.limit, speed,
+                                                     args.pcap_port or args.dst_port)
+    else:
+        msgs, offsets = load_schedule(args.csv_file, args.limit, speed)
+    if not msgs:
+        print(f"No messages in {args.csv_file}")
+        return
+    n = len(msgs)
+    span_s = offsets[-1] / 1e9
+    print(f"Loaded {n} messages; replay span {span_s:.3f}s at speed {args.speed}")
+
+    s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    s.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 8 << 20)
+    s.bind((args.bind, args.port))
+    dst = (args.dst, args.dst_port)
+
+    # Packets are built up front so the send loop is only pacing + sendto
+    if from_pcap:
+        pkts = []
+        for i, p in enumerate(payloads):
+            pkt = bytearray(p)
+            if not args.verbatim:
+                struct.pack_into('>I', pkt, SEQ_OFF, (args.seq_base + i) & 0xFFFFFFFF)
+            pkts.append(bytes(pkt))
+    else:
+        pkts = [lobster_to_lob_packet(m, (args.seq_base + i) & 0xFFFFFFFF, 0) for i, m in enumerate(msgs)]
+    stamp = not (from_pcap and args.verbatim)
+
+    ready = mp.Event()
+    last_send_ns = mp.Value('q', 0, lock=False)
+    parent_conn, child_conn = mp.Pipe(duplex=False)
+    rx = mp.Process(target=_receiver, args=(s, ready, last_send_ns, int(args.drain_ms * 1e6), child_conn, rtc))
+    rx.start()
+    ready.wait()
+    rtc.apply_thread('main')   # the pacing loop below
+
+    t_sched = [0] * n
+    t_send = [0] * n
+    start = now_ns() + 1_000_000
+    wall0 = time.time_ns() - now_ns()
+    for i in range(n):
+        deadline = start + offsets[i]
+        t = pace_until(deadline)
+        if stamp:
+            pkt = bytearray(pkts[i])
+            struct.pack_into('>Q', pkt, T_SEND_OFF, t + wall0)  # t_send: wall clock, as the other runners
+        else:
+            pkt = pkts[i]
+        s.sendto(pkt, dst)
+        t_sched[i] = deadline
+        t_send[i] = t
+    last_send_ns.value = now_ns()
+
+    rx_seq, rx_t, scores, placed = parent_conn.recv()
+    rx.join()
+    s.close()
+    if placed is not None:   # the receiver's placement and errors (its copy includes ours up to the fork)
+        rtc.effective['rx'], rx_errors, rx_locked = placed
+        rtc.locked = rtc.locked and rx_locked   # mlockall=ok only if both processes are locked
+        rtc.errors = rx_errors + [e for e in rtc.errors if e not in rx_errors]
+    print(rtc.describe())
+    rt.save(rt.sidecar_path(args.out), rtc)
+
+    late_ns = int(args.late_us * 1000)
+    seq_base = args.seq_base
+    if not stamp:   # verbatim: captured seqs, mapped to send order (first occurrence wins)
+        index = {}
+        for i, m in enumerate(msgs):
+            index.setdefault(m['orig_seq'], i)
+        rx_seq = [index.get(sq, -1) for sq in rx_seq]
+        seq_base = 0
+    t_rx, status, ooo, dups, stray = classify(t_send, rx_seq, rx_t, late_ns, seq_base)
+    score_by_seq = {}
+    for sq, sc in zip(rx_seq, scores):
+        score_by_seq.setdefault(sq - seq_base, sc)
+
+    with open(args.out, 'w', newline='') as f_out:
+        writer = csv.writer(f_out)
+        writer.writerow(['seq', 'lob_time', 't_sched', 't_send', 't_recv', 'rtt_ns', 'send_lag_ns',
+                         'status', 'out_of_order', 'dups', 'fpga_score'])
+        for i in range(n):
+            rtt = t_rx[i] - t_send[i] if t_rx[i] is not None else -1
+            writer.writerow([msgs[i]['orig_seq'] if not stamp else args.seq_base + i, msgs[i]['time'], t_sched[i], t_send[i], t_rx[i] or 0, rtt,
+                             t_send[i] - t_sched[i], status[i], int(ooo[i]), dups[i], score_by_seq.get(i, '')])
+
+    rtts = sorted(t_rx[i] - t_send[i] for i in range(n) if t_rx[i] is not None)
+    lags = sorted(t_send[i] - t_sched[i] for i in range(n))
+    dur = (t_send[-1] - t_send[0]) / 1e9
+    print(f"Sent {n} in {dur:.3f}s ({n / dur if dur > 0 else float('inf'):.0f} pps)")
+    print(f"Replies: ok={status.count('ok')} late={status.count('late')} lost={status.count('lost')} "
+          f"out_of_order={sum(ooo)} dups={sum(dups)} stray={stray}")
+    if rtts:
+        print(f"RTT us: p50={pct(rtts, .5) / 1e3:.1f} p99={pct(rtts, .99) / 1e3:.1f} "
+              f"p99.9={pct(rtts, .999) / 1e3:.1f} max={rtts[-1] / 1e3:.1f}")
+    print(f"Send lag us: p50={pct(lags, .5) / 1e3:.1f} p99={pct(lags, .99) / 1e3:.1f} max={lags[-1] / 1e3:.1f}")
+    print(f"Saved to {args.out}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,482 @@
+#!/usr/bin/env python3
+"""
+Throughput suite for the book, feature, quantization and codec libraries,
+with JSON baselines.
+
+microbench.py answers "how long does one reflex-lane call take"; this
+answers "did a library change make the bulk paths slower". Every case runs
+over a fixed, seeded dataset generated into a temp dir (nothing is
+downloaded, no licensed data):
+
+  book.storm          SimpleBook under add / cancel storms on a deep book:
+                      bursts of orders inside the spread, then cancels of
+                      the new best levels (each forces a BBO rescan)
+  features_ref.run    scalar reference features over LOBSTER messages
+                      (models/datasets/synth_lobster.py, Hawkes arrivals)
+  features_vec        vectorized features over level-0 events, one process
+  features_split      the same events through features_pipeline.features_split
+                      (8 chunks, up to 4 workers); its rate over
+                      features_vec's is the split speedup, and the serial
+                      checkpoint / resync share is printed after the table
+  load_features_bin   features.bin (16 B >ihHII records) -> float32 [N, 4]
+  build_labels        LOBSTER message + orderbook CSVs -> 20 ms mid labels
+  emulate_mlp_int8    int8 MLP emulation (cpu_parity.py), fixed 4-32-1 spec
+  packet.encode       deltas_packet for 1-8 delta LOB1 packets
+  packet.decode       header + features + telemetry decoders on replies
+
+Each case runs once as warmup and then --repeats times; a run reports the
+median, min and max items per second. Runs are appended to a baselines
+file (--save) keyed by host and scale, and every run is compared with the
+last saved run of the same host, scale and dataset version. A case
+regressed when both its median and its best (fastest repeat) rate dropped
+by more than --max-regression-pct; any regression exits 1. On a noisy,
+unpinned machine raise --repeats or the threshold, or --pin the run.
+
+  python3 host/strategy/perf_suite.py                      # compare with the last baseline
+  python3 host/strategy/perf_suite.py --save --label dict-book
+  python3 host/strategy/perf_suite.py --cases book.storm packet.decode --scale 0.2 --pin 3
+"""
+import gc
+import json
+import os
+import platform
+import struct
+import sys
+import tempfile
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from statistics import median
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from host.client import decoders
+from host.client.core import HDR_FMT, MAGIC, deltas_packet
+from host.strategy.book import SimpleBook
+from models import features_ref, features_vec
+from models.datasets import synth_lobster
+from models.datasets.build_labels import build_labels
+from models.features_pipeline import features_split
+from models.tests.cpu_parity import emulate_mlp_int8
+from models.train.train_baselines import load_features_bin
+
+# Bump when a generator below changes: baselines of another version are not comparable
+DATASET_VERSION = 2
+SEED = 1234
+DEFAULT_BASELINES = Path(__file__).resolve().parents[2] / 'latency_analysis' / 'results' / 'perf_baselines.json'
+
+# items per case at --scale 1
+SIZES = {
+    'book.storm': 200_000,
+    'features_ref.run': 50_000,
+    'features_vec': 500_000,
+    'features_split': 500_000,
+    'load_features_bin': 100_000,
+    'build_labels': 50_000,
+    'emulate_mlp_int8': 200_000,
+    'packet.encode': 20_000,
+    'packet.decode': 20_000,
+}
+
+PRICE_TICK_1E4 = 100        # $0.01 in LOBSTER price * 1e4 units
+OB_LEVELS = 10
+
+
+# --- datasets -------------------------------------------------------------
+
+@dataclass
+class Dataset:
+    root: Path
+    scale: float
+    sizes: Dict[str, int]
+    messages_csv: Optional[Path] = None
+    orderbook_csv: Optional[Path] = None
+    features_bin: Optional[Path] = None
+
+
+def scaled_sizes(scale: float) -> Dict[str, int]:
+    return {k: max(16, int(round(v * scale))) for k, v in SIZES.items()}
+
+
+def write_lobster(msg_path: Path, ob_path: Path, n: int, seed: int = SEED) -> None:
+    """LOBSTER message + level-10 orderbook CSVs: the first n messages of a Hawkes synth_lobster stream."""
+    msg = synth_lobster.generate(synth_lobster.SynthConfig(orders=n, seed=seed, arrivals='hawkes'))
+    msg = {k: v[:n] for k, v in msg.items()}
+    synth_lobster.write_messages(msg_path, msg)
+    synth_lobster.write_orderbook(ob_path, synth_lobster.orderbook(msg, OB_LEVELS))
+
+
+def write_features_bin(path: Path, n: int, seed: int = SEED) -> None:
+    rng = np.random.default_rng(seed + 1)
+    rec = np.zeros(n, dtype=[('ofi', '>i4'), ('imb', '>i2'), ('rsv', '>u2'), ('burst', '>u4'), ('vol', '>u4')])
+    rec['ofi'] = rng.integers(-50_000, 50_000, n)
+    rec['imb'] = rng.integers(-32_768, 32_767, n)
+    rec['burst'] = rng.integers(0, 1 << 24, n)
+    rec['vol'] = rng.integers(0, 1 << 20, n)
+    path.write_bytes(rec.tobytes())
+
+
+def make_dataset(root: Path, scale: float = 1.0, cases: Sequence[str] = tuple(SIZES)) -> Dataset:
+    """Generate the files the selected cases read; in-memory inputs are built by the cases."""
+    ds = Dataset(Path(root), scale, scaled_sizes(scale))
+    if {'features_ref.run', 'build_labels'} & set(cases):
+        ds.messages_csv, ds.orderbook_csv = ds.root / 'messages.csv', ds.root / 'orderbook.csv'
+        write_lobster(ds.messages_csv, ds.orderbook_csv,
+                      max(ds.sizes['features_ref.run'], ds.sizes['build_labels']))
+    if 'load_features_bin' in cases:
+        ds.features_bin = ds.root / 'features.bin'
+        write_features_bin(ds.features_bin, ds.sizes['load_features_bin'])
+    return ds
+
+
+def mlp_spec(d: int = 4, h: int = 32, seed: int = SEED) -> dict:
+    """Fixed int8 MLP spec in the mlp_int8.json layout (independent of whatever model was last exported)."""
+    rng = np.random.default_rng(seed + 2)
+    return {'type': 'mlp', 'in_scale': 0.05,
+            'w0_int8': rng.integers(-127, 128, (h, d)).tolist(), 'b0_int32': rng.integers(-500, 500, h).tolist(),
+            'w0_scale': 0.01, 'b0_scale': 0.0005, 'act0_scale': 0.02,
+            'w1_int8': rng.integers(-127, 128, (1, h)).tolist(), 'b1_int32': [12], 'w1_scale': 0.01,
+            'b1_scale': 0.0002}
+
+
+# --- cases ----------------------------------------------------------------
+
+# case factory(dataset) -> (fn, items): fn runs the whole workload once and can be repeated
+Case = Tuple[Callable[[], object], int]
+
+
+def _storm(n: int, levels: int = 200, mid: int = 100_000, seed: int = SEED):
+    rng = np.random.default_rng(seed + 3)
+    book = SimpleBook()
+    book.load_snapshot([(mid + 5 + i, 100) for i in range(levels)], [(mid - 5 - i, 100) for i in range(levels)])
+    ups = []
+    while len(ups) < n:
+        side = int(rng.integers(0, 2))
+        burst = int(rng.integers(4, 32))
+        sign = 1 if side == 0 else -1
+        # orders stepping into the spread (each a new best), plus adds on resting levels
+        inside = [(side, mid + sign * (5 - 1 - k % 4), int(q), 1) for k, q in enumerate(rng.integers(1, 50, burst))]
+        resting = [(side, mid - sign * (5 + int(k)), 10, 1) for k in rng.integers(0, levels, burst // 2)]
+        ups += inside + resting
+        # the cancel storm: everything added above, best levels first
+        ups += [(s, p, q, 3) for s, p, q, _ in reversed(inside)] + [(s, p, q, 3) for s, p, q, _ in resting]
+    return book, ups
+
+
+def case_book_storm(ds: Dataset) -> Case:
+    book, ups = _storm(ds.sizes['book.storm'])
+    apply = book.apply_update
+
+    def fn():
+        # each burst is cancelled in full, so the book ends where it started
+        for u in ups:
+            apply(*u)
+    return fn, len(ups)
+
+
+def case_features_ref(ds: Dataset) -> Case:
+    n = ds.sizes['features_ref.run']
+    path = ds.root / 'messages_ref.csv'
+    with ds.messages_csv.open() as src, path.open('w') as dst:
+        dst.writelines(line for _, line in zip(range(n), src))
+
+    def fn():
+        for _ in features_ref.run(str(path), price_tick=PRICE_TICK_1E4):
+            pass
+    return fn, n
+
+
+def _events(n: int, seed: int = SEED) -> np.ndarray:
+    """Level-0 add/cancel/trade events on a few price levels, as LOBSTER messages give."""
+    rng = np.random.default_rng(seed + 7)
+    ev = np.zeros(n, dtype=features_vec.EVENT_DTYPE)
+    ev['ts_ns'] = np.cumsum(rng.integers(0, 300_000, n))
+    ev['price_ticks'] = rng.integers(100, 110, n)
+    ev['qty'] = rng.integers(-300, 300, n)
+    ev['side'] = rng.integers(0, 2, n)
+    ev['action'] = rng.choice([0, 1, 2, 3], n)
+    return ev
+
+
+def case_features_vec(ds: Dataset) -> Case:
+    ev = _events(ds.sizes['features_vec'])
+    return (lambda: features_vec.features(ev)), len(ev)
+
+
+SPLIT_STATS: Dict[str, float] = {}   # last features_split run: checkpoint_s, parallel_s, resync_s, ...
+
+
+def case_features_split(ds: Dataset) -> Case:
+    ev = _events(ds.sizes['features_split'])
+    workers = min(4, os.cpu_count() or 1)
+    return (lambda: features_split(ev, workers=workers, n_chunks=8, stats=SPLIT_STATS)), len(ev)
+
+
+def case_load_features_bin(ds: Dataset) -> Case:
+    return (lambda: load_features_bin(ds.features_bin)), ds.sizes['load_features_bin']
+
+
+def case_build_labels(ds: Dataset) -> Case:
+    n = ds.sizes['build_labels']
+    msg, ob = ds.root / 'messages_lbl.csv', ds.root / 'orderbook_lbl.csv'
+    for src, dst in ((ds.messages_csv, msg), (ds.orderbook_csv, ob)):
+        with src.open() as fi, dst.open('w') as fo:
+            fo.writelines(line for _, line in zip(range(n), fi))
+    out = ds.root / 'labels.csv'
+    return (lambda: build_labels(msg, ob, out, horizon_ms=20.0, tick_size=0.01)), n
+
+
+def case_emulate_mlp_int8(ds: Dataset) -> Case:
+    n = ds.sizes['emulate_mlp_int8']
+    rng = np.random.default_rng(SEED + 4)
+    X = rng.normal(0.0, 2.0, (n, 4)).astype(np.float32)
+    spec = mlp_spec()
+    return (lambda: emulate_mlp_int8(spec, X)), n
+
+
+def _deltas(n: int, seed: int = SEED):
+    rng = np.random.default_rng(seed + 5)
+    out = []
+    for cnt in rng.integers(1, 9, n).tolist():
+        out.append([(100_000 + int(rng.integers(-64, 64)), int(rng.integers(1, 500)), 0,
+                     int(rng.integers(0, 2)), int(rng.integers(1, 4))) for _ in range(cnt)])
+    return out
+
+
+def case_packet_encode(ds: Dataset) -> Case:
+    pkts = _deltas(ds.sizes['packet.encode'])
+
+    def fn():
+        for d in pkts:
+            deltas_packet(d)
+    return fn, len(pkts)
+
+
+def case_packet_decode(ds: Dataset) -> Case:
+    n = ds.sizes['packet.decode']
+    rng = np.random.default_rng(SEED + 6)
+    replies = []
+    for i in range(n):
+        hdr = struct.pack(HDR_FMT, MAGIC, 1, 3, 0, 32, i, 1_700_000_000_000_000_000 + i, 0, 0)
+        feat = struct.pack(decoders.FEAT_FMT, int(rng.integers(-1000, 1000)), int(rng.integers(-32768, 32767)), 0,
+                           int(rng.integers(0, 1 << 20)), int(rng.integers(0, 1 << 20)))
+        t2 = 1_000_000_000 + i * 1000
+        tel = struct.pack(decoders.TELEM_FMT, t2, t2 + 100, t2 + 200, t2 + 300, t2 + 150, t2 + 400,
+                          i % 4, int(rng.integers(0, 1 << 16)))
+        replies.append(hdr + feat + tel)
+    hdr = struct.Struct(HDR_FMT)
+
+    def fn():
+        for r in replies:
+            f = dict(zip(('magic', 'ver', 'msg_type', 'flags', 'hdr_len', 'seq', 't_send'), hdr.unpack_from(r)))
+            f.update(decoders.features(r))
+            f.update(decoders.telemetry(r))
+    return fn, n
+
+
+CASES: Dict[str, Callable[[Dataset], Case]] = {
+    'book.storm': case_book_storm,
+    'features_ref.run': case_features_ref,
+    'features_vec': case_features_vec,
+    'features_split': case_features_split,
+    'load_features_bin': case_load_features_bin,
+    'build_labels': case_build_labels,
+    'emulate_mlp_int8': case_emulate_mlp_int8,
+    'packet.encode': case_packet_encode,
+    'packet.decode': case_packet_decode,
+}
+UNITS = {'book.storm': 'updates', 'features_ref.run': 'rows', 'features_vec': 'events', 'features_split': 'events',
+         'load_features_bin': 'records',
+         'build_labels': 'rows', 'emulate_mlp_int8': 'samples', 'packet.encode': 'packets',
+         'packet.decode': 'packets'}
+
+
+# --- measurement ----------------------------------------------------------
+
+@dataclass
+class CaseResult:
+    name: str
+    items: int
+    unit: str
+    times_s: List[float] = field(default_factory=list)
+
+    @property
+    def rates(self) -> List[float]:
+        return [self.items / t for t in self.times_s]
+
+    def summary(self) -> dict:
+        r = self.rates
+        return {'items': self.items, 'unit': self.unit, 'times_s': self.times_s,
+                'rate_median': median(r), 'rate_min': min(r), 'rate_max': max(r)}
+
+
+def run_case(name: str, case: Case, repeats: int = 5, warmup: int = 1) -> CaseResult:
+    fn, items = case
+    for _ in range(warmup):
+        fn()
+    res = CaseResult(name, items, UNITS.get(name, 'items'))
+    for _ in range(repeats):
+        gc.collect()   # start every repeat from the same heap
+        t0 = time.perf_counter_ns()
+        fn()
+        res.times_s.append((time.perf_counter_ns() - t0) / 1e9)
+    return res
+
+
+# --- baselines ------------------------------------------------------------
+
+def host_id() -> dict:
+    return {'host': platform.node(), 'machine': platform.machine(), 'python': platform.python_version()}
+
+
+def new_entry(results: Sequence[CaseResult], scale: float, label: str = '') -> dict:
+    try:
+        from latency_analysis.results_store import git_state
+        rev, dirty = git_state()
+    except ImportError:
+        rev, dirty = None, None
+    return {'time_unix': time.time(), 'label': label, 'git_rev': rev, 'git_dirty': dirty,
+            'dataset_version': DATASET_VERSION, 'scale': scale, **host_id(),
+            'cases': {r.name: r.summary() for r in results}}
+
+
+def load_baselines(path: Path) -> List[dict]:
+    if not Path(path).exists():
+        return []
+    with open(path) as f:
+        return json.load(f).get('runs', [])
+
+
+def save_baseline(path: Path, entry: dict) -> None:
+    runs = load_baselines(path) + [entry]
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix('.tmp')
+    tmp.write_text(json.dumps({'runs': runs}, indent=2) + '\n')
+    os.replace(tmp, path)
+
+
+def last_baseline(runs: Sequence[dict], entry: dict) -> Optional[dict]:
+    """Most recent run measured on the same host, scale and dataset version."""
+    keys = ('host', 'machine', 'python', 'scale', 'dataset_version')
+    for r in reversed(runs):
+        if all(r.get(k) == entry.get(k) for k in keys):
+            return r
+    return None
+
+
+def compare(base: dict, cand: dict, max_regression_pct: float = 10.0) -> List[Tuple[str, float, float, str]]:
+    """(case, base median rate, delta %, verdict) for every case both runs have."""
+    out = []
+    for name, c in cand['cases'].items():
+        b = base['cases'].get(name)
+        if b is None or b['items'] != c['items']:
+            continue
+        delta = 100.0 * (c['rate_median'] / b['rate_median'] - 1.0)
+        best = 100.0 * (c['rate_max'] / b['rate_max'] - 1.0)   # fastest repeat: least disturbed by the machine
+        if delta < -max_regression_pct and best < -max_regression_pct:
+            verdict = 'regression'
+        elif delta > max_regression_pct and best > max_regression_pct:
+            verdict = 'faster'
+        else:
+            verdict = 'ok'
+        out.append((name, b['rate_median'], delta, verdict))
+    return out
+
+
+def _rate(x: float) -> str:
+    for div, suffix in ((1e6, 'M'), (1e3, 'k')):
+        if x >= div:
+            return f"{x / div:.2f}{suffix}"
+    return f"{x:.0f}"
+
+
+def format_results(entry: dict, base: Optional[dict] = None, max_regression_pct: float = 10.0) -> str:
+    diffs = {d[0]: d for d in compare(base, entry, max_regression_pct)} if base else {}
+    lines = [f"{'case':<19}{'items':>9} {'unit':<8}{'median/s':>10}{'[min, max]':>22}"
+             f"{'baseline':>11}{'delta':>9}  verdict"]
+    for name, c in entry['cases'].items():
+        rng = f"[{_rate(c['rate_min'])}, {_rate(c['rate_max'])}]"
+        line = f"{name:<19}{c['items']:>9} {c['unit']:<8}{_rate(c['rate_median']):>10}{rng:>22}"
+        if name in diffs:
+            _, b, delta, verdict = diffs[name]
+            line += f"{_rate(b):>11}{delta:>+8.1f}%  {verdict}"
+        lines.append(line)
+    if base:
+        when = time.strftime('%Y-%m-%d %H:%M', time.localtime(base['time_unix']))
+        lines.append(f"\nbaseline: {when} git {(base.get('git_rev') or '?')[:10]}"
+                     f"{'+' if base.get('git_dirty') else ''} {base.get('label', '')}")
+    else:
+        lines.append("\nno baseline for this host / scale / dataset version (run with --save)")
+    return "\n".join(lines)
+
+
+def format_split(entry: dict, stats: Optional[dict] = None) -> str:
+    """features_split speedup over features_vec and, from its last run, the serial share."""
+    cases = entry['cases']
+    if 'features_vec' not in cases or 'features_split' not in cases:
+        return ''
+    line = f"features_split: {cases['features_split']['rate_median'] / cases['features_vec']['rate_median']:.2f}x features_vec"
+    stats = SPLIT_STATS if stats is None else stats
+    if stats:
+        total = stats['checkpoint_s'] + stats['parallel_s'] + stats['resync_s']
+        line += (f", serial checkpoint {stats['checkpoint_s'] * 1e3:.1f} ms + resync {stats['resync_s'] * 1e3:.1f} ms"
+                 f" ({100.0 * (stats['checkpoint_s'] + stats['resync_s']) / total:.0f}% of the run)")
+    return line
+
+
+def main():
+    import argparse
+    try:
+        from host.telemetry import rt
+    except ImportError:
+        rt = None
+    ap = argparse.ArgumentParser(description='Throughput suite for the book, feature, quantization and codec libraries')
+    ap.add_argument('--cases', nargs='+', choices=list(CASES), default=list(CASES))
+    ap.add_argument('--scale', type=float, default=1.0, help='Dataset size multiplier (baselines are per scale)')
+    ap.add_argument('--repeats', type=int, default=5, help='Timed runs per case after one warmup run')
+    ap.add_argument('--baselines', type=str, default=str(DEFAULT_BASELINES), help='Baselines JSON (run history)')
+    ap.add_argument('--save', action='store_true', help='Append this run to the baselines file')
+    ap.add_argument('--label', type=str, default='', help='Label stored with --save')
+    ap.add_argument('--max-regression-pct', type=float, default=10.0,
+                    help='Drop of both the median and the best rate that counts as a regression')
+    ap.add_argument('--json', type=str, help='Write this run (same layout as a baseline entry) here')
+    if rt is not None:
+        rt.add_rt_args(ap)
+    args = ap.parse_args()
+    if rt is not None:
+        try:
+            rtc = rt.apply_from_args(args)
+        except RuntimeError as e:
+            sys.exit(f"CPU isolation check failed: {e}")
+
+    results = []
+    with tempfile.TemporaryDirectory(prefix='perf_suite_') as d:
+        ds = make_dataset(Path(d), args.scale, args.cases)
+        for name in args.cases:
+            res = run_case(name, CASES[name](ds), args.repeats)
+            results.append(res)
+            print(f"{name}: {_rate(median(res.rates))} {res.unit}/s", flush=True)
+    entry = new_entry(results, args.scale, args.label)
+    if rt is not None and rtc.enabled():
+        entry['rt'] = rt.brief(rtc.summary())
+    base = last_baseline(load_baselines(Path(args.baselines)), entry)
+    print()
+    print(format_results(entry, base, args.max_regression_pct))
+    split = format_split(entry)
+    if split:
+        print(split)
+    if args.json:
+        Path(args.json).write_text(json.dumps(entry, indent=2) + '\n')
+    if args.save:
+        save_baseline(Path(args.baselines), entry)
+        print(f"Saved baseline to {args.baselines}")
+    regressed = base is not None and any(v == 'regression' for *_, v in compare(base, entry, args.max_regression_pct))
+    sys.exit(1 if regressed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -9,14 +9,15 @@ import os
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
 
 import argparse
-import socket
 import time
-import csv
-import struct
+from host.client import decoders, sources
+from host.client.core import add_net_args, client_from_args, run_client
+from host.client.sinks import CallbackSink, add_log_args, log_sink
+from host.telemetry.writer import AsyncTextLog
 from host.strategy.book import SimpleBook
 from host.strategy.reflex import ReflexEngine
 from host.strategy.arbiter import Arbiter
-from host.strategy.lobster_loader import parse_lobster_message, lobster_to_lob_packet, load_lobster_snapshot
+from host.strategy.lobster_loader import load_lobster_snapshot
 
 def main():
     parser = argparse.ArgumentParser()
@@ -25,18 +26,15 @@ def main():
     parser.add_argument('--limit', type=int, default=10000, help='Max packets')
     parser.add_argument('--pps', type=float, default=100.0, help='Replay speed (pkts/sec)')
     parser.add_argument('--out', type=str, default='docs/experiments/exp_phase4_two_lane_brain/data/replay.csv')
+    add_net_args(parser, port=4003, timeout_ms=20.0)
+    add_log_args(parser)
     args = parser.parse_args()
 
-    # Setup Network
-    s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-    s.bind(('192.168.10.1', 4003))
-    s.setblocking(False)
-    dst = ('192.168.10.2', 4000)
-
     # Strategies
     book = SimpleBook()
     reflex = ReflexEngine()
     arbiter = Arbiter()
+    console = AsyncTextLog(sys.stdout)  # status lines are printed off the reply path
 
     # Load Initial Book State
     print(f"Loading initial book from {args.book_file}...")
@@ -44,92 +42,41 @@ def main():
     book.load_snapshot(asks, bids)
     print(f"Book initialized: Best Bid={book.best_bid} Best Ask={book.best_ask} Spread={book.get_spread()}")
 
-    # Logging
-    f_out = open(args.out, 'w')
-    writer = csv.writer(f_out)
-    writer.writerow(['seq', 'lob_time', 't_send', 't_reflex', 't_fpga', 'latency_gap_ns', 'reflex_act', 'fpga_score', 'final_dec'])
-
-    print(f"Replaying {args.csv_file} at {args.pps} PPS...")
+    def reflex_lane(req):
+        # Map LOBSTER types to simple actions for book update
+        msg = req.meta['msg']
+        side = 0 if msg['side'] == 1 else 1
+        book.apply_update(side, msg['price'], msg['size'], 1 if msg['type'] == 1 else 3)
+        req.meta['reflex_act'] = reflex.evaluate(book, msg['price'], side)
+        req.meta['t_reflex'] = time.clock_gettime_ns(time.CLOCK_MONOTONIC_RAW)
 
-    seq = 0
-    interval = 1.0 / args.pps
-    next_send = time.time()
-    
-    with open(args.csv_file, 'r') as f_in:
-        for line in f_in:
-            if seq >= args.limit:
-                break
-                
-            msg = parse_lobster_message(line)
-            if not msg: continue
-            
-            # Rate Limit
-            now = time.time()
-            if now < next_send:
-                time.sleep(next_send - now)
-            
-            # 1. Prepare & Send
-            t_send_ns = int(time.time() * 1e9)
-            pkt = lobster_to_lob_packet(msg, seq, t_send_ns)
-            
-            t0 = time.clock_gettime_ns(time.CLOCK_MONOTONIC_RAW)
-            s.sendto(pkt, dst)
-            
-            # 2. Reflex Lane (CPU)
-            # Map LOBSTER types to simple actions for book update
-            action_code = 1 if msg['type'] == 1 else 3
-            book.apply_update(
-                0 if msg['side'] == 1 else 1,
-                msg['price'],
-                msg['size'],
-                action_code
-            )
-            reflex_act = reflex.evaluate(book, msg['price'], 0 if msg['side'] == 1 else 1)
-            t_reflex = time.clock_gettime_ns(time.CLOCK_MONOTONIC_RAW)
-            
-            # 3. FPGA Lane (Wait for Neural Score)
-            fpga_score = 0.0
-            t_fpga = 0
-            
-            while True:
-                try:
-                    data, _ = s.recvfrom(4096)
-                    t_fpga = time.clock_gettime_ns(time.CLOCK_MONOTONIC_RAW)
-                    
-                    # Parse correctly based on lob_v1.h
-                    # Offset 32: Features (16B)
-                    # Offset 48: Score (4B, Q16.16)
-                    if len(data) >= 52: # Header(32) + Features(16) + Score(4)
-                        score_int = struct.unpack('>I', data[48:52])[0]
-                        # Convert Q16.16 to float
-                        fpga_score = score_int / 65536.0
-                    elif len(data) >= 48:
-                        # Fallback if score missing (shouldn't happen with correct bitstream)
-                        # Just use 0.0
-                        pass
-                        
-                    break
-                except BlockingIOError:
-                    if time.clock_gettime_ns(time.CLOCK_MONOTONIC_RAW) - t0 > 20_000_000:
-                        break
-                    continue
-            
-            # 4. Arbiter
-            final_dec = arbiter.decide(reflex_act, fpga_score, {})
+    def row(req, reply):
+        # FPGA lane: Q16.16 score at offset 48 (lob_v1_feat_score_t); 0.0 if missing or timed out
+        t_fpga = reply.t_recv if reply else 0
+        fpga_score = reply.fields.get('score', 0.0) if reply else 0.0
+        final_dec = arbiter.decide(req.meta['reflex_act'], fpga_score, {})
+        t_reflex = req.meta['t_reflex']
+        gap = t_fpga - t_reflex if t_fpga > 0 else -1
+        if req.seq % 100 == 0:
+            console.append(f"Seq {req.seq}: Gap={gap/1000:.1f}us Reflex={req.meta['reflex_act'].name} "
+                  f"Score={fpga_score:.4f} Dec={final_dec.name}")
+        return [req.seq, req.meta['msg']['time'], req.t_send, t_reflex, t_fpga, gap,
+                req.meta['reflex_act'].name, fpga_score, final_dec.name]
 
-            # Stats
-            gap = t_fpga - t_reflex if t_fpga > 0 else -1
-            
-            writer.writerow([seq, msg['time'], t0, t_reflex, t_fpga, gap, reflex_act.name, fpga_score, final_dec.name])
-            
-            if seq % 100 == 0:
-                print(f"Seq {seq}: Gap={gap/1000:.1f}us Reflex={reflex_act.name} Score={fpga_score:.4f} Dec={final_dec.name}")
-            
-            seq += 1
-            next_send += interval
+    sink = log_sink(args, args.out, ['seq', 'lob_time', 't_send', 't_reflex', 't_fpga', 'latency_gap_ns',
+                                     'reflex_act', 'fpga_score', 'final_dec'], row,
+                    fields=['latency_gap_ns'], sample_columns=['seq', 't_send', 't_reflex', 't_fpga', 'latency_gap_ns'],
+                    bin_columns={'t1_host_ns': 't_send', 't5_host_ns': 't_fpga', 't_reflex_ns': 't_reflex',
+                                 'score': 'fpga_score'})
+    src = sources.lobster(args.csv_file, limit=args.limit, pps=args.pps)
+    client = client_from_args(args, decoders=[decoders.score], sinks=[CallbackSink(on_send=reflex_lane), sink])
 
-    f_out.close()
-    print(f"Done. Saved to {args.out}")
+    print(f"Replaying {args.csv_file} at {args.pps} PPS...")
+    stats = run_client(client, src)
+    console.close()
+    print(stats.summary())
+    print(sink.summary())
+    print(f"Done. Saved to {sink.path}")
 
 if __name__ == '__main__':
     main()
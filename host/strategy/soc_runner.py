@@ -9,123 +9,85 @@ import os
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
 
 import argparse
-import socket
-import struct
-import time
-import csv
+from host.client import decoders, sources
+from host.client.core import add_net_args, client_from_args, run_client
+from host.client.sinks import add_log_args, log_sink
+from host.telemetry import clocksync, rt
+from host.telemetry.writer import AsyncTextLog
 
-# Telemetry Format: T2, T3, T4, T5, T_Reflex, T6, Reflex_Act, MLP_Score
-# 6 Q (u64), 2 I (u32)
-TELEM_FMT = '>QQQQQQII'
-TELEM_LEN = 56
-
-REFLEX_ACTIONS = {0: 'NONE', 1: 'CANCEL', 2: 'TAKE', 3: 'WIDEN'}
+FABRIC_COLUMNS = ['mlp_cycles', 'feat_cycles', 'feat_dbg_cycles', 'fabric_math_ns', 'fabric_shell_ns', 'ps_glue_ns']
 
 def main():
     parser = argparse.ArgumentParser()
     parser.add_argument('--pps', type=float, default=10.0)
     parser.add_argument('--count', type=int, default=1000)
     parser.add_argument('--out', type=str, default='docs/experiments/exp_phase5_soc_benchmark/data/soc_results.csv')
-    parser.add_argument('--ip', type=str, default='192.168.10.2')
+    add_net_args(parser, port=4005, timeout_ms=100.0)  # New port for SoC tests
+    add_log_args(parser)
+    parser.add_argument('--sync-ms', type=float, default=0.0,
+                        help='Interleave a clock-sync PING this often, e.g. 100 (default off: the traffic is '
+                             'the deltas alone); model saved as <out>.clock.json')
+    rt.add_rt_args(parser)
     args = parser.parse_args()
 
-    # Create output directory
-    os.makedirs(os.path.dirname(args.out), exist_ok=True)
-
-    # Setup Network
-    s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-    s.bind(('192.168.10.1', 4005)) # New port for SoC tests
-    s.setblocking(False)
-    dst = (args.ip, 4000)
+    console = AsyncTextLog(sys.stdout)  # status lines are printed off the reply path
 
-    # Logging
-    f = open(args.out, 'w')
-    writer = csv.writer(f)
-    writer.writerow(['seq', 't_host_send', 't_host_recv', 't2_rx', 't3_dma_start', 't4_feat_done', 
-                     't5_score_done', 't_reflex_done', 't6_tx', 
-                     'reflex_act', 'mlp_score', 'latency_internal_gap_ns', 'latency_host_rtt_ns'])
-
-    print(f"Starting SoC Runner. Target: {args.pps} PPS. Count: {args.count}")
-    print(f"Logging to {args.out}")
+    def row(req, reply):
+        if req.meta.get('ping'):  # clock-sync PING, collected by ClockSyncSink
+            return None
+        if reply is None:
+            console.append(f"Seq {req.seq}: Timeout")
+            return None
+        f = reply.fields
+        if 't2' not in f:
+            console.append(f"Seq {req.seq}: Received short packet len={len(reply.data)}")
+            return None
+        # Internal gap: positive = FPGA was slower. Neuro decision is t5 (score) or t4 (features only).
+        neuro_time = f['t5'] if f['t5'] > 0 else f['t4']
+        gap = neuro_time - f['t_reflex']
+        rtt = reply.t_recv - req.t_send
+        if req.seq % 10 == 0:
+            console.append(f"Seq {req.seq}: RTT={rtt/1e6:.2f}ms Reflex={f['reflex_act']} Score={f['mlp_score']:.4f} "
+                  f"Gap={gap/1000:.1f}us (Reflex@{f['t_reflex']-f['t2']}ns, Neuro@{neuro_time-f['t2']}ns)")
+        # Fabric counters (echo server --fabric-counters, msg_type 5); empty otherwise
+        return [req.seq, req.t_send, reply.t_recv, f['t2'], f['t3'], f['t4'], f['t5'], f['t_reflex'], f['t6'],
+                f['reflex_act'], f['mlp_score'], gap, rtt,
+                *(f.get(k) for k in FABRIC_COLUMNS)]
 
-    seq = 0
-    interval = 1.0 / args.pps
-    next_send = time.time()
+    sink = log_sink(args, args.out, ['seq', 't_host_send', 't_host_recv', 't2_rx', 't3_dma_start', 't4_feat_done',
+                                     't5_score_done', 't_reflex_done', 't6_tx',
+                                     'reflex_act', 'mlp_score', 'latency_internal_gap_ns', 'latency_host_rtt_ns',
+                                     *FABRIC_COLUMNS], row,
+                    # the internal gap is signed: only the sampled rows keep it exactly
+                    fields=['latency_host_rtt_ns', 'latency_internal_gap_ns'],
+                    sample_columns=['seq', 't2_rx', 't3_dma_start', 't4_feat_done', 't5_score_done',
+                                    't_reflex_done', 't6_tx', 'latency_internal_gap_ns', 'latency_host_rtt_ns'],
+                    bin_columns={'reflex_act': 'reflex_act', 't1_host_ns': 't_host_send', 't5_host_ns': 't_host_recv',
+                                 't2_pynq_ns': 't2_rx', 't3_pynq_ns': 't3_dma_start', 't4_pynq_ns': 't4_feat_done',
+                                 't5_pynq_ns': 't5_score_done', 't6_pynq_ns': 't6_tx', 't_reflex_ns': 't_reflex_done',
+                                 'score': 'mlp_score', 'mlp_cycles': 'mlp_cycles', 'feat_cycles': 'feat_cycles',
+                                 'feat_dbg_cycles': 'feat_dbg_cycles'})
+    # Delta (Price, Qty=100, Bid=0, Add=1); a crossed bid every 50th packet triggers Reflex
+    src = sources.synthetic(args.count, args.pps,
+                            lambda i: [(102000 if i % 50 == 0 else 100000, 100, 0, 0, 1)])
+    sinks = [sink]
+    if args.sync_ms > 0:
+        sinks.append(clocksync.ClockSyncSink(clocksync.sidecar_path(sink.path)))
+        src = clocksync.with_pings(src, int(args.sync_ms * 1e6))
+    client = client_from_args(args, decoders=[decoders.telemetry, decoders.fabric, decoders.ping], sinks=sinks)
 
     try:
-        while seq < args.count:
-            now = time.time()
-            if now >= next_send:
-                # 1. GENERATE & SEND
-                t_send_ns = int(time.time() * 1e9)
-                # Header (LOB1, Ver1, Type1=Delta)
-                pkt = struct.pack('>4sBBHHIQQH', b'LOB1', 1, 1, 0x8001, 32, seq, t_send_ns, 0, 0)
-                
-                # Generate a fake crossed book occasionally to trigger Reflex
-                # Normal: Bid 100, Ask 101. Crossed: Bid 102.
-                price = 100000
-                if seq % 50 == 0:
-                    price = 102000 # Cross logic (Ask is usually ~100100)
-                
-                # Delta (Price, Qty=100, Bid=0, Add=1)
-                delta = struct.pack('>iiHBBI', price, 100, 0, 0, 1, 0)
-                
-                msg = pkt + delta
-                
-                t0 = time.clock_gettime_ns(time.CLOCK_MONOTONIC_RAW)
-                s.sendto(msg, dst)
-                
-                # 2. RECV & PARSE
-                while True:
-                    try:
-                        data, _ = s.recvfrom(4096)
-                        t_recv = time.clock_gettime_ns(time.CLOCK_MONOTONIC_RAW)
-                        
-                        # Parse Header (32) + Features (16) + Telemetry (56)
-                        if len(data) >= 32 + 16 + TELEM_LEN:
-                            # Extract Telemetry
-                            telem_bytes = data[-TELEM_LEN:]
-                            t2, t3, t4, t5, t_reflex, t6, reflex_act, mlp_score = struct.unpack(TELEM_FMT, telem_bytes)
-                            
-                            # Calculate Internal Latency Gap
-                            # Positive = FPGA was slower. Negative = FPGA was faster.
-                            # Note: t4 is Feature Done, t5 is Score Done.
-                            # Decision time for FPGA is t5 (if SNN used) or t4 (if just feats).
-                            # Let's assume t5 is the "Neuro Decision Time".
-                            
-                            neuro_time = t5 if t5 > 0 else t4
-                            gap = neuro_time - t_reflex
-                            
-                            act_name = REFLEX_ACTIONS.get(reflex_act, str(reflex_act))
-                            score_float = mlp_score / 65536.0
-                            
-                            rtt = t_recv - t0
-                            
-                            writer.writerow([seq, t0, t_recv, t2, t3, t4, t5, t_reflex, t6, 
-                                             act_name, score_float, gap, rtt])
-                            
-                            if seq % 10 == 0:
-                                print(f"Seq {seq}: RTT={rtt/1e6:.2f}ms Reflex={act_name} Score={score_float:.4f} "
-                                      f"Gap={gap/1000:.1f}us (Reflex@{t_reflex-t2}ns, Neuro@{neuro_time-t2}ns)")
-                        else:
-                            print(f"Seq {seq}: Received short packet len={len(data)}")
-                        
-                        break
-                    except BlockingIOError:
-                        if time.clock_gettime_ns(time.CLOCK_MONOTONIC_RAW) - t0 > 100_000_000: # 100ms timeout
-                            print(f"Seq {seq}: Timeout")
-                            break
-                        continue
-                
-                seq += 1
-                next_send += interval
-
-    except KeyboardInterrupt:
-        print("Stopping...")
-    finally:
-        f.close()
-        print(f"Done.")
+        rt.apply_from_args(args, log_path=sink.path)   # <out>.rt.json; after the sinks start their writers
+    except RuntimeError as e:
+        sys.exit(f"CPU isolation check failed: {e}")
+    print(f"Starting SoC Runner. Target: {args.pps} PPS. Count: {args.count}")
+    print(f"Logging to {sink.path}")
+    stats = run_client(client, src)
+    console.close()
+    print(stats.summary())
+    for s in sinks:
+        print(s.summary())
+    print(f"Done.")
 
 if __name__ == "__main__":
     main()
-
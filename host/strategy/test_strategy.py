@@ -1,11 +1,16 @@
+import math
+import tempfile
 import unittest
 import sys
 import os
+from pathlib import Path
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
 
 from host.strategy.book import SimpleBook
 from host.strategy.reflex import ReflexEngine, ReflexAction
 from host.strategy.arbiter import Arbiter, Decision
+from host.strategy.open_loop_replay import classify, parse_speed
+from host.strategy import microbench, perf_suite
 
 class TestStrategy(unittest.TestCase):
     def test_book_crossing(self):
@@ -57,6 +62,69 @@ class TestStrategy(unittest.TestCase):
         d = arb.decide(ReflexAction.NONE, 10.0, {})
         self.assertEqual(d, Decision.HOLD)
 
+    def test_open_loop_classify(self):
+        self.assertEqual(parse_speed('10x'), 10.0)
+        self.assertEqual(parse_speed('max'), 0.0)
+        t_send = [0, 100, 200, 300, 400]
+        # seq 2 overtaken by seq 3, seq 1 answered late and twice, seq 4 lost, seq 9 unknown
+        rx_seq = [0, 3, 2, 1, 1, 9]
+        rx_t = [50, 350, 260, 5000, 5100, 6000]
+        t_rx, status, ooo, dups, stray = classify(t_send, rx_seq, rx_t, late_ns=1000)
+        self.assertEqual(status, ['ok', 'late', 'ok', 'ok', 'lost'])
+        self.assertEqual(ooo, [False, True, True, False, False])
+        self.assertEqual(dups, [0, 1, 0, 0, 0])
+        self.assertEqual(stray, 1)
+        self.assertIsNone(t_rx[4])
+
+    def test_microbench(self):
+        x = list(range(1000))
+        est, lo, hi = microbench.quantile_ci(x, 50)
+        self.assertEqual(est, 500)
+        self.assertTrue(460 <= lo < 500 < hi <= 540)
+        self.assertTrue(math.isnan(microbench.quantile_ci(x[:100], 99.9)[2]))   # too few samples for an upper bound
+
+        timer = microbench.timer_overhead(2000)
+        self.assertGreater(timer.pair_ns, 0)
+        for name, make in microbench.CASES.items():
+            fn, harness = make()
+            for _ in range(300):   # inputs cycle without drifting the state
+                fn()
+                harness()
+        res = microbench.bench('book.apply_update', microbench.CASES['book.apply_update'](), timer,
+                               batches=20, singles=200, min_batch_ns=20_000, max_warmup=40)
+        self.assertEqual(len(res.batched_ns), 20)
+        self.assertGreater(res.k, 1)
+        p50, lo, hi = res.batched_q['p50']
+        self.assertLessEqual(lo, p50)
+        self.assertLessEqual(p50, hi)
+        self.assertGreater(p50, 0)
+        self.assertIn('book.apply_update', microbench.format_results([res], timer))
+
+    def test_perf_suite(self):
+        with tempfile.TemporaryDirectory() as d:
+            ds = perf_suite.make_dataset(Path(d), scale=0.01)
+            results = [perf_suite.run_case(name, make(ds), repeats=2) for name, make in perf_suite.CASES.items()]
+            self.assertTrue((Path(d) / 'labels.csv').exists())
+            entry = perf_suite.new_entry(results, 0.01, 'test')
+            self.assertEqual(set(entry['cases']), set(perf_suite.CASES))
+            self.assertIn('x features_vec, serial checkpoint', perf_suite.format_split(entry))
+            for c in entry['cases'].values():
+                self.assertGreater(c['items'], 0)
+                self.assertLessEqual(c['rate_min'], c['rate_median'])
+                self.assertLessEqual(c['rate_median'], c['rate_max'])
+
+            path = Path(d) / 'baselines.json'
+            self.assertIsNone(perf_suite.last_baseline(perf_suite.load_baselines(path), entry))
+            perf_suite.save_baseline(path, entry)
+            base = perf_suite.last_baseline(perf_suite.load_baselines(path), entry)
+            self.assertEqual(base['label'], 'test')
+            self.assertIsNone(perf_suite.last_baseline([base], dict(entry, scale=1.0)))   # other scale: not comparable
+
+        slow = {'cases': {k: dict(c, rate_median=c['rate_median'] / 2, rate_max=c['rate_max'] / 2)
+                          for k, c in entry['cases'].items()}}
+        self.assertTrue(all(v == 'regression' for *_, v in perf_suite.compare(base, slow)))
+        self.assertTrue(all(v == 'ok' for *_, v in perf_suite.compare(base, entry)))
+        self.assertIn('regression', perf_suite.format_results(slow, base))
+
 if __name__ == '__main__':
     unittest.main()
-
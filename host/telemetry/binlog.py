@@ -0,0 +1,152 @@
+"""
+Append-only binary telemetry log: fixed-size records of a NumPy structured
+dtype behind a self-describing header.
+
+  0      4s  magic b"TLOG"
+  4      u16 format version
+  6      u16 header_len (records start here; 4096, so they stay page aligned)
+  8      u32 record size (bytes)
+  12     JSON (utf-8, NUL padded to header_len): schema name + version, dtype
+         descr, clock metadata, free-form run meta
+
+There is no record count in the header: the file is valid after every block
+write, and a reader takes (size - header_len) // record_size records, so a
+crash loses at most the unflushed block. Records are little-endian.
+
+Writers fill a preallocated block (BinLogWriter.append is one structured-array
+store) and write it with a single tofile() when full. read_binlog() loads with
+np.fromfile (no parsing) or np.memmap (nothing read until touched), so 100M
+record runs stay analyzable.
+"""
+import json
+import os
+import socket
+import struct
+import time
+from typing import Optional, Tuple
+
+import numpy as np
+
+MAGIC = b"TLOG"
+FORMAT_VERSION = 1
+HEADER_LEN = 4096
+_FIXED = struct.Struct("<4sHHI")
+
+FLAG_REPLY = 1 << 0
+FLAG_TIMEOUT = 1 << 1
+FLAG_TIMING = 1 << 2     # t2..t6 present (msg_type 4 or SoC telemetry)
+
+# Per-packet T1..T6. Host stamps (t1 send, t5 receive) are CLOCK_MONOTONIC_RAW
+# on the host; t2..t6 and t_reflex are CLOCK_MONOTONIC_RAW on the PYNQ. 0 = absent.
+# v2: the v1 pad carries mlp_cycles; feat_cycles / feat_dbg_cycles appended (msg_type 5).
+TIMING_SCHEMA = ("timing", 2)
+TIMING_DTYPE = np.dtype([
+    ("seq", "<u4"), ("flags", "<u2"), ("reflex_act", "<i2"),
+    ("t1_host_ns", "<i8"), ("t5_host_ns", "<i8"),
+    ("t2_pynq_ns", "<i8"), ("t3_pynq_ns", "<i8"), ("t4_pynq_ns", "<i8"),
+    ("t5_pynq_ns", "<i8"), ("t6_pynq_ns", "<i8"), ("t_reflex_ns", "<i8"),
+    ("score", "<f4"), ("mlp_cycles", "<u4"), ("feat_cycles", "<u4"), ("feat_dbg_cycles", "<u4"),
+])
+
+# run_cycle_bench.py: CPU reflex vs FPGA lane, -1 where one list is shorter
+COMPARISON_SCHEMA = ("cpu_vs_fpga", 1)
+COMPARISON_DTYPE = np.dtype([("cpu_ns", "<i8"), ("fpga_ns", "<i8")])
+
+
+def clock_metadata(remote_clock: Optional[str] = "CLOCK_MONOTONIC_RAW (PYNQ)") -> dict:
+    """Clock names plus one (monotonic_raw, realtime) pair so offline tools can map to wall time."""
+    mono = time.clock_gettime_ns(time.CLOCK_MONOTONIC_RAW)
+    wall = time.time_ns()
+    meta = {
+        "host_clock": "CLOCK_MONOTONIC_RAW",
+        "host_clock_res_ns": int(time.clock_getres(time.CLOCK_MONOTONIC_RAW) * 1e9),
+        "mono_raw_ns": mono,
+        "realtime_ns": wall,
+        "hostname": socket.gethostname(),
+    }
+    if remote_clock:
+        meta["remote_clock"] = remote_clock
+    return meta
+
+
+def _header(dtype: np.dtype, schema: Tuple[str, int], clocks: dict, meta: Optional[dict]) -> bytes:
+    doc = json.dumps({"schema": schema[0], "schema_version": schema[1], "descr": dtype.descr,
+                      "clocks": clocks, "meta": meta or {}}).encode()
+    if _FIXED.size + len(doc) > HEADER_LEN:
+        raise ValueError("telemetry log header metadata too large")
+    return _FIXED.pack(MAGIC, FORMAT_VERSION, HEADER_LEN, dtype.itemsize) + doc.ljust(HEADER_LEN - _FIXED.size, b"\0")
+
+
+class BinLogWriter:
+    """Preallocated block of block_records records; full blocks go out with one write."""
+
+    def __init__(self, path: str, dtype: np.dtype = TIMING_DTYPE, schema: Tuple[str, int] = TIMING_SCHEMA,
+                 block_records: int = 1 << 16, clocks: Optional[dict] = None, meta: Optional[dict] = None):
+        d = os.path.dirname(path)
+        if d:
+            os.makedirs(d, exist_ok=True)
+        self.path = path
+        self.dtype = np.dtype(dtype)
+        self.buf = np.zeros(block_records, dtype=self.dtype)
+        self.n = 0
+        self.written = 0
+        self.f = open(path, "wb", buffering=0)
+        self.f.write(_header(self.dtype, schema, clock_metadata() if clocks is None else clocks, meta))
+
+    def append(self, rec: tuple) -> None:
+        self.buf[self.n] = rec
+        self.n += 1
+        if self.n == len(self.buf):
+            self.flush()
+
+    def append_many(self, recs: np.ndarray) -> None:
+        self.flush()
+        np.asarray(recs, dtype=self.dtype).tofile(self.f)
+        self.written += len(recs)
+
+    def flush(self) -> None:
+        if self.n:
+            self.buf[:self.n].tofile(self.f)
+            self.written += self.n
+            self.n = 0
+
+    def close(self) -> None:
+        if not self.f.closed:
+            self.flush()
+            self.f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def read_header(path: str) -> dict:
+    with open(path, "rb") as f:
+        raw = f.read(HEADER_LEN)
+    magic, ver, hlen, rsize = _FIXED.unpack_from(raw)
+    if magic != MAGIC:
+        raise ValueError(f"{path}: not a telemetry log")
+    if ver != FORMAT_VERSION:
+        raise ValueError(f"{path}: unsupported telemetry log version {ver}")
+    doc = json.loads(raw[_FIXED.size:hlen].rstrip(b"\0"))
+    doc["header_len"] = hlen
+    doc["record_size"] = rsize
+    doc["dtype"] = np.dtype([tuple(f) for f in doc["descr"]])
+    if doc["dtype"].itemsize != rsize:
+        raise ValueError(f"{path}: record size {rsize} does not match schema {doc['dtype'].itemsize}")
+    return doc
+
+
+def read_binlog(path: str, mmap: bool = False, schema: Optional[str] = None) -> Tuple[dict, np.ndarray]:
+    """(header, records). mmap=True returns a read-only np.memmap instead of reading the file."""
+    hdr = read_header(path)
+    if schema is not None and hdr["schema"] != schema:
+        raise ValueError(f"{path}: schema {hdr['schema']!r}, expected {schema!r}")
+    n = (os.path.getsize(path) - hdr["header_len"]) // hdr["record_size"]
+    if mmap:
+        if n == 0:
+            return hdr, np.zeros(0, dtype=hdr["dtype"])
+        return hdr, np.memmap(path, dtype=hdr["dtype"], mode="r", offset=hdr["header_len"], shape=(n,))
+    return hdr, np.fromfile(path, dtype=hdr["dtype"], count=n, offset=hdr["header_len"])
@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+Host <-> PYNQ clock alignment over LOB1 PING (msg_type 0).
+
+Each PING reply carries the server's receive and transmit stamps
+(lob_v1_ping_ts_t, PYNQ CLOCK_MONOTONIC_RAW, the clock of t2..t6), so one
+exchange gives the NTP four timestamps:
+
+  t1 host send   t2 server rx   t3 server tx   t4 host rx
+  offset = ((t2 - t1) + (t3 - t4)) / 2      (remote - host)
+  delay  = (t4 - t1) - (t3 - t2)
+
+Queueing only ever adds delay, and the lowest-delay exchange has the least
+room for asymmetry, so the fit keeps the minimum-delay sample per window
+(min-RTT filter) and drops windows whose best delay is still far above the
+global minimum. A least-squares line through those points gives offset and
+drift. The offset error is bounded by half the minimum delay (path asymmetry).
+
+ClockModel.legs() turns per-packet (t1, t2, t6, t5) into clock-corrected
+uplink / PYNQ / downlink times; analyze_latency.py uses it when a run has a
+.clock.json sidecar. test_lob_stream.py and soc_runner.py write one only
+with --sync-ms (off by default, so plain runs send the deltas alone).
+
+Fabric timers (latency_timer_*, feat_dbg_cycles) are durations in fabric
+cycles, not points in time, so they need no alignment: cycles_to_ns().
+
+Standalone measurement:
+  python3 host/telemetry/clocksync.py --count 200 --pps 50
+"""
+import json
+import os
+import struct
+import sys
+from dataclasses import asdict, dataclass
+from typing import Iterable, Iterator, List, Optional, Sequence, Tuple
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from host.client.core import HDR_FMT, HDR_LEN, MAGIC, Outgoing, Sink
+
+PING_TS_FMT = '>QQ'          # lob_v1_ping_ts_t: t_rx_ns, t_tx_ns
+PING_TS_LEN = 16
+FABRIC_NS_PER_CYCLE = 8      # 125 MHz fabric clock
+
+
+def cycles_to_ns(cycles, ns_per_cycle: int = FABRIC_NS_PER_CYCLE):
+    return cycles * ns_per_cycle
+
+
+def ping_packet() -> bytes:
+    """PING request; seq and t_send are filled in by the client."""
+    return struct.pack(HDR_FMT, MAGIC, 1, 0, 0, HDR_LEN, 0, 0, 0, 0)
+
+
+def with_pings(source: Iterable[Outgoing], interval_ns: int) -> Iterator[Outgoing]:
+    """Interleave a PING every interval_ns of schedule time (first one at the start)."""
+    next_ping = 0
+    for out in source:
+        while out.offset_ns >= next_ping:
+            yield Outgoing(next_ping, ping_packet(), {'ping': True})
+            next_ping += interval_ns
+        yield out
+
+
+@dataclass
+class ClockModel:
+    """remote = host + offset_ns + drift_ppm * 1e-6 * (host - t_ref_ns)."""
+    offset_ns: float
+    drift_ppm: float
+    t_ref_ns: int
+    min_delay_ns: int
+    err_ns: float            # offset bound from path asymmetry (min delay / 2)
+    samples: int
+    used: int
+
+    def offset_at(self, t_host):
+        return self.offset_ns + self.drift_ppm * 1e-6 * (t_host - self.t_ref_ns)
+
+    def to_host(self, t_remote, t_host_hint):
+        """Remote timestamp on the host timeline; t_host_hint picks the drift point (any nearby host stamp)."""
+        return t_remote - self.offset_at(t_host_hint)
+
+    def legs(self, t1, t2, t6, t5):
+        """(uplink, pynq, downlink) in ns; works on scalars or NumPy arrays."""
+        up = self.to_host(t2, t1) - t1
+        down = t5 - self.to_host(t6, t5)
+        return up, t6 - t2, down
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+def fit(samples: Sequence[Tuple[int, int, int, int]], window_ns: int = 1_000_000_000,
+        max_excess_ns: int = 20_000) -> ClockModel:
+    """ClockModel from (t1, t2, t3, t4) exchanges with the min-RTT filter."""
+    if not samples:
+        raise ValueError("no clock sync samples")
+    pts = []  # (delay, mid host time, offset) of the best exchange per window
+    best = {}
+    for t1, t2, t3, t4 in samples:
+        delay = (t4 - t1) - (t3 - t2)
+        if delay < 0:
+            continue
+        w = (t1 - samples[0][0]) // window_ns
+        if w not in best or delay < best[w][0]:
+            best[w] = (delay, (t1 + t4) // 2, ((t2 - t1) + (t3 - t4)) / 2.0)
+    if not best:
+        raise ValueError("no clock sync sample with a non-negative delay")
+    min_delay = min(b[0] for b in best.values())
+    pts = [b for b in best.values() if b[0] <= 2 * min_delay + max_excess_ns]
+    t_ref = pts[0][1]
+    if len(pts) < 2:
+        off, drift = pts[0][2], 0.0
+    else:
+        # offsets are large (unrelated boot times): fit around the first point
+        xs = [p[1] - t_ref for p in pts]
+        ys = [p[2] - pts[0][2] for p in pts]
+        n = len(pts)
+        mx, my = sum(xs) / n, sum(ys) / n
+        sxx = sum((x - mx) ** 2 for x in xs)
+        slope = sum((x - mx) * (y - my) for x, y in zip(xs, ys)) / sxx if sxx else 0.0
+        off = pts[0][2] + my - slope * mx
+        drift = slope * 1e6
+    return ClockModel(off, drift, t_ref, min_delay, min_delay / 2.0, len(samples), len(pts))
+
+
+class ClockSyncSink(Sink):
+    """Collects PING exchanges from a run; writes samples + fitted model to path on close."""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self.samples: List[Tuple[int, int, int, int]] = []
+        self.model: Optional[ClockModel] = None
+
+    def on_reply(self, req, reply):
+        f = reply.fields
+        if f.get('msg_type') == 0 and 'ping_t_rx' in f:
+            self.samples.append((req.t_send, f['ping_t_rx'], f['ping_t_tx'], reply.t_recv))
+
+    def close(self):
+        if not self.samples:
+            return
+        self.model = fit(self.samples)
+        if self.path:
+            save(self.path, self.samples, self.model)
+
+    def summary(self) -> str:
+        m = self.model
+        if m is None:
+            return "clock sync: no PING replies with server timestamps (old echo server?)"
+        return (f"clock sync: offset={m.offset_ns / 1e3:.1f}us drift={m.drift_ppm:.2f}ppm "
+                f"min_rtt={m.min_delay_ns / 1e3:.1f}us (+/-{m.err_ns / 1e3:.1f}us) used {m.used}/{m.samples}")
+
+
+def sidecar_path(log_path: str) -> str:
+    root, _ = os.path.splitext(log_path)
+    return root + '.clock.json'
+
+
+def save(path: str, samples, model: ClockModel) -> None:
+    with open(path, 'w') as f:
+        json.dump({'model': model.to_dict(), 'samples': [list(s) for s in samples]}, f)
+
+
+def load(path: str) -> ClockModel:
+    with open(path) as f:
+        return ClockModel(**json.load(f)['model'])
+
+
+def load_for(log_path: str) -> Optional[ClockModel]:
+    """The clock model saved next to a run log, if any."""
+    p = sidecar_path(log_path)
+    return load(p) if os.path.exists(p) else None
+
+
+def main():
+    import argparse
+    from host.client import decoders, sources
+    from host.client.core import add_net_args, client_from_args, run_client
+
+    ap = argparse.ArgumentParser(description='Estimate host <-> PYNQ clock offset and drift over PING')
+    ap.add_argument('--count', type=int, default=200)
+    ap.add_argument('--pps', type=float, default=50.0)
+    ap.add_argument('--out', type=str, help='Write samples + model JSON here')
+    add_net_args(ap, port=4007, timeout_ms=100.0)
+    args = ap.parse_args()
+
+    sink = ClockSyncSink(args.out)
+    src = (Outgoing(o.offset_ns, ping_packet()) for o in sources.synthetic(args.count, args.pps, lambda i: []))
+    run_client(client_from_args(args, decoders=[decoders.ping], sinks=[sink]), src)
+    print(sink.summary())
+
+
+if __name__ == '__main__':
+    main()
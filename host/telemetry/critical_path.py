@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+"""
+Per-packet critical-path decomposition of the host <-> PYNQ round trip.
+
+Every reply with T1..T6 becomes a chain of legs that sums to its RTT:
+
+  uplink         host send (t1)      -> PYNQ rx (t2)         needs clock sync
+  rx_to_reflex   t2                  -> reflex decided (t_reflex)
+  reflex_to_dma  t_reflex            -> DMA start (t3)
+  dma_to_feat    t3                  -> feature DMA done (t4)
+  feat_to_score  t4                  -> score DMA done (t5)
+  score_to_tx    t5                  -> PYNQ tx (t6)
+  downlink       t6                  -> host receive          needs clock sync
+
+A missing middle stamp (no reflex lane, PS fallback without DMA, no score)
+gives a zero leg and its time lands in the next present leg. Without a
+.clock.json sidecar, uplink + downlink is reported as one `network` leg.
+
+Tail attribution: the tail is every packet at or above the RTT p99 (p99.9),
+the body every packet at or below the median. Legs sum to RTT, so the mean
+tail-minus-body difference of each leg is its exact share of the tail's
+excess; the conditional medians (leg | tail vs leg | body) show whether the
+leg is shifted or only occasionally blows up.
+
+Periodic stalls: per-packet RTT (and leg) excess over its median is binned on
+the send-time axis and Fourier transformed; peaks well above the spectrum's
+mean are reported with a hint when they sit on a common kernel tick rate.
+
+  python3 host/telemetry/critical_path.py soc_results.tlog
+  python3 host/telemetry/critical_path.py latency.csv --quantiles 99 99.9 --out critical_path.txt
+"""
+import os
+import sys
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from host.telemetry import clocksync
+from host.telemetry.binlog import FLAG_REPLY, read_binlog
+from host.telemetry.csvchunks import read_csv_chunks
+
+STAMPS = ['t1_host_ns', 't2_pynq_ns', 't_reflex_ns', 't3_pynq_ns', 't4_pynq_ns', 't5_pynq_ns', 't6_pynq_ns',
+          't5_host_ns']
+MID_LEGS = [('rx_to_reflex', 't_reflex_ns'), ('reflex_to_dma', 't3_pynq_ns'), ('dma_to_feat', 't4_pynq_ns'),
+            ('feat_to_score', 't5_pynq_ns')]
+# CSV header names per stamp: test_lob_stream.py / soc_runner.py
+CSV_ALIASES = {
+    't1_host_ns': ('t1_host_ns', 't_host_send'), 't5_host_ns': ('t5_host_ns', 't_host_recv'),
+    't2_pynq_ns': ('t2_pynq_ns', 't2_rx'), 't_reflex_ns': ('t_reflex_ns', 't_reflex_done'),
+    't3_pynq_ns': ('t3_pynq_ns', 't3_dma_start'), 't4_pynq_ns': ('t4_pynq_ns', 't4_feat_done'),
+    't5_pynq_ns': ('t5_pynq_ns', 't5_score_done'), 't6_pynq_ns': ('t6_pynq_ns', 't6_tx'),
+}
+TICK_HZ = (100, 250, 300, 1000)
+
+
+def stamps_from_binlog(path: str) -> Dict[str, np.ndarray]:
+    _, rec = read_binlog(path, schema='timing')
+    rec = rec[(rec['flags'] & FLAG_REPLY) != 0]
+    out = {}
+    for s in STAMPS:
+        v = rec[s].astype(np.float64)
+        v[v == 0] = np.nan
+        out[s] = v
+    return out
+
+
+def stamps_from_csv(path: str) -> Dict[str, np.ndarray]:
+    cols = [c for names in CSV_ALIASES.values() for c in names]
+    parts: Dict[str, List[np.ndarray]] = {c: [] for c in cols}
+    for chunk in read_csv_chunks(path, cols):
+        for c in cols:
+            parts[c].append(chunk[c])
+    full = {c: np.concatenate(v) if v else np.zeros(0) for c, v in parts.items()}
+    out = {}
+    for s, names in CSV_ALIASES.items():
+        v = full[names[0]].copy()
+        for alt in names[1:]:
+            v = np.where(np.isnan(v), full[alt], v)
+        v[v == 0] = np.nan
+        out[s] = v
+    return out
+
+
+def load_stamps(path: str) -> Dict[str, np.ndarray]:
+    return stamps_from_binlog(path) if path.endswith('.tlog') else stamps_from_csv(path)
+
+
+def packet_legs(stamps: Dict[str, np.ndarray],
+                clock: Optional[clocksync.ClockModel] = None) -> Tuple[Dict[str, np.ndarray], np.ndarray, np.ndarray]:
+    """
+    (legs, rtt, t_send) for packets with t1, t2, t6 and host receive; legs
+    sum to rtt per packet. NaN middle stamps carry their time to the next leg.
+    """
+    t1, t2, t6, t5h = (stamps[k] for k in ('t1_host_ns', 't2_pynq_ns', 't6_pynq_ns', 't5_host_ns'))
+    ok = ~(np.isnan(t1) | np.isnan(t2) | np.isnan(t6) | np.isnan(t5h))
+    t1, t2, t6, t5h = t1[ok], t2[ok], t6[ok], t5h[ok]
+    rtt = t5h - t1
+    legs: Dict[str, np.ndarray] = {}
+    if clock is not None:
+        up, _, down = clock.legs(t1, t2, t6, t5h)
+        legs['uplink'] = np.asarray(up, dtype=np.float64)
+    prev = t2
+    for name, key in MID_LEGS:
+        s = stamps.get(key)
+        s = s[ok] if s is not None else np.full(len(t1), np.nan)
+        present = ~np.isnan(s)
+        legs[name] = np.where(present, s - prev, 0.0)
+        prev = np.where(present, s, prev)
+    legs['score_to_tx'] = t6 - prev
+    if clock is not None:
+        legs['downlink'] = np.asarray(down, dtype=np.float64)
+    else:
+        legs['network'] = rtt - (t6 - t2)
+    return legs, rtt, t1
+
+
+def attribute_tail(legs: Dict[str, np.ndarray], rtt: np.ndarray, q: float) -> Dict[str, dict]:
+    """Per leg: body / tail conditional medians and its share of the tail's mean excess over the body."""
+    if len(rtt) == 0:
+        return {}
+    tail = rtt >= np.percentile(rtt, q)
+    body = rtt <= np.percentile(rtt, 50)
+    excess = rtt[tail].mean() - rtt[body].mean()
+    out = {}
+    for name, v in legs.items():
+        d = v[tail].mean() - v[body].mean()
+        out[name] = {
+            'body_p50_ns': float(np.median(v[body])), 'tail_p50_ns': float(np.median(v[tail])),
+            'delta_mean_ns': float(d), 'share': float(d / excess) if excess else 0.0,
+        }
+    return out
+
+
+def periodic_stalls(t_ns: np.ndarray, values: np.ndarray, bin_ns: Optional[float] = None, top: int = 3,
+                    min_ratio: float = 25.0, max_bins: int = 1 << 20) -> List[Tuple[float, float]]:
+    """
+    [(frequency Hz, share of spectral power)] for the strongest periodic
+    components of max(values - median, 0) sampled on the t_ns axis. Noise
+    power per bin is exponential around the mean, so a bin above min_ratio x
+    mean is a real period; harmonics of a stronger pick are dropped.
+    """
+    if len(t_ns) < 64:
+        return []
+    t = t_ns - t_ns.min()
+    if bin_ns is None:
+        gaps = np.diff(np.sort(t))
+        bin_ns = float(np.median(gaps[gaps > 0])) if np.any(gaps > 0) else 1.0
+    bin_ns = max(bin_ns, float(t.max()) / max_bins, 1.0)
+    idx = (t // bin_ns).astype(np.int64)
+    x = np.zeros(int(idx.max()) + 1)
+    np.maximum.at(x, idx, np.maximum(values - np.median(values), 0.0))
+    x -= x.mean()
+    power = np.abs(np.fft.rfft(x)) ** 2
+    freqs = np.fft.rfftfreq(len(x), bin_ns / 1e9)
+    if len(power) < 4 or not power[1:].any():
+        return []
+    total = power[1:].sum()
+    p = power[1:-1]
+    is_peak = (p > power[:-2]) & (p >= power[2:]) & (p > min_ratio * power[1:].mean())
+    cand = np.nonzero(is_peak)[0] + 1
+    picked: List[int] = []
+    for i in cand[np.argsort(power[cand])[::-1]]:
+        if not any(abs(i - j * round(i / j)) <= 2 * round(i / j) for j in picked):
+            picked.append(i)
+        if len(picked) == top:
+            break
+    return [(float(freqs[i]), float(power[i] / total)) for i in picked]
+
+
+def stall_hint(freq_hz: float, tol: float = 0.02) -> str:
+    for hz in TICK_HZ:
+        if abs(freq_hz - hz) <= tol * hz:
+            return f"kernel tick? (CONFIG_HZ={hz})"
+    if freq_hz < 20:
+        return "slow periodic task (GC, log/metrics flush, cron-like timer?)"
+    return ""
+
+
+def report(legs: Dict[str, np.ndarray], rtt: np.ndarray, t_send: np.ndarray,
+           quantiles: Sequence[float] = (99, 99.9), clock: Optional[clocksync.ClockModel] = None) -> str:
+    lines = ["=" * 80, "CRITICAL PATH (per-packet legs, sum = RTT)", "=" * 80,
+             f"Packets with t1/t2/t6/host rx: {len(rtt)}"]
+    if len(rtt) == 0:
+        return "\n".join(lines + ["No timed replies (run the echo server with --enable-timing)", "=" * 80])
+    if clock is None:
+        lines.append("No clock sync sidecar: uplink + downlink reported as 'network'")
+    else:
+        lines.append(f"Clock-corrected host legs (offset error <= {clock.err_ns / 1000.0:.2f} µs)")
+    lines.append("")
+    lines.append(f"{'leg':<15}{'p50 µs':>10}{'p99 µs':>10}{'mean µs':>10}")
+    for name, v in legs.items():
+        p50, p99 = np.percentile(v, [50, 99])
+        lines.append(f"{name:<15}{p50 / 1e3:>10.2f}{p99 / 1e3:>10.2f}{v.mean() / 1e3:>10.2f}")
+    p50, p99 = np.percentile(rtt, [50, 99])
+    lines.append(f"{'rtt':<15}{p50 / 1e3:>10.2f}{p99 / 1e3:>10.2f}{rtt.mean() / 1e3:>10.2f}")
+
+    for q in quantiles:
+        att = attribute_tail(legs, rtt, q)
+        thr = np.percentile(rtt, q)
+        n_tail = int((rtt >= thr).sum())
+        lines.append("")
+        lines.append(f"Tail >= p{q:g} ({thr / 1e3:.2f} µs, {n_tail} packets) vs body <= p50:")
+        lines.append(f"{'leg':<15}{'body p50':>10}{'tail p50':>10}{'Δmean µs':>10}{'share':>8}")
+        for name, a in sorted(att.items(), key=lambda kv: -kv[1]['share']):
+            lines.append(f"{name:<15}{a['body_p50_ns'] / 1e3:>10.2f}{a['tail_p50_ns'] / 1e3:>10.2f}"
+                         f"{a['delta_mean_ns'] / 1e3:>10.2f}{100 * a['share']:>7.1f}%")
+        top = max(att.items(), key=lambda kv: kv[1]['share'])[0]
+        lines.append(f"  -> p{q:g} excess is mostly {top}")
+
+    lines.append("")
+    lines.append("Periodic stalls (FFT of excess over median vs send time):")
+    found = False
+    for name, v in [('rtt', rtt)] + list(legs.items()):
+        for f, share in periodic_stalls(t_send, v):
+            found = True
+            hint = stall_hint(f)
+            lines.append(f"  {name:<15} {f:>9.2f} Hz  (period {1e3 / f:.2f} ms, {100 * share:.1f}% of power)"
+                         f"{'  ' + hint if hint else ''}")
+    if not found:
+        lines.append("  none above the noise floor")
+    lines.append("=" * 80)
+    return "\n".join(lines)
+
+
+def main():
+    import argparse
+    ap = argparse.ArgumentParser(description='Per-packet leg decomposition and tail attribution')
+    ap.add_argument('log', type=str, help='.tlog (timing schema) or CSV from test_lob_stream.py / soc_runner.py')
+    ap.add_argument('--clock', type=str, help='Clock sync JSON (default: <log>.clock.json if present)')
+    ap.add_argument('--quantiles', type=float, nargs='+', default=[99, 99.9])
+    ap.add_argument('--out', type=str, help='Also write the report here')
+    args = ap.parse_args()
+
+    clock = clocksync.load(args.clock) if args.clock else clocksync.load_for(args.log)
+    legs, rtt, t_send = packet_legs(load_stamps(args.log), clock)
+    text = report(legs, rtt, t_send, args.quantiles, clock)
+    print(text)
+    if args.out:
+        with open(args.out, 'w') as f:
+            f.write(text + '\n')
+
+
+if __name__ == '__main__':
+    main()
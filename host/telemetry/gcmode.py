@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Garbage-collector control for the Python hot loops (fpga/pynq/feature_echo_mt.py).
+
+CPython's cyclic GC runs whenever generation-0 allocations pass a threshold,
+in whichever thread happens to allocate, so a packet can stall for the whole
+collection. Modes:
+
+  default  GC untouched; pauses are only measured
+  freeze   collect once, gc.freeze() everything alive (startup objects, the
+           overlay, buffers) so later collections never traverse it
+  latency  freeze + gc.disable(); collections run only from GcControl.idle(),
+           called by the processor thread when its queue is empty, or are
+           forced once pending allocations pass a hard cap so a never-idle
+           run cannot grow without bound
+
+Every collection, wherever it runs, is timed with gc.callbacks and lands in a
+ThreadMetrics ('gc' thread: pause counters, gc_pause stage histogram), so GC
+pauses show up on the metrics endpoint next to the per-stage latencies.
+Collections are serialized under the GIL, which keeps that thread's
+single-writer rule.
+"""
+import gc
+import time
+from typing import Optional
+
+MODES = ('default', 'freeze', 'latency')
+GC_COUNTERS = ('gc_pauses', 'gc_pauses_gen2', 'gc_collected', 'gc_idle_collects', 'gc_forced_collects')
+
+
+_CLOCK = getattr(time, 'CLOCK_MONOTONIC_RAW', time.CLOCK_MONOTONIC)   # same clock as metrics.py windows
+
+
+def _now() -> int:
+    return time.clock_gettime_ns(_CLOCK)
+
+
+class GcMonitor:
+    """Times every collection via gc.callbacks into a ThreadMetrics with GC_COUNTERS and a 'gc_pause' stage."""
+
+    def __init__(self, metrics):
+        self.metrics = metrics
+        self.t_start = 0
+        self.max_pause_ns = 0
+
+    def _callback(self, phase, info):
+        if phase == 'start':
+            self.t_start = _now()
+            return
+        t = _now()
+        ns = t - self.t_start
+        m = self.metrics
+        m.inc('gc_pauses')
+        if info.get('generation') == 2:
+            m.inc('gc_pauses_gen2')
+        m.inc('gc_collected', info.get('collected', 0))
+        m.observe('gc_pause', ns, t)
+        if ns > self.max_pause_ns:
+            self.max_pause_ns = ns
+
+    def install(self):
+        if self._callback not in gc.callbacks:
+            gc.callbacks.append(self._callback)
+
+    def remove(self):
+        if self._callback in gc.callbacks:
+            gc.callbacks.remove(self._callback)
+
+
+class GcControl:
+    """
+    Applies one of MODES for the duration of a run. In 'latency' mode the owner
+    calls idle() whenever it has nothing to do: young generations are collected
+    once idle_allocs objects are pending, a full collection at most every
+    full_interval_s. check() belongs on the hot path and only forces a
+    collection past hard_cap pending allocations.
+    """
+
+    def __init__(self, mode: str = 'default', monitor: Optional[GcMonitor] = None, idle_allocs: int = 700,
+                 hard_cap: int = 100_000, full_interval_s: float = 10.0):
+        if mode not in MODES:
+            raise ValueError(f"gc mode {mode!r}, expected one of {MODES}")
+        self.mode = mode
+        self.monitor = monitor
+        self.idle_allocs = idle_allocs
+        self.hard_cap = hard_cap
+        self.full_interval_ns = int(full_interval_s * 1e9)
+        self.last_full_ns = 0
+        self.was_enabled = gc.isenabled()
+        self.frozen = 0
+
+    def enter(self) -> 'GcControl':
+        """Call once startup allocations are done and before the worker threads start."""
+        if self.monitor is not None:
+            self.monitor.install()
+        if self.mode != 'default':
+            gc.collect()
+            gc.freeze()
+            self.frozen = gc.get_freeze_count()
+        if self.mode == 'latency':
+            gc.disable()
+        self.last_full_ns = _now()
+        return self
+
+    def exit(self):
+        if self.mode == 'latency' and self.was_enabled:
+            gc.enable()
+        if self.mode != 'default':
+            gc.unfreeze()
+        if self.monitor is not None:
+            self.monitor.remove()
+
+    def __enter__(self):
+        return self.enter()
+
+    def __exit__(self, *exc):
+        self.exit()
+
+    def _collect(self, generation: int, counter: str):
+        if self.monitor is not None:
+            self.monitor.metrics.inc(counter)
+        gc.collect(generation)
+
+    def idle(self, now_ns: Optional[int] = None) -> bool:
+        """Collect if due; True when a collection ran. No-op unless mode == 'latency'."""
+        if self.mode != 'latency':
+            return False
+        now = _now() if now_ns is None else now_ns
+        if now - self.last_full_ns >= self.full_interval_ns:
+            self.last_full_ns = now
+            self._collect(2, 'gc_idle_collects')
+            return True
+        if gc.get_count()[0] >= self.idle_allocs:
+            self._collect(0, 'gc_idle_collects')
+            return True
+        return False
+
+    def check(self) -> bool:
+        """Hot-path guard: force a young collection once hard_cap allocations are pending."""
+        if self.mode == 'latency' and gc.get_count()[0] >= self.hard_cap:
+            self._collect(1, 'gc_forced_collects')
+            return True
+        return False
+
+    def pending(self) -> int:
+        """Generation-0 allocations not yet collected (a gauge)."""
+        return gc.get_count()[0]
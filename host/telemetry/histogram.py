@@ -0,0 +1,293 @@
+"""
+HdrHistogram-style latency recording.
+
+LatencyHistogram buckets values log-linearly: each power-of-two range is split
+into 2^k linear sub-buckets, with k chosen so every value is stored to within
+sig_figs significant digits (3 -> <0.1% error). Memory is fixed by
+(max_value, sig_figs), not by the sample count. record() is O(1), two
+histograms with the same layout merge by adding counts, and the serialized
+form is a small zlib-compressed varint stream of the non-zero buckets.
+
+LatencyRecorder keeps one histogram per named field plus optional sampled raw
+rows (every Nth), and reads/writes both as one .hist file:
+
+  b"HREC" u16 version u32 meta_len | meta JSON | per field: u32 len + histogram
+  bytes | sampled rows (int64, row-major, INT64_MIN = missing)
+"""
+import json
+import math
+import struct
+import time
+import zlib
+from array import array
+from typing import Dict, Iterable, List, Optional, Sequence
+
+try:
+    import numpy as np
+except Exception:
+    np = None
+
+HIST_MAGIC = b"HIST"
+HIST_VERSION = 1
+_HIST_HDR = struct.Struct("<4sBBHQQqqQQ")   # magic, ver, sig_figs, rsv, max_value, total, min, max, sum, negative
+REC_MAGIC = b"HREC"
+REC_VERSION = 1
+MISSING = -(2**63)
+
+
+def _varint(out: bytearray, v: int) -> None:
+    while v >= 0x80:
+        out.append((v & 0x7F) | 0x80)
+        v >>= 7
+    out.append(v)
+
+
+def _read_varints(buf: bytes):
+    v = shift = 0
+    for b in buf:
+        v |= (b & 0x7F) << shift
+        if b & 0x80:
+            shift += 7
+        else:
+            yield v
+            v = shift = 0
+
+
+class LatencyHistogram:
+    def __init__(self, max_value: int = 1 << 40, sig_figs: int = 3):
+        if not 1 <= sig_figs <= 5:
+            raise ValueError("sig_figs must be 1..5")
+        self.max_value = int(max_value)
+        self.sig_figs = sig_figs
+        self.sub_bits = max(1, math.ceil(math.log2(2 * 10 ** sig_figs)))
+        self.half = 1 << (self.sub_bits - 1)
+        n_buckets = max(0, self.max_value.bit_length() - self.sub_bits) + 1
+        self.counts = array("Q", bytes(8 * (n_buckets + 1) * self.half))
+        self.total = 0
+        self.min = 0
+        self.max = 0
+        self.sum = 0
+        self.negative = 0   # values < 0 are counted here, not bucketed
+
+    # --- index math (HdrHistogram layout) ---------------------------------
+    def index(self, v: int) -> int:
+        b = v.bit_length() - self.sub_bits
+        if b <= 0:
+            return v
+        return (b + 1) * self.half + (v >> b) - self.half
+
+    def bucket_range(self, i: int):
+        """(lowest, highest) value stored in counts[i]."""
+        if i < 2 * self.half:
+            return i, i
+        b = i // self.half - 1
+        sub = i % self.half + self.half
+        return sub << b, ((sub + 1) << b) - 1
+
+    # --- recording --------------------------------------------------------
+    def record(self, v: int, count: int = 1) -> None:
+        v = int(v)
+        if v < 0:
+            self.negative += count
+            return
+        if v > self.max_value:
+            v = self.max_value
+        self.counts[self.index(v)] += count
+        if self.total == 0 or v < self.min:
+            self.min = v
+        if v > self.max:
+            self.max = v
+        self.total += count
+        self.sum += v * count
+
+    def record_many(self, values) -> None:
+        """Bulk record (NumPy bincount when available)."""
+        if np is None:
+            for v in values:
+                self.record(v)
+            return
+        v = np.asarray(values, dtype=np.int64)
+        neg = v < 0
+        self.negative += int(neg.sum())
+        v = np.minimum(v[~neg], self.max_value)
+        if v.size == 0:
+            return
+        bl = np.zeros(v.shape, dtype=np.int64)
+        nz = v > 0
+        bl[nz] = np.floor(np.log2(v[nz])).astype(np.int64) + 1
+        # float log2 can be off by one right at powers of two; fix exactly
+        bl[nz] += (v[nz] >> bl[nz]) > 0
+        bl[nz] -= (v[nz] >> np.maximum(bl[nz] - 1, 0)) == 0
+        b = bl - self.sub_bits
+        idx = np.where(b <= 0, v, (b + 1) * self.half + (v >> np.maximum(b, 0)) - self.half)
+        binc = np.bincount(idx, minlength=len(self.counts))
+        cur = np.frombuffer(self.counts, dtype=np.uint64)
+        cur += binc.astype(np.uint64)
+        lo, hi = int(v.min()), int(v.max())
+        self.min = lo if self.total == 0 else min(self.min, lo)
+        self.max = max(self.max, hi)
+        self.total += int(v.size)
+        self.sum += int(v.sum())
+
+    def merge(self, other: "LatencyHistogram") -> "LatencyHistogram":
+        if (other.max_value, other.sig_figs) != (self.max_value, self.sig_figs):
+            raise ValueError("cannot merge histograms with different layouts")
+        if other.total:
+            for i, c in enumerate(other.counts):
+                if c:
+                    self.counts[i] += c
+            self.min = other.min if self.total == 0 else min(self.min, other.min)
+            self.max = max(self.max, other.max)
+            self.total += other.total
+            self.sum += other.sum
+        self.negative += other.negative
+        return self
+
+    # --- queries ----------------------------------------------------------
+    def mean(self) -> float:
+        return self.sum / self.total if self.total else 0.0
+
+    def stddev(self) -> float:
+        """Population std from bucket midpoints (exact to the bucket resolution)."""
+        if self.total == 0:
+            return 0.0
+        m = self.mean()
+        acc = 0.0
+        for i, c in enumerate(self.counts):
+            if c:
+                lo, hi = self.bucket_range(i)
+                acc += c * ((lo + hi) / 2.0 - m) ** 2
+        return math.sqrt(acc / self.total)
+
+    def percentiles(self, qs: Sequence[float]) -> List[int]:
+        """Values at percentiles qs (0..100), as HdrHistogram's highest equivalent value."""
+        if self.total == 0:
+            return [0] * len(qs)
+        order = sorted(range(len(qs)), key=lambda k: qs[k])
+        out = [0] * len(qs)
+        targets = [max(1, math.ceil(qs[k] / 100.0 * self.total)) for k in order]
+        j = 0
+        acc = 0
+        for i, c in enumerate(self.counts):
+            if not c:
+                continue
+            acc += c
+            while j < len(order) and acc >= targets[j]:
+                out[order[j]] = min(self.bucket_range(i)[1], self.max)
+                j += 1
+            if j == len(order):
+                break
+        return out
+
+    def percentile(self, q: float) -> int:
+        return self.percentiles([q])[0]
+
+    def buckets(self):
+        """(lowest, highest, count) for non-empty buckets, ascending."""
+        return [(*self.bucket_range(i), c) for i, c in enumerate(self.counts) if c]
+
+    # --- serialization ----------------------------------------------------
+    def to_bytes(self) -> bytes:
+        body = bytearray()
+        last = -1
+        for i, c in enumerate(self.counts):
+            if c:
+                _varint(body, i - last - 1)
+                _varint(body, c)
+                last = i
+        hdr = _HIST_HDR.pack(HIST_MAGIC, HIST_VERSION, self.sig_figs, 0, self.max_value, self.total,
+                             self.min, self.max, self.sum, self.negative)
+        return hdr + zlib.compress(bytes(body), 6)
+
+    @classmethod
+    def from_bytes(cls, raw: bytes) -> "LatencyHistogram":
+        magic, ver, sig, _, max_value, total, mn, mx, sm, neg = _HIST_HDR.unpack_from(raw)
+        if magic != HIST_MAGIC or ver != HIST_VERSION:
+            raise ValueError(f"not a v{HIST_VERSION} histogram")
+        h = cls(max_value, sig)
+        vals = list(_read_varints(zlib.decompress(raw[_HIST_HDR.size:])))
+        i = -1
+        for gap, c in zip(vals[0::2], vals[1::2]):
+            i += gap + 1
+            h.counts[i] = c
+        h.total, h.min, h.max, h.sum, h.negative = total, mn, mx, sm, neg
+        return h
+
+
+class LatencyRecorder:
+    """Named histograms plus every sample_every-th raw row (0 = no raw rows)."""
+
+    def __init__(self, fields: Iterable[str], sample_every: int = 0, sample_columns: Sequence[str] = (),
+                 sig_figs: int = 3, meta: Optional[dict] = None):
+        self.hist: Dict[str, LatencyHistogram] = {f: LatencyHistogram(sig_figs=sig_figs) for f in fields}
+        self.sample_every = int(sample_every)
+        self.sample_columns = list(sample_columns)
+        self.samples = array("q")
+        self.n_rows = 0
+        self.meta = dict(meta or {})
+
+    def record(self, values: Dict[str, Optional[int]]) -> None:
+        for name, h in self.hist.items():
+            v = values.get(name)
+            if v is not None:
+                h.record(v)
+        if self.sample_every and self.n_rows % self.sample_every == 0:
+            for c in self.sample_columns:
+                v = values.get(c)
+                self.samples.append(MISSING if v is None else int(v))
+        self.n_rows += 1
+
+    def merge(self, other: "LatencyRecorder") -> "LatencyRecorder":
+        for name, h in other.hist.items():
+            if name in self.hist:
+                self.hist[name].merge(h)
+            else:
+                self.hist[name] = h
+        if other.sample_columns == self.sample_columns:
+            self.samples.extend(other.samples)
+        self.n_rows += other.n_rows
+        return self
+
+    def sampled_rows(self):
+        """Sampled raw rows as a dict of column -> list (None where missing)."""
+        n = len(self.sample_columns)
+        cols = {c: [] for c in self.sample_columns}
+        for r in range(len(self.samples) // n if n else 0):
+            for k, c in enumerate(self.sample_columns):
+                v = self.samples[r * n + k]
+                cols[c].append(None if v == MISSING else v)
+        return cols
+
+    def save(self, path) -> None:
+        meta = dict(self.meta, fields=list(self.hist), sample_every=self.sample_every,
+                    sample_columns=self.sample_columns, n_rows=self.n_rows,
+                    n_samples=len(self.samples) // max(len(self.sample_columns), 1),
+                    saved_unix_ns=time.time_ns())
+        mj = json.dumps(meta).encode()
+        with open(path, "wb") as f:
+            f.write(REC_MAGIC + struct.pack("<HI", REC_VERSION, len(mj)) + mj)
+            for h in self.hist.values():
+                blob = h.to_bytes()
+                f.write(struct.pack("<I", len(blob)) + blob)
+            f.write(self.samples.tobytes())
+
+    @classmethod
+    def load(cls, path) -> "LatencyRecorder":
+        raw = open(path, "rb").read()
+        if raw[:4] != REC_MAGIC:
+            raise ValueError(f"{path}: not a latency recorder file")
+        ver, mlen = struct.unpack_from("<HI", raw, 4)
+        if ver != REC_VERSION:
+            raise ValueError(f"{path}: unsupported version {ver}")
+        pos = 10 + mlen
+        meta = json.loads(raw[10:pos])
+        rec = cls([], meta["sample_every"], meta["sample_columns"])
+        for name in meta["fields"]:
+            (n,) = struct.unpack_from("<I", raw, pos)
+            rec.hist[name] = LatencyHistogram.from_bytes(raw[pos + 4:pos + 4 + n])
+            pos += 4 + n
+        rec.samples.frombytes(raw[pos:])
+        rec.n_rows = meta["n_rows"]
+        rec.meta = {k: v for k, v in meta.items()
+                    if k not in ("fields", "sample_every", "sample_columns", "n_rows", "n_samples")}
+        return rec
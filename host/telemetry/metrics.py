@@ -0,0 +1,295 @@
+#!/usr/bin/env python3
+"""
+Live metrics for long-running servers (fpga/pynq/feature_echo_mt.py).
+
+Each thread owns a ThreadMetrics: plain int counters and one rolling
+LatencyHistogram per pipeline stage, written only by that thread, so the hot
+path takes no lock. The owner swaps its current histograms into `prev` every
+window_s (a single reference store); MetricsRegistry reads counters
+(an int load is atomic under the GIL, at most one event stale) and merges the
+last complete window of every thread on demand. Gauges such as queue depths
+are callables sampled at scrape time.
+
+MetricsServer exposes one registry two ways:
+
+  HTTP  GET /metrics   Prometheus text format (counters, gauges, summaries)
+  UDP   any datagram   JSON snapshot reply (watch a soak with main() below)
+
+Standalone watcher:
+  python3 host/telemetry/metrics.py --udp 192.168.10.2:9101 --interval 1
+"""
+import json
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+try:
+    from host.telemetry.histogram import LatencyHistogram
+except ImportError:   # copied next to the echo server on the board
+    from histogram import LatencyHistogram
+
+QUANTILES = (50, 90, 99, 99.9)
+MAX_STAGE_NS = 1 << 36   # ~69 s; longer stage times are clamped
+
+
+# The echo server passes CLOCK_MONOTONIC_RAW stamps as observe(now_ns=...); windows must
+# use the same clock, since NTP slews CLOCK_MONOTONIC away from it over a multi-day soak
+_CLOCK = getattr(time, 'CLOCK_MONOTONIC_RAW', time.CLOCK_MONOTONIC)
+
+
+def _now() -> int:
+    return time.clock_gettime_ns(_CLOCK)
+
+
+def parse_addr(s: str) -> Tuple[str, int]:
+    host, port = s.rsplit(':', 1)
+    return host, int(port)
+
+
+class ThreadMetrics:
+    """Counters and stage histograms owned by one thread; only that thread may call inc/observe."""
+
+    def __init__(self, name: str, counters: Sequence[str] = (), stages: Sequence[str] = (),
+                 window_s: float = 10.0, sig_figs: int = 2):
+        self.name = name
+        self.counts: Dict[str, int] = dict.fromkeys(counters, 0)
+        self.stages = list(stages)
+        self.sig_figs = sig_figs
+        self.window_ns = int(window_s * 1e9)
+        self.n = dict.fromkeys(self.stages, 0)        # cumulative count / sum per stage
+        self.sum_ns = dict.fromkeys(self.stages, 0)
+        self.cur = self._new()
+        self.prev: Optional[Dict[str, LatencyHistogram]] = None
+        self.prev_end_ns = 0
+        self.window_end_ns = _now() + self.window_ns
+
+    def _new(self) -> Dict[str, LatencyHistogram]:
+        return {s: LatencyHistogram(MAX_STAGE_NS, self.sig_figs) for s in self.stages}
+
+    def inc(self, name: str, n: int = 1) -> None:
+        self.counts[name] += n
+
+    def observe(self, stage: str, ns: int, now_ns: Optional[int] = None) -> None:
+        """now_ns, if given, is a CLOCK_MONOTONIC_RAW stamp (saves a clock read)."""
+        if (_now() if now_ns is None else now_ns) >= self.window_end_ns:
+            self.rotate()
+        self.cur[stage].record(ns)
+        self.n[stage] += 1
+        self.sum_ns[stage] += ns
+
+    def rotate(self) -> None:
+        self.prev_end_ns = self.window_end_ns
+        self.prev, self.cur = self.cur, self._new()
+        self.window_end_ns += self.window_ns * max(1, -(-(_now() - self.window_end_ns) // self.window_ns))
+
+    def window(self, now_ns: int) -> Optional[Dict[str, LatencyHistogram]]:
+        """Last complete window, or None once the owner has gone a full window without observing."""
+        if self.prev is None or now_ns - self.prev_end_ns > self.window_ns:
+            return None
+        return self.prev
+
+
+class MetricsRegistry:
+    def __init__(self, prefix: str = 'lob', quantiles: Sequence[float] = QUANTILES):
+        self.prefix = prefix
+        self.quantiles = list(quantiles)
+        self.threads: List[ThreadMetrics] = []
+        self.gauges: Dict[str, Callable[[], float]] = {}
+        self.info: Dict[str, object] = {}   # static run config (JSON snapshot only), e.g. RT placement
+        self.t_start_ns = _now()
+
+    def thread(self, name: str, counters: Sequence[str] = (), stages: Sequence[str] = (),
+               window_s: float = 10.0) -> ThreadMetrics:
+        """Register before the owning thread starts."""
+        m = ThreadMetrics(name, counters, stages, window_s)
+        self.threads.append(m)
+        return m
+
+    def gauge(self, name: str, fn: Callable[[], float]) -> None:
+        self.gauges[name] = fn
+
+    def counters(self) -> Dict[str, int]:
+        out: Dict[str, int] = {}
+        for t in self.threads:
+            for k, v in list(t.counts.items()):
+                out[k] = out.get(k, 0) + v
+        return out
+
+    def stage_histograms(self) -> Dict[str, LatencyHistogram]:
+        """Last complete window per stage, merged across threads."""
+        now = _now()
+        out: Dict[str, LatencyHistogram] = {}
+        for t in self.threads:
+            w = t.window(now)
+            for s in t.stages:
+                h = out.setdefault(s, LatencyHistogram(MAX_STAGE_NS, t.sig_figs))
+                if w is not None:
+                    h.merge(w[s])
+        return out
+
+    def snapshot(self) -> dict:
+        stages = {}
+        hists = self.stage_histograms()
+        for t in self.threads:
+            for s in t.stages:
+                h = hists[s]
+                st = stages.setdefault(s, {'count': 0, 'sum_ns': 0, 'window_count': h.total,
+                                           'window_mean_ns': round(h.mean()),
+                                           'window_max_ns': h.max})
+                st['count'] += t.n[s]
+                st['sum_ns'] += t.sum_ns[s]
+                st.update({f'p{q:g}_ns': v for q, v in zip(self.quantiles, h.percentiles(self.quantiles))})
+        gauges = {}
+        for k, fn in self.gauges.items():
+            try:
+                gauges[k] = fn()
+            except Exception:
+                gauges[k] = None
+        return {'uptime_s': round((_now() - self.t_start_ns) / 1e9, 3), 'counters': self.counters(),
+                'gauges': gauges, 'stages': stages, 'info': self.info,
+                'window_s': self.threads[0].window_ns / 1e9 if self.threads else None}
+
+    def prometheus(self) -> str:
+        p = self.prefix
+        lines = [f'# TYPE {p}_uptime_seconds gauge', f'{p}_uptime_seconds {(_now() - self.t_start_ns) / 1e9:.3f}']
+        # one family per counter, one series per owning thread
+        families: Dict[str, List[Tuple[str, int]]] = {}
+        for t in self.threads:
+            for k, v in list(t.counts.items()):
+                families.setdefault(k, []).append((t.name, v))
+        for k, series in families.items():
+            lines.append(f'# TYPE {p}_{k}_total counter')
+            lines.extend(f'{p}_{k}_total{{thread="{name}"}} {v}' for name, v in series)
+        for k, fn in self.gauges.items():
+            try:
+                v = fn()
+            except Exception:
+                continue
+            lines.append(f'# TYPE {p}_{k} gauge')
+            lines.append(f'{p}_{k} {v}')
+        # stages shared by several threads are one summary: merged window, summed totals
+        for s, h in self.stage_histograms().items():
+            owners = [t for t in self.threads if s in t.n]
+            name = f'{p}_stage_{s}_seconds'
+            lines.append(f'# TYPE {name} summary')
+            for q, v in zip(self.quantiles, h.percentiles(self.quantiles)):
+                lines.append(f'{name}{{quantile="{q / 100:g}"}} {v / 1e9:.9f}')
+            lines.append(f'{name}_sum {sum(t.sum_ns[s] for t in owners) / 1e9:.9f}')
+            lines.append(f'{name}_count {sum(t.n[s] for t in owners)}')
+        return '\n'.join(lines) + '\n'
+
+
+class MetricsServer:
+    """Serves a registry over HTTP (/metrics) and/or UDP (JSON) from daemon threads."""
+
+    def __init__(self, registry: MetricsRegistry, http_addr: Optional[Tuple[str, int]] = None,
+                 udp_addr: Optional[Tuple[str, int]] = None):
+        self.registry = registry
+        self.http = None
+        self.udp = None
+        self.threads: List[threading.Thread] = []
+        if http_addr is not None:
+            reg = registry
+
+            class Handler(BaseHTTPRequestHandler):
+                def do_GET(self):
+                    if self.path.split('?')[0] not in ('/', '/metrics'):
+                        self.send_error(404)
+                        return
+                    body = reg.prometheus().encode()
+                    self.send_response(200)
+                    self.send_header('Content-Type', 'text/plain; version=0.0.4')
+                    self.send_header('Content-Length', str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+
+                def log_message(self, *a):
+                    pass
+
+            self.http = HTTPServer(http_addr, Handler)
+        if udp_addr is not None:
+            self.udp = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            self.udp.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            try:
+                self.udp.bind(udp_addr)
+            except OSError:   # nothing is served unless both endpoints bind
+                self.udp.close()
+                if self.http is not None:
+                    self.http.server_close()
+                raise
+        if self.http is not None:
+            self._start(self.http.serve_forever, 'metrics-http')
+        if self.udp is not None:
+            self._start(self._serve_udp, 'metrics-udp')
+
+    def _start(self, fn, name):
+        t = threading.Thread(target=fn, name=name, daemon=True)
+        t.start()
+        self.threads.append(t)
+
+    def _serve_udp(self):
+        while True:
+            try:
+                _, addr = self.udp.recvfrom(256)
+                self.udp.sendto(json.dumps(self.registry.snapshot()).encode(), addr)
+            except OSError:
+                break
+
+    def addresses(self) -> dict:
+        out = {}
+        if self.http is not None:
+            out['http'] = self.http.server_address[:2]
+        if self.udp is not None:
+            out['udp'] = self.udp.getsockname()[:2]
+        return out
+
+    def close(self):
+        if self.http is not None:
+            self.http.shutdown()
+            self.http.server_close()
+        if self.udp is not None:
+            self.udp.close()
+
+
+def query_udp(addr: Tuple[str, int], timeout_s: float = 1.0) -> dict:
+    s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    s.settimeout(timeout_s)
+    try:
+        s.sendto(b'?', addr)
+        return json.loads(s.recv(65536))
+    finally:
+        s.close()
+
+
+def format_snapshot(snap: dict) -> str:
+    c = ' '.join(f'{k}={v}' for k, v in snap['counters'].items())
+    g = ' '.join(f'{k}={v}' for k, v in snap['gauges'].items())
+    st = ' '.join(f"{k}=p50:{v.get('p50_ns', 0) / 1e3:.1f}/p99:{v.get('p99_ns', 0) / 1e3:.1f}us"
+                  for k, v in snap['stages'].items() if v['window_count'])
+    return f"t={snap['uptime_s']:.0f}s {c} {g} {st}".rstrip()
+
+
+def main():
+    import argparse
+    ap = argparse.ArgumentParser(description='Poll a metrics UDP endpoint and print one line per interval')
+    ap.add_argument('--udp', type=str, default='192.168.10.2:9101')
+    ap.add_argument('--interval', type=float, default=1.0)
+    ap.add_argument('--json', action='store_true', help='Print raw JSON snapshots')
+    args = ap.parse_args()
+    addr = parse_addr(args.udp)
+    try:
+        while True:
+            try:
+                snap = query_udp(addr)
+                print(json.dumps(snap) if args.json else format_snapshot(snap), flush=True)
+            except socket.timeout:
+                print(f"no reply from {args.udp}", flush=True)
+            time.sleep(args.interval)
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+"""
+Nanosecond pcap capture of LOB1 datagrams.
+
+Each datagram is wrapped in synthetic Ethernet / IPv4 / UDP headers built
+from the socket addresses (MACs are 02:00:<IPv4>, UDP checksum 0), so
+Wireshark, tcpdump -r and host/client/sources.read_pcap_udp read the file
+like a wire capture. Records use the nanosecond pcap magic (0xa1b23c4d).
+
+Timestamps are wall-clock ns. The runners stamp CLOCK_MONOTONIC_RAW on the
+hot path; add wall_offset_ns() once instead of reading a second clock
+per packet.
+
+PcapWriter packs records into a bytearray and writes it with one write()
+per buf_bytes. writer.AsyncPcapLog runs it on a background thread for the
+host clients and the echo server. Stdlib only: on the board, copy this file
+next to feature_echo_mt.py.
+"""
+import struct
+import time
+from typing import Iterable, Optional, Tuple
+
+MAGIC_NS = 0xa1b23c4d
+LINKTYPE_ETHERNET = 1
+SNAPLEN = 65535
+GLOBAL_HDR = struct.Struct('<IHHiIII')
+REC_HDR = struct.Struct('<IIII')
+ETH_IP_UDP = struct.Struct('>6s6sH BBHHHBBH4s4s HHHH')   # 14 + 20 + 8 bytes
+ETHERTYPE_IPV4 = 0x0800
+FLAG_DF = 0x4000
+
+Addr = Tuple[str, int]
+
+
+def wall_offset_ns() -> int:
+    """Add to a CLOCK_MONOTONIC_RAW stamp to get wall-clock ns."""
+    return time.time_ns() - time.clock_gettime_ns(time.CLOCK_MONOTONIC_RAW)
+
+
+def _ip4(host: str) -> bytes:
+    try:
+        return bytes(int(x) for x in host.split('.'))[:4].ljust(4, b'\0')
+    except ValueError:   # hostname or '' (INADDR_ANY)
+        return bytes(4)
+
+
+def _checksum(hdr: bytes) -> int:
+    s = sum(struct.unpack('>10H', hdr))
+    s = (s & 0xFFFF) + (s >> 16)
+    s = (s & 0xFFFF) + (s >> 16)
+    return ~s & 0xFFFF
+
+
+class PcapWriter:
+    def __init__(self, path: str, buf_bytes: int = 1 << 20):
+        self.path = path
+        self.f = open(path, 'wb')
+        self.f.write(GLOBAL_HDR.pack(MAGIC_NS, 2, 4, 0, 0, SNAPLEN, LINKTYPE_ETHERNET))
+        self.buf = bytearray()
+        self.buf_bytes = buf_bytes
+        self.packets = 0
+        self.ip_id = 0
+        self._ends = {}
+
+    def _endpoint(self, addr: Optional[Addr]):
+        ep = self._ends.get(addr)
+        if ep is None:
+            ip = _ip4(addr[0]) if addr else bytes(4)
+            ep = self._ends[addr] = (b'\x02\x00' + ip, ip, addr[1] if addr else 0)
+        return ep
+
+    def write(self, ts_ns: int, payload: bytes, src: Optional[Addr] = None, dst: Optional[Addr] = None) -> None:
+        s_mac, s_ip, s_port = self._endpoint(src)
+        d_mac, d_ip, d_port = self._endpoint(dst)
+        n = len(payload)
+        hdr = bytearray(ETH_IP_UDP.pack(d_mac, s_mac, ETHERTYPE_IPV4,
+                                        0x45, 0, 28 + n, self.ip_id, FLAG_DF, 64, 17, 0, s_ip, d_ip,
+                                        s_port, d_port, 8 + n, 0))
+        struct.pack_into('>H', hdr, 24, _checksum(bytes(hdr[14:34])))
+        self.ip_id = (self.ip_id + 1) & 0xFFFF
+        sec, ns = divmod(ts_ns, 1_000_000_000)
+        self.buf += REC_HDR.pack(sec, ns, 42 + n, 42 + n)
+        self.buf += hdr
+        self.buf += payload
+        self.packets += 1
+        if len(self.buf) >= self.buf_bytes:
+            self.flush()
+
+    def write_many(self, records: Iterable[Tuple[int, bytes, Optional[Addr], Optional[Addr]]]) -> None:
+        for ts_ns, payload, src, dst in records:
+            self.write(ts_ns, payload, src, dst)
+
+    def flush(self) -> None:
+        if self.buf:
+            self.f.write(self.buf)
+            self.buf = bytearray()
+        self.f.flush()
+
+    def close(self) -> None:
+        if not self.f.closed:
+            self.flush()
+            self.f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
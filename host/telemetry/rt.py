@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+"""
+CPU affinity, SCHED_FIFO and mlockall for the servers, benches and host runners.
+
+The Makefile's tune / untune targets (infra/tuning/) set up the machine:
+isolcpus, nohz_full, rcu_nocbs, IRQ steering. This module places a process
+on it. Each entry point names its threads by role:
+
+  feature_echo_mt.py    rx, proc, tx
+  run_cycle_bench.py    main (the benchmark loop)
+  test_lob_stream.py,   main (asyncio send/receive loop)
+  soc_runner.py
+  open_loop_replay.py   main (sender), rx (receiver process)
+
+  --pin rx=2 --pin proc=3 --pin tx=2   cpulists per role; a bare --pin 3 covers every role
+  --fifo proc=80                       SCHED_FIFO priority per role (bare --fifo 50: every role)
+  --mlockall                           lock current and future pages (no page faults mid-run)
+  --require-isolation                  exit unless pinned CPUs are in isolcpus and nohz_full
+
+Every call is best effort: a missing privilege is recorded in errors and the
+run continues. apply_process() runs once in the main thread and
+apply_thread(role) at the top of each thread. Threads inherit the placement
+of the thread that starts them, so runners start their helper threads (the
+host/telemetry/writer.py sink writers) before pinning the hot thread; those
+stay on the default CPUs under SCHED_OTHER. mlockall is not inherited across
+fork: a forked worker calls lock_child(). summary() holds the requested
+and effective settings (affinity and policy read back from the kernel) plus
+the kernel command line isolation. Runners store it in their log metadata
+or a <log>.rt.json sidecar, so every result says where it ran.
+"""
+import ctypes
+import ctypes.util
+import json
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Set
+
+MCL_CURRENT = 1
+MCL_FUTURE = 2
+ALL = '*'
+ISOLATION_KEYS = ('isolcpus', 'nohz_full', 'rcu_nocbs')
+POLICIES = {getattr(os, k): k[6:].lower() for k in ('SCHED_OTHER', 'SCHED_FIFO', 'SCHED_RR', 'SCHED_BATCH',
+                                                      'SCHED_IDLE') if hasattr(os, k)}
+
+
+def parse_cpus(s: str) -> Set[int]:
+    """'2,4-7' -> {2, 4, 5, 6, 7}; isolcpus flags such as 'domain,managed_irq' are skipped."""
+    out: Set[int] = set()
+    for part in s.split(','):
+        part = part.strip()
+        if not part or not part[0].isdigit():
+            continue
+        if '-' in part:
+            lo, hi = part.split('-', 1)
+            out.update(range(int(lo), int(hi.split(':')[0]) + 1))
+        else:
+            out.add(int(part))
+    return out
+
+
+def format_cpus(cpus) -> str:
+    cpus = sorted(cpus)
+    runs, i = [], 0
+    while i < len(cpus):
+        j = i
+        while j + 1 < len(cpus) and cpus[j + 1] == cpus[j] + 1:
+            j += 1
+        runs.append(str(cpus[i]) if i == j else f"{cpus[i]}-{cpus[j]}")
+        i = j + 1
+    return ','.join(runs)
+
+
+def parse_role_args(items: List[str], value=str) -> Dict[str, object]:
+    """['rx=2', 'proc=3', '4'] -> {'rx': '2', 'proc': '3', '*': '4'} (values through value())."""
+    out = {}
+    for item in items or ():
+        role, sep, v = item.partition('=')
+        if not sep:
+            role, v = ALL, item
+        out[role.strip()] = value(v.strip())
+    return out
+
+
+def kernel_isolation(cmdline_path: str = '/proc/cmdline') -> Dict[str, Optional[Set[int]]]:
+    """CPUs listed for isolcpus / nohz_full / rcu_nocbs on the kernel command line (None = absent)."""
+    out: Dict[str, Optional[Set[int]]] = dict.fromkeys(ISOLATION_KEYS)
+    try:
+        with open(cmdline_path) as f:
+            words = f.read().split()
+    except OSError:
+        return out
+    for w in words:
+        k, _, v = w.partition('=')
+        if k in out:
+            out[k] = parse_cpus(v)
+    return out
+
+
+def isolation_problems(cpus: Set[int], iso: Dict[str, Optional[Set[int]]]) -> List[str]:
+    problems = []
+    for k in ('isolcpus', 'nohz_full'):
+        if iso.get(k) is None:
+            problems.append(f"{k} not on the kernel command line")
+        elif not cpus <= iso[k]:
+            problems.append(f"CPUs {format_cpus(cpus - iso[k])} not in {k}={format_cpus(iso[k])}")
+    return problems
+
+
+def mlockall(flags: int = MCL_CURRENT | MCL_FUTURE) -> None:
+    libc = ctypes.CDLL(ctypes.util.find_library('c') or None, use_errno=True)
+    if libc.mlockall(flags) != 0:
+        err = ctypes.get_errno()
+        raise OSError(err, f"mlockall: {os.strerror(err)} (needs root or a large RLIMIT_MEMLOCK)")
+
+
+def thread_state() -> dict:
+    """Affinity and scheduling policy of the calling thread, as the kernel reports them."""
+    st = {'tid': threading.get_native_id()}
+    try:
+        st['cpus'] = format_cpus(os.sched_getaffinity(0))
+    except (AttributeError, OSError):
+        pass
+    try:
+        st['policy'] = POLICIES.get(os.sched_getscheduler(0), 'unknown')
+        st['priority'] = os.sched_getparam(0).sched_priority
+    except (AttributeError, OSError):
+        pass
+    return st
+
+
+class RtControl:
+    """Requested pinning / FIFO / mlock for one process; records what actually took effect."""
+
+    def __init__(self, pins: Optional[Dict[str, str]] = None, fifo: Optional[Dict[str, int]] = None,
+                 mlock: bool = False, require_isolation: bool = False):
+        self.pins = dict(pins or {})
+        self.fifo = dict(fifo or {})
+        self.mlock = mlock
+        self.require_isolation = require_isolation
+        self.errors: List[str] = []
+        self.effective: Dict[str, dict] = {}
+        self.isolation = {}
+        self.locked = False
+
+    def enabled(self) -> bool:
+        return bool(self.pins or self.fifo or self.mlock)
+
+    def pinned_cpus(self) -> Set[int]:
+        out: Set[int] = set()
+        for v in self.pins.values():
+            out |= parse_cpus(v)
+        return out
+
+    def apply_process(self) -> 'RtControl':
+        """mlockall and the isolation check; raises RuntimeError with --require-isolation."""
+        self.isolation = {k: (format_cpus(v) if v is not None else None) for k, v in kernel_isolation().items()}
+        cpus = self.pinned_cpus()
+        if cpus:
+            problems = isolation_problems(cpus, kernel_isolation())
+            if problems and self.require_isolation:
+                raise RuntimeError("; ".join(problems))
+            self.errors += problems
+        if self.mlock:
+            try:
+                mlockall()
+                self.locked = True
+            except OSError as e:
+                self.errors.append(str(e))
+        return self
+
+    def lock_child(self) -> None:
+        """mlockall again in a forked child (memory locks are not inherited); records the outcome."""
+        if self.mlock:
+            try:
+                mlockall()
+            except OSError as e:
+                self.locked = False
+                self.errors.append(f"child: {e}")
+
+    def apply_thread(self, role: str) -> dict:
+        """Pin / schedule the calling thread for role; returns its effective state."""
+        cpus = self.pins.get(role, self.pins.get(ALL))
+        prio = self.fifo.get(role, self.fifo.get(ALL))
+        if cpus:
+            try:
+                os.sched_setaffinity(0, parse_cpus(cpus))
+            except (AttributeError, OSError, ValueError) as e:
+                self.errors.append(f"{role}: affinity {cpus}: {e}")
+        if prio:
+            try:
+                os.sched_setscheduler(0, os.SCHED_FIFO, os.sched_param(prio))
+            except (AttributeError, OSError) as e:
+                self.errors.append(f"{role}: SCHED_FIFO {prio}: {e}")
+        st = thread_state()
+        self.effective[role] = st
+        return st
+
+    def target(self, role: str, fn):
+        """fn wrapped to run apply_thread(role) first, for threading.Thread(target=...)."""
+        def run(*a, **kw):
+            self.apply_thread(role)
+            return fn(*a, **kw)
+        return run
+
+    def wait(self, roles, timeout_s: float = 1.0) -> None:
+        """Until every role's thread has applied its settings (for describe() right after start)."""
+        end = time.monotonic() + timeout_s
+        while any(r not in self.effective for r in roles) and time.monotonic() < end:
+            time.sleep(0.001)
+
+    def summary(self) -> dict:
+        return {'pins': self.pins, 'fifo': self.fifo, 'mlockall': self.locked if self.mlock else None,
+                'effective': self.effective, 'kernel': self.isolation, 'errors': self.errors}
+
+    def describe(self) -> str:
+        parts = [f"{r}: cpus={s.get('cpus')} {s.get('policy')}/{s.get('priority')}"
+                 for r, s in self.effective.items()]
+        if self.mlock:
+            parts.append(f"mlockall={'ok' if self.locked else 'FAILED'}")
+        iso = ' '.join(f"{k}={v}" for k, v in self.isolation.items() if v is not None) or 'no isolcpus/nohz_full'
+        s = f"RT {'; '.join(parts)} [{iso}]"
+        if self.errors:
+            s += "\nRT warnings: " + "; ".join(self.errors)
+        return s
+
+
+def add_rt_args(parser) -> None:
+    parser.add_argument('--pin', action='append', default=[], metavar='[ROLE=]CPUS',
+                        help='Pin a thread role to a cpulist (e.g. proc=3, rx=2,6); bare CPUS pins every role')
+    parser.add_argument('--fifo', action='append', default=[], metavar='[ROLE=]PRIO',
+                        help='SCHED_FIFO priority (1-99) per role; bare PRIO applies to every role')
+    parser.add_argument('--mlockall', action='store_true', help='mlockall(MCL_CURRENT|MCL_FUTURE) at startup')
+    parser.add_argument('--require-isolation', action='store_true',
+                        help='Exit unless every pinned CPU is in isolcpus and nohz_full')
+
+
+def rt_from_args(args) -> RtControl:
+    return RtControl(parse_role_args(args.pin), parse_role_args(args.fifo, int), args.mlockall,
+                     args.require_isolation)
+
+
+def brief(summary: dict) -> str:
+    """One line for result manifests: 'proc=3:fifo/80 rx=2:other/0 mlockall'."""
+    parts = [f"{r}={s.get('cpus')}:{s.get('policy')}/{s.get('priority')}"
+             for r, s in sorted(summary.get('effective', {}).items())]
+    if summary.get('mlockall'):
+        parts.append('mlockall')
+    return ' '.join(parts)
+
+
+def apply_from_args(args, role: str = 'main', log_path: Optional[str] = None) -> RtControl:
+    """
+    add_rt_args options for a single-threaded runner: process settings, then
+    the calling thread as role. Prints the result and saves it next to
+    log_path. RuntimeError when --require-isolation fails. Without any RT
+    option nothing is applied, printed or saved.
+    """
+    rtc = rt_from_args(args)
+    if not (rtc.enabled() or rtc.require_isolation):
+        return rtc
+    rtc.apply_process()
+    rtc.apply_thread(role)
+    print(rtc.describe())
+    if log_path:
+        save(sidecar_path(log_path), rtc)
+    return rtc
+
+
+def sidecar_path(log_path: str) -> str:
+    root, _ = os.path.splitext(log_path)
+    return root + '.rt.json'
+
+
+def save(path: str, rt: RtControl) -> None:
+    d = os.path.dirname(path)
+    if d:
+        os.makedirs(d, exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump(rt.summary(), f, indent=2)
+
+
+def load_for(log_path: str) -> Optional[dict]:
+    """The RT summary saved next to a run log, if any."""
+    p = sidecar_path(log_path)
+    if not os.path.exists(p):
+        return None
+    with open(p) as f:
+        return json.load(f)
@@ -0,0 +1,476 @@
+import gc
+import os
+import random
+import socket
+import struct
+import sys
+import tempfile
+import threading
+import time
+import unittest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from host.client import decoders
+from host.client.core import Outgoing
+from host.telemetry import clocksync, gcmode, metrics, rt
+from host.telemetry.histogram import LatencyHistogram, LatencyRecorder
+from host.telemetry.writer import AsyncCsvLog, AsyncTextLog
+
+try:
+    import numpy as np
+    from host.telemetry import binlog, critical_path
+except Exception:
+    np = None
+
+
+class TestLatencyHistogram(unittest.TestCase):
+    def setUp(self):
+        rnd = random.Random(7)
+        self.values = [int(rnd.lognormvariate(10, 1.5)) for _ in range(20000)] + [0, 1, 2047, 2048, 4096]
+
+    def test_bucket_resolution(self):
+        h = LatencyHistogram()
+        for v in list(range(5000)) + [(1 << k) + d for k in range(11, 40) for d in (-1, 0, 1)]:
+            lo, hi = h.bucket_range(h.index(v))
+            self.assertTrue(lo <= v <= hi)
+            self.assertLessEqual(hi - lo, max(v, 2048) / 1024)
+
+    def test_percentiles_within_precision(self):
+        h = LatencyHistogram()
+        for v in self.values:
+            h.record(v)
+        ref = sorted(self.values)
+        for q, got in zip((50, 90, 99, 99.9, 100), h.percentiles([50, 90, 99, 99.9, 100])):
+            exact = ref[max(1, -(-int(q * len(ref)) // 100)) - 1]
+            self.assertLessEqual(abs(got - exact), exact / 1000 + 1, q)
+        self.assertEqual(h.max, ref[-1])
+        self.assertEqual(h.sum, sum(ref))
+
+    def test_merge_and_roundtrip(self):
+        a, b, both = LatencyHistogram(), LatencyHistogram(), LatencyHistogram()
+        half = len(self.values) // 2
+        for v in self.values[:half]:
+            a.record(v)
+        for v in self.values[half:]:
+            b.record(v)
+        for v in self.values:
+            both.record(v)
+        a.merge(b)
+        self.assertEqual(a.counts, both.counts)
+        c = LatencyHistogram.from_bytes(a.to_bytes())
+        self.assertEqual(c.counts, both.counts)
+        self.assertEqual((c.total, c.min, c.max, c.sum), (both.total, both.min, both.max, both.sum))
+        with self.assertRaises(ValueError):
+            a.merge(LatencyHistogram(sig_figs=2))
+
+    @unittest.skipIf(np is None, "numpy not installed")
+    def test_record_many_matches_record(self):
+        a, b = LatencyHistogram(), LatencyHistogram()
+        for v in self.values:
+            a.record(v)
+        b.record_many(np.array(self.values + [-5]))
+        self.assertEqual(a.counts, b.counts)
+        self.assertEqual(b.negative, 1)
+
+    def test_recorder_file(self):
+        rec = LatencyRecorder(['rtt_ns', 'dma_ns'], sample_every=10, sample_columns=['seq', 'rtt_ns'])
+        for i, v in enumerate(self.values[:1000]):
+            rec.record({'seq': i, 'rtt_ns': v, 'dma_ns': None if i % 2 else v // 2})
+        with tempfile.TemporaryDirectory() as d:
+            path = os.path.join(d, 'run.hist')
+            rec.save(path)
+            back = LatencyRecorder.load(path)
+        self.assertEqual(back.n_rows, 1000)
+        self.assertEqual(back.hist['rtt_ns'].counts, rec.hist['rtt_ns'].counts)
+        self.assertEqual(back.hist['dma_ns'].total, 500)
+        rows = back.sampled_rows()
+        self.assertEqual(rows['seq'][:3], [0, 10, 20])
+        self.assertEqual(rows['rtt_ns'][1], self.values[10])
+
+
+@unittest.skipIf(np is None, "numpy not installed")
+class TestBinLog(unittest.TestCase):
+    def _records(self, n):
+        return [(i, binlog.FLAG_REPLY, i % 4, 1000 * i, 1000 * i + 500, 10 * i, 11 * i, 12 * i, 13 * i, 14 * i,
+                 12 * i + 1, i / 8.0, 100 + i, 60 + i, 40) for i in range(n)]
+
+    def test_roundtrip_fromfile_and_mmap(self):
+        recs = self._records(10)
+        with tempfile.TemporaryDirectory() as d:
+            path = os.path.join(d, 'run.tlog')
+            with binlog.BinLogWriter(path, block_records=4, meta={'pps': 100}) as w:
+                for r in recs[:7]:
+                    w.append(r)
+                self.assertEqual(w.written, 4)   # one full block on disk, 3 buffered
+                w.append_many(np.array(recs[7:], dtype=binlog.TIMING_DTYPE))
+            self.assertEqual(os.path.getsize(path), binlog.HEADER_LEN + 10 * binlog.TIMING_DTYPE.itemsize)
+            hdr, a = binlog.read_binlog(path, schema='timing')
+            _, m = binlog.read_binlog(path, mmap=True)
+            self.assertEqual(hdr['meta'], {'pps': 100})
+            self.assertEqual(hdr['clocks']['host_clock'], 'CLOCK_MONOTONIC_RAW')
+            self.assertEqual(a.tolist(), np.array(recs, dtype=binlog.TIMING_DTYPE).tolist())
+            self.assertEqual(m['t6_pynq_ns'].tolist(), a['t6_pynq_ns'].tolist())
+            del m
+            with open(path, 'ab') as f:   # torn trailing record after a crash is ignored
+                f.write(b'\x01' * 17)
+            self.assertEqual(len(binlog.read_binlog(path)[1]), 10)
+            with self.assertRaises(ValueError):
+                binlog.read_binlog(path, schema='cpu_vs_fpga')
+
+
+class _StalledLog(AsyncTextLog):
+    """Writer that blocks until released, standing in for a stalled disk."""
+
+    def __init__(self, stream, gate):
+        self.gate = gate
+        super().__init__(stream, block_records=4, n_buffers=2, flush_interval_s=10.0)
+
+    def _write(self, buf, n):
+        self.gate.wait()
+        super()._write(buf, n)
+
+
+class TestAsyncWriter(unittest.TestCase):
+    def test_csv_rows_in_order(self):
+        with tempfile.TemporaryDirectory() as d:
+            path = os.path.join(d, 'out.csv')
+            # default buffer count: a tight loop (no I/O waits to yield the GIL) never drops
+            log = AsyncCsvLog(path, ['seq', 'v'], block_records=16)
+            for i in range(1000):
+                self.assertTrue(log.append([i, i * 2]))
+            log.close()
+            with open(path) as f:
+                lines = f.read().splitlines()
+        self.assertEqual(lines[0], 'seq,v')
+        self.assertEqual(lines[1:], [f'{i},{i * 2}' for i in range(1000)])
+        self.assertEqual(log.stats()['written'], 1000)
+        self.assertEqual(log.dropped, 0)
+
+    def test_stall_drops_instead_of_blocking(self):
+        import io
+        out = io.StringIO()
+        gate = threading.Event()
+        log = _StalledLog(out, gate)
+        ok = [log.append(str(i)) for i in range(20)]
+        # buffer 1 is stuck in the writer, buffer 2 is full and queued: the rest is dropped
+        self.assertEqual(ok, [True] * 8 + [False] * 12)
+        self.assertEqual(log.dropped, 12)
+        gate.set()
+        log.close()
+        self.assertEqual(out.getvalue().split(), [str(i) for i in range(8)])
+        self.assertIn('WARNING: 12 of 20 records NOT logged (60.00%)', log.summary())
+
+    def test_default_buffers_cover_a_stall(self):
+        from host.telemetry import writer
+        self.assertEqual(writer.buffers_for(4096, 100_000, 0.5), 14)
+        self.assertEqual(writer.buffers_for(1 << 16, 100_000, 0.5), writer.MIN_BUFFERS)
+
+    @unittest.skipIf(np is None, "numpy not installed")
+    def test_async_binlog_readable(self):
+        from host.telemetry.writer import AsyncBinLog
+        with tempfile.TemporaryDirectory() as d:
+            path = os.path.join(d, 'run.tlog')
+            log = AsyncBinLog(path, block_records=64, n_buffers=8)
+            for i in range(500):
+                log.append((i, binlog.FLAG_REPLY, 0, i, i + 7, 0, 0, 0, 0, 0, 0, 0.0, 0, 0, 0))
+            log.close()
+            _, rec = binlog.read_binlog(path)
+        self.assertEqual(rec['seq'].tolist(), list(range(500)))
+        self.assertTrue(((rec['t5_host_ns'] - rec['t1_host_ns']) == 7).all())
+
+
+class TestClockSync(unittest.TestCase):
+    OFFSET = 7_000_000_000_123   # PYNQ boot is unrelated to the host's
+    DRIFT_PPM = 25.0
+
+    def _remote(self, t):
+        return int(t + self.OFFSET + self.DRIFT_PPM * 1e-6 * (t - 10**12))
+
+    def _exchanges(self, n=400, base_ns=40_000, proc_ns=15_000):
+        rnd = random.Random(3)
+        out = []
+        t = 10**12
+        for _ in range(n):
+            up = base_ns + int(rnd.expovariate(1 / 30_000))     # queueing only ever adds delay
+            down = base_ns + int(rnd.expovariate(1 / 30_000))
+            t2 = self._remote(t + up)
+            out.append((t, t2, t2 + proc_ns, t + up + proc_ns + down))
+            t += 50_000_000
+        return out
+
+    def test_fit_recovers_offset_and_drift(self):
+        m = clocksync.fit(self._exchanges())
+        self.assertLess(m.min_delay_ns - 80_000, 5_000)
+        self.assertAlmostEqual(m.drift_ppm, self.DRIFT_PPM, delta=0.5)
+        t_host = 10**12 + 10 * 10**9
+        self.assertLess(abs(m.offset_at(t_host) - (self._remote(t_host) - t_host)), 2_000)
+        up, pynq, down = m.legs(t_host, self._remote(t_host + 40_000), self._remote(t_host + 60_000),
+                                t_host + 100_000)
+        self.assertLess(abs(up - 40_000), 2_000)
+        self.assertLess(abs(down - 40_000), 2_000)
+
+    def test_with_pings_and_sink(self):
+        src = [Outgoing(i * 30_000_000, b'x') for i in range(10)]
+        out = list(clocksync.with_pings(iter(src), 100_000_000))
+        self.assertEqual([o.offset_ns for o in out if o.meta.get('ping')], [0, 100_000_000, 200_000_000])
+        self.assertEqual([o.offset_ns for o in out], sorted(o.offset_ns for o in out))
+
+        class Req:
+            pass
+
+        class Rep:
+            pass
+
+        sink = clocksync.ClockSyncSink()
+        for t1, t2, t3, t4 in self._exchanges(50):
+            data = bytearray(clocksync.ping_packet()) + struct.pack('>QQ', t2, t3)
+            req, rep = Req(), Rep()
+            req.t_send, rep.t_recv = t1, t4
+            rep.fields = {'msg_type': 0, **decoders.ping(bytes(data))}
+            sink.on_reply(req, rep)
+        sink.close()
+        self.assertEqual(len(sink.samples), 50)
+        self.assertIn('clock sync: offset=', sink.summary())
+
+
+class TestMetrics(unittest.TestCase):
+    def test_windows_use_the_callers_raw_clock(self):
+        t0 = time.clock_gettime_ns(time.CLOCK_MONOTONIC_RAW)
+        m = metrics.ThreadMetrics('rx', stages=['stage'], window_s=1.0)
+        t1 = time.clock_gettime_ns(time.CLOCK_MONOTONIC_RAW)
+        self.assertTrue(t0 + m.window_ns <= m.window_end_ns <= t1 + m.window_ns)
+        m.observe('stage', 5, now_ns=time.clock_gettime_ns(time.CLOCK_MONOTONIC_RAW) + m.window_ns)
+        self.assertIsNotNone(m.window(time.clock_gettime_ns(time.CLOCK_MONOTONIC_RAW) + m.window_ns))
+
+    def test_threads_aggregate_and_serve(self):
+        reg = metrics.MetricsRegistry(prefix='t')
+        a = reg.thread('rx', ['pkts'], ['stage'], window_s=1.0)
+        b = reg.thread('proc', ['pkts', 'errors'], ['stage'], window_s=1.0)
+        reg.gauge('depth', lambda: 3)
+
+        def work(m, base):
+            for i in range(1000):
+                m.inc('pkts')
+                m.observe('stage', base + i, now_ns=0)
+        ts = [threading.Thread(target=work, args=(m, base)) for m, base in ((a, 1000), (b, 5000))]
+        for t in ts:
+            t.start()
+        for t in ts:
+            t.join()
+        self.assertEqual(reg.counters(), {'pkts': 2000, 'errors': 0})
+        self.assertEqual(reg.snapshot()['stages']['stage']['window_count'], 0)  # window not complete yet
+        for m in (a, b):
+            m.observe('stage', 1, now_ns=m.window_end_ns)   # roll both windows
+        snap = reg.snapshot()
+        st = snap['stages']['stage']
+        self.assertEqual((st['count'], st['window_count']), (2002, 2000))
+        self.assertAlmostEqual(st['p50_ns'], 1999, delta=20)   # rx's 1000..1999 below proc's 5000..5999
+        self.assertAlmostEqual(st['p99_ns'], 5979, delta=60)
+        self.assertEqual(snap['gauges'], {'depth': 3})
+        text = reg.prometheus()
+        self.assertIn('t_pkts_total{thread="proc"} 1000', text)
+        self.assertIn('t_pkts_total{thread="rx"} 1000', text)
+        self.assertIn('t_stage_stage_seconds_count 2002', text)
+        types = [ln for ln in text.splitlines() if ln.startswith('# TYPE')]
+        self.assertEqual(len(types), len(set(types)))   # one TYPE line per metric family
+        self.assertEqual(text.count('t_stage_stage_seconds_count'), 1)
+
+        srv = metrics.MetricsServer(reg, http_addr=('127.0.0.1', 0), udp_addr=('127.0.0.1', 0))
+        try:
+            from urllib.request import urlopen
+            host, port = srv.addresses()['http']
+            with urlopen(f'http://{host}:{port}/metrics', timeout=2) as r:
+                self.assertIn('t_depth 3', r.read().decode())
+            self.assertEqual(metrics.query_udp(srv.addresses()['udp'])['counters']['pkts'], 2000)
+        finally:
+            srv.close()
+
+        taken = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        taken.bind(('127.0.0.1', 0))
+        try:
+            with self.assertRaises(OSError):   # caller logs and serves without metrics
+                metrics.MetricsServer(reg, http_addr=('127.0.0.1', 0), udp_addr=taken.getsockname())
+        finally:
+            taken.close()
+
+
+class TestGcMode(unittest.TestCase):
+    def test_latency_mode_collects_only_when_idle(self):
+        reg = metrics.MetricsRegistry()
+        m = reg.thread('gc', gcmode.GC_COUNTERS, ['gc_pause'])
+        mon = gcmode.GcMonitor(m)
+        enabled = gc.isenabled()
+        with gcmode.GcControl('latency', mon, idle_allocs=100, hard_cap=10_000, full_interval_s=3600) as gcc:
+            self.assertFalse(gc.isenabled())
+            self.assertGreater(gcc.frozen, 0)
+            n0 = m.counts['gc_pauses']   # enter()'s own collection is timed too
+            junk = [[i] for i in range(500)]
+            self.assertEqual(m.counts['gc_pauses'], n0)   # no automatic collection while disabled
+            self.assertTrue(gcc.idle())
+            self.assertEqual((m.counts['gc_pauses'], m.counts['gc_idle_collects']), (n0 + 1, 1))
+            self.assertFalse(gcc.idle())
+            self.assertTrue(gcc.idle(now_ns=gcc.last_full_ns + gcc.full_interval_ns))   # full collection due
+            self.assertEqual(m.counts['gc_pauses_gen2'], 2)
+            self.assertFalse(gcc.check())
+            junk += [[i] for i in range(20_000)]
+            self.assertTrue(gcc.check())
+            self.assertEqual(m.counts['gc_forced_collects'], 1)
+            self.assertEqual(m.n['gc_pause'], m.counts['gc_pauses'])
+            self.assertGreater(mon.max_pause_ns, 0)
+        self.assertEqual(gc.isenabled(), enabled)
+        self.assertEqual(gc.get_freeze_count(), 0)
+        self.assertNotIn(mon._callback, gc.callbacks)
+        with gcmode.GcControl('default') as gcc:
+            self.assertFalse(gcc.idle())
+        with self.assertRaises(ValueError):
+            gcmode.GcControl('off')
+
+
+class TestRt(unittest.TestCase):
+    def test_parse_and_isolation(self):
+        self.assertEqual(rt.parse_cpus('domain,managed_irq,2-4,7'), {2, 3, 4, 7})
+        self.assertEqual(rt.format_cpus({0, 2, 3, 4, 7}), '0,2-4,7')
+        self.assertEqual(rt.parse_role_args(['rx=2', 'proc=3-4', '5']), {'rx': '2', 'proc': '3-4', '*': '5'})
+        self.assertEqual(rt.parse_role_args(['80', 'proc=90'], int), {'*': 80, 'proc': 90})
+        with tempfile.TemporaryDirectory() as d:
+            path = os.path.join(d, 'cmdline')
+            with open(path, 'w') as f:
+                f.write('ro quiet isolcpus=domain,managed_irq,4-7 nohz_full=4-7\n')
+            iso = rt.kernel_isolation(path)
+        self.assertEqual(iso, {'isolcpus': {4, 5, 6, 7}, 'nohz_full': {4, 5, 6, 7}, 'rcu_nocbs': None})
+        self.assertEqual(rt.isolation_problems({5, 6}, iso), [])
+        self.assertEqual(rt.isolation_problems({3, 5}, iso), ['CPUs 3 not in isolcpus=4-7', 'CPUs 3 not in nohz_full=4-7'])
+        self.assertIn('nohz_full not on the kernel command line', rt.isolation_problems({1}, {'isolcpus': {1}}))
+
+    @unittest.skipUnless(hasattr(os, 'sched_getaffinity'), "no sched_getaffinity")
+    def test_thread_placement_recorded(self):
+        cpu = min(os.sched_getaffinity(0))
+        rtc = rt.RtControl(pins={'worker': str(cpu)})
+        t = threading.Thread(target=rtc.target('worker', lambda: None))
+        t.start()
+        t.join()
+        rtc.wait(['worker'])
+        self.assertEqual(rtc.effective['worker']['cpus'], str(cpu))
+        self.assertNotEqual(rtc.effective['worker']['tid'], threading.get_native_id())
+        with tempfile.TemporaryDirectory() as d:
+            rt.save(rt.sidecar_path(os.path.join(d, 'run', 'soc.csv')), rtc)
+            self.assertEqual(rt.brief(rt.load_for(os.path.join(d, 'run', 'soc.tlog'))), f"worker={cpu}:other/0")
+
+    def test_apply_from_args_without_options_is_a_noop(self):
+        import argparse
+        ap = argparse.ArgumentParser()
+        rt.add_rt_args(ap)
+        with tempfile.TemporaryDirectory() as d:
+            log = os.path.join(d, 'run.csv')
+            rtc = rt.apply_from_args(ap.parse_args([]), log_path=log)
+            self.assertEqual(rtc.effective, {})
+            self.assertIsNone(rt.load_for(log))
+
+
+@unittest.skipIf(np is None, "numpy not installed")
+class TestCriticalPath(unittest.TestCase):
+    def test_legs_tail_and_stall_period(self):
+        rng = np.random.default_rng(3)
+        n = 40_000
+        t1 = 1_000_000 + 10_000 * np.arange(n, dtype=np.float64)    # 100k pps for 0.4 s
+        up = 20_000 + rng.exponential(2_000, n)
+        stall = np.where((t1 % 4_000_000) < 200_000, 60_000.0, 0.0)  # 250 Hz, 200 µs wide
+        t2 = t1 + up + 5e9                                            # PYNQ clock 5 s ahead
+        t3 = t2 + 3_000 + rng.exponential(300, n)
+        t4 = t3 + 8_000 + rng.exponential(500, n) + stall
+        t5 = t4 + 4_000
+        t6 = t5 + 2_000
+        t5h = t6 - 5e9 + 20_000 + rng.exponential(2_000, n)
+        stamps = {'t1_host_ns': t1, 't2_pynq_ns': t2, 't_reflex_ns': np.full(n, np.nan), 't3_pynq_ns': t3,
+                  't4_pynq_ns': t4, 't5_pynq_ns': t5, 't6_pynq_ns': t6, 't5_host_ns': t5h}
+        stamps['t4_pynq_ns'][::7] = np.nan   # missing stamp: its time moves to feat_to_score
+        legs, rtt, t_send = critical_path.packet_legs(stamps)
+        self.assertEqual(len(rtt), n)
+        np.testing.assert_allclose(sum(legs.values()), rtt)
+        self.assertEqual(float(np.abs(legs['rx_to_reflex']).max()), 0.0)
+        self.assertIn('network', legs)
+
+        att = critical_path.attribute_tail(legs, rtt, 99)
+        self.assertAlmostEqual(sum(a['share'] for a in att.values()), 1.0)
+        self.assertEqual(max(att, key=lambda k: att[k]['share']), 'dma_to_feat')
+        self.assertGreater(att['dma_to_feat']['tail_p50_ns'] - att['dma_to_feat']['body_p50_ns'], 40_000)
+
+        peaks = critical_path.periodic_stalls(t_send, legs['dma_to_feat'])
+        self.assertTrue(peaks)
+        self.assertAlmostEqual(peaks[0][0], 250, delta=5)
+        self.assertIn('CONFIG_HZ=250', critical_path.stall_hint(peaks[0][0]))
+        text = critical_path.report(legs, rtt, t_send)
+        self.assertIn('p99 excess is mostly dma_to_feat', text)
+
+
+@unittest.skipIf(np is None, "numpy not installed")
+class TestCsvChunks(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.d = self._tmp.name
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def test_fill_empty(self):
+        from host.telemetry.csvchunks import _fill_empty
+        self.assertEqual(_fill_empty(b'1,,3\r\n,2,\n,,,\n4,5,6'),
+                         b'1,nan,3\nnan,2,nan\nnan,nan,nan,nan\n4,5,6\n')
+
+    def test_chunks_stay_row_aligned(self):
+        from host.telemetry.csvchunks import read_csv_chunks
+        path = os.path.join(self.d, 'c.csv')
+        with open(path, 'w') as f:
+            f.write('a,b,c\n1,,3\n,5,6\n7,8,\n9,x,11\n\n12,13,14\n')
+        chunks = list(read_csv_chunks(path, ['c', 'a', 'missing'], chunk_rows=2))
+        self.assertEqual([len(c['a']) for c in chunks], [2, 2, 1])
+        a = np.concatenate([c['a'] for c in chunks])
+        cc = np.concatenate([c['c'] for c in chunks])
+        np.testing.assert_array_equal(a, [1, np.nan, 7, 9, 12])
+        np.testing.assert_array_equal(cc, [3, 6, np.nan, 11, 14])
+        self.assertTrue(all(np.isnan(c['missing']).all() for c in chunks))
+
+    def test_streamed_percentiles_match_in_memory(self):
+        from host.udp.analyze_latency import CSV_COLUMNS, load_latency_data, present, stream_latency_csv
+        rnd = random.Random(3)
+        path = os.path.join(self.d, 'latency.csv')
+        with open(path, 'w') as f:
+            f.write(','.join(CSV_COLUMNS) + '\n')
+            for seq in range(1000):
+                rtt = int(rnd.lognormvariate(11, 0.5))
+                total = int(rtt * 0.6)
+                row = {c: '' for c in CSV_COLUMNS}
+                row.update(seq=seq, t1_host_ns=10**9 + seq * 10**5, rtt_ns=rtt, pynq_total_ns=total,
+                           dma_ns=int(rnd.lognormvariate(8, 0.3)), net_est_ns=rtt - total)
+                if seq % 7 == 0:
+                    row['pynq_total_ns'] = row['net_est_ns'] = ''
+                if seq % 11 == 0:
+                    row['dma_ns'] = ''
+                if seq % 13 == 0:
+                    row['rtt_ns'] = ''
+                f.write(','.join(str(row[c]) for c in CSV_COLUMNS) + '\n')
+
+        data = load_latency_data(path)
+        self.assertEqual({len(v) for v in data.values()}, {1000})   # row-aligned, NaN where empty
+        seq = data['seq'].astype(int)
+        np.testing.assert_array_equal(np.isnan(data['pynq_total_ns']), seq % 7 == 0)
+        np.testing.assert_array_equal(np.isnan(data['dma_ns']), seq % 11 == 0)
+        np.testing.assert_array_equal(np.isnan(data['rtt_ns']), seq % 13 == 0)
+        both = ~np.isnan(data['rtt_ns']) & ~np.isnan(data['pynq_total_ns'])
+        np.testing.assert_array_equal(data['net_est_ns'][both], (data['rtt_ns'] - data['pynq_total_ns'])[both])
+        rec = stream_latency_csv(path, chunk_rows=64, sample_every=10)
+        self.assertEqual(rec.n_rows, 1000)
+        qs = [50, 90, 99, 99.9]
+        for name in ('rtt_ns', 'pynq_total_ns', 'dma_ns', 'net_est_ns'):
+            exact = np.percentile(present(data[name]), qs, method='inverted_cdf')
+            self.assertEqual(rec.hist[name].total, len(present(data[name])), name)
+            for q, want, got in zip(qs, exact, rec.hist[name].percentiles(qs)):
+                self.assertAlmostEqual(got, want, delta=want * 2e-3, msg=f'{name} p{q}')
+        rows = rec.sampled_rows()
+        self.assertEqual(rows['seq'], list(range(0, 1000, 10)))
+        self.assertEqual([r is None for r in rows['rtt_ns']], [s % 13 == 0 for s in range(0, 1000, 10)])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,250 @@
+"""
+Double-buffered background logging for the host runners.
+
+The hot path (reply callback between recvfrom and the next sendto) only
+stores a record into a preallocated buffer slot. When a buffer fills it is
+handed to a writer thread, which serializes it to disk while the hot path
+carries on in a spare buffer. With every buffer still in flight the record is
+dropped and counted, never waited for, so an I/O stall shows up as
+`dropped` instead of as a latency spike. By default there are enough buffers
+to ride out STALL_S of writer stall at rate_hz records/s (buffers_for()).
+
+  AsyncBinLog   NumPy structured blocks -> binlog.py .tlog file (tofile)
+  AsyncCsvLog   row lists -> csv.writer.writerows
+  AsyncTextLog  strings -> a text stream (periodic status lines)
+  AsyncPcapLog  (ts_ns, payload, src, dst) -> pcap.py nanosecond capture
+
+The writer holds the GIL only while encoding; file writes release it.
+Every flush_interval_s the writer asks the hot path to hand over a partial
+buffer on its next append, so slow runs still reach disk incrementally.
+"""
+import csv
+import os
+import queue
+import threading
+import time
+from typing import List, Optional, Sequence, Tuple
+
+try:
+    import numpy as np
+    from host.telemetry import binlog
+except Exception:
+    np = None
+    binlog = None
+try:
+    from host.telemetry import pcap
+except ImportError:
+    import pcap   # copied next to feature_echo_mt.py on the board
+
+_STOP = object()
+DEFAULT_RATE_HZ = 100_000   # records/s the default buffer count is sized for
+STALL_S = 0.5               # writer stall (GIL, page cache flush) to absorb without drops
+MIN_BUFFERS = 3
+
+
+def buffers_for(block_records: int, rate_hz: float = DEFAULT_RATE_HZ, stall_s: float = STALL_S) -> int:
+    """Buffers needed to keep appending for stall_s at rate_hz while the writer is stuck."""
+    return max(MIN_BUFFERS, -(-int(rate_hz * stall_s) // max(1, int(block_records))) + 1)
+
+
+class _AsyncLog:
+    def __init__(self, block_records: int, n_buffers: Optional[int] = None, flush_interval_s: float = 1.0,
+                 rate_hz: float = DEFAULT_RATE_HZ):
+        if n_buffers is None:
+            n_buffers = buffers_for(block_records, rate_hz)
+        if n_buffers < 2:
+            raise ValueError("need at least two buffers")
+        self.block = int(block_records)
+        self.free: "queue.SimpleQueue" = queue.SimpleQueue()
+        self.full: "queue.SimpleQueue" = queue.SimpleQueue()
+        for _ in range(n_buffers):
+            self.free.put(self._alloc())
+        self.cur = self.free.get()
+        self.n = 0
+        self.flush_interval_s = flush_interval_s
+        self.flush_requested = False
+        self.appended = 0
+        self.written = 0
+        self.dropped = 0   # hot path only: all buffers in flight
+        self.failed = 0    # writer thread only: records of a block whose write raised
+        self.max_write_s = 0.0
+        self.error: Optional[BaseException] = None
+        self.closed = False
+        self.thread = threading.Thread(target=self._run, name=type(self).__name__, daemon=True)
+        self.thread.start()
+
+    # --- subclass hooks ----------------------------------------------------
+    def _alloc(self):
+        raise NotImplementedError
+
+    def _write(self, buf, n: int) -> None:
+        raise NotImplementedError
+
+    def _close_output(self) -> None:
+        pass
+
+    # --- hot path ----------------------------------------------------------
+    def append(self, rec) -> bool:
+        """Store one record; False if it was dropped (all buffers in flight)."""
+        if self.cur is None:
+            try:
+                self.cur = self.free.get_nowait()
+            except queue.Empty:
+                self.dropped += 1
+                return False
+        self.cur[self.n] = rec
+        self.n += 1
+        self.appended += 1
+        if self.n == self.block or self.flush_requested:
+            self._hand_off()
+        return True
+
+    def _hand_off(self) -> None:
+        self.flush_requested = False
+        if self.cur is None or self.n == 0:
+            return
+        self.full.put((self.cur, self.n))
+        self.cur = None
+        self.n = 0
+
+    # --- writer thread -----------------------------------------------------
+    def _run(self) -> None:
+        while True:
+            try:
+                item = self.full.get(timeout=self.flush_interval_s)
+            except queue.Empty:
+                self.flush_requested = True
+                continue
+            if item is _STOP:
+                break
+            buf, n = item
+            t0 = time.perf_counter()
+            try:
+                self._write(buf, n)
+                self.written += n
+            except BaseException as e:   # keep draining so the hot path never stalls on a dead writer
+                if self.error is None:
+                    self.error = e
+                self.failed += n
+            self.max_write_s = max(self.max_write_s, time.perf_counter() - t0)
+            self.free.put(buf)
+
+    def flush(self) -> None:
+        """Hand over the partial buffer now (call from the hot-path thread)."""
+        self._hand_off()
+
+    def close(self) -> None:
+        if self.closed:
+            return
+        self.closed = True
+        self._hand_off()
+        self.full.put(_STOP)
+        self.thread.join()
+        self._close_output()
+        if self.error is not None:
+            raise RuntimeError(f"{type(self).__name__}: write failed") from self.error
+
+    def stats(self) -> dict:
+        return {'appended': self.appended, 'written': self.written, 'dropped': self.dropped + self.failed,
+                'failed': self.failed, 'max_write_ms': round(self.max_write_s * 1e3, 3)}
+
+    def summary(self) -> str:
+        s = self.stats()
+        out = f"log: written={s['written']} dropped={s['dropped']} max_write={s['max_write_ms']:.1f}ms"
+        if s['dropped']:
+            total = s['appended'] + self.dropped
+            out += (f"\n*** WARNING: {s['dropped']} of {total} records NOT logged "
+                    f"({100.0 * s['dropped'] / max(total, 1):.2f}%); the log is incomplete ***")
+        return out
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class AsyncBinLog(_AsyncLog):
+    """binlog.BinLogWriter's file format, written from the background thread."""
+
+    def __init__(self, path: str, dtype=None, schema: Optional[Tuple[str, int]] = None,
+                 block_records: int = 1 << 16, n_buffers: Optional[int] = None, flush_interval_s: float = 1.0,
+                 clocks: Optional[dict] = None, meta: Optional[dict] = None, rate_hz: float = DEFAULT_RATE_HZ):
+        if binlog is None:
+            raise RuntimeError("binary telemetry logs need numpy")
+        self.dtype = np.dtype(binlog.TIMING_DTYPE if dtype is None else dtype)
+        # block_records=1: the writer only writes the header; blocks go out via _write
+        self.w = binlog.BinLogWriter(path, self.dtype, schema or binlog.TIMING_SCHEMA, 1, clocks, meta)
+        self.path = path
+        super().__init__(block_records, n_buffers, flush_interval_s, rate_hz)
+
+    def _alloc(self):
+        return np.zeros(self.block, dtype=self.dtype)
+
+    def _write(self, buf, n):
+        buf[:n].tofile(self.w.f)
+
+    def _close_output(self):
+        self.w.close()
+
+
+class AsyncCsvLog(_AsyncLog):
+    def __init__(self, path: str, header: Sequence[str], block_records: int = 4096, n_buffers: Optional[int] = None,
+                 flush_interval_s: float = 1.0, rate_hz: float = DEFAULT_RATE_HZ):
+        d = os.path.dirname(path)
+        if d:
+            os.makedirs(d, exist_ok=True)
+        self.path = path
+        self.f = open(path, 'w', newline='')
+        self.w = csv.writer(self.f)
+        self.w.writerow(header)
+        super().__init__(block_records, n_buffers, flush_interval_s, rate_hz)
+
+    def _alloc(self) -> List:
+        return [None] * self.block
+
+    def _write(self, buf, n):
+        self.w.writerows(buf[:n])
+        self.f.flush()
+
+    def _close_output(self):
+        self.f.close()
+
+
+class AsyncTextLog(_AsyncLog):
+    """Status lines: the hot path appends a string, the thread prints it."""
+
+    def __init__(self, stream, block_records: int = 256, n_buffers: Optional[int] = None,
+                 flush_interval_s: float = 0.2, rate_hz: float = 1000.0):
+        self.stream = stream
+        super().__init__(block_records, n_buffers, flush_interval_s, rate_hz)
+
+    def _alloc(self) -> List:
+        return [None] * self.block
+
+    def _write(self, buf, n):
+        self.stream.write('\n'.join(buf[:n]) + '\n')
+        self.stream.flush()
+
+
+class AsyncPcapLog(_AsyncLog):
+    """Datagrams appended as (ts_ns, payload, src, dst); the thread frames and writes them in bulk."""
+
+    def __init__(self, path: str, block_records: int = 4096, n_buffers: Optional[int] = None,
+                 flush_interval_s: float = 1.0, rate_hz: float = DEFAULT_RATE_HZ):
+        d = os.path.dirname(path)
+        if d:
+            os.makedirs(d, exist_ok=True)
+        self.path = path
+        self.w = pcap.PcapWriter(path)
+        super().__init__(block_records, n_buffers, flush_interval_s, rate_hz)
+
+    def _alloc(self) -> List:
+        return [None] * self.block
+
+    def _write(self, buf, n):
+        self.w.write_many(buf[:n])
+        self.w.flush()
+
+    def _close_output(self):
+        self.w.close()
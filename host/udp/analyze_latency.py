@@ -2,55 +2,162 @@
 """
 Latency analysis script for neuro-hft-fpga system.
 Reads CSV log from test_lob_stream.py and generates statistics + plots.
+A .hist file (test_lob_stream.py --log-hist) gives the same summary and
+plots from HDR histograms; the time series uses its sampled rows. A .tlog
+(--log-bin / --log-format bin) is loaded with np.fromfile, or memory-mapped
+with --mmap, and derived vectorized.
+
+CSVs are parsed in chunks with np.loadtxt (empty cells become NaN, so
+columns stay row-aligned). Loaded data keeps one float64 value per reply in
+every column, NaN where a stamp or metric is missing; missing values are
+dropped only where a percentile, mean or plot is computed. --stream never
+holds the whole file: each chunk goes into HDR histograms plus every Nth raw
+row, and the .hist summary and plots are produced from those.
+
+If the run left a <log>.clock.json (PING clock sync, host/telemetry/clocksync.py),
+every record also gets clock-corrected one-way legs (uplink host->PYNQ,
+downlink PYNQ->host) instead of the network estimate by subtraction.
+--critical-path adds the per-packet leg / tail attribution report
+(host/telemetry/critical_path.py).
 """
 import argparse
-import csv
+import os
+import sys
 from pathlib import Path
 import numpy as np
-import matplotlib.pyplot as plt
-import matplotlib
-matplotlib.use('Agg')  # Non-interactive backend
-
-
-def load_latency_data(csv_path):
-    """Load latency CSV and return as numpy arrays."""
-    data = {
-        'seq': [], 't1_host_ns': [], 't5_host_ns': [], 'rtt_ns': [],
-        't2_pynq_ns': [], 't3_pynq_ns': [], 't4_pynq_ns': [], 
-        't5_pynq_ns': [], 't6_pynq_ns': [],
-        'pynq_total_ns': [], 'dma_ns': [], 'net_est_ns': [],
-        'ofi': [], 'imb_q15': [], 'burst_q16': [], 'vol_q16': []
-    }
-    
-    with open(csv_path, 'r') as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            for key in data.keys():
-                val = row.get(key)
-                if val == '' or val is None:
-                    data[key].append(None)
-                else:
-                    try:
-                        data[key].append(int(val) if key in ['seq', 'ofi', 'imb_q15', 'burst_q16', 'vol_q16'] or '_ns' in key else float(val))
-                    except:
-                        data[key].append(None)
-    
-    # Convert to numpy arrays, filtering out None values for numeric fields
-    result = {}
-    for key, values in data.items():
-        if key in ['seq', 'ofi', 'imb_q15', 'burst_q16', 'vol_q16']:
-            result[key] = np.array([v for v in values if v is not None])
-        else:
-            result[key] = np.array([v for v in values if v is not None], dtype=np.float64)
-    
-    return result
+try:
+    import matplotlib
+    matplotlib.use('Agg')  # Non-interactive backend
+    import matplotlib.pyplot as plt
+except Exception:   # loading and summaries still work (tests, headless boxes); plots need matplotlib
+    plt = None
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+from host.telemetry import clocksync, critical_path
+from host.telemetry.clocksync import cycles_to_ns
+from host.telemetry.binlog import FLAG_REPLY, read_binlog
+from host.telemetry.csvchunks import CHUNK_ROWS, read_csv_chunks
+from host.telemetry.histogram import MISSING, LatencyRecorder
+
+HIST_SECTIONS = [
+    ('rtt_ns', 'Round-Trip Time (RTT)', [50, 90, 95, 99, 99.9]),
+    ('pynq_total_ns', 'PYNQ Total Processing Time', [50, 90, 95, 99]),
+    ('dma_ns', 'DMA Processing Time (including PL)', [50, 90, 95, 99]),
+    ('net_est_ns', 'Network Time (estimated by subtraction)', [50, 90, 95, 99]),
+    ('uplink_ns', 'Uplink host->PYNQ (clock-corrected)', [50, 90, 99]),
+    ('downlink_ns', 'Downlink PYNQ->host (clock-corrected)', [50, 90, 99]),
+]
+CLOCK_FIELDS = ('uplink_ns', 'downlink_ns')
+
+
+CSV_COLUMNS = ['seq', 't1_host_ns', 't5_host_ns', 'rtt_ns',
+               't2_pynq_ns', 't3_pynq_ns', 't4_pynq_ns', 't5_pynq_ns', 't6_pynq_ns',
+               'pynq_total_ns', 'dma_ns', 'net_est_ns',
+               'ofi', 'imb_q15', 'burst_q16', 'vol_q16']
+
+
+def present(v):
+    """The non-missing values of a row-aligned column."""
+    v = np.asarray(v, dtype=np.float64)
+    return v[~np.isnan(v)]
+
+
+def load_latency_data(csv_path, chunk_rows=CHUNK_ROWS):
+    """
+    Load a latency CSV as row-aligned float64 columns: one entry per logged
+    reply in every column, NaN where the cell was empty.
+    """
+    parts = {c: [] for c in CSV_COLUMNS}
+    for chunk in read_csv_chunks(csv_path, CSV_COLUMNS, chunk_rows):
+        for c, v in chunk.items():
+            parts[c].append(v)
+    data = {c: np.concatenate(v) if v else np.zeros(0) for c, v in parts.items()}
+    clock = clocksync.load_for(csv_path)
+    if clock is not None:
+        add_clock_legs(data, clock)
+    return data
+
+
+def stream_latency_csv(csv_path, chunk_rows=CHUNK_ROWS, sample_every=100):
+    """
+    Bounded-memory load for multi-GB CSVs: HDR histograms of the HIST_SECTIONS
+    metrics plus every sample_every-th (seq, rtt) row, as a LatencyRecorder
+    (same summary and plots as a .hist file).
+    """
+    clock = clocksync.load_for(csv_path)
+    fields = [name for name, _, _ in HIST_SECTIONS if clock is not None or name not in CLOCK_FIELDS]
+    rec = LatencyRecorder(fields, sample_every, ['seq', 'rtt_ns'], meta={'source': str(csv_path)})
+    for chunk in read_csv_chunks(csv_path, CSV_COLUMNS, chunk_rows):
+        if clock is not None:
+            quad = [chunk[k] for k in ('t1_host_ns', 't2_pynq_ns', 't6_pynq_ns', 't5_host_ns')]
+            ok = np.logical_and.reduce([q > 0 for q in quad])
+            up, _, down = clock.legs(*(q[ok] for q in quad))
+            chunk['uplink_ns'], chunk['downlink_ns'] = up, down
+        for name in fields:
+            v = chunk[name]
+            rec.hist[name].record_many(v[~np.isnan(v)].astype(np.int64))
+        n = len(chunk['rtt_ns'])
+        if sample_every:
+            idx = np.arange(-rec.n_rows % sample_every, n, sample_every)
+            rows = np.column_stack([chunk['seq'][idx], chunk['rtt_ns'][idx]])
+            rec.samples.extend(np.where(np.isnan(rows), MISSING, rows).astype(np.int64).ravel().tolist())
+        rec.n_rows += n
+    return rec
+
+
+def add_clock_legs(data, clock):
+    """
+    Row-aligned uplink_ns / downlink_ns from a clocksync.ClockModel, NaN where
+    the reply lacks one of the four stamps (t1, t2, t6, host receive).
+    """
+    quad = [data[k] for k in ('t1_host_ns', 't2_pynq_ns', 't6_pynq_ns', 't5_host_ns')]
+    ok = np.logical_and.reduce([q > 0 for q in quad])   # NaN compares False
+    up, _, down = clock.legs(*(q[ok] for q in quad))
+    for key, leg in (('uplink_ns', up), ('downlink_ns', down)):
+        data[key] = np.full(len(ok), np.nan)
+        data[key][ok] = leg
+    data['clock'] = clock
+    print(f"  clock sync: offset error <= {clock.err_ns / 1000.0:.2f} µs, drift {clock.drift_ppm:.2f} ppm "
+          f"({clock.used} of {clock.samples} PINGs)")
+
+
+def load_latency_binlog(path, mmap=False):
+    """load_latency_data for a timing .tlog: same row-aligned keys (0 stamps become NaN), computed column-wise."""
+    hdr, rec = read_binlog(path, mmap=mmap, schema='timing')
+    rec = rec[(rec['flags'] & FLAG_REPLY) != 0]
+    data = {'seq': rec['seq'].astype(np.float64)}
+    for key in ('t1_host_ns', 't5_host_ns', 't2_pynq_ns', 't3_pynq_ns', 't4_pynq_ns', 't5_pynq_ns', 't6_pynq_ns'):
+        v = rec[key].astype(np.float64)
+        v[v == 0] = np.nan
+        data[key] = v
+    t1, t5, t2, t3, t5p, t6 = (data[k] for k in ('t1_host_ns', 't5_host_ns', 't2_pynq_ns', 't3_pynq_ns',
+                                                 't5_pynq_ns', 't6_pynq_ns'))
+    data['rtt_ns'] = t5 - t1
+    data['pynq_total_ns'] = t6 - t2
+    data['dma_ns'] = t5p - t3
+    data['net_est_ns'] = data['rtt_ns'] - data['pynq_total_ns']
+    if 'mlp_cycles' in rec.dtype.names:   # schema v2: fabric counters (msg_type 5)
+        has_fab = (rec['mlp_cycles'] != 0) & ~np.isnan(data['dma_ns'])
+        mlp = rec['mlp_cycles'].astype(np.float64)
+        feat = rec['feat_cycles'].astype(np.float64)
+        dbg = rec['feat_dbg_cycles'].astype(np.float64)
+        fabric = np.where(has_fab, cycles_to_ns(mlp), np.nan)
+        math_ns = np.where(has_fab, cycles_to_ns(dbg + np.maximum(mlp - feat, 0)), np.nan)
+        data['fabric_math_ns'] = math_ns
+        data['fabric_shell_ns'] = fabric - math_ns
+        data['ps_glue_ns'] = (t5p - t2) - fabric
+    clock = clocksync.load_for(path)
+    if clock is not None:
+        add_clock_legs(data, clock)
+    print(f"  {len(rec)} replies, schema v{hdr['schema_version']}, host clock {hdr['clocks'].get('host_clock')}")
+    return data
 
 
 def compute_percentiles(data_ns, percentiles=[50, 90, 95, 99, 99.9]):
-    """Compute percentiles for a latency metric in nanoseconds."""
+    """Compute percentiles for a latency metric in nanoseconds (one partition for all of them); NaN is skipped."""
+    data_ns = present(data_ns)
     if len(data_ns) == 0:
         return {p: None for p in percentiles}
-    return {p: np.percentile(data_ns, p) for p in percentiles}
+    return dict(zip(percentiles, np.percentile(data_ns, percentiles)))
 
 
 def print_latency_summary(data, outfile=None):
@@ -59,13 +166,13 @@ def print_latency_summary(data, outfile=None):
     lines.append("=" * 80)
     lines.append("LATENCY SUMMARY")
     lines.append("=" * 80)
-    lines.append(f"Total packets: {len(data['rtt_ns'])}")
+    rtt_us = present(data['rtt_ns']) / 1000.0
+    lines.append(f"Total packets: {len(rtt_us)}")
     lines.append("")
     
     # RTT statistics
-    if len(data['rtt_ns']) > 0:
+    if len(rtt_us) > 0:
         lines.append("Round-Trip Time (RTT):")
-        rtt_us = data['rtt_ns'] / 1000.0
         pcts = compute_percentiles(rtt_us, [50, 90, 95, 99, 99.9])
         lines.append(f"  p50:  {pcts[50]:.2f} µs")
         lines.append(f"  p90:  {pcts[90]:.2f} µs")
@@ -77,9 +184,9 @@ def print_latency_summary(data, outfile=None):
         lines.append("")
     
     # PYNQ processing time
-    if len(data['pynq_total_ns']) > 0 and data['pynq_total_ns'][0] is not None:
+    pynq_us = present(data['pynq_total_ns']) / 1000.0
+    if len(pynq_us) > 0:
         lines.append("PYNQ Total Processing Time:")
-        pynq_us = data['pynq_total_ns'] / 1000.0
         pcts = compute_percentiles(pynq_us, [50, 90, 95, 99])
         lines.append(f"  p50:  {pcts[50]:.2f} µs")
         lines.append(f"  p90:  {pcts[90]:.2f} µs")
@@ -89,9 +196,9 @@ def print_latency_summary(data, outfile=None):
         lines.append("")
     
     # DMA time
-    if len(data['dma_ns']) > 0 and data['dma_ns'][0] is not None:
+    dma_us = present(data['dma_ns']) / 1000.0
+    if len(dma_us) > 0:
         lines.append("DMA Processing Time (including PL):")
-        dma_us = data['dma_ns'] / 1000.0
         pcts = compute_percentiles(dma_us, [50, 90, 95, 99])
         lines.append(f"  p50:  {pcts[50]:.2f} µs")
         lines.append(f"  p90:  {pcts[90]:.2f} µs")
@@ -101,9 +208,9 @@ def print_latency_summary(data, outfile=None):
         lines.append("")
     
     # Network time estimate
-    if len(data['net_est_ns']) > 0 and data['net_est_ns'][0] is not None:
+    net_us = present(data['net_est_ns']) / 1000.0
+    if len(net_us) > 0:
         lines.append("Network Time (estimated by subtraction):")
-        net_us = data['net_est_ns'] / 1000.0
         pcts = compute_percentiles(net_us, [50, 90, 95, 99])
         lines.append(f"  p50:  {pcts[50]:.2f} µs")
         lines.append(f"  p90:  {pcts[90]:.2f} µs")
@@ -112,6 +219,30 @@ def print_latency_summary(data, outfile=None):
         lines.append(f"  mean: {np.mean(net_us):.2f} µs")
         lines.append("")
     
+    # Fabric cycle counters (schema v2 .tlog from --fabric-counters runs)
+    if len(present(data.get('ps_glue_ns', []))) > 0:
+        lines.append("PYNQ t2->t5 decomposition (fabric counters, 8 ns/cycle):")
+        for key, label in (('fabric_math_ns', 'fabric math '), ('fabric_shell_ns', 'fabric shell'),
+                           ('ps_glue_ns', 'PS glue     ')):
+            v_us = present(data[key]) / 1000.0
+            pcts = compute_percentiles(v_us, [50, 99])
+            lines.append(f"  {label}  p50: {pcts[50]:.2f} µs  p99: {pcts[99]:.2f} µs  "
+                         f"mean: {np.mean(v_us):.2f} µs")
+        lines.append("")
+
+    # Clock-corrected one-way legs (PING sync)
+    for key, title in (('uplink_ns', 'Uplink host->PYNQ (clock-corrected):'),
+                       ('downlink_ns', 'Downlink PYNQ->host (clock-corrected):')):
+        leg_us = present(data.get(key, [])) / 1000.0
+        if len(leg_us) > 0:
+            lines.append(title)
+            pcts = compute_percentiles(leg_us, [50, 90, 99])
+            lines.append(f"  p50:  {pcts[50]:.2f} µs")
+            lines.append(f"  p90:  {pcts[90]:.2f} µs")
+            lines.append(f"  p99:  {pcts[99]:.2f} µs")
+            lines.append(f"  mean: {np.mean(leg_us):.2f} µs  (offset error <= {data['clock'].err_ns / 1000.0:.2f} µs)")
+            lines.append("")
+
     lines.append("=" * 80)
     
     output = '\n'.join(lines)
@@ -125,12 +256,11 @@ def print_latency_summary(data, outfile=None):
 
 def plot_rtt_histogram(data, outdir):
     """Generate RTT histogram with percentile markers."""
-    if len(data['rtt_ns']) == 0:
+    rtt_us = present(data['rtt_ns']) / 1000.0
+    if len(rtt_us) == 0:
         print("No RTT data to plot")
         return
     
-    rtt_us = data['rtt_ns'] / 1000.0
-    
     fig, ax = plt.subplots(figsize=(10, 6))
     
     # Histogram
@@ -159,15 +289,15 @@ def plot_rtt_histogram(data, outdir):
 
 def plot_latency_breakdown(data, outdir):
     """Generate stacked bar chart showing latency breakdown."""
-    if len(data['pynq_total_ns']) == 0 or data['pynq_total_ns'][0] is None:
+    if len(present(data['pynq_total_ns'])) == 0:
         print("No PYNQ timing data for breakdown plot")
         return
     
     # Compute mean times in microseconds
-    rtt_mean = np.mean(data['rtt_ns']) / 1000.0
-    pynq_mean = np.mean(data['pynq_total_ns']) / 1000.0
-    dma_mean = np.mean(data['dma_ns']) / 1000.0
-    net_mean = np.mean(data['net_est_ns']) / 1000.0
+    rtt_mean = np.nanmean(data['rtt_ns']) / 1000.0
+    pynq_mean = np.nanmean(data['pynq_total_ns']) / 1000.0
+    dma_mean = np.nanmean(data['dma_ns']) / 1000.0 if len(present(data['dma_ns'])) else 0.0
+    net_mean = np.nanmean(data['net_est_ns']) / 1000.0
     
     # Breakdown components
     pynq_overhead = pynq_mean - dma_mean  # Python processing time on PYNQ
@@ -183,9 +313,17 @@ def plot_latency_breakdown(data, outdir):
     x = np.arange(len(categories))
     width = 0.5
     
-    p1 = ax.bar(x, network, width, label=f'Network (~{net_mean:.1f} µs)', color='lightcoral')
-    p2 = ax.bar(x, pynq_proc, width, bottom=network, label=f'PYNQ Overhead (~{pynq_overhead:.1f} µs)', color='lightskyblue')
-    p3 = ax.bar(x, dma_pl, width, bottom=np.array(network)+np.array(pynq_proc), label=f'DMA+PL (~{dma_mean:.1f} µs)', color='lightgreen')
+    if len(present(data.get('uplink_ns', []))) > 0:
+        # Clock-corrected: split the network share into its two legs
+        up_mean = np.nanmean(data['uplink_ns']) / 1000.0
+        down_mean = np.nanmean(data['downlink_ns']) / 1000.0
+        ax.bar(x, [up_mean], width, label=f'Uplink (~{up_mean:.1f} µs)', color='lightcoral')
+        ax.bar(x, [down_mean], width, bottom=[up_mean], label=f'Downlink (~{down_mean:.1f} µs)', color='salmon')
+        network = [up_mean + down_mean]
+    else:
+        ax.bar(x, network, width, label=f'Network (~{net_mean:.1f} µs)', color='lightcoral')
+    ax.bar(x, pynq_proc, width, bottom=network, label=f'PYNQ Overhead (~{pynq_overhead:.1f} µs)', color='lightskyblue')
+    ax.bar(x, dma_pl, width, bottom=np.array(network)+np.array(pynq_proc), label=f'DMA+PL (~{dma_mean:.1f} µs)', color='lightgreen')
     
     ax.set_ylabel('Latency (µs)', fontsize=12)
     ax.set_title(f'Latency Breakdown (Total RTT: {rtt_mean:.1f} µs)', fontsize=14, fontweight='bold')
@@ -203,12 +341,13 @@ def plot_latency_breakdown(data, outdir):
 
 def plot_time_series(data, outdir):
     """Generate time series plot of RTT over packet sequence."""
-    if len(data['rtt_ns']) == 0:
+    has_rtt = ~np.isnan(data['rtt_ns'])   # seq and rtt are row-aligned: mask both
+    if not has_rtt.any():
         print("No RTT data for time series")
         return
     
-    rtt_us = data['rtt_ns'] / 1000.0
-    seq = data['seq']
+    rtt_us = data['rtt_ns'][has_rtt] / 1000.0
+    seq = data['seq'][has_rtt]
     
     fig, ax = plt.subplots(figsize=(12, 6))
     
@@ -234,11 +373,10 @@ def plot_time_series(data, outdir):
 
 def plot_latency_cdf(data, outdir):
     """Generate cumulative distribution function plot for RTT."""
-    if len(data['rtt_ns']) == 0:
+    rtt_us = present(data['rtt_ns']) / 1000.0
+    if len(rtt_us) == 0:
         print("No RTT data for CDF plot")
         return
-    
-    rtt_us = data['rtt_ns'] / 1000.0
     sorted_rtt = np.sort(rtt_us)
     cdf = np.arange(1, len(sorted_rtt) + 1) / len(sorted_rtt)
     
@@ -264,31 +402,187 @@ def plot_latency_cdf(data, outdir):
     print(f"Saved: {outfile}")
 
 
+def print_hist_summary(rec, outfile=None):
+    """print_latency_summary for a LatencyRecorder."""
+    rtt = rec.hist.get('rtt_ns')
+    lines = ["=" * 80, "LATENCY SUMMARY (HDR histograms)", "=" * 80,
+             f"Total packets: {rtt.total if rtt else rec.n_rows}", ""]
+    for name, title, qs in HIST_SECTIONS:
+        h = rec.hist.get(name)
+        if h is None or h.total == 0:
+            continue
+        lines.append(f"{title}:")
+        for q, v in zip(qs, h.percentiles(qs)):
+            label = f"p{int(q)}" if q == int(q) else "p999"
+            lines.append(f"  {label + ':':<6}{v / 1000.0:.2f} µs")
+        lines.append(f"  mean: {h.mean() / 1000.0:.2f} µs")
+        if name == 'rtt_ns':
+            lines.append(f"  std:  {h.stddev() / 1000.0:.2f} µs")
+            lines.append(f"  max:  {h.max / 1000.0:.2f} µs")
+        lines.append("")
+    lines.append("=" * 80)
+
+    output = '\n'.join(lines)
+    print(output)
+    if outfile:
+        with open(outfile, 'w') as f:
+            f.write(output)
+        print(f"\nSummary written to {outfile}")
+
+
+def _bucket_arrays(h):
+    b = h.buckets()
+    lo = np.array([x[0] for x in b], dtype=np.float64)
+    hi = np.array([x[1] for x in b], dtype=np.float64)
+    cnt = np.array([x[2] for x in b], dtype=np.float64)
+    return lo, hi, cnt
+
+
+def plot_hist_files(rec, outdir):
+    """rtt_histogram / latency_breakdown / rtt_timeseries / rtt_cdf from a LatencyRecorder."""
+    h = rec.hist.get('rtt_ns')
+    if h is None or h.total == 0:
+        print("No RTT data to plot")
+        return
+    lo, hi, cnt = _bucket_arrays(h)
+    mid_us = (lo + hi) / 2000.0
+    p50, p99, p999 = (v / 1000.0 for v in h.percentiles([50, 99, 99.9]))
+
+    fig, ax = plt.subplots(figsize=(10, 6))
+    ax.hist(mid_us, bins=50, weights=cnt, alpha=0.7, color='steelblue', edgecolor='black')
+    for val, color, label in ((p50, 'green', 'p50'), (p99, 'orange', 'p99'), (p999, 'red', 'p99.9')):
+        ax.axvline(val, color=color, linestyle='--', linewidth=2, label=f'{label}: {val:.2f} µs')
+    ax.set_xlabel('Round-Trip Time (µs)', fontsize=12)
+    ax.set_ylabel('Count', fontsize=12)
+    ax.set_title('RTT Histogram with Percentiles', fontsize=14, fontweight='bold')
+    ax.legend()
+    ax.grid(True, alpha=0.3)
+    outfile = Path(outdir) / 'rtt_histogram.png'
+    plt.tight_layout()
+    plt.savefig(outfile, dpi=150)
+    plt.close()
+    print(f"Saved: {outfile}")
+
+    fig, ax = plt.subplots(figsize=(10, 6))
+    ax.step(hi / 1000.0, np.cumsum(cnt) / h.total * 100, where='post', linewidth=2, color='steelblue')
+    for q, val in zip([50, 90, 95, 99, 99.9], h.percentiles([50, 90, 95, 99, 99.9])):
+        ax.plot(val / 1000.0, q, 'ro', markersize=6)
+        ax.text(val / 1000.0, q + 1, f'p{int(q) if q == int(q) else q}', fontsize=9)
+    ax.set_xlabel('Round-Trip Time (µs)', fontsize=12)
+    ax.set_ylabel('Cumulative Probability (%)', fontsize=12)
+    ax.set_title('RTT Cumulative Distribution Function', fontsize=14, fontweight='bold')
+    ax.grid(True, alpha=0.3)
+    outfile = Path(outdir) / 'rtt_cdf.png'
+    plt.tight_layout()
+    plt.savefig(outfile, dpi=150)
+    plt.close()
+    print(f"Saved: {outfile}")
+
+    parts = {k: rec.hist[k] for k in ('pynq_total_ns', 'dma_ns', 'net_est_ns') if k in rec.hist}
+    if len(parts) == 3 and all(p.total for p in parts.values()):
+        net, pynq, dma = (parts[k].mean() / 1000.0 for k in ('net_est_ns', 'pynq_total_ns', 'dma_ns'))
+        fig, ax = plt.subplots(figsize=(10, 6))
+        ax.bar([0], [net], 0.5, label=f'Network (~{net:.1f} µs)', color='lightcoral')
+        ax.bar([0], [pynq - dma], 0.5, bottom=[net], label=f'PYNQ Overhead (~{pynq - dma:.1f} µs)',
+               color='lightskyblue')
+        ax.bar([0], [dma], 0.5, bottom=[net + pynq - dma], label=f'DMA+PL (~{dma:.1f} µs)', color='lightgreen')
+        ax.set_ylabel('Latency (µs)', fontsize=12)
+        ax.set_title(f'Latency Breakdown (Total RTT: {h.mean() / 1000.0:.1f} µs)', fontsize=14, fontweight='bold')
+        ax.set_xticks([0])
+        ax.set_xticklabels(['End-to-End'])
+        ax.legend()
+        ax.grid(True, axis='y', alpha=0.3)
+        outfile = Path(outdir) / 'latency_breakdown.png'
+        plt.tight_layout()
+        plt.savefig(outfile, dpi=150)
+        plt.close()
+        print(f"Saved: {outfile}")
+    else:
+        print("No PYNQ timing data for breakdown plot")
+
+    rows = rec.sampled_rows()
+    pts = [(s, r) for s, r in zip(rows.get('seq', []), rows.get('rtt_ns', [])) if s is not None and r is not None]
+    if not pts:
+        print("No sampled rows for time series")
+        return
+    fig, ax = plt.subplots(figsize=(12, 6))
+    ax.plot([s for s, _ in pts], [r / 1000.0 for _, r in pts], linewidth=0.5, alpha=0.7, color='steelblue')
+    ax.axhline(p50, color='green', linestyle='--', linewidth=1, label=f'p50: {p50:.2f} µs', alpha=0.7)
+    ax.axhline(p99, color='red', linestyle='--', linewidth=1, label=f'p99: {p99:.2f} µs', alpha=0.7)
+    ax.set_xlabel('Packet Sequence Number', fontsize=12)
+    ax.set_ylabel('Round-Trip Time (µs)', fontsize=12)
+    ax.set_title(f'RTT Time Series (1 in {rec.sample_every} packets)', fontsize=14, fontweight='bold')
+    ax.grid(True, alpha=0.3)
+    ax.legend()
+    outfile = Path(outdir) / 'rtt_timeseries.png'
+    plt.tight_layout()
+    plt.savefig(outfile, dpi=150)
+    plt.close()
+    print(f"Saved: {outfile}")
+
+
 def main():
     parser = argparse.ArgumentParser(description='Analyze latency measurements from test_lob_stream.py')
-    parser.add_argument('csv_file', type=str, help='CSV file with latency data')
+    parser.add_argument('csv_file', type=str, help='CSV file with latency data (or .hist / .tlog)')
+    parser.add_argument('--mmap', action='store_true', help='.tlog: memory-map instead of reading the file')
+    parser.add_argument('--stream', action='store_true',
+                        help='CSV: bounded memory (HDR histograms + sampled rows), for multi-GB soak logs')
+    parser.add_argument('--chunk-rows', type=int, default=CHUNK_ROWS, help='CSV rows parsed per chunk')
+    parser.add_argument('--sample-every', type=int, default=100, help='--stream: keep every Nth row for the time series')
     parser.add_argument('--outdir', type=str, default='.', help='Output directory for plots and summary')
     parser.add_argument('--summary', type=str, default='summary.txt', help='Summary filename (saved in outdir)')
+    parser.add_argument('--critical-path', action='store_true',
+                        help='Per-packet leg decomposition, tail attribution and stall periodicity '
+                             '(critical_path.txt in outdir; not with .hist / --stream)')
     args = parser.parse_args()
     
     # Create output directory
     outdir = Path(args.outdir)
     outdir.mkdir(parents=True, exist_ok=True)
     
+    summary_path = outdir / args.summary if args.summary else None
+    if args.csv_file.endswith('.hist') or args.stream:
+        print(f"Loading histograms from {args.csv_file}...")
+        if args.csv_file.endswith('.hist'):
+            rec = LatencyRecorder.load(args.csv_file)
+        else:
+            rec = stream_latency_csv(args.csv_file, args.chunk_rows, args.sample_every)
+        print_hist_summary(rec, summary_path)
+        if plt is None:
+            print("\nmatplotlib not installed: skipping plots")
+            return
+        print("\nGenerating plots...")
+        plot_hist_files(rec, outdir)
+        print(f"\nAnalysis complete! Plots saved to {outdir}/")
+        return
+
     # Load data
     print(f"Loading data from {args.csv_file}...")
-    data = load_latency_data(args.csv_file)
+    if args.csv_file.endswith('.tlog'):
+        data = load_latency_binlog(args.csv_file, mmap=args.mmap)
+    else:
+        data = load_latency_data(args.csv_file, args.chunk_rows)
     
     # Print summary (place in output directory)
-    summary_path = outdir / args.summary if args.summary else None
     print_latency_summary(data, summary_path)
     
     # Generate plots
-    print("\nGenerating plots...")
-    plot_rtt_histogram(data, outdir)
-    plot_latency_breakdown(data, outdir)
-    plot_time_series(data, outdir)
-    plot_latency_cdf(data, outdir)
+    if plt is None:
+        print("\nmatplotlib not installed: skipping plots")
+    else:
+        print("\nGenerating plots...")
+        plot_rtt_histogram(data, outdir)
+        plot_latency_breakdown(data, outdir)
+        plot_time_series(data, outdir)
+        plot_latency_cdf(data, outdir)
+
+    if args.critical_path:
+        clock = clocksync.load_for(args.csv_file)
+        legs, rtt, t_send = critical_path.packet_legs(critical_path.load_stamps(args.csv_file), clock)
+        text = critical_path.report(legs, rtt, t_send, clock=clock)
+        print("\n" + text)
+        with open(outdir / 'critical_path.txt', 'w') as f:
+            f.write(text + '\n')
     
     print(f"\nAnalysis complete! Plots saved to {outdir}/")
 
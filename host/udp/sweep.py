@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""
+Offered-load sweep against the echo server; stops at the saturation knee.
+
+Load ramps geometrically (--start-pps * --factor^k). Each step runs the
+pooled sendmmsg generator (host/client/generator.py) for --step-s seconds
+and records RTT percentiles and loss. With --kpi-cmd, the echo server's KPI
+line (feature_echo_mt.py: "KPI rx=.. tx=.. fallbacks=.. timeouts=.. errors=..")
+is read before and after each step and the counter deltas go in the table;
+--kpi-udp reads the same counters from the server's metrics endpoint instead.
+
+A step fails when loss > --max-loss-pct, achieved rate < --min-achieved of
+offered, or p99 exceeds both --p99-factor x the first step's p99 and
+--p99-floor-us. The knee is the last passing step; the sweep stops after
+--fail-steps consecutive failures.
+
+Writes one combined CSV (--out) and a throughput-vs-p99 plot next to it
+(when matplotlib is available).
+
+  python3 host/udp/sweep.py --start-pps 1000 --max-pps 500000 \\
+      --kpi-cmd "ssh xilinx@192.168.10.2 'grep KPI /tmp/feature_echo.log | tail -n 1'"
+"""
+import argparse
+import csv
+import os
+import re
+import socket
+import subprocess
+import sys
+import time
+from pathlib import Path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from host.client.core import deltas_packet
+from host.client.generator import PacketPool, run_generator
+from host.telemetry.metrics import parse_addr, query_udp
+
+try:
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+except Exception:
+    plt = None
+
+KPI_RE = re.compile(r'(\w+)=(\d+)')
+KPI_FIELDS = ('rx', 'tx', 'pl_done', 'fallbacks', 'timeouts', 'errors')
+# metrics endpoint counter -> KPI line name
+KPI_COUNTERS = {'rx_pkts': 'rx', 'tx_pkts': 'tx', 'pl_done': 'pl_done', 'pl_fallbacks': 'fallbacks',
+                'pl_timeouts': 'timeouts', 'pl_errors': 'errors'}
+COLUMNS = ['offered_pps', 'achieved_pps', 'sent', 'replies', 'loss_pct',
+           'p50_us', 'p90_us', 'p99_us', 'p999_us', 'max_us', 'late_bursts', 'local_drops',
+           'kpi_rx', 'kpi_tx', 'kpi_pl_done', 'kpi_fallbacks', 'kpi_timeouts', 'kpi_errors', 'status']
+
+
+def read_kpi(cmd):
+    """Counters from the last KPI line printed by cmd (empty dict if none)."""
+    if not cmd:
+        return {}
+    try:
+        out = subprocess.run(cmd, shell=True, capture_output=True, text=True, timeout=10).stdout
+    except subprocess.TimeoutExpired:
+        return {}
+    lines = [l for l in out.splitlines() if 'KPI' in l]
+    if not lines:
+        return {}
+    return {k: int(v) for k, v in KPI_RE.findall(lines[-1])}
+
+
+def read_kpi_udp(addr):
+    """KPI counters from the echo server's metrics UDP endpoint (empty dict if it does not answer)."""
+    if addr is None:
+        return {}
+    try:
+        counters = query_udp(addr)['counters']
+    except (OSError, ValueError, KeyError):
+        return {}
+    return {KPI_COUNTERS[k]: v for k, v in counters.items() if k in KPI_COUNTERS}
+
+
+def kpi_delta(before, after):
+    return {k: (after[k] - before.get(k, 0)) if k in after else '' for k in KPI_FIELDS}
+
+
+def step_status(row, base_p99_us, args):
+    if row['loss_pct'] > args.max_loss_pct:
+        return 'loss'
+    if row['achieved_pps'] < args.min_achieved * row['offered_pps']:
+        return 'rate'
+    if base_p99_us and row['p99_us'] > max(args.p99_factor * base_p99_us, args.p99_floor_us):
+        return 'p99'
+    return 'ok'
+
+
+def knee(rows):
+    """Last passing step before the first failure (None if the first step already failed)."""
+    best = None
+    for r in rows:
+        if r['status'] != 'ok':
+            break
+        best = r
+    return best
+
+
+def plot(rows, path):
+    if plt is None:
+        return False
+    fig, ax = plt.subplots(figsize=(8, 5))
+    x = [r['achieved_pps'] for r in rows]
+    ax.plot(x, [r['p99_us'] for r in rows], 'o-', label='p99')
+    ax.plot(x, [r['p50_us'] for r in rows], 's--', alpha=0.6, label='p50')
+    k = knee(rows)
+    if k:
+        ax.axvline(k['achieved_pps'], color='r', ls=':', label=f"knee {k['achieved_pps']:.0f} pps")
+    ax.set_xscale('log')
+    ax.set_yscale('log')
+    ax.set_xlabel('Achieved throughput (pps)')
+    ax.set_ylabel('RTT (us)')
+    ax.set_title('Throughput vs latency')
+    ax.grid(True, which='both', alpha=0.3)
+    ax.legend()
+    fig.tight_layout()
+    fig.savefig(path, dpi=120)
+    plt.close(fig)
+    return True
+
+
+def main():
+    ap = argparse.ArgumentParser(description='Sweep offered load and find the throughput/latency knee')
+    ap.add_argument('--start-pps', type=float, default=1000.0)
+    ap.add_argument('--factor', type=float, default=1.5, help='Geometric step between loads')
+    ap.add_argument('--max-pps', type=float, default=1_000_000.0)
+    ap.add_argument('--step-s', type=float, default=5.0, help='Duration of each step')
+    ap.add_argument('--gap-s', type=float, default=1.0, help='Idle time between steps')
+    ap.add_argument('--batch', type=int, default=32, help='Max packets per sendmmsg burst')
+    ap.add_argument('--max-loss-pct', type=float, default=1.0)
+    ap.add_argument('--min-achieved', type=float, default=0.95, help='Fraction of offered load that must be sent')
+    ap.add_argument('--p99-factor', type=float, default=5.0, help='p99 blow-up vs first step that marks the knee')
+    ap.add_argument('--p99-floor-us', type=float, default=1000.0, help='Never flag p99 below this')
+    ap.add_argument('--fail-steps', type=int, default=2, help='Consecutive failing steps before stopping')
+    ap.add_argument('--kpi-cmd', type=str, default='', help='Shell command printing the echo server KPI line(s)')
+    ap.add_argument('--kpi-udp', type=str, default='', help='Echo server metrics endpoint HOST:PORT (e.g. 192.168.10.2:9101)')
+    ap.add_argument('--drain-ms', type=float, default=200.0)
+    ap.add_argument('--bind', type=str, default='192.168.10.1')
+    ap.add_argument('--port', type=int, default=4001)
+    ap.add_argument('--ip', type=str, default='192.168.10.2')
+    ap.add_argument('--dst-port', type=int, default=4000)
+    ap.add_argument('--out', type=str, default='latency_analysis/sweep.csv')
+    args = ap.parse_args()
+
+    pool = PacketPool([deltas_packet([(100000 + (i % 64), 100, 0, 0, 1)]) for i in range(4096)])
+    s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    s.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, 8 << 20)
+    s.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 8 << 20)
+    s.bind((args.bind, args.port))
+    dst = (args.ip, args.dst_port)
+    kpi_addr = parse_addr(args.kpi_udp) if args.kpi_udp else None
+
+    rows = []
+    base_p99 = None
+    fails = 0
+    seq0 = 0
+    pps = args.start_pps
+    print(f"{'offered':>10} {'achieved':>10} {'loss%':>7} {'p50us':>8} {'p99us':>8} {'p99.9us':>8} "
+          f"{'fallbk':>7} {'tmo':>5}  status")
+    while pps <= args.max_pps:
+        count = max(1, int(pps * args.step_s))
+        # ~1 burst per ms at most: low rates stay smooth, high rates amortize the syscall
+        batch = max(1, min(args.batch, int(pps // 1000)))
+        before = read_kpi_udp(kpi_addr) or read_kpi(args.kpi_cmd)
+        res = run_generator(s, dst, pool, pps, count, batch=batch, drain_s=args.drain_ms / 1e3, seq0=seq0)
+        after = read_kpi_udp(kpi_addr) or read_kpi(args.kpi_cmd)
+        seq0 = (seq0 + count) & 0xFFFFFFFF
+        row = {'offered_pps': round(pps, 1), 'achieved_pps': round(res.achieved_pps, 1), 'sent': res.sent,
+               'replies': res.replies, 'loss_pct': round(100.0 * res.lost / max(res.sent, 1), 3),
+               'p50_us': res.pct(.5) / 1e3, 'p90_us': res.pct(.9) / 1e3, 'p99_us': res.pct(.99) / 1e3,
+               'p999_us': res.pct(.999) / 1e3, 'max_us': res.rtt.max / 1e3,
+               'late_bursts': res.late_bursts, 'local_drops': res.dropped_local}
+        row.update({f'kpi_{k}': v for k, v in kpi_delta(before, after).items()})
+        if base_p99 is None and res.rtt.total:
+            base_p99 = row['p99_us']
+        row['status'] = step_status(row, base_p99, args)
+        rows.append(row)
+        print(f"{row['offered_pps']:>10.0f} {row['achieved_pps']:>10.0f} {row['loss_pct']:>7.2f} "
+              f"{row['p50_us']:>8.1f} {row['p99_us']:>8.1f} {row['p999_us']:>8.1f} "
+              f"{str(row['kpi_fallbacks']):>7} {str(row['kpi_timeouts']):>5}  {row['status']}")
+        fails = fails + 1 if row['status'] != 'ok' else 0
+        if fails >= args.fail_steps:
+            break
+        pps *= args.factor
+        time.sleep(args.gap_s)
+    s.close()
+
+    out = Path(args.out)
+    out.parent.mkdir(parents=True, exist_ok=True)
+    with open(out, 'w', newline='') as f:
+        w = csv.DictWriter(f, fieldnames=COLUMNS)
+        w.writeheader()
+        w.writerows(rows)
+    print(f"\nTable: {out}")
+    if plot(rows, out.with_suffix('.png')):
+        print(f"Curve: {out.with_suffix('.png')}")
+    k = knee(rows)
+    if k:
+        print(f"Knee: {k['achieved_pps']:.0f} pps (offered {k['offered_pps']:.0f}) "
+              f"p99={k['p99_us']:.1f}us loss={k['loss_pct']:.2f}%")
+    else:
+        print("Knee: not found (first step already failed; lower --start-pps)")
+
+
+if __name__ == '__main__':
+    main()
@@ -5,161 +5,149 @@ No retransmits, no connected socket - just clean send/receive.
 Includes latency measurement with nanosecond precision.
 """
 import argparse
-import csv
+import os
 import socket
-import struct
-import time
 import sys
+import time
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from host.client import decoders, sources
+from host.client.core import add_net_args, client_from_args, deltas_packet, run_client
+from host.client.generator import PacketPool, run_generator
+from host.client.sinks import BinLogSink, CallbackSink, CsvSink, HistogramSink, ProgressSink
+from host.telemetry import clocksync, rt
+from host.telemetry.histogram import LatencyRecorder
+
+def apply_rt(args):
+    """Pin / prioritize the send-receive loop; placement saved as <log>.rt.json."""
+    try:
+        rt.apply_from_args(args, log_path=args.log_csv or args.log_bin or args.log_hist)
+    except RuntimeError as e:
+        sys.exit(f"CPU isolation check failed: {e}")
+
+def run_gen(args):
+    # --pps 0 (max rate) without --max-packets runs for --duration-s
+    count = args.max_packets or (max(1, int(args.pps * args.duration_s)) if args.pps > 0 else None)
+    if args.pcap:
+        print("--pcap is not supported with --gen (capture on the echo server with feature_echo_mt.py --pcap)")
+    # Same single-delta packet as the paced mode, cycling the price so the book moves
+    pool = PacketPool([deltas_packet([(100000 + (i % 64), 100, 0, 0, 1)]) for i in range(args.pool)])
+    s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    s.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, 8 << 20)
+    s.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 8 << 20)
+    s.bind((args.bind, args.port))
+    what = f"{count} packets" if count is not None else f"{args.duration_s:g}s"
+    print(f"Generator: {what} at {args.pps or 'max'} pps, batch={args.batch} to {(args.ip, args.dst_port)}")
+    res = run_generator(s, (args.ip, args.dst_port), pool, args.pps, count, batch=args.batch,
+                        drain_s=args.timeout_ms / 1e3, duration_s=args.duration_s if count is None else 0.0)
+    s.close()
+    print(res.summary())
+    if args.log_hist:
+        rec = LatencyRecorder(['rtt_ns'], meta={'mode': 'gen', 'pps': args.pps, 'batch': args.batch})
+        rec.hist['rtt_ns'].merge(res.rtt)
+        rec.save(args.log_hist)
+        print(f"RTT histogram written to {args.log_hist}")
+    return res
 
 def main():
     parser = argparse.ArgumentParser(description='Stream LOB packets and measure latency')
     parser.add_argument('pps', type=float, help='Packets per second')
     parser.add_argument('--log-csv', type=str, help='CSV file to log latency data')
+    parser.add_argument('--log-hist', type=str,
+                        help='.hist file: HDR histograms of rtt/pynq/dma/net + every --sample-every-th row')
+    parser.add_argument('--log-bin', type=str, help='.tlog file: fixed-size T1..T6 records (host/telemetry/binlog.py)')
+    parser.add_argument('--sample-every', type=int, default=100, help='--log-hist: raw row sampling (0 = none)')
+    parser.add_argument('--sync-ms', type=float, default=0.0,
+                        help='Interleave a clock-sync PING this often, e.g. 100 (default off: the traffic is '
+                             'the deltas alone); model saved as <log>.clock.json')
     parser.add_argument('--max-packets', type=int, help='Stop after N packets')
+    parser.add_argument('--gen', action='store_true',
+                        help='High-rate generator: pre-encoded pool, sendmmsg bursts, busy-wait pacing')
+    parser.add_argument('--batch', type=int, default=32, help='--gen: packets per sendmmsg burst')
+    parser.add_argument('--pool', type=int, default=4096, help='--gen: pre-encoded packets (cycled)')
+    parser.add_argument('--duration-s', type=float, default=10.0, help='--gen: run length when --max-packets is not set')
+    add_net_args(parser, port=4001, timeout_ms=1000.0, max_inflight=1024)
+    rt.add_rt_args(parser)
     args = parser.parse_args()
-    
-    pps = args.pps
-    interval = 1.0 / pps if pps > 0 else 0
-    
-    # Setup CSV logging if requested
-    csv_file = None
-    csv_writer = None
+
+    if args.gen:
+        apply_rt(args)
+        return run_gen(args)
+
+    counts = {'feat': 0, 'ping': 0}
+
+    def count_features(req, reply):
+        if reply.fields['msg_type'] in decoders.FEATURE_REPLIES:  # FEATURES, _WITH_TIMING, _WITH_FABRIC
+            counts['feat'] += 1
+
+    def count_pings(req):
+        if req.meta.get('ping'):
+            counts['ping'] += 1
+
+    def row(req, reply):
+        if reply.fields['msg_type'] not in decoders.FEATURE_REPLIES:
+            return None
+        f = reply.fields
+        rtt_ns = reply.t_recv - req.t_send
+        t2, t3, t4, t5_pynq, t6, t_reflex = (f.get(k) for k in ('t2', 't3', 't4', 't5', 't6', 't_reflex'))
+        # Derived metrics
+        pynq_total = (t6 - t2) if (t6 and t2) else None
+        dma_time = (t5_pynq - t3) if (t5_pynq and t3) else None
+        net_est = (rtt_ns - pynq_total) if pynq_total else None
+        return [req.seq, req.t_send, reply.t_recv, rtt_ns,
+                t2, t3, t4, t5_pynq, t6, t_reflex,
+                pynq_total, dma_time, net_est,
+                f.get('ofi'), f.get('imb'), f.get('burst'), f.get('vol')]
+
+    sinks = [CallbackSink(on_send=count_pings, on_reply=count_features), ProgressSink(1.0)]
+    header = ['seq', 't1_host_ns', 't5_host_ns', 'rtt_ns',
+              't2_pynq_ns', 't3_pynq_ns', 't4_pynq_ns', 't5_pynq_ns', 't6_pynq_ns', 't_reflex_ns',
+              'pynq_total_ns', 'dma_ns', 'net_est_ns',
+              'ofi', 'imb_q15', 'burst_q16', 'vol_q16']
     if args.log_csv:
-        csv_file = open(args.log_csv, 'w', newline='')
-        csv_writer = csv.writer(csv_file)
-        csv_writer.writerow(['seq', 't1_host_ns', 't5_host_ns', 'rtt_ns', 
-                            't2_pynq_ns', 't3_pynq_ns', 't4_pynq_ns', 't5_pynq_ns', 't6_pynq_ns',
-                            'pynq_total_ns', 'dma_ns', 'net_est_ns',
-                            'ofi', 'imb_q15', 'burst_q16', 'vol_q16'])
+        sinks.append(CsvSink(args.log_csv, header, row, log_timeouts=False))
         print(f"Logging latency data to {args.log_csv}")
-    
-    # Create unconnected UDP socket
-    s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-    s.bind(('192.168.10.1', 4001))
-    s.settimeout(0.001)  # 1ms timeout for non-blocking receive
-    
-    dst = ('192.168.10.2', 4000)
-    
-    # LOB header format: magic(4) ver(1) type(1) flags(2) hdr_len(2) seq(4) t_send_ns(8) t_ing(8) rsv2(2)
-    # Delta format: price_ticks(4) qty(4) level(2) side(1) action(1) rsv(4) = 16 bytes
-    
-    sent = 0
-    received = 0
-    feat_count = 0
+    if args.log_hist:
+        sinks.append(HistogramSink(args.log_hist, header, row, ['rtt_ns', 'pynq_total_ns', 'dma_ns', 'net_est_ns'],
+                                   ['seq', 't1_host_ns', 'rtt_ns', 'pynq_total_ns', 'dma_ns', 'net_est_ns'],
+                                   args.sample_every, log_timeouts=False, meta={'mode': 'stream', 'pps': args.pps}))
+        print(f"Logging latency histograms to {args.log_hist}")
+    if args.log_bin:
+        sinks.append(BinLogSink(args.log_bin, header, row, {h: h for h in header}, log_timeouts=False,
+                                meta={'mode': 'stream', 'pps': args.pps}))
+        print(f"Logging binary timing records to {args.log_bin}")
+
+    # One delta: price=100000 (in ticks), qty=100, level=0, side=0 (bid), action=1 (add)
+    src = sources.synthetic(args.max_packets, args.pps, lambda i: [(100000, 100, 0, 0, 1)])
+    sync = None
+    if args.sync_ms > 0:
+        log = args.log_csv or args.log_bin or args.log_hist
+        sync = clocksync.ClockSyncSink(clocksync.sidecar_path(log) if log else None)
+        sinks.append(sync)
+        src = clocksync.with_pings(src, int(args.sync_ms * 1e6))
+    client = client_from_args(args, decoders=[decoders.features, decoders.timing, decoders.ping], sinks=sinks)
+    apply_rt(args)   # after the sinks: their writer threads keep the default placement
+
+    print(f"Streaming LOB packets at {args.pps} pps to {client.dst}")
+    print("Press Ctrl+C to stop\n")
     start_time = time.time()
-    last_print = start_time
-    
-    # Timing data storage (seq -> timestamps)
-    pending_sends = {}  # seq -> t1_ns
-    
-    print(f"Streaming LOB packets at {pps} pps to {dst}")
+    stats = run_client(client, src)
+    elapsed = time.time() - start_time
+    sent, feat_count = stats.sent - counts['ping'], counts['feat']
+    print(f"\n\nFinal: sent={sent} recv={stats.replies} feat={feat_count} timeouts={stats.timeouts}")
+    print(f"Elapsed: {elapsed:.1f}s")
+    print(f"Send rate: {sent/elapsed:.1f} pps")
+    print(f"Feature rate: {feat_count/elapsed:.1f} pps")
+    print(f"Success rate: {100.0*feat_count/sent if sent > 0 else 0:.1f}%")
+    for s in sinks:
+        if isinstance(s, (CsvSink, BinLogSink, clocksync.ClockSyncSink)):
+            print(s.summary())
     if args.log_csv:
-        print(f"Latency measurement enabled (CSV logging)")
-    print("Press Ctrl+C to stop\n")
-    
-    try:
-        while True:
-            # Check max packets limit
-            if args.max_packets and sent >= args.max_packets:
-                break
-            
-            # Send a LOB packet with 1 delta (minimal)
-            seq = sent
-            t_send_ns = int(time.time() * 1e9)
-            
-            # Header: type=1 (DELTAS), flags=0x8001 (reset + count=1)
-            hdr = struct.pack('>4sBBHHIQQH', 
-                b'LOB1', 1, 1, 0x8001, 32, seq, t_send_ns, 0, 0)
-            
-            # One delta: price=100000 (in ticks), qty=100, level=0, side=0 (bid), action=1 (add)
-            delta = struct.pack('>iiHBBI', 100000, 100, 0, 0, 1, 0)
-            
-            pkt = hdr + delta
-            
-            # T1: Host send timestamp (immediately before sendto)
-            t1_ns = time.clock_gettime_ns(time.CLOCK_MONOTONIC_RAW)
-            s.sendto(pkt, dst)
-            
-            if csv_writer:
-                pending_sends[seq] = t1_ns
-            sent += 1
-            
-            # Try to receive (non-blocking)
-            try:
-                data, addr = s.recvfrom(4096)
-                # T5: Host receive timestamp (immediately after recvfrom)
-                t5_ns = time.clock_gettime_ns(time.CLOCK_MONOTONIC_RAW)
-                
-                if len(data) >= 32:
-                    magic = data[0:4]
-                    msg_type = data[5]
-                    if magic == b'LOB1':
-                        received += 1
-                        if msg_type == 2 or msg_type == 4:  # FEATURES or FEATURES_WITH_TIMING
-                            feat_count += 1
-                            
-                            # Parse sequence number from reply (offset 10 per lob_v1.h)
-                            reply_seq = struct.unpack('>I', data[10:14])[0]
-                            
-                            # Parse features if payload is long enough
-                            ofi = imb = burst = vol = None
-                            if len(data) >= 48:  # 32 (header) + 16 (features)
-                                feat_data = data[32:48]
-                                ofi = struct.unpack('>i', feat_data[0:4])[0]
-                                imb = struct.unpack('>h', feat_data[4:6])[0]
-                                burst = struct.unpack('>I', feat_data[8:12])[0]
-                                vol = struct.unpack('>I', feat_data[12:16])[0]
-                            
-                            # Parse timing metadata if present (msg_type=4)
-                            t2 = t3 = t4 = t5_pynq = t6 = None
-                            if msg_type == 4 and len(data) >= 88:  # 32 (header) + 16 (features) + 40 (timing)
-                                timing_data = data[48:88]
-                                t2, t3, t4, t5_pynq, t6 = struct.unpack('>QQQQQ', timing_data)
-                            
-                            # Log timing data if we sent this packet
-                            if csv_writer and reply_seq in pending_sends:
-                                t1_ns = pending_sends.pop(reply_seq)
-                                rtt_ns = t5_ns - t1_ns
-                                
-                                # Compute derived metrics
-                                pynq_total = (t6 - t2) if (t6 and t2) else None
-                                dma_time = (t5_pynq - t3) if (t5_pynq and t3) else None
-                                net_est = (rtt_ns - pynq_total) if pynq_total else None
-                                
-                                csv_writer.writerow([reply_seq, t1_ns, t5_ns, rtt_ns,
-                                                    t2, t3, t4, t5_pynq, t6,
-                                                    pynq_total, dma_time, net_est,
-                                                    ofi, imb, burst, vol])
-            except socket.timeout:
-                pass
-            
-            # Print stats every second
-            now = time.time()
-            if now - last_print >= 1.0:
-                elapsed = now - start_time
-                print(f"sent={sent} recv={received} feat={feat_count} "
-                      f"rate={sent/elapsed:.1f} pps feat_rate={feat_count/elapsed:.1f} pps")
-                last_print = now
-            
-            # Rate limiting
-            if interval > 0:
-                time.sleep(interval)
-                
-    except KeyboardInterrupt:
-        pass
-    finally:
-        elapsed = time.time() - start_time
-        print(f"\n\nFinal: sent={sent} recv={received} feat={feat_count}")
-        print(f"Elapsed: {elapsed:.1f}s")
-        print(f"Send rate: {sent/elapsed:.1f} pps")
-        print(f"Feature rate: {feat_count/elapsed:.1f} pps")
-        print(f"Success rate: {100.0*feat_count/sent if sent > 0 else 0:.1f}%")
-        
-        # Close CSV file
-        if csv_file:
-            csv_file.close()
-            print(f"Latency data written to {args.log_csv}")
+        print(f"Latency data written to {args.log_csv}")
+    if args.log_hist:
+        print(f"Latency histograms written to {args.log_hist}")
+    if args.log_bin:
+        print(f"Timing records written to {args.log_bin}")
 
 if __name__ == '__main__':
     main()
-
@@ -28,6 +28,10 @@ For each row i we:
   - Consider only rows where final_dec in {BUY, SELL}.
   - Compute whether the decision's direction matches the label sign.
 
+Parsed arrays (LOBSTER prices, replay decisions) are memoized by
+models/cache.py, keyed by the input files' content hashes, so re-running
+with another --horizon skips the CSV parsing.
+
 Outputs:
   - Printed summary with:
       - trade_count, hit_rate, fraction_up/down/flat.
@@ -39,6 +43,7 @@ from __future__ import annotations
 
 import argparse
 import csv
+import sys
 from dataclasses import dataclass
 from pathlib import Path
 from typing import List, Tuple
@@ -46,6 +51,12 @@ from typing import List, Tuple
 import matplotlib.pyplot as plt
 import numpy as np
 
+REPO_ROOT = Path(__file__).resolve().parent.parent
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+from models.cache import NpyCache, add_cache_args, cache_from_args  # noqa: E402
+
 
 @dataclass
 class ReplayRow:
@@ -114,6 +125,26 @@ def load_lobster_csv(path: Path) -> List[LobsterMsg]:
     return msgs
 
 
+def lobster_prices(path: Path, cache: NpyCache) -> np.ndarray:
+    return cache.memo(
+        "lobster_price",
+        lambda: np.array([m.price for m in load_lobster_csv(path)], dtype=np.int64),
+        files=[path],
+    )
+
+
+def replay_decisions(path: Path, cache: NpyCache) -> np.ndarray:
+    """[N, 2] int64 of (seq, direction_from_dec(final_dec)) per replay row."""
+    return cache.memo(
+        "replay_dec",
+        lambda: np.array(
+            [(r.seq, direction_from_dec(r.final_dec)) for r in load_replay_csv(path)],
+            dtype=np.int64,
+        ).reshape(-1, 2),
+        files=[path],
+    )
+
+
 def direction_from_dec(dec: str) -> int:
     """
     Map final_dec strings into directional intents:
@@ -145,38 +176,33 @@ def compute_hit_rate(
     """
     Return (hit_rate, trade_count, num_up, num_down).
     """
-    assert len(replay_rows) <= len(msgs), "Replay rows cannot exceed LOBSTER messages"
-
-    hits = 0
-    trades = 0
-    num_up = 0
-    num_down = 0
-
-    for r in replay_rows:
-        if r.seq < 0 or r.seq >= len(msgs):
-            continue
-        future_idx = r.seq + horizon
-        if future_idx >= len(msgs):
-            continue
-
-        direction = direction_from_dec(r.final_dec)
-        if direction == 0:
-            # We only care about explicit buy/sell decisions
-            continue
-
-        current_price = msgs[r.seq].price
-        future_price = msgs[future_idx].price
-        price_delta = future_price - current_price
-        label = sign(price_delta)
+    seq = np.array([r.seq for r in replay_rows], dtype=np.int64)
+    direction = np.array([direction_from_dec(r.final_dec) for r in replay_rows], dtype=np.int64)
+    prices = np.array([m.price for m in msgs], dtype=np.int64)
+    return hit_rate_arrays(seq, direction, prices, horizon)
+
+
+def hit_rate_arrays(
+    seq: np.ndarray,
+    direction: np.ndarray,
+    prices: np.ndarray,
+    horizon: int,
+) -> Tuple[float, int, int, int]:
+    """
+    Array form of compute_hit_rate(): seq/direction per replay row, prices per
+    LOBSTER message.
+    """
+    assert len(seq) <= len(prices), "Replay rows cannot exceed LOBSTER messages"
 
-        if label > 0:
-            num_up += 1
-        elif label < 0:
-            num_down += 1
+    # We only care about explicit buy/sell decisions with a future price
+    keep = (seq >= 0) & (seq + horizon < len(prices)) & (direction != 0)
+    s = seq[keep]
+    label = np.sign(prices[s + horizon] - prices[s])
 
-        trades += 1
-        if direction == label:
-            hits += 1
+    trades = int(s.size)
+    hits = int(np.count_nonzero(direction[keep] == label))
+    num_up = int(np.count_nonzero(label > 0))
+    num_down = int(np.count_nonzero(label < 0))
 
     hit_rate = hits / trades if trades > 0 else 0.0
     return hit_rate, trades, num_up, num_down
@@ -235,6 +261,7 @@ def main() -> None:
         default=50,
         help="Look-ahead horizon in messages for price direction label",
     )
+    add_cache_args(ap)
     args = ap.parse_args()
 
     replay_path = Path(args.replay_csv)
@@ -245,13 +272,17 @@ def main() -> None:
     if not lobster_path.exists():
         raise SystemExit(f"lobster_csv not found: {lobster_path}")
 
-    replay_rows = load_replay_csv(replay_path)
-    msgs = load_lobster_csv(lobster_path)
-    print(f"loaded {len(replay_rows)} replay rows and {len(msgs)} LOBSTER messages")
-
-    hit_rate, trades, num_up, num_down = compute_hit_rate(
-        replay_rows,
-        msgs,
+    cache = cache_from_args(args)
+    dec = replay_decisions(replay_path, cache)
+    prices = lobster_prices(lobster_path, cache)
+    print(f"loaded {len(dec)} replay rows and {len(prices)} LOBSTER messages")
+    if cache.enabled:
+        print(cache.summary())
+
+    hit_rate, trades, num_up, num_down = hit_rate_arrays(
+        dec[:, 0],
+        dec[:, 1],
+        prices,
         horizon=args.horizon,
     )
 
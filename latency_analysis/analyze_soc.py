@@ -3,8 +3,9 @@
 Host-side analysis for SoC latency experiments.
 
 Consumes:
-  - latency_analysis/latency_comparison.csv
-      (from run_cycle_bench.py: CPU vs full FPGA lane, in ns)
+  - latency_analysis/latency_comparison.tlog, else latency_analysis/latency_comparison.csv
+      (from run_cycle_bench.py: CPU vs full FPGA lane, in ns; the .tlog is
+      loaded with np.fromfile, see host/telemetry/binlog.py)
   - latency_analysis/soc_full.log
   - latency_analysis/soc_mlp_only.log
   - latency_analysis/soc_nodma.log
@@ -14,21 +15,36 @@ Produces:
   - latency_analysis/plots/cdf_cpu_vs_fpga.png
   - latency_analysis/plots/soc_overlay_bar_avg_latency.png
   - latency_analysis/soc_summaries.csv   (parsed summary blocks from logs)
+
+To keep a run for later comparison (bitstream hash, git rev, bootstrap
+regression gate), use results_store.py record / compare.
 """
 
 from __future__ import annotations
 
 import csv
 import re
+import sys
 from dataclasses import dataclass
 from pathlib import Path
 from typing import Iterable, List, Optional
 
-import matplotlib.pyplot as plt
 import numpy as np
 
+try:
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+except Exception:   # parsing still works (results_store.py); plots need matplotlib
+    plt = None
+
 HERE = Path(__file__).resolve().parent
 PLOTS_DIR = HERE / "plots"
+REPO_ROOT = HERE.parent
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+from host.telemetry.binlog import COMPARISON_SCHEMA, read_binlog  # noqa: E402
 
 
 @dataclass
@@ -54,6 +70,10 @@ class SummaryRecord:
 
 
 def load_latency_comparison(path: Path) -> tuple[np.ndarray, np.ndarray]:
+    if path.suffix == ".tlog":
+        _, rec = read_binlog(str(path), schema=COMPARISON_SCHEMA[0])
+        cpu, fpga = rec["cpu_ns"], rec["fpga_ns"]
+        return cpu[cpu >= 0], fpga[fpga >= 0]
     cpu_ns: List[int] = []
     fpga_ns: List[int] = []
     with path.open("r", newline="") as f:
@@ -478,8 +498,14 @@ def make_nodma_stacked_plot(records: list[SummaryRecord]) -> None:
 
 
 def main() -> None:
-    # 1. CPU vs FPGA CDF from latency_comparison.csv
-    latency_csv = HERE / "latency_comparison.csv"
+    if plt is None:
+        print("error: matplotlib is required for the plots (results_store.py works without it)")
+        sys.exit(1)
+
+    # 1. CPU vs FPGA CDF from latency_comparison.tlog (binary) or .csv
+    latency_csv = HERE / "latency_comparison.tlog"
+    if not latency_csv.exists():
+        latency_csv = HERE / "latency_comparison.csv"
     if latency_csv.exists():
         make_cpu_vs_fpga_cdf(latency_csv)
     else:
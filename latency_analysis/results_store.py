@@ -0,0 +1,415 @@
+#!/usr/bin/env python3
+"""
+Results store and regression gate for SoC / echo-server benchmark runs.
+
+A store is a directory of runs, one sub-directory per run:
+
+  <store>/<run_id>/manifest.json   run id, time, label, git rev (+dirty),
+                                   sha256 of the bitstream and other
+                                   artifacts, free-form config, summary
+                                   blocks parsed from the soc_*.log files
+  <store>/<run_id>/samples.npz     raw latency samples (ns), one array per
+                                   metric (cpu_ns, fpga_ns, rtt_ns, ...)
+
+`compare` diffs p50 / p99 / p99.9 of every metric two runs share. Each
+delta gets a percentile-bootstrap confidence interval (both runs resampled
+independently); a quantile regressed when the whole interval is above zero
+and the shift is larger than --min-effect-pct. Any regression exits 1, so the
+command can gate a bitstream or server change:
+
+  python3 latency_analysis/results_store.py record --label new-dma \\
+      --bitstream fpga/overlays/feature_overlay.bit --config pps=1000
+  python3 latency_analysis/results_store.py list
+  python3 latency_analysis/results_store.py compare            # previous vs latest
+  python3 latency_analysis/results_store.py compare 20250101-120000-base latest
+
+Samples come from latency_comparison.tlog / .csv (run_cycle_bench.py) by
+default, or --samples NAME=PATH[:COLUMN] for any .tlog / .csv / .npy log.
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import hashlib
+import json
+import subprocess
+import sys
+import time
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+HERE = Path(__file__).resolve().parent
+REPO_ROOT = HERE.parent
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+from host.telemetry import rt  # noqa: E402
+from host.telemetry.binlog import read_binlog  # noqa: E402
+from latency_analysis.analyze_soc import (  # noqa: E402
+    load_latency_comparison,
+    parse_log_summaries,
+)
+
+DEFAULT_STORE = HERE / "results"
+QUANTILES = (50.0, 99.0, 99.9)
+SOC_LOGS = [("full", "soc_full.log"), ("mlp_only", "soc_mlp_only.log"),
+            ("nodma", "soc_nodma.log"), ("core", "soc_core.log")]
+MIN_TAIL_SAMPLES = 10  # a quantile needs this many samples above it to be gated
+
+
+@dataclass
+class RunManifest:
+    run_id: str
+    created_unix: float
+    label: str = ""
+    git_rev: Optional[str] = None
+    git_dirty: Optional[bool] = None
+    artifacts: Dict[str, str] = field(default_factory=dict)   # name -> sha256
+    config: Dict[str, str] = field(default_factory=dict)
+    sources: Dict[str, str] = field(default_factory=dict)     # metric -> file it came from
+    summaries: List[dict] = field(default_factory=list)       # analyze_soc.SummaryRecord fields
+    notes: str = ""
+
+
+@dataclass
+class QuantileDiff:
+    metric: str
+    q: float
+    base_ns: float
+    cand_ns: float
+    ci_lo_ns: float
+    ci_hi_ns: float
+    verdict: str          # regression, improvement, same, n/a
+
+    @property
+    def delta_ns(self) -> float:
+        return self.cand_ns - self.base_ns
+
+    @property
+    def delta_pct(self) -> float:
+        return 100.0 * self.delta_ns / self.base_ns if self.base_ns else 0.0
+
+
+# --- recording ------------------------------------------------------------
+
+def sha256_file(path: Path) -> str:
+    h = hashlib.sha256()
+    with path.open("rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def git_state(repo: Path = REPO_ROOT) -> Tuple[Optional[str], Optional[bool]]:
+    try:
+        rev = subprocess.run(["git", "rev-parse", "HEAD"], cwd=repo, capture_output=True,
+                             text=True, timeout=10, check=True).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=repo,
+                               capture_output=True, text=True, timeout=30, check=True).stdout.strip() != ""
+        return rev, dirty
+    except (OSError, subprocess.SubprocessError):
+        return None, None
+
+
+def load_samples(spec: str) -> Tuple[str, np.ndarray, str]:
+    """NAME=PATH[:COLUMN] -> (name, int64 samples, source). COLUMN defaults to NAME."""
+    name, _, rest = spec.partition("=")
+    if not rest:
+        raise ValueError(f"--samples expects NAME=PATH[:COLUMN], got {spec!r}")
+    path, _, column = rest.partition(":")
+    column = column or name
+    p = Path(path)
+    if p.suffix == ".npy":
+        vals = np.load(p)
+    elif p.suffix == ".tlog":
+        _, rec = read_binlog(str(p))
+        if column not in rec.dtype.names:
+            raise ValueError(f"{p}: no field {column!r} (have {', '.join(rec.dtype.names)})")
+        vals = np.asarray(rec[column])
+    else:
+        out = []
+        with p.open("r", newline="") as f:
+            for row in csv.DictReader(f):
+                v = (row.get(column) or "").strip()
+                try:
+                    out.append(float(v))
+                except ValueError:
+                    pass
+        vals = np.array(out)
+    vals = np.asarray(vals, dtype=np.float64)
+    vals = vals[np.isfinite(vals) & (vals >= 0)]
+    return name, vals.astype(np.int64), f"{p}:{column}"
+
+
+def new_run_id(label: str) -> str:
+    stamp = time.strftime("%Y%m%d-%H%M%S")
+    safe = "".join(c if c.isalnum() or c in "-_" else "-" for c in label)
+    return f"{stamp}-{safe}" if safe else stamp
+
+
+def record_run(store: Path, label: str = "", samples: Optional[Dict[str, np.ndarray]] = None,
+               sources: Optional[Dict[str, str]] = None, artifacts: Optional[Dict[str, Path]] = None,
+               config: Optional[Dict[str, str]] = None, summaries: Sequence = (),
+               notes: str = "", run_id: Optional[str] = None) -> Path:
+    """Write one run (manifest.json + samples.npz) and return its directory."""
+    rev, dirty = git_state()
+    m = RunManifest(
+        run_id=run_id or new_run_id(label),
+        created_unix=time.time(),
+        label=label,
+        git_rev=rev,
+        git_dirty=dirty,
+        artifacts={k: sha256_file(Path(p)) for k, p in (artifacts or {}).items()},
+        config=dict(config or {}),
+        sources=dict(sources or {}),
+        summaries=[asdict(s) if not isinstance(s, dict) else s for s in summaries],
+        notes=notes,
+    )
+    d = store / m.run_id
+    if d.exists():
+        raise ValueError(f"run {m.run_id} already exists in {store}")
+    d.mkdir(parents=True)
+    np.savez_compressed(d / "samples.npz", **{k: np.asarray(v, dtype=np.int64) for k, v in (samples or {}).items()})
+    (d / "manifest.json").write_text(json.dumps(asdict(m), indent=2) + "\n")
+    return d
+
+
+# --- loading --------------------------------------------------------------
+
+def list_runs(store: Path) -> List[RunManifest]:
+    """Runs in the store, oldest first."""
+    runs = []
+    for mf in store.glob("*/manifest.json"):
+        runs.append(RunManifest(**json.loads(mf.read_text())))
+    return sorted(runs, key=lambda r: (r.created_unix, r.run_id))
+
+
+def resolve_run(store: Path, ref: str) -> RunManifest:
+    """Run id, unique id prefix, 'latest', or 'latest~N'."""
+    runs = list_runs(store)
+    if not runs:
+        raise ValueError(f"no runs in {store}")
+    if ref.startswith("latest"):
+        back = int(ref.partition("~")[2] or 0)
+        if back >= len(runs):
+            raise ValueError(f"{ref}: only {len(runs)} runs in {store}")
+        return runs[-1 - back]
+    hits = [r for r in runs if r.run_id == ref] or [r for r in runs if r.run_id.startswith(ref)]
+    if len(hits) != 1:
+        raise ValueError(f"{ref!r} matches {len(hits)} runs in {store}")
+    return hits[0]
+
+
+def load_run_samples(store: Path, run_id: str) -> Dict[str, np.ndarray]:
+    with np.load(store / run_id / "samples.npz") as z:
+        return {k: z[k] for k in z.files}
+
+
+# --- comparison -----------------------------------------------------------
+
+def bootstrap_quantile_diff(base: np.ndarray, cand: np.ndarray, qs: Sequence[float] = QUANTILES,
+                            n_boot: int = 1000, alpha: float = 0.05, seed: int = 0,
+                            max_n: int = 50_000) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    (lo, hi) percentile-bootstrap interval of quantile(cand) - quantile(base)
+    for each q. Runs longer than max_n are subsampled once first; resamples
+    go in batches of about 4M elements.
+    """
+    rng = np.random.default_rng(seed)
+    if len(base) > max_n:
+        base = rng.choice(base, max_n, replace=False)
+    if len(cand) > max_n:
+        cand = rng.choice(cand, max_n, replace=False)
+    qf = np.asarray(qs, dtype=np.float64) / 100.0
+    diffs = np.empty((n_boot, len(qf)))
+    batch = max(1, (4 << 20) // max(len(base), len(cand)))
+    for start in range(0, n_boot, batch):
+        b = min(batch, n_boot - start)
+        rb = base[rng.integers(0, len(base), (b, len(base)))]
+        rc = cand[rng.integers(0, len(cand), (b, len(cand)))]
+        diffs[start:start + b] = (np.quantile(rc, qf, axis=1) - np.quantile(rb, qf, axis=1)).T
+    lo, hi = np.quantile(diffs, [alpha / 2, 1 - alpha / 2], axis=0)
+    return lo, hi
+
+
+def compare_samples(base: Dict[str, np.ndarray], cand: Dict[str, np.ndarray],
+                    metrics: Optional[Sequence[str]] = None, qs: Sequence[float] = QUANTILES,
+                    n_boot: int = 1000, alpha: float = 0.05, min_effect_pct: float = 2.0,
+                    seed: int = 0) -> List[QuantileDiff]:
+    names = [m for m in (metrics or sorted(set(base) & set(cand))) if m in base and m in cand]
+    out: List[QuantileDiff] = []
+    for name in names:
+        b = base[name].astype(np.float64)
+        c = cand[name].astype(np.float64)
+        if len(b) == 0 or len(c) == 0:
+            continue
+        lo, hi = bootstrap_quantile_diff(b, c, qs, n_boot, alpha, seed)
+        pb, pc = np.percentile(b, qs), np.percentile(c, qs)
+        for k, q in enumerate(qs):
+            tail = min(len(b), len(c)) * (1 - q / 100.0)
+            d = QuantileDiff(name, q, float(pb[k]), float(pc[k]), float(lo[k]), float(hi[k]), "same")
+            if tail < MIN_TAIL_SAMPLES:
+                d.verdict = "n/a"
+            elif lo[k] > 0 and d.delta_pct > min_effect_pct:
+                d.verdict = "regression"
+            elif hi[k] < 0 and -d.delta_pct > min_effect_pct:
+                d.verdict = "improvement"
+            out.append(d)
+    return out
+
+
+def compare_summaries(base: RunManifest, cand: RunManifest) -> List[Tuple[str, float, float]]:
+    """(overlay :: label, base avg ns, cand avg ns) for summary blocks both runs have (informational)."""
+    key = lambda s: f"{s['overlay']} :: {s['label']}"  # noqa: E731
+    b = {key(s): s["cycles_avg"] * 8.0 for s in base.summaries}
+    return [(k, b[k], s["cycles_avg"] * 8.0) for s in cand.summaries if (k := key(s)) in b]
+
+
+def format_report(base: RunManifest, cand: RunManifest, diffs: List[QuantileDiff],
+                  summaries: List[Tuple[str, float, float]], alpha: float) -> str:
+    lines = [f"baseline : {base.run_id}  git {(base.git_rev or '?')[:10]}{'+' if base.git_dirty else ''}  {base.label}",
+             f"candidate: {cand.run_id}  git {(cand.git_rev or '?')[:10]}{'+' if cand.git_dirty else ''}  {cand.label}"]
+    changed = sorted(k for k in set(base.artifacts) | set(cand.artifacts)
+                     if base.artifacts.get(k) != cand.artifacts.get(k))
+    if changed:
+        lines.append(f"changed artifacts: {', '.join(changed)}")
+    for k in sorted(set(base.config) | set(cand.config)):
+        if base.config.get(k) != cand.config.get(k):
+            lines.append(f"changed config: {k}: {base.config.get(k, '-')} -> {cand.config.get(k, '-')}")
+    lines.append("")
+    lines.append(f"{'metric':<14} {'q':>6} {'base us':>10} {'cand us':>10} {'delta':>8}  "
+                 f"{str(int((1 - alpha) * 100)) + '% CI (us)':<24} verdict")
+    for d in diffs:
+        ci = f"[{d.ci_lo_ns / 1e3:+.2f}, {d.ci_hi_ns / 1e3:+.2f}]"
+        lines.append(f"{d.metric:<14} {'p' + format(d.q, 'g'):>6} {d.base_ns / 1e3:>10.2f} {d.cand_ns / 1e3:>10.2f} "
+                     f"{d.delta_pct:>+7.1f}%  {ci:<24} {d.verdict}")
+    if summaries:
+        lines.append("")
+        lines.append("SoC log summaries (avg, no CI):")
+        for k, b, c in summaries:
+            lines.append(f"  {k:<50} {b / 1e3:>9.2f} -> {c / 1e3:>9.2f} us ({100.0 * (c - b) / b if b else 0.0:+.1f}%)")
+    n_reg = sum(d.verdict == "regression" for d in diffs)
+    lines.append("")
+    lines.append(f"verdict: {'REGRESSION (' + str(n_reg) + ')' if n_reg else 'ok'}")
+    return "\n".join(lines)
+
+
+# --- CLI ------------------------------------------------------------------
+
+def _kv(items: Sequence[str]) -> Dict[str, str]:
+    out = {}
+    for it in items:
+        k, sep, v = it.partition("=")
+        if not sep:
+            raise ValueError(f"expected KEY=VALUE, got {it!r}")
+        out[k] = v
+    return out
+
+
+def cmd_record(args) -> int:
+    samples: Dict[str, np.ndarray] = {}
+    sources: Dict[str, str] = {}
+    for spec in args.samples:
+        name, vals, src = load_samples(spec)
+        samples[name], sources[name] = vals, src
+    if not args.samples:
+        comp = HERE / "latency_comparison.tlog"
+        if not comp.exists():
+            comp = HERE / "latency_comparison.csv"
+        if comp.exists():
+            samples["cpu_ns"], samples["fpga_ns"] = load_latency_comparison(comp)
+            sources["cpu_ns"] = sources["fpga_ns"] = str(comp)
+    summaries = []
+    if not args.no_soc_logs:
+        for overlay, name in SOC_LOGS:
+            p = Path(args.soc_log_dir) / name
+            if p.exists():
+                summaries.extend(parse_log_summaries(p, overlay=overlay))
+    if not samples and not summaries:
+        print("nothing to record: no --samples, latency_comparison.* or soc_*.log found")
+        return 2
+    config = _kv(args.config)
+    # CPU placement the runner saved next to its log (host/telemetry/rt.py)
+    for name, src in sorted(sources.items()):
+        placed = rt.load_for(src if Path(src).exists() else src.rsplit(":", 1)[0])
+        if placed is not None:
+            config.setdefault(f"rt.{name}", rt.brief(placed))
+    artifacts = {k: Path(v) for k, v in _kv(args.artifact).items()}
+    if args.bitstream:
+        artifacts["bitstream"] = Path(args.bitstream)
+    d = record_run(Path(args.store), args.label, samples, sources, artifacts, config,
+                   summaries, args.notes)
+    print(f"recorded {d.name}: " + ", ".join(f"{k} n={len(v)}" for k, v in samples.items())
+          + (f", {len(summaries)} summary blocks" if summaries else ""))
+    return 0
+
+
+def cmd_list(args) -> int:
+    for r in list_runs(Path(args.store)):
+        when = time.strftime("%Y-%m-%d %H:%M", time.localtime(r.created_unix))
+        bit = r.artifacts.get("bitstream", "")[:10]
+        print(f"{r.run_id:<36} {when}  git {(r.git_rev or '?')[:10]}{'+' if r.git_dirty else ' '} "
+              f"bit {bit or '-':<10}  {r.label}")
+    return 0
+
+
+def cmd_compare(args) -> int:
+    store = Path(args.store)
+    base = resolve_run(store, args.baseline)
+    cand = resolve_run(store, args.candidate)
+    diffs = compare_samples(load_run_samples(store, base.run_id), load_run_samples(store, cand.run_id),
+                            args.metric or None, args.quantiles, args.boot, args.alpha, args.min_effect_pct)
+    report = format_report(base, cand, diffs, compare_summaries(base, cand), args.alpha)
+    print(report)
+    if args.out:
+        Path(args.out).write_text(json.dumps({"baseline": base.run_id, "candidate": cand.run_id,
+                                              "diffs": [dict(asdict(d), delta_pct=d.delta_pct) for d in diffs]},
+                                             indent=2) + "\n")
+    return 1 if any(d.verdict == "regression" for d in diffs) else 0
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Record benchmark runs and gate latency regressions")
+    ap.add_argument("--store", type=str, default=str(DEFAULT_STORE), help="Results store directory")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+
+    rec = sub.add_parser("record", help="Store the current results as a new run")
+    rec.add_argument("--label", type=str, default="")
+    rec.add_argument("--bitstream", type=str, help="Bitstream used for the run (sha256 goes in the manifest)")
+    rec.add_argument("--artifact", action="append", default=[], metavar="NAME=PATH",
+                     help="Other files to fingerprint (e.g. server=fpga/pynq/feature_echo_mt.py)")
+    rec.add_argument("--config", action="append", default=[], metavar="KEY=VALUE")
+    rec.add_argument("--samples", action="append", default=[], metavar="NAME=PATH[:COLUMN]",
+                     help="Raw latency samples; default cpu_ns/fpga_ns from latency_comparison.*")
+    rec.add_argument("--soc-log-dir", type=str, default=str(HERE), help="Where the soc_*.log files are")
+    rec.add_argument("--no-soc-logs", action="store_true")
+    rec.add_argument("--notes", type=str, default="")
+
+    sub.add_parser("list", help="List stored runs")
+
+    cmp_ = sub.add_parser("compare", help="Diff two runs; exit 1 on a significant regression")
+    cmp_.add_argument("baseline", nargs="?", default="latest~1")
+    cmp_.add_argument("candidate", nargs="?", default="latest")
+    cmp_.add_argument("--metric", action="append", default=[], help="Only these metrics (default: all shared)")
+    cmp_.add_argument("--quantiles", type=float, nargs="+", default=list(QUANTILES))
+    cmp_.add_argument("--boot", type=int, default=1000, help="Bootstrap resamples")
+    cmp_.add_argument("--alpha", type=float, default=0.05, help="1 - confidence level")
+    cmp_.add_argument("--min-effect-pct", type=float, default=2.0,
+                      help="Ignore significant shifts smaller than this")
+    cmp_.add_argument("--out", type=str, help="Write the comparison as JSON")
+
+    args = ap.parse_args()
+    try:
+        rc = {"record": cmd_record, "list": cmd_list, "compare": cmd_compare}[args.cmd](args)
+    except ValueError as e:
+        print(f"error: {e}", file=sys.stderr)
+        rc = 2
+    sys.exit(rc)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+import os
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from latency_analysis import results_store as rs
+
+
+class TestResultsStore(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(11)
+        self.base = (20_000 + rng.lognormal(9, 0.6, 20_000)).astype(np.int64)
+        self.same = (20_000 + rng.lognormal(9, 0.6, 20_000)).astype(np.int64)
+        self.slow = (self.same * 1.15).astype(np.int64)
+
+    def test_verdicts(self):
+        diffs = rs.compare_samples({'rtt_ns': self.base}, {'rtt_ns': self.same}, n_boot=200)
+        self.assertEqual([d.verdict for d in diffs], ['same'] * 3)
+        diffs = rs.compare_samples({'rtt_ns': self.base}, {'rtt_ns': self.slow}, n_boot=200)
+        self.assertEqual([d.verdict for d in diffs], ['regression'] * 3)
+        for d in diffs:
+            self.assertLess(d.ci_lo_ns, d.delta_ns)
+            self.assertGreater(d.ci_hi_ns, d.delta_ns)
+        diffs = rs.compare_samples({'rtt_ns': self.slow}, {'rtt_ns': self.base}, n_boot=200)
+        self.assertEqual(diffs[0].verdict, 'improvement')
+        diffs = rs.compare_samples({'x': self.base[:500]}, {'x': self.slow[:500]}, n_boot=100)
+        self.assertEqual(diffs[-1].verdict, 'n/a')   # p99.9 of 500 samples: no tail to judge
+
+    def test_store_roundtrip(self):
+        with tempfile.TemporaryDirectory() as d:
+            store = Path(d)
+            bit = store / 'overlay.bit'
+            bit.write_bytes(b'\x00' * 64)
+            rs.record_run(store, 'base', {'rtt_ns': self.base}, artifacts={'bitstream': bit},
+                          config={'pps': '1000'}, run_id='r1')
+            bit.write_bytes(b'\x01' * 64)
+            rs.record_run(store, 'cand', {'rtt_ns': self.slow}, artifacts={'bitstream': bit}, run_id='r2')
+            with self.assertRaises(ValueError):
+                rs.record_run(store, 'dup', {}, run_id='r1')
+            self.assertEqual([r.run_id for r in rs.list_runs(store)], ['r1', 'r2'])
+            base, cand = rs.resolve_run(store, 'latest~1'), rs.resolve_run(store, 'latest')
+            self.assertEqual((base.run_id, base.config), ('r1', {'pps': '1000'}))
+            self.assertNotEqual(base.artifacts['bitstream'], cand.artifacts['bitstream'])
+            samples = rs.load_run_samples(store, 'r2')
+            self.assertEqual(samples['rtt_ns'].tolist(), self.slow.tolist())
+            diffs = rs.compare_samples(rs.load_run_samples(store, 'r1'), samples, n_boot=100)
+            report = rs.format_report(base, cand, diffs, [], 0.05)
+            self.assertIn('changed artifacts: bitstream', report)
+            self.assertIn('verdict: REGRESSION (3)', report)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,189 @@
+"""
+On-disk memoization for the offline analysis scripts.
+
+cpu_parity.py, tests/validate_score_parity.py and
+latency_analysis/analyze_model_usefulness.py re-parse the same LOBSTER
+CSVs / features.bin / RX dumps and re-run the int8 emulation on every
+invocation. NpyCache stores each derived array as <key>.npy, where the key
+hashes
+  - the content (sha256) of every input file,
+  - the parameters that shaped the result (price_tick, tau_burst_ns, ...),
+  - the model spec (canonical JSON of mlp_int8.json / logreg_int8.json),
+so editing any input, parameter or spec misses the cache instead of
+returning stale arrays.
+
+File digests are remembered per (path, size, mtime_ns) in digests.json, so
+a warm run stats its inputs instead of re-reading them. Entries are evicted
+least-recently-used first (a hit refreshes the file's mtime) once the
+directory holds more than max_bytes.
+
+Default location is $HFT_LAB_CACHE, else ~/.cache/hft-latency-lab.
+"""
+import hashlib
+import json
+import os
+import tempfile
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Optional, Union
+
+import numpy as np
+
+VERSION = 1                       # bump to invalidate every entry
+DEFAULT_MAX_BYTES = 1 << 30
+ENV_DIR = "HFT_LAB_CACHE"
+DIGESTS = "digests.json"
+
+PathLike = Union[str, Path]
+
+
+def default_dir() -> Path:
+    env = os.environ.get(ENV_DIR)
+    return Path(env) if env else Path.home() / ".cache" / "hft-latency-lab"
+
+
+def file_sha256(path: PathLike, chunk: int = 1 << 22) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        while True:
+            b = f.read(chunk)
+            if not b:
+                break
+            h.update(b)
+    return h.hexdigest()
+
+
+def spec_sha256(spec) -> str:
+    """Digest of a JSON-able object (model spec or parameter dict), key order ignored."""
+    return hashlib.sha256(json.dumps(spec, sort_keys=True, separators=(",", ":")).encode()).hexdigest()
+
+
+class NpyCache:
+    def __init__(self, root: Optional[PathLike] = None, max_bytes: int = DEFAULT_MAX_BYTES,
+                 enabled: bool = True):
+        self.root = Path(root) if root is not None else default_dir()
+        self.max_bytes = max_bytes
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self._digests: Optional[Dict[str, list]] = None
+
+    # --- keys ---------------------------------------------------------------
+
+    def _load_digests(self) -> Dict[str, list]:
+        if self._digests is None:
+            try:
+                self._digests = json.loads((self.root / DIGESTS).read_text())
+            except (OSError, ValueError):
+                self._digests = {}
+        return self._digests
+
+    def file_digest(self, path: PathLike) -> str:
+        p = os.path.realpath(path)
+        st = os.stat(p)
+        if not self.enabled:
+            return file_sha256(p)
+        memo = self._load_digests()
+        hit = memo.get(p)
+        if hit and hit[0] == st.st_size and hit[1] == st.st_mtime_ns:
+            return hit[2]
+        digest = file_sha256(p)
+        memo[p] = [st.st_size, st.st_mtime_ns, digest]
+        self.root.mkdir(parents=True, exist_ok=True)
+        _atomic_write(self.root / DIGESTS, json.dumps(memo).encode())
+        return digest
+
+    def key(self, kind: str, files: Iterable[PathLike] = (), params: Optional[dict] = None,
+            spec=None) -> str:
+        parts = {
+            "v": VERSION,
+            "kind": kind,
+            "files": [self.file_digest(f) for f in files],
+            "params": params or {},
+            "spec": spec_sha256(spec) if spec is not None else None,
+        }
+        return f"{kind}-{spec_sha256(parts)[:32]}"
+
+    # --- entries ------------------------------------------------------------
+
+    def path(self, key: str) -> Path:
+        return self.root / f"{key}.npy"
+
+    def load(self, key: str) -> Optional[np.ndarray]:
+        p = self.path(key)
+        try:
+            arr = np.load(p, allow_pickle=False)
+        except (OSError, ValueError):   # missing, or truncated by a crash
+            return None
+        os.utime(p)
+        return arr
+
+    def store(self, key: str, arr: np.ndarray) -> None:
+        self.root.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=self.root, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            np.save(f, np.ascontiguousarray(arr), allow_pickle=False)
+        os.replace(tmp, self.path(key))
+        self.evict()
+
+    def memo(self, kind: str, compute: Callable[[], np.ndarray], files: Iterable[PathLike] = (),
+             params: Optional[dict] = None, spec=None) -> np.ndarray:
+        """Return the cached array for (kind, files, params, spec), computing it on a miss."""
+        if not self.enabled:
+            return compute()
+        key = self.key(kind, files, params, spec)
+        arr = self.load(key)
+        if arr is not None:
+            self.hits += 1
+            return arr
+        self.misses += 1
+        arr = np.asarray(compute())
+        self.store(key, arr)
+        return arr
+
+    def evict(self) -> int:
+        """Drop least-recently-used entries until the cache fits max_bytes. Returns bytes freed."""
+        entries = []
+        for p in self.root.glob("*.npy"):
+            try:
+                st = p.stat()
+            except OSError:
+                continue
+            entries.append((st.st_mtime_ns, st.st_size, p))
+        total = sum(e[1] for e in entries)
+        freed = 0
+        for _, size, p in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                p.unlink()
+            except OSError:
+                continue
+            total -= size
+            freed += size
+        return freed
+
+    def clear(self) -> None:
+        for p in self.root.glob("*.npy"):
+            p.unlink()
+        (self.root / DIGESTS).unlink(missing_ok=True)
+        self._digests = None
+
+    def summary(self) -> str:
+        return f"cache {self.root}: {self.hits} hit(s), {self.misses} miss(es)"
+
+
+def _atomic_write(path: Path, data: bytes) -> None:
+    fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+    with os.fdopen(fd, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def add_cache_args(ap) -> None:
+    ap.add_argument("--cache-dir", default=None, help=f"Array cache directory (default ${ENV_DIR} or ~/.cache/hft-latency-lab)")
+    ap.add_argument("--cache-max-mb", type=int, default=DEFAULT_MAX_BYTES >> 20, help="Evict least-recently-used entries past this size")
+    ap.add_argument("--no-cache", action="store_true", help="Recompute everything; do not read or write the cache")
+
+
+def cache_from_args(args) -> NpyCache:
+    return NpyCache(args.cache_dir, max_bytes=args.cache_max_mb << 20, enabled=not args.no_cache)
@@ -4,12 +4,14 @@ import pathlib
 import sys
 from pathlib import Path
 
-# Ensure repo root import for models.features_ref
+# Ensure repo root import for models.features_*
 REPO_ROOT = Path(__file__).resolve().parents[2]
 if str(REPO_ROOT) not in sys.path:
     sys.path.insert(0, str(REPO_ROOT))
 
+from models.features_pipeline import CHUNK_BYTES, build_features, features_split  # noqa: E402
 from models.features_ref import run as ref_run  # noqa: E402
+from models.features_vec import load_lobster_events, run as vec_run  # noqa: E402
 
 
 def parse_args() -> argparse.Namespace:
@@ -22,6 +24,12 @@ def parse_args() -> argparse.Namespace:
         default=100.0,
         help="Tick size for the input 'price' column units. For raw LOBSTER (price=$*1e4), use 100.0.",
     )
+    ap.add_argument("--workers", type=int, default=2,
+                    help="Parser processes for the staged pipeline; 0 = single process (features_vec)")
+    ap.add_argument("--chunk-mb", type=float, default=CHUNK_BYTES / (1 << 20), help="Pipeline chunk size (MiB)")
+    ap.add_argument("--split", type=int, default=0,
+                    help="Compute N time chunks on --workers processes from state checkpoints (0 = staged pipeline)")
+    ap.add_argument("--reference", action="store_true", help="Use the scalar features_ref path (slow, for cross-checks)")
     return ap.parse_args()
 
 
@@ -29,15 +37,29 @@ def main():
     args = parse_args()
     outp = Path(args.out)
     outp.parent.mkdir(parents=True, exist_ok=True)
-    count = 0
-    with open(outp, "wb") as f:
-        for _, feat in ref_run(args.message, price_tick=args.price_tick):
-            f.write(feat)
-            count += 1
+    if args.reference:
+        count = 0
+        with open(outp, "wb") as f:
+            for _, feat in ref_run(args.message, price_tick=args.price_tick):
+                f.write(feat)
+                count += 1
+    elif args.split > 0:
+        ev = load_lobster_events(args.message, price_tick=args.price_tick)
+        feats = features_split(ev, workers=args.workers, n_chunks=args.split)
+        outp.write_bytes(feats.tobytes())
+        count = len(feats)
+    elif args.workers <= 0:
+        _, feats = vec_run(args.message, price_tick=args.price_tick)
+        outp.write_bytes(feats.tobytes())
+        count = len(feats)
+    else:
+        st = build_features(args.message, outp, price_tick=args.price_tick, workers=args.workers,
+                            chunk_bytes=int(args.chunk_mb * (1 << 20)))
+        count = st["snapshots"]
+        print(f"pipeline: {st['chunks']} chunks, {st['wall_s']:.2f}s wall, "
+              f"feature stage busy {st['feature_stage_s']:.2f}s")
     print(f"Wrote {outp} ({count} snapshots, {count*16} bytes)")
 
 
 if __name__ == "__main__":
     main()
-
-
@@ -0,0 +1,313 @@
+#!/usr/bin/env python3
+"""
+Synthetic LOBSTER message / orderbook streams for load and tail-latency tests.
+
+Real sessions are licensed; the host runners' synthetic packets (one price,
+a cross every 50th packet) never exercise the BBO rescans in SimpleBook or
+the burst / vol decay the way a market does. This builds arbitrarily long,
+reproducible (seeded) streams in the LOBSTER layout, vectorized end to end:
+
+  arrivals      order submissions as a Poisson process or a self-exciting
+                Hawkes process (exponential kernel, simulated generation by
+                generation through its branching structure)
+  deep book     an initial ladder of resting orders on every level, then
+                submissions at a geometric depth from a random-walk mid
+  lifetimes     every order ends in a deletion (type 3) or execution
+                (type 4) after an exponential lifetime, or is executed when
+                the mid walks through its price; some get a partial cancel
+                (type 2) first; orders alive at the end stay resting
+  cancel storms at Poisson storm times most orders near the touch are
+                deleted within a few milliseconds
+  crossings     a small fraction of orders is priced through the opposite
+                touch and executed shortly after, so the book is briefly
+                crossed (the reflex lane's trigger)
+
+Message rows are  time_s, type, order_id, size, price (* 1e4), direction
+(1 buy, -1 sell); orderbook rows are ask_p1, ask_s1, bid_p1, bid_s1, ... per
+message, with LOBSTER's +/-9999999999 / 0 for empty levels. Executions
+take the order's own price; no matching engine runs, so only crossing
+orders consume liquidity across the spread.
+
+  python3 models/datasets/synth_lobster.py --orders 1000000 --arrivals hawkes \\
+      --message data/synth_message_10.csv --orderbook data/synth_orderbook_10.csv
+"""
+import argparse
+from dataclasses import dataclass, fields
+from pathlib import Path
+from typing import Dict, Optional
+
+import numpy as np
+
+SUBMIT, CANCEL, DELETE, EXECUTE = 1, 2, 3, 4
+EMPTY_ASK, EMPTY_BID = 9_999_999_999, -9_999_999_999
+GRID_CELLS = 1 << 22  # orderbook chunk rows x price levels held at once
+
+
+@dataclass
+class SynthConfig:
+    orders: int = 100_000           # submissions after the initial ladder
+    seed: int = 0
+    start_s: float = 34_200.0       # 09:30:00, seconds after midnight
+    arrivals: str = "poisson"       # poisson | hawkes
+    rate_hz: float = 2_000.0        # Poisson rate / Hawkes background rate
+    hawkes_branching: float = 0.7   # expected children per event (< 1)
+    hawkes_decay_hz: float = 1_000.0
+    mid0: int = 1_000_000           # $100.00 in price * 1e4
+    tick: int = 100                 # $0.01
+    move_prob: float = 0.02         # mid moves one tick at this share of submissions
+    levels: int = 50                # ladder depth per side, and the deepest submission
+    ladder_orders: int = 2          # initial resting orders per level
+    depth_p: float = 0.25           # geometric depth from the touch (mean 1 / p levels)
+    size_mean: float = 100.0
+    lifetime_s: float = 0.5
+    execute_prob: float = 0.3       # share of orders that end in an execution
+    partial_prob: float = 0.2
+    storm_rate_hz: float = 1.0
+    storm_s: float = 0.005
+    storm_levels: int = 5           # orders this close to the mid are hit
+    storm_share: float = 0.8
+    cross_prob: float = 0.002
+    cross_life_s: float = 50e-6
+
+
+def poisson_times(n: int, rate_hz: float, rng: np.random.Generator) -> np.ndarray:
+    return np.cumsum(rng.exponential(1.0 / rate_hz, n))
+
+
+def hawkes_times(n: int, rate_hz: float, branching: float, decay_hz: float,
+                 rng: np.random.Generator) -> np.ndarray:
+    """
+    First n events of a Hawkes process with intensity
+    rate + sum branching * decay * exp(-decay * (t - t_i)). Immigrants are
+    Poisson; each event has Poisson(branching) children at Exp(decay)
+    offsets, one vectorized generation at a time.
+    """
+    if not 0.0 <= branching < 1.0:
+        raise ValueError(f"hawkes branching ratio must be in [0, 1), got {branching}")
+    horizon = 1.2 * n * (1.0 - branching) / rate_hz
+    while True:
+        gen = np.sort(rng.uniform(0.0, horizon, rng.poisson(rate_hz * horizon)))
+        out = [gen]
+        while gen.size:
+            kids = rng.poisson(branching, gen.size)
+            gen = np.repeat(gen, kids) + rng.exponential(1.0 / decay_hz, int(kids.sum()))
+            gen = gen[gen < horizon]
+            out.append(gen)
+        t = np.sort(np.concatenate(out))
+        if t.size >= n:
+            return t[:n]
+        horizon *= 1.5 * n / max(t.size, 1)
+
+
+def _orders(cfg: SynthConfig, rng: np.random.Generator):
+    """Submissions: ladder first, then the arrival stream. Prices in ticks."""
+    t_arr = (hawkes_times(cfg.orders, cfg.rate_hz, cfg.hawkes_branching, cfg.hawkes_decay_hz, rng)
+             if cfg.arrivals == "hawkes" else poisson_times(cfg.orders, cfg.rate_hz, rng))
+    mid0 = cfg.mid0 // cfg.tick
+    step = rng.choice([-1, 0, 1], cfg.orders, p=[cfg.move_prob / 2, 1.0 - cfg.move_prob, cfg.move_prob / 2])
+    mid = mid0 + np.cumsum(step)
+    side = rng.integers(0, 2, cfg.orders)          # 0 buy, 1 sell
+    depth = np.minimum(rng.geometric(cfg.depth_p, cfg.orders) - 1, cfg.levels - 1)
+    sign = np.where(side == 0, -1, 1)
+    price = mid + sign * (1 + depth)               # two-tick spread around the mid
+    cross = rng.random(cfg.orders) < cfg.cross_prob
+    price[cross] = mid[cross] - sign[cross] * (1 + rng.integers(0, 3, int(cross.sum())))
+
+    lad = np.arange(cfg.levels).repeat(cfg.ladder_orders)
+    l_side = np.r_[np.zeros(lad.size, np.int64), np.ones(lad.size, np.int64)]
+    l_price = np.r_[mid0 - 1 - lad, mid0 + 1 + lad]
+    n_lad = l_side.size
+
+    t = np.r_[np.zeros(n_lad), t_arr]
+    side = np.r_[l_side, side]
+    price = np.r_[l_price, price]
+    mid = np.r_[np.full(n_lad, mid0), mid]
+    cross = np.r_[np.zeros(n_lad, bool), cross]
+    size = np.maximum(1, rng.geometric(1.0 / cfg.size_mean, t.size))
+    life = rng.exponential(cfg.lifetime_s, t.size)
+    life[:n_lad] = np.inf                          # the ladder rests until a storm hits it
+    life[cross] = rng.uniform(0.2, 1.0, int(cross.sum())) * cfg.cross_life_s
+    return t, side, price, mid, size, life, cross
+
+
+def _first_cross(mid: np.ndarray, price: np.ndarray, side: np.ndarray) -> np.ndarray:
+    """
+    Index of the first later submission whose mid runs through the order
+    (buy: mid <= price - 1, sell: mid >= price + 1), or -1. The mid moves in
+    one-tick steps, so that is the first later index where mid equals the
+    level exactly: one searchsorted over (mid, index) keys.
+    """
+    n = mid.size
+    level = np.where(side == 0, price - 1, price + 1)
+    lo = int(min(mid.min(), level.min()))
+    keys = np.sort((mid - lo) * (n + 1) + np.arange(n))
+    q = (level - lo) * (n + 1) + np.arange(n) + 1
+    pos = np.searchsorted(keys, q)
+    hit = keys[np.minimum(pos, n - 1)]
+    ok = (pos < n) & (hit // (n + 1) == level - lo)
+    return np.where(ok, hit % (n + 1), -1)
+
+
+def _storms(cfg: SynthConfig, t, price, mid, end, rng: np.random.Generator) -> np.ndarray:
+    """Cut end (in place) for orders a storm deletes; True where that happened."""
+    horizon = float(t[-1])
+    hit = np.zeros(t.size, bool)
+    near = np.abs(price - mid) <= cfg.storm_levels
+    for ts in np.sort(rng.uniform(0.0, horizon, rng.poisson(cfg.storm_rate_hz * horizon))):
+        alive = near & (t < ts) & (end > ts) & (rng.random(t.size) < cfg.storm_share)
+        end[alive] = ts + rng.uniform(0.0, cfg.storm_s, int(alive.sum()))
+        hit |= alive
+    return hit
+
+
+def generate(cfg: SynthConfig) -> Dict[str, np.ndarray]:
+    """Message columns (time_s, type, order_id, size, price, direction), time ordered."""
+    if cfg.arrivals not in ("poisson", "hawkes"):
+        raise ValueError(f"unknown arrival process {cfg.arrivals!r}")
+    rng = np.random.default_rng(cfg.seed)
+    t, side, price, mid, size, life, cross = _orders(cfg, rng)
+    n = t.size
+    oid = np.arange(n, dtype=np.int64) + 1
+    end = t + life
+    # resting orders the mid walks through are executed (crossing orders are meant to cross)
+    j = _first_cross(mid, price, side)
+    swept = (j >= 0) & ~cross
+    swept &= t[np.where(swept, j, 0)] < end
+    end[swept] = t[j[swept]]
+    stormed = _storms(cfg, t, price, mid, end, rng)
+    filled = cross | (swept & ~stormed) | (~stormed & (rng.random(n) < cfg.execute_prob))
+    end_type = np.where(filled, EXECUTE, DELETE)
+    horizon = float(t[-1])
+
+    part = (rng.random(n) < cfg.partial_prob) & (size > 1) & ~cross
+    part_t = t + (np.minimum(end, horizon) - t) * rng.uniform(0.0, 1.0, n)
+    part_size = np.maximum(1, (size * rng.uniform(0.1, 0.9, n)).astype(np.int64))
+    part_size = np.minimum(part_size, size - 1)
+    ends = end <= horizon
+
+    # submits, partial cancels, final deletes / executions; order kind breaks time ties
+    cols = [
+        (t, np.full(n, SUBMIT), oid, size, price, side, np.zeros(n)),
+        (part_t[part], np.full(int(part.sum()), CANCEL), oid[part], part_size[part], price[part], side[part],
+         np.ones(int(part.sum()))),
+        (end[ends], end_type[ends], oid[ends], (size - np.where(part, part_size, 0))[ends], price[ends],
+         side[ends], np.where(swept, -1.0, 2.0)[ends]),   # a sweep fills before the submit that moved the mid
+    ]
+    ts, typ, ids, sz, px, sd, kind = (np.concatenate(c) for c in zip(*cols))
+    order = np.lexsort((kind, ts))
+    return {
+        "time_s": cfg.start_s + ts[order],
+        "type": typ[order].astype(np.int64),
+        "order_id": ids[order],
+        "size": sz[order].astype(np.int64),
+        "price": px[order].astype(np.int64) * cfg.tick,
+        "direction": np.where(sd[order] == 0, 1, -1),
+    }
+
+
+def orderbook(msg: Dict[str, np.ndarray], levels: int = 10) -> np.ndarray:
+    """
+    LOBSTER orderbook rows (book after each message), int64 [N, 4 * levels].
+    Per side and chunk of messages, size changes are scattered into a
+    [rows x prices] grid over the prices in use and cumsum'd down the rows;
+    the first `levels` non-empty prices from each touch are picked with a
+    rank cumsum along the prices.
+    """
+    px = msg["price"]
+    n = px.size
+    out = np.empty((n, 4 * levels), dtype=np.int64)
+    out[:, 0::4], out[:, 2::4] = EMPTY_ASK, EMPTY_BID
+    out[:, 1::4] = out[:, 3::4] = 0
+    if n == 0:
+        return out
+    pmin, pmax = int(px.min()), int(px.max())
+    tick = int(np.gcd.reduce(px - pmin)) or 1
+    cell = (px - pmin) // tick
+    n_px = (pmax - pmin) // tick + 1
+    signed = np.where(msg["type"] == SUBMIT, msg["size"], -msg["size"])
+    buy = msg["direction"] == 1
+    q = {True: np.zeros(n_px, np.int64), False: np.zeros(n_px, np.int64)}
+    chunk = max(1, GRID_CELLS // n_px)
+    for lo in range(0, n, chunk):
+        hi = min(n, lo + chunk)
+        rows = np.arange(hi - lo)
+        for is_buy, col in ((False, 0), (True, 2)):
+            m = buy[lo:hi] == is_buy
+            # only prices resting on this side or touched in the chunk, ascending
+            used = np.unique(np.r_[np.flatnonzero(q[is_buy]), cell[lo:hi][m]])
+            grid = np.zeros((hi - lo, used.size), np.int64)
+            np.add.at(grid, (rows[m], np.searchsorted(used, cell[lo:hi][m])), signed[lo:hi][m])
+            grid = np.cumsum(grid, axis=0) + q[is_buy][used]
+            q[is_buy][used] = grid[-1]
+            if is_buy:                                 # best (highest bid / lowest ask) first
+                grid, used = grid[:, ::-1], used[::-1]
+            live = grid > 0
+            rank = np.cumsum(live, axis=1)
+            r, c = np.nonzero(live & (rank <= levels))
+            lvl = rank[r, c] - 1
+            out[lo + r, 4 * lvl + col] = pmin + tick * used[c]
+            out[lo + r, 4 * lvl + col + 1] = grid[r, c]
+    return out
+
+
+def write_messages(path: Path, msg: Dict[str, np.ndarray], chunk_rows: int = 1 << 14) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    cols = [msg[k] for k in ("time_s", "type", "order_id", "size", "price", "direction")]
+    with path.open("w") as f:
+        for lo in range(0, cols[0].size, chunk_rows):
+            part = [c[lo:lo + chunk_rows].tolist() for c in cols]
+            f.write(("%.9f,%d,%d,%d,%d,%d\n" * len(part[0])) % tuple(v for r in zip(*part) for v in r))
+
+
+def write_orderbook(path: Path, ob: np.ndarray, chunk_rows: int = 1 << 14) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    row = ",".join(["%d"] * ob.shape[1]) + "\n"
+    with path.open("w") as f:
+        for lo in range(0, ob.shape[0], chunk_rows):
+            part = ob[lo:lo + chunk_rows]
+            f.write((row * part.shape[0]) % tuple(part.ravel().tolist()))   # one format call per chunk
+
+
+def summary(msg: Dict[str, np.ndarray], ob: Optional[np.ndarray] = None) -> str:
+    n = msg["time_s"].size
+    span = float(msg["time_s"][-1] - msg["time_s"][0]) if n else 0.0
+    counts = {k: int((msg["type"] == v).sum()) for k, v in
+              (("submit", SUBMIT), ("cancel", CANCEL), ("delete", DELETE), ("execute", EXECUTE))}
+    gaps = np.diff(msg["time_s"])
+    busy = float(np.mean(gaps < 1e-4)) if gaps.size else 0.0
+    s = (f"{n} messages over {span:.3f}s ({n / span if span else 0:.0f}/s), "
+         + ", ".join(f"{k}={v}" for k, v in counts.items()) + f", gaps<100us={busy:.1%}")
+    if ob is not None and n:
+        crossed = (ob[:, 2] != EMPTY_BID) & (ob[:, 0] != EMPTY_ASK) & (ob[:, 2] >= ob[:, 0])
+        s += f", crossed rows={int(crossed.sum())}"
+    return s
+
+
+def config_from_args(args: argparse.Namespace) -> SynthConfig:
+    return SynthConfig(**{f.name: getattr(args, f.name) for f in fields(SynthConfig)})
+
+
+def parse_args() -> argparse.Namespace:
+    ap = argparse.ArgumentParser(description="Generate synthetic LOBSTER message / orderbook CSVs.")
+    ap.add_argument("--message", required=True, help="Output message CSV")
+    ap.add_argument("--orderbook", help="Output orderbook CSV (book after every message)")
+    ap.add_argument("--book-levels", type=int, default=10, help="Levels per side in --orderbook")
+    for f in fields(SynthConfig):
+        ap.add_argument("--" + f.name.replace("_", "-"), type=type(f.default), default=f.default)
+    return ap.parse_args()
+
+
+def main():
+    args = parse_args()
+    msg = generate(config_from_args(args))
+    write_messages(Path(args.message), msg)
+    ob = None
+    if args.orderbook:
+        ob = orderbook(msg, args.book_levels)
+        write_orderbook(Path(args.orderbook), ob)
+    print(summary(msg, ob))
+    print(f"Wrote {args.message}" + (f" and {args.orderbook}" if args.orderbook else ""))
+
+
+if __name__ == "__main__":
+    main()
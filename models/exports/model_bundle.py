@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+"""
+Binary model bundle: int8 weights + int32 biases in one blob with a fixed header.
+
+The JSON export (mlp_int8.json) is fine for humans but every consumer has to
+round-trip it through Python lists. The bundle is the same model laid out the
+way the fabric wants it, so the PYNQ runtime can mmap it and copy it straight
+into a single pynq.allocate buffer for weight_loader.
+
+Layout (little-endian, i.e. the ARM/DDR view the weight_loader m_axi ports read):
+
+  [0:128)      header (HDR_FMT, zero padded)
+  W0 section   int8  [hidden, in_dim] row-major   (logreg: [1, in_dim])
+  B0 section   int32 [hidden]                     (logreg: [1])
+  W1 section   int8  [out_dim, hidden]            (logreg: empty)
+  B1 section   int32 [out_dim]                    (logreg: empty)
+
+Every section starts on a SECTION_ALIGN boundary, so weight_loader pointers are
+just buffer.physical_address + offset. Two CRC32s guard the header and payload.
+"""
+import argparse
+import json
+import struct
+import zlib
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Tuple
+
+import numpy as np
+
+MAGIC = b"MLPB"
+VERSION = 1
+HDR_LEN = 128
+SECTION_ALIGN = 64
+
+MODEL_TYPES = {"logreg": 0, "mlp": 1}
+SECTIONS = ("w0", "b0", "w1", "b1")
+SECTION_DTYPES = {"w0": np.int8, "b0": np.dtype("<i4"), "w1": np.int8, "b1": np.dtype("<i4")}
+SCALES = ("in_scale", "w0_scale", "b0_scale", "act0_scale", "w1_scale", "b1_scale")
+
+# magic, version, model_type, rsv, in_dim, hidden, out_dim, rsv,
+# 4 x (offset, nbytes), 6 x f64 scales, payload_crc32, header_crc32
+HDR_FMT = "<4sHBBHHHH" + "II" * len(SECTIONS) + "d" * len(SCALES) + "II"
+HDR_CRC_OFFSET = struct.calcsize(HDR_FMT) - 4
+assert struct.calcsize(HDR_FMT) <= HDR_LEN
+
+
+def _align(n: int) -> int:
+    return (n + SECTION_ALIGN - 1) // SECTION_ALIGN * SECTION_ALIGN
+
+
+@dataclass
+class ModelBundle:
+    model_type: str
+    in_dim: int
+    hidden: int
+    out_dim: int
+    scales: Dict[str, float]
+    sections: Dict[str, Tuple[int, int]]  # name -> (offset, nbytes)
+    raw: np.ndarray                       # whole bundle as uint8 (memmap when loaded from disk)
+
+    def array(self, name: str) -> np.ndarray:
+        """Zero-copy view of one section with its natural dtype and shape."""
+        off, nbytes = self.sections[name]
+        arr = self.raw[off:off + nbytes].view(SECTION_DTYPES[name])
+        if name == "w0":
+            return arr.reshape(-1, self.in_dim)
+        if name == "w1" and self.hidden:
+            return arr.reshape(-1, self.hidden)
+        return arr
+
+    @property
+    def nbytes(self) -> int:
+        return int(self.raw.size)
+
+
+def spec_arrays(spec: Dict) -> Dict[str, np.ndarray]:
+    """Pull the int8/int32 tensors out of a logreg/mlp int8 JSON spec."""
+    if spec["type"] == "logreg":
+        return {
+            "w0": np.array(spec["w_int8"], dtype=np.int8).reshape(1, -1),
+            "b0": np.array(spec["b_int32"], dtype=np.int32).reshape(-1),
+            "w1": np.zeros((0,), dtype=np.int8),
+            "b1": np.zeros((0,), dtype=np.int32),
+        }
+    if spec["type"] == "mlp":
+        return {
+            "w0": np.array(spec["w0_int8"], dtype=np.int8),
+            "b0": np.array(spec["b0_int32"], dtype=np.int32).reshape(-1),
+            "w1": np.array(spec["w1_int8"], dtype=np.int8),
+            "b1": np.array(spec["b1_int32"], dtype=np.int32).reshape(-1),
+        }
+    raise ValueError(f"Unknown model type: {spec['type']}")
+
+
+def spec_scales(spec: Dict) -> Dict[str, float]:
+    if spec["type"] == "logreg":
+        return {
+            "in_scale": float(spec["in_scale"]),
+            "w0_scale": float(spec["w_scale"]),
+            "b0_scale": float(spec["b_scale"]),
+            "act0_scale": 0.0,
+            "w1_scale": 0.0,
+            "b1_scale": 0.0,
+        }
+    return {name: float(spec[name]) for name in SCALES}
+
+
+def pack_bundle(spec: Dict) -> bytes:
+    arrays = spec_arrays(spec)
+    scales = spec_scales(spec)
+    w0 = arrays["w0"]
+    in_dim = int(w0.shape[1])
+    hidden = int(w0.shape[0]) if spec["type"] == "mlp" else 0
+    out_dim = int(arrays["w1"].shape[0]) if spec["type"] == "mlp" else 1
+
+    blobs = [arrays[name].astype(SECTION_DTYPES[name]).tobytes(order="C") for name in SECTIONS]
+    offsets = []
+    off = HDR_LEN
+    for blob in blobs:
+        offsets.append((off, len(blob)))
+        off = _align(off + len(blob))
+    total = _align(offsets[-1][0] + offsets[-1][1])
+
+    buf = bytearray(total)
+    for (o, n), blob in zip(offsets, blobs):
+        buf[o:o + n] = blob
+    payload_crc = zlib.crc32(bytes(buf[HDR_LEN:]))
+
+    fields = [MAGIC, VERSION, MODEL_TYPES[spec["type"]], 0, in_dim, hidden, out_dim, 0]
+    for o, n in offsets:
+        fields += [o, n]
+    fields += [scales[name] for name in SCALES]
+    fields += [payload_crc, 0]
+    struct.pack_into(HDR_FMT, buf, 0, *fields)
+    struct.pack_into("<I", buf, HDR_CRC_OFFSET, zlib.crc32(bytes(buf[:HDR_CRC_OFFSET])))
+    return bytes(buf)
+
+
+def write_bundle(path: Path, spec: Dict) -> Path:
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(pack_bundle(spec))
+    return path
+
+
+def parse_bundle(raw: np.ndarray, verify: bool = True) -> ModelBundle:
+    """Parse a bundle held in a uint8 array (bytes, memmap or pynq buffer)."""
+    raw = np.asarray(raw).view(np.uint8).reshape(-1)
+    if raw.size < HDR_LEN:
+        raise ValueError(f"bundle too short: {raw.size} bytes")
+    hdr = raw[:HDR_LEN].tobytes()
+    fields = struct.unpack_from(HDR_FMT, hdr)
+    magic, version, model_type, _, in_dim, hidden, out_dim, _ = fields[:8]
+    if magic != MAGIC:
+        raise ValueError(f"bad bundle magic {magic!r}")
+    if version != VERSION:
+        raise ValueError(f"unsupported bundle version {version}")
+    sec = fields[8:8 + 2 * len(SECTIONS)]
+    sections = {name: (sec[2 * i], sec[2 * i + 1]) for i, name in enumerate(SECTIONS)}
+    scale_vals = fields[8 + 2 * len(SECTIONS):8 + 2 * len(SECTIONS) + len(SCALES)]
+    payload_crc, header_crc = fields[-2:]
+    if verify:
+        if zlib.crc32(hdr[:HDR_CRC_OFFSET]) != header_crc:
+            raise ValueError("bundle header checksum mismatch")
+        if zlib.crc32(raw[HDR_LEN:].tobytes()) != payload_crc:
+            raise ValueError("bundle payload checksum mismatch")
+    for name, (o, n) in sections.items():
+        if o + n > raw.size:
+            raise ValueError(f"bundle section {name} [{o}:{o + n}) past end ({raw.size} bytes)")
+    types = {v: k for k, v in MODEL_TYPES.items()}
+    return ModelBundle(
+        model_type=types.get(model_type, str(model_type)),
+        in_dim=in_dim,
+        hidden=hidden,
+        out_dim=out_dim,
+        scales=dict(zip(SCALES, scale_vals)),
+        sections=sections,
+        raw=raw,
+    )
+
+
+def load_bundle(path: Path, mmap: bool = True, verify: bool = True) -> ModelBundle:
+    """Open a bundle; with mmap=True section arrays are views onto the file."""
+    if mmap:
+        raw = np.memmap(Path(path), dtype=np.uint8, mode="r")
+    else:
+        raw = np.fromfile(Path(path), dtype=np.uint8)
+    return parse_bundle(raw, verify=verify)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Pack an int8 JSON export into a binary model bundle, or inspect one.")
+    ap.add_argument("--int8-json", help="logreg_int8.json or mlp_int8.json to pack")
+    ap.add_argument("--out", help="Output bundle path (with --int8-json)")
+    ap.add_argument("--inspect", help="Print the header of an existing bundle")
+    args = ap.parse_args()
+
+    if args.int8_json:
+        if not args.out:
+            ap.error("--out is required with --int8-json")
+        spec = json.loads(Path(args.int8_json).read_text())
+        p = write_bundle(Path(args.out), spec)
+        print(f"Wrote {p} ({p.stat().st_size} bytes)")
+    if args.inspect:
+        b = load_bundle(Path(args.inspect))
+        print(f"{args.inspect}: type={b.model_type} in_dim={b.in_dim} hidden={b.hidden} out_dim={b.out_dim} bytes={b.nbytes}")
+        for name, (o, n) in b.sections.items():
+            print(f"  {name}: offset=0x{o:04x} bytes={n}")
+        for name, v in b.scales.items():
+            print(f"  {name} = {v!r}")
+    if not args.int8_json and not args.inspect:
+        ap.error("nothing to do (use --int8-json/--out or --inspect)")
+
+
+if __name__ == "__main__":
+    main()
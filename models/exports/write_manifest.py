@@ -6,30 +6,35 @@ from typing import List
 
 import numpy as np
 
+# Repo-local imports
+import sys
+REPO_ROOT = Path(__file__).resolve().parents[2]
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+from models.exports.model_bundle import load_bundle, write_bundle  # noqa: E402
+
+
+# Row i of the table is the text "ii\n" for byte value i; indexing it with a
+# uint8 array formats a whole section in one go instead of per-byte f-strings.
+_HEX_LINES = np.frombuffer("".join(f"{i:02x}\n" for i in range(256)).encode("ascii"), dtype=np.uint8).reshape(256, 3)
+
 
 def write_mem_bytes(path: Path, data_bytes: bytes) -> None:
     """
     Write a .mem file with one byte per line in hex (Vivado compatible for BRAM init).
     """
     path.parent.mkdir(parents=True, exist_ok=True)
-    with path.open("w") as f:
-        for b in data_bytes:
-            f.write(f"{b:02x}\n")
+    arr = np.frombuffer(bytes(data_bytes), dtype=np.uint8)
+    path.write_bytes(_HEX_LINES[arr].tobytes())
 
 
 def write_mem_int32(path: Path, data: np.ndarray, endian: str = "big") -> None:
     """
     Write 32-bit integers as 4 bytes per line (hex), big-endian by default.
     """
-    assert data.dtype == np.int32
-    path.parent.mkdir(parents=True, exist_ok=True)
-    with path.open("w") as f:
-        for v in data:
-            u = np.uint32(v).item()
-            if endian == "big":
-                f.write(f"{(u >> 24) & 0xFF:02x}\n{(u >> 16) & 0xFF:02x}\n{(u >> 8) & 0xFF:02x}\n{u & 0xFF:02x}\n")
-            else:
-                f.write(f"{u & 0xFF:02x}\n{(u >> 8) & 0xFF:02x}\n{(u >> 16) & 0xFF:02x}\n{(u >> 24) & 0xFF:02x}\n")
+    assert data.dtype.kind == "i" and data.dtype.itemsize == 4
+    write_mem_bytes(path, data.astype(">i4" if endian == "big" else "<i4").tobytes())
 
 
 def write_mem_int8_matrix(path: Path, mat: np.ndarray) -> None:
@@ -51,15 +56,18 @@ def main():
     outdir = Path(args.outdir)
     outdir.mkdir(parents=True, exist_ok=True)
 
+    # The binary bundle is the source of truth; .mem files are rendered from its sections
+    bundle_path = write_bundle(outdir / "model.bin", spec)
+    bundle = load_bundle(bundle_path)
+
     manifest = {"type": spec["type"], "files": {}, "scales": {}, "topology": {}}
 
     if spec["type"] == "logreg":
-        w = np.array(spec["w_int8"], dtype=np.int8)  # [1, in_dim]
-        b = np.array(spec["b_int32"], dtype=np.int32)
+        w = bundle.array("w0")  # [1, in_dim]
         w_path = outdir / "w0.mem"
         b_path = outdir / "b0.mem"
         write_mem_int8_matrix(w_path, w)
-        write_mem_int32(b_path, b, endian=args.endian)
+        write_mem_int32(b_path, bundle.array("b0"), endian=args.endian)
         manifest["files"] = {"w0": str(w_path), "b0": str(b_path)}
         manifest["scales"] = {
             "in_scale": spec["in_scale"],
@@ -68,18 +76,16 @@ def main():
         }
         manifest["topology"] = {"in_dim": int(w.shape[1]), "out_dim": 1}
     elif spec["type"] == "mlp":
-        w0 = np.array(spec["w0_int8"], dtype=np.int8)
-        b0 = np.array(spec["b0_int32"], dtype=np.int32)
-        w1 = np.array(spec["w1_int8"], dtype=np.int8)
-        b1 = np.array(spec["b1_int32"], dtype=np.int32)
+        w0 = bundle.array("w0")
+        w1 = bundle.array("w1")
         w0_path = outdir / "w0.mem"
         b0_path = outdir / "b0.mem"
         w1_path = outdir / "w1.mem"
         b1_path = outdir / "b1.mem"
         write_mem_int8_matrix(w0_path, w0)
-        write_mem_int32(b0_path, b0, endian=args.endian)
+        write_mem_int32(b0_path, bundle.array("b0"), endian=args.endian)
         write_mem_int8_matrix(w1_path, w1)
-        write_mem_int32(b1_path, b1, endian=args.endian)
+        write_mem_int32(b1_path, bundle.array("b1"), endian=args.endian)
         manifest["files"] = {"w0": str(w0_path), "b0": str(b0_path), "w1": str(w1_path), "b1": str(b1_path)}
         manifest["scales"] = {
             "in_scale": spec["in_scale"],
@@ -93,6 +99,12 @@ def main():
     else:
         raise ValueError(f"Unknown model type: {spec['type']}")
 
+    manifest["bundle"] = {
+        "path": str(bundle_path),
+        "bytes": bundle.nbytes,
+        "sections": {name: {"offset": o, "bytes": n} for name, (o, n) in bundle.sections.items()},
+    }
+
     (outdir / "model_manifest.json").write_text(json.dumps(manifest, indent=2))
     print(f"Wrote manifest and mem files to {outdir}")
 
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+FeatureState: the complete per-stream state behind a LOB1 feature snapshot.
+
+Book (16 levels per side), OFI accumulator, burst/vol recurrences, last
+timestamp and previous mid, held in flat slot attributes instead of locals of
+a generator, so a replay can be checkpointed (snapshot), resumed (restore) or
+seeded at a split point in another process.
+
+  step(delta)         one event -> (ofi, imb_q1_15, burst, vol), as features_ref
+  step_batch(deltas)  EVENT_DTYPE array -> FEAT_DTYPE via features_vec;
+                      any other iterable of deltas -> list of step() results
+
+A delta is anything unpacking as EVENT_DTYPE's field order:
+(ts_ns, price_ticks, qty, level, side, action). Levels >= N_LEVELS map to 0,
+as in features_vec.events_from_deltas.
+"""
+from typing import Iterable, Optional, Tuple
+
+N_LEVELS = 16
+Q16 = 16
+I32_MAX = 2**31 - 1
+I32_MIN = -(2**31)
+U32_MAX = 0xFFFFFFFF
+
+
+class FeatureState:
+    __slots__ = ("bid_p", "bid_q", "ask_p", "ask_q", "ofi", "burst", "vol", "last_t", "mid_prev",
+                 "tau_burst_ns", "tau_vol_ns")
+
+    def __init__(self, tau_burst_ns: int = 200_000, tau_vol_ns: int = 2_000_000):
+        self.tau_burst_ns = int(tau_burst_ns)
+        self.tau_vol_ns = int(tau_vol_ns)
+        self.reset()
+
+    def reset(self) -> None:
+        """Zero state, as a packet with the reset flag (bit15) does."""
+        self.bid_p = [0] * N_LEVELS
+        self.bid_q = [0] * N_LEVELS
+        self.ask_p = [0] * N_LEVELS
+        self.ask_q = [0] * N_LEVELS
+        self.ofi = 0
+        self.burst = 0
+        self.vol = 0
+        self.last_t: Optional[int] = None
+        self.mid_prev = 0
+
+    def apply_book(self, price_ticks: int, qty: int, level: int, side: int, action: int) -> None:
+        """Book and OFI part of a step (no timestamp, no decay)."""
+        if level >= N_LEVELS:
+            level = 0
+        if side == 0:
+            bp, bq = self.bid_p, self.bid_q
+        else:
+            bp, bq = self.ask_p, self.ask_q
+        if action == 0:
+            bp[level] = price_ticks
+            bq[level] = qty
+        elif action == 1 or action == 2:
+            bq[level] += qty
+            ofi = self.ofi + (qty if side == 0 else -qty)
+            self.ofi = I32_MAX if ofi > I32_MAX else (I32_MIN if ofi < I32_MIN else ofi)
+        elif action == 3:
+            bq[level] = 0
+        if bq[level] < 0:
+            bq[level] = 0
+
+    def imbalance(self) -> int:
+        """Level-0 imbalance, Q1.15, truncating division as in HLS."""
+        b, a = self.bid_q[0], self.ask_q[0]
+        den = b + a
+        if den == 0:
+            return 0
+        num = (b - a) << 15
+        imb = num // den if num >= 0 else -((-num) // den)
+        return max(min(imb, 2**15 - 1), -(2**15))
+
+    def step(self, delta) -> Tuple[int, int, int, int]:
+        ts_ns, price_ticks, qty, level, side, action = delta
+        ts_ns = int(ts_ns)
+        self.apply_book(int(price_ticks), int(qty), int(level), int(side), int(action))
+
+        dt = 0 if self.last_t is None else max(0, ts_ns - self.last_t)
+        self.last_t = ts_ns
+        burst = self.burst - (self.burst * dt // self.tau_burst_ns) + (1 << Q16)
+        self.burst = max(0, min(burst, U32_MAX))
+        mid_now = (self.bid_p[0] + self.ask_p[0]) // 2
+        dp = abs(mid_now - self.mid_prev)
+        self.mid_prev = mid_now
+        vol = self.vol + (((dp << Q16) - self.vol) * dt // self.tau_vol_ns)
+        self.vol = max(0, min(vol, U32_MAX))
+        return self.ofi, self.imbalance(), self.burst, self.vol
+
+    def step_batch(self, deltas: Iterable):
+        if getattr(deltas, "dtype", None) is not None and deltas.dtype.names:
+            try:
+                from models.features_vec import features
+            except ImportError:
+                from features_vec import features
+            return features(deltas, tau_burst_ns=self.tau_burst_ns, tau_vol_ns=self.tau_vol_ns, state=self)
+        return [self.step(d) for d in deltas]
+
+    def snapshot(self) -> tuple:
+        """Flat, immutable, picklable copy of the state (taus are configuration, not state)."""
+        return (*self.bid_p, *self.bid_q, *self.ask_p, *self.ask_q,
+                self.ofi, self.burst, self.vol, self.last_t, self.mid_prev)
+
+    def restore(self, snap: tuple) -> "FeatureState":
+        n = N_LEVELS
+        if len(snap) != 4 * n + 5:
+            raise ValueError(f"snapshot has {len(snap)} fields, expected {4 * n + 5}")
+        self.bid_p = list(snap[0:n])
+        self.bid_q = list(snap[n:2 * n])
+        self.ask_p = list(snap[2 * n:3 * n])
+        self.ask_q = list(snap[3 * n:4 * n])
+        self.ofi, self.burst, self.vol, self.last_t, self.mid_prev = snap[4 * n:]
+        return self
+
+    @classmethod
+    def from_snapshot(cls, snap: tuple, tau_burst_ns: int = 200_000, tau_vol_ns: int = 2_000_000) -> "FeatureState":
+        return cls(tau_burst_ns, tau_vol_ns).restore(snap)
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, FeatureState) and self.snapshot() == other.snapshot()
+
+    def __repr__(self) -> str:
+        return (f"FeatureState(bid0={self.bid_p[0]}x{self.bid_q[0]}, ask0={self.ask_p[0]}x{self.ask_q[0]}, "
+                f"ofi={self.ofi}, burst={self.burst}, vol={self.vol}, last_t={self.last_t})")
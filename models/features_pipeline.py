@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+"""
+Staged features.bin build: reader -> parser workers -> ordered feature stage -> writer.
+
+  reader     (process) readinto() large newline-aligned chunks of the CSV
+  parsers    (N procs) text -> float64 columns (the expensive, stateless part)
+  features   (main)    reorders chunks, runs features_vec with a FeatureState so the
+                       stateful recurrence sees one continuous stream
+  writer     (process) one write() per chunk of 16B snapshots
+
+Chunks travel through fixed pools of multiprocessing.shared_memory blocks;
+queues only carry (slot, nbytes, chunk_idx) tuples, never the data. The free
+slot queues are the back-pressure: a stage blocks when the next one falls
+behind, so memory stays bounded however large the day is.
+
+Output is byte-identical to features_ref.run() / features_vec.run().
+
+features_split() is the other way to spread one long day over cores: a
+vectorized state-only pass (features_vec.book_checkpoints) leaves the exact
+book at each time-chunk boundary, every chunk is computed in parallel from its
+checkpoint with burst/vol guessed by walking the WARMUP_EVENTS before it, and
+the main process re-walks each chunk from its true burst/vol only until it
+meets the guessed walk (features_vec.resync_decay). The decays forget their
+start within a few tau, so the serial part is a small fraction of the day.
+"""
+import multiprocessing as mp
+import queue
+import time
+from multiprocessing import shared_memory
+from pathlib import Path
+
+import numpy as np
+
+from models.feature_state import FeatureState
+from models.features_vec import (FEAT_DTYPE, _burst_walk, _vol_walk, book_checkpoints, events_from_cols, features,
+                                 parse_lobster_lines, resync_decay)
+
+CHUNK_BYTES = 4 << 20
+MIN_ROW_BYTES = 12   # "t,1,i,s,p,d\n": fewest bytes a parseable row can take
+N_COLS = 5
+FEAT_LEN = 16
+WARMUP_EVENTS = 4096   # decay steps walked before a split chunk to guess its burst/vol
+
+
+def _slot_pool(ctx, n: int, size: int):
+    shms = [shared_memory.SharedMemory(create=True, size=size) for _ in range(n)]
+    free = ctx.Queue()
+    for i in range(n):
+        free.put(i)
+    return shms, free
+
+
+def _reader(src, raw_shms, raw_free, parse_q, n_parsers, chunk_bytes):
+    tail = b""
+    idx = 0
+    with open(src, "rb") as f:
+        while True:
+            slot = raw_free.get()
+            buf = raw_shms[slot].buf
+            t = len(tail)
+            buf[:t] = tail
+            n = f.readinto(buf[t:chunk_bytes])
+            total = t + n
+            if n == 0:
+                if total:
+                    parse_q.put((slot, total, idx))  # last line without trailing newline
+                else:
+                    raw_free.put(slot)
+                break
+            cut = bytes(buf[:total]).rfind(b"\n") + 1
+            if cut == 0:
+                raise RuntimeError(f"line longer than chunk ({chunk_bytes} bytes) at chunk {idx}")
+            tail = bytes(buf[cut:total])
+            parse_q.put((slot, cut, idx))
+            idx += 1
+    for _ in range(n_parsers):
+        parse_q.put(None)
+
+
+def _parser(raw_shms, raw_free, parsed_shms, parsed_free, parse_q, feat_q):
+    while True:
+        # Take the output slot before the chunk: whoever holds the next chunk
+        # in order can always finish, so the ordered stage never deadlocks.
+        pslot = parsed_free.get()
+        item = parse_q.get()
+        if item is None:
+            parsed_free.put(pslot)
+            feat_q.put(None)
+            return
+        slot, n, idx = item
+        text = bytes(raw_shms[slot].buf[:n]).decode()
+        raw_free.put(slot)
+        cols = parse_lobster_lines(text.splitlines())
+        out = np.ndarray(cols.shape, dtype=np.float64, buffer=parsed_shms[pslot].buf)
+        out[:] = cols
+        feat_q.put((pslot, len(cols), idx))
+
+
+def _writer(out_path, out_shms, out_free, write_q):
+    with open(out_path, "wb") as f:
+        while True:
+            item = write_q.get()
+            if item is None:
+                return
+            slot, nbytes = item
+            f.write(out_shms[slot].buf[:nbytes])
+            out_free.put(slot)
+
+
+def build_features(src, out, price_tick: float = 1.0,
+                   tau_burst_ns: int = 200_000, tau_vol_ns: int = 2_000_000,
+                   workers: int = 2, chunk_bytes: int = CHUNK_BYTES) -> dict:
+    """Stream src (LOBSTER CSV) to out (features.bin). Returns counts and stage timing."""
+    ctx = mp.get_context()
+    workers = max(1, int(workers))
+    max_rows = chunk_bytes // MIN_ROW_BYTES + 1
+    raw_shms, raw_free = _slot_pool(ctx, 2 * workers + 2, chunk_bytes)
+    parsed_shms, parsed_free = _slot_pool(ctx, 2 * workers + 1, max_rows * N_COLS * 8)
+    out_shms, out_free = _slot_pool(ctx, 3, max_rows * FEAT_LEN)
+    parse_q, feat_q, write_q = ctx.Queue(), ctx.Queue(), ctx.Queue()
+    Path(out).parent.mkdir(parents=True, exist_ok=True)
+
+    procs = [ctx.Process(target=_reader, args=(str(src), raw_shms, raw_free, parse_q, workers, chunk_bytes))]
+    procs += [ctx.Process(target=_parser, args=(raw_shms, raw_free, parsed_shms, parsed_free, parse_q, feat_q))
+              for _ in range(workers)]
+    procs.append(ctx.Process(target=_writer, args=(str(out), out_shms, out_free, write_q)))
+
+    t_start = time.perf_counter()
+    busy = 0.0
+    rows = chunks = 0
+    state = FeatureState(tau_burst_ns, tau_vol_ns)
+    t0 = None
+    try:
+        for p in procs:
+            p.start()
+        pending = {}
+        next_idx = 0
+        parsers_done = 0
+        while parsers_done < workers or pending:
+            if next_idx not in pending:
+                if parsers_done == workers:
+                    raise RuntimeError(f"chunk {next_idx} never arrived")
+                try:
+                    item = feat_q.get(timeout=1.0)
+                except queue.Empty:
+                    dead = [p for p in procs if p.exitcode not in (None, 0)]
+                    if dead:
+                        raise RuntimeError(f"pipeline stage exited with code {dead[0].exitcode}")
+                    continue
+                if item is None:
+                    parsers_done += 1
+                else:
+                    pending[item[2]] = item
+                continue
+
+            pslot, n, _ = pending.pop(next_idx)
+            t_busy = time.perf_counter()
+            cols = np.ndarray((n, N_COLS), dtype=np.float64, buffer=parsed_shms[pslot].buf)
+            if t0 is None and n:
+                t0 = float(cols[0, 0])  # first parseable row of the file anchors time
+            ev = events_from_cols(cols, t0 if t0 is not None else 0.0, price_tick)
+            del cols
+            parsed_free.put(pslot)
+            feats = features(ev, tau_burst_ns=tau_burst_ns, tau_vol_ns=tau_vol_ns, state=state)
+            if len(feats):
+                wslot = out_free.get()
+                nbytes = feats.nbytes
+                dst = np.ndarray((nbytes,), dtype=np.uint8, buffer=out_shms[wslot].buf)
+                dst[:] = feats.view(np.uint8)
+                del dst
+                write_q.put((wslot, nbytes))
+            busy += time.perf_counter() - t_busy
+            rows += len(feats)
+            chunks += 1
+            next_idx += 1
+        write_q.put(None)
+        for p in procs:
+            p.join()
+        bad = [p.exitcode for p in procs if p.exitcode != 0]
+        if bad:
+            raise RuntimeError(f"pipeline stage exited with code {bad[0]}")
+    finally:
+        for p in procs:
+            if p.is_alive():
+                p.terminate()
+        for shm in raw_shms + parsed_shms + out_shms:
+            shm.close()
+            shm.unlink()
+    wall = time.perf_counter() - t_start
+    return {"snapshots": rows, "chunks": chunks, "wall_s": wall, "feature_stage_s": busy}
+
+
+def _split_job(job):
+    ev, snap, warm_dt, warm_dp, tau_burst_ns, tau_vol_ns = job
+    st = FeatureState.from_snapshot(snap, tau_burst_ns, tau_vol_ns)
+    if warm_dt:
+        st.burst = _burst_walk(warm_dt, st.tau_burst_ns)[-1]
+        st.vol = _vol_walk(warm_dt, warm_dp, st.tau_vol_ns)[-1]
+    return features(ev, tau_burst_ns=tau_burst_ns, tau_vol_ns=tau_vol_ns, state=st)
+
+
+def features_split(ev: np.ndarray, tau_burst_ns: int = 200_000, tau_vol_ns: int = 2_000_000,
+                   workers: int = 2, n_chunks: int = 0, state: FeatureState = None,
+                   stats: dict = None) -> np.ndarray:
+    """
+    features(ev) computed as n_chunks time slices on a process pool, each seeded
+    from a checkpoint. Starts from state (if given) and leaves it at the end of ev.
+    stats, if given, receives the wall time of the serial parts (checkpoint_s,
+    resync_s) and the number of resynced steps.
+    """
+    workers = max(1, int(workers))
+    n_chunks = max(1, int(n_chunks or workers))
+    if state is None:
+        state = FeatureState(tau_burst_ns, tau_vol_ns)
+    n = len(ev)
+    if n == 0:
+        return np.zeros(0, dtype=FEAT_DTYPE)
+    bounds = np.linspace(0, n, min(n_chunks, n) + 1).astype(np.int64).tolist()
+    burst, vol = state.burst, state.vol
+    t0 = time.perf_counter()
+    snaps, dt, dp_q16 = book_checkpoints(ev, bounds, state)
+    jobs = []
+    for k, (a, b) in enumerate(zip(bounds[:-1], bounds[1:])):
+        w = max(0, a - WARMUP_EVENTS) if k else a   # the first chunk's burst/vol are exact
+        jobs.append((ev[a:b], snaps[k], dt[w:a].tolist(), dp_q16[w:a].tolist(), tau_burst_ns, tau_vol_ns))
+    t1 = time.perf_counter()
+    if workers == 1 or len(jobs) == 1:
+        results = [_split_job(j) for j in jobs]
+    else:
+        with mp.get_context().Pool(min(workers, len(jobs))) as pool:
+            results = pool.map(_split_job, jobs)
+    t2 = time.perf_counter()
+    out = np.empty(n, dtype=FEAT_DTYPE)  # concatenate would drop the wire (big-endian) byte order
+    resynced = 0
+    for k, (a, b, feats) in enumerate(zip(bounds[:-1], bounds[1:], results)):
+        out[a:b] = feats
+        if k:
+            fb, fv = resync_decay(dt[a:b], dp_q16[a:b], burst, vol, out["burst"][a:b], out["vol"][a:b],
+                                  tau_burst_ns, tau_vol_ns)
+            out["burst"][a:a + len(fb)] = fb
+            out["vol"][a:a + len(fv)] = fv
+            resynced += len(fb)
+        burst, vol = int(out["burst"][b - 1]), int(out["vol"][b - 1])
+    state.burst, state.vol = burst, vol
+    if stats is not None:
+        stats.update(checkpoint_s=t1 - t0, parallel_s=t2 - t1, resync_s=time.perf_counter() - t2,
+                     resynced_steps=resynced, chunks=len(jobs))
+    return out
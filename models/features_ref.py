@@ -1,7 +1,12 @@
 #!/usr/bin/env python3
 import csv
 import struct
-from typing import Iterator, Tuple
+from typing import Iterator, Optional, Tuple
+
+try:
+    from models.feature_state import FeatureState
+except ImportError:  # run as a script from models/
+    from feature_state import FeatureState
 
 # Feature snapshot matches protocol lob_v1_feat_t (network byte order in wire)
 # Here we emit big-endian packing: >iHHiI
@@ -17,22 +22,16 @@ def clamp16(x: int) -> int:
 def run(csv_path: str,
         price_tick: float = 1.0,
         tau_burst_ns: int = 200_000,
-        tau_vol_ns: int = 2_000_000) -> Iterator[Tuple[int, bytes]]:
+        tau_vol_ns: int = 2_000_000,
+        state: Optional[FeatureState] = None) -> Iterator[Tuple[int, bytes]]:
     """
     Consume a CSV of LOB events and yield (ts_ns, 16B features blob) per event.
     CSV columns expected by host replay mapping:
       time_seconds, type, order_id, size, price, direction
     We map to deltas compatibly with the host replayer's simplified logic.
+    With state, the walk continues from (and advances) that FeatureState.
     """
-    # Top-N levels
-    N = 16
-    bid = [{'p': 0, 'q': 0} for _ in range(N)]
-    ask = [{'p': 0, 'q': 0} for _ in range(N)]
-    ofi = 0
-    burst = 0  # Q16.16
-    vol = 0    # Q16.16
-    last_t = None
-    mid_prev = 0
+    st = state if state is not None else FeatureState(tau_burst_ns, tau_vol_ns)
 
     with open(csv_path, newline='') as f:
         rdr = csv.reader(f)
@@ -61,52 +60,7 @@ def run(csv_path: str,
             price_ticks = int(round(price / price_tick))
             level = 0  # simplified level mapping as in host replayer
 
-            book = bid if side == 0 else ask
-            if action == 0:
-                book[level]['p'] = price_ticks
-                book[level]['q'] = qty
-            elif action == 1:
-                book[level]['q'] += qty
-            elif action == 2:
-                # host encodes update qty as delta (can be negative)
-                book[level]['q'] += qty
-            elif action == 3:
-                # Remove => clear level (host sends qty=0 for delete)
-                book[level]['q'] = 0
-            # Clamp non-negative
-            if book[level]['q'] < 0:
-                book[level]['q'] = 0
-
-            # OFI accumulator
-            sgn = +1 if side == 0 else -1
-            # Count only add/update; set/remove not included
-            amt = qty if action in (1, 2) else 0
-            ofi = clamp32(ofi + sgn * amt)
-
-            bid0_q = bid[0]['q']; ask0_q = ask[0]['q']
-            den = bid0_q + ask0_q
-            if den != 0:
-                num_scaled = (bid0_q - ask0_q) << 15
-                if num_scaled >= 0:
-                    imb_q1_15 = clamp16(num_scaled // den)
-                else:
-                    imb_q1_15 = clamp16(-((-num_scaled) // den))
-            else:
-                imb_q1_15 = 0
-
-            dt = 0 if last_t is None else max(0, ts_ns - last_t)
-            last_t = ts_ns
-
-            # Burst: v = v - v*dt/tau + 1
-            burst = burst - (burst * dt // tau_burst_ns) + (1 << Q16)
-            burst = max(0, min(burst, 0xFFFFFFFF))
-
-            # Micro-volatility on mid changes
-            mid_now = (bid[0]['p'] + ask[0]['p']) // 2
-            dp = abs(mid_now - mid_prev)
-            mid_prev = mid_now
-            vol = vol + (((dp << Q16) - vol) * dt // tau_vol_ns)
-            vol = max(0, min(vol, 0xFFFFFFFF))
+            ofi, imb_q1_15, burst, vol = st.step((ts_ns, price_ticks, qty, level, side, action))
 
             # Pack as: int32 (ofi), int16 (imb), uint16 (rsv0), uint32 (burst), uint32 (vol)
             feat = struct.pack(">ihHII", ofi, imb_q1_15, 0, burst & 0xFFFFFFFF, vol & 0xFFFFFFFF)
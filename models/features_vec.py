@@ -0,0 +1,462 @@
+#!/usr/bin/env python3
+"""
+Vectorized feature engine, bit-exact with models/features_ref.py.
+
+features_ref.run() walks one event at a time with list-of-dict book state.
+Here the same recurrences are evaluated over whole NumPy columns:
+
+  - level-0 qty per side is a reflected walk q_t = max(0, q_{t-1} + d_t) that
+    restarts on set/remove/reset. Within a segment it is W_t - min(0, min W),
+    with W the segmented cumsum, so it needs only cumsum/cummin.
+  - level-0 price is a forward fill of the last set (action 0).
+  - OFI is a segmented cumsum; the int32 clamp is checked and only the tail
+    after the first saturation is walked in Python.
+  - imbalance is elementwise (truncating division, as in HLS).
+  - burst/vol are floor-division recurrences; they stay a scalar loop, but a
+    tight one over plain ints with everything else precomputed.
+
+Event columns use EVENT_DTYPE (the LOB1 delta fields plus a timestamp), so the
+same engine runs on LOBSTER CSV rows or on deltas decoded from packet dumps.
+"""
+import csv
+from typing import Optional, Tuple
+
+import numpy as np
+
+try:
+    from models.feature_state import N_LEVELS, FeatureState
+except ImportError:  # run as a script from models/
+    from feature_state import N_LEVELS, FeatureState
+
+Q16 = 16
+I32_MAX = 2**31 - 1
+I32_MIN = -(2**31)
+U32_MAX = 0xFFFFFFFF
+
+# protocol/lob_v1.h, network byte order
+FEAT_DTYPE = np.dtype([("ofi", ">i4"), ("imb", ">i2"), ("rsv", ">u2"), ("burst", ">u4"), ("vol", ">u4")])
+DELTA_DTYPE = np.dtype([("price_ticks", ">i4"), ("qty", ">i4"), ("level", ">u2"),
+                        ("side", "u1"), ("action", "u1"), ("rsv", ">u4")])
+FEAT_FIELDS = ("ofi", "imb", "burst", "vol")
+
+# Host-side event columns
+EVENT_DTYPE = np.dtype([("ts_ns", "<i8"), ("price_ticks", "<i8"), ("qty", "<i8"),
+                        ("level", "<u2"), ("side", "u1"), ("action", "u1")])
+
+# LOBSTER event type -> (action, qty sign); same mapping as replay-udp.c / features_ref
+_LOBSTER_ACTION = {1: (1, 1), 2: (2, -1), 3: (2, -1), 4: (3, 0), 5: (2, 0)}
+
+
+def _parse_rows_slow(lines) -> np.ndarray:
+    rows = []
+    for row in csv.reader(lines):
+        try:
+            rows.append((float(row[0]), int(row[1]), int(row[3]), float(row[4]), int(row[5])))
+        except Exception:
+            continue
+    return np.array(rows, dtype=np.float64).reshape(-1, 5)
+
+
+def parse_lobster_lines(lines) -> np.ndarray:
+    """
+    LOBSTER rows (list of str lines) -> float64 [n, 5] columns
+    (time, type, size, price, direction); unparseable rows are skipped.
+    """
+    try:
+        return np.loadtxt(lines, delimiter=",", usecols=(0, 1, 3, 4, 5), dtype=np.float64, ndmin=2)
+    except ValueError:
+        return _parse_rows_slow(lines)
+
+
+def events_from_cols(cols: np.ndarray, t0_s: float, price_tick: float = 1.0) -> np.ndarray:
+    """Parsed columns -> EVENT_DTYPE, timestamps relative to t0_s (unknown types dropped)."""
+    ev = np.zeros(len(cols), dtype=EVENT_DTYPE)
+    if len(cols) == 0:
+        return ev
+    t_s, typ, size, price, direction = cols.T
+    ev["ts_ns"] = np.rint((t_s - t0_s) * 1e9).astype(np.int64)
+    ev["side"] = np.where(direction == 1, 0, 1)
+    typ = typ.astype(np.int64)
+    size = size.astype(np.int64)
+    keep = np.zeros(len(cols), dtype=bool)
+    for t, (action, sgn) in _LOBSTER_ACTION.items():
+        m = typ == t
+        keep |= m
+        ev["action"][m] = action
+        ev["qty"][m] = sgn * size[m]
+    ev["price_ticks"] = np.rint(price / price_tick).astype(np.int64)
+    return ev[keep]
+
+
+def load_lobster_events(csv_path: str, price_tick: float = 1.0) -> np.ndarray:
+    """LOBSTER message CSV -> EVENT_DTYPE array (unknown types dropped, as the replayer does)."""
+    with open(csv_path, newline="") as f:
+        cols = parse_lobster_lines(f.read().splitlines())
+    # First parseable row anchors time even if its type is later dropped
+    t0 = cols[0, 0] if len(cols) else 0.0
+    return events_from_cols(cols, t0, price_tick)
+
+
+def events_from_deltas(deltas: np.ndarray, ts_ns: Optional[np.ndarray] = None, n_levels: int = 16) -> np.ndarray:
+    """DELTA_DTYPE array (wire order) -> EVENT_DTYPE; levels >= n_levels map to 0 like the echo."""
+    ev = np.zeros(len(deltas), dtype=EVENT_DTYPE)
+    ev["price_ticks"] = deltas["price_ticks"]
+    ev["qty"] = deltas["qty"]
+    lvl = deltas["level"].astype(np.int64)
+    ev["level"] = np.where(lvl < n_levels, lvl, 0)
+    ev["side"] = deltas["side"]
+    ev["action"] = deltas["action"]
+    if ts_ns is not None:
+        ev["ts_ns"] = ts_ns
+    return ev
+
+
+def _segment_first(start: np.ndarray) -> np.ndarray:
+    """Index of the segment start for every element (start[0] must be True)."""
+    return np.maximum.accumulate(np.where(start, np.arange(len(start)), 0))
+
+
+def _segmented_cumsum(x: np.ndarray, first: np.ndarray) -> np.ndarray:
+    cs = np.cumsum(x)
+    return cs - cs[first] + x[first]
+
+
+def _segmented_cummin_neg(w: np.ndarray, start: np.ndarray) -> np.ndarray:
+    """Running min of min(w, 0), restarting at each segment start."""
+    wc = np.minimum(w, 0)
+    if len(wc) == 0:
+        return wc
+    seg = np.cumsum(start) - 1
+    n_seg = int(seg[-1]) + 1
+    span = int(-wc.min()) + 1
+    if span * n_seg < 2**62:
+        # Earlier segments get larger offsets so they never win a later min
+        off = (n_seg - 1 - seg).astype(np.int64) * span
+        return np.minimum.accumulate(wc + off) - off
+    out = np.empty_like(wc)
+    bounds = np.append(np.flatnonzero(start), len(wc))
+    for a, b in zip(bounds[:-1], bounds[1:]):
+        out[a:b] = np.minimum.accumulate(wc[a:b])
+    return out
+
+
+def _level0(ev: np.ndarray, side: int, reset: np.ndarray, q0: int = 0, p0: int = 0) -> Tuple[np.ndarray, np.ndarray]:
+    """(qty, price) of level 0 on one side after every event, starting from (q0, p0)."""
+    n = len(ev)
+    action = ev["action"]
+    own = (ev["side"] == side) & ((ev["level"] == 0) | (ev["level"] >= N_LEVELS))
+    sel = np.flatnonzero(own | reset)
+    if len(sel) == 0:
+        return np.full(n, q0, dtype=np.int64), np.full(n, p0, dtype=np.int64)
+    own_s = own[sel]
+    act_s = action[sel]
+    qty_s = ev["qty"][sel]
+    is_set = own_s & (act_s == 0)
+
+    start = reset[sel] | (own_s & ((act_s == 0) | (act_s == 3)))
+    base = np.where(is_set, np.maximum(qty_s, 0), 0)
+    if not start[0]:
+        base[0] = q0  # leading segment continues the carried-in qty
+    start[0] = True
+    d = np.where(own_s & ((act_s == 1) | (act_s == 2)), qty_s, 0)
+    first = _segment_first(start)
+    w = base[first] + _segmented_cumsum(d, first)
+    q_s = w - _segmented_cummin_neg(w, start)
+
+    # Price: last set since reset (reset alone zeroes it)
+    p_evt = is_set | reset[sel]
+    p_val = np.where(is_set, ev["price_ticks"][sel], 0)
+    last = np.maximum.accumulate(np.where(p_evt, np.arange(len(sel)), -1))
+    p_s = np.where(last >= 0, p_val[np.maximum(last, 0)], p0)
+
+    # Forward fill onto every event
+    pos = np.cumsum(own | reset) - 1
+    valid = pos >= 0
+    pos = np.maximum(pos, 0)
+    return np.where(valid, q_s[pos], q0), np.where(valid, p_s[pos], p0)
+
+
+def _ofi(ev: np.ndarray, reset: np.ndarray, ofi0: int = 0) -> np.ndarray:
+    action = ev["action"]
+    sgn = np.where(ev["side"] == 0, 1, -1)
+    amt = np.where((action == 1) | (action == 2), sgn * ev["qty"], 0).astype(np.int64)
+    if len(amt) == 0:
+        return amt
+    if not reset[0]:
+        amt[0] += ofi0
+    start = reset.copy()
+    start[0] = True
+    ofi = _segmented_cumsum(amt, _segment_first(start))
+    over = np.flatnonzero((ofi > I32_MAX) | (ofi < I32_MIN))
+    if len(over):
+        # Saturation is sticky; walk exactly from the first clamp onward
+        i0 = int(over[0])
+        acc = int(ofi[i0 - 1]) if i0 > 0 else 0
+        out = ofi[:i0].tolist()
+        for a, r in zip(amt[i0:].tolist(), reset[i0:].tolist()):
+            if r:
+                acc = 0
+            acc = max(min(acc + a, I32_MAX), I32_MIN)
+            out.append(acc)
+        ofi = np.array(out, dtype=np.int64)
+    return ofi
+
+
+def imbalance_q15(bid_q: np.ndarray, ask_q: np.ndarray) -> np.ndarray:
+    """Q1.15 imbalance with C (truncate toward zero) division, clamped to int16."""
+    num = (bid_q - ask_q) << 15
+    den = bid_q + ask_q
+    safe = np.where(den == 0, 1, den)
+    imb = np.sign(num) * (np.abs(num) // safe)
+    return np.where(den == 0, 0, np.clip(imb, -(2**15), 2**15 - 1))
+
+
+def _book_columns(ev: np.ndarray, reset: np.ndarray, state: Optional[FeatureState] = None):
+    if state is None:
+        state = FeatureState()
+    bq, bp = _level0(ev, 0, reset, state.bid_q[0], state.bid_p[0])
+    aq, app = _level0(ev, 1, reset, state.ask_q[0], state.ask_p[0])
+    return _ofi(ev, reset, state.ofi), bq, bp, aq, app
+
+
+def book_state(ev: np.ndarray, reset: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    (ofi, imb_q1_15, mid) after every event. reset[i] clears book and OFI
+    before event i is applied.
+    """
+    if reset is None:
+        reset = np.zeros(len(ev), dtype=bool)
+    ofi, bq, bp, aq, app = _book_columns(ev, reset)
+    return ofi, imbalance_q15(bq, aq), (bp + app) // 2
+
+
+def _burst_walk(dt: list, tb: int, burst: int = 0) -> list:
+    out = []
+    put = out.append
+    one = 1 << Q16
+    for d in dt:
+        burst = burst - burst * d // tb + one
+        if burst > U32_MAX:
+            burst = U32_MAX
+        elif burst < 0:
+            burst = 0
+        put(burst)
+    return out
+
+
+def _vol_walk(dt: list, dp_q16: list, tv: int, vol: int = 0) -> list:
+    out = []
+    put = out.append
+    for d, x in zip(dt, dp_q16):
+        if d:
+            vol = vol + (x - vol) * d // tv
+            if vol > U32_MAX:
+                vol = U32_MAX
+            elif vol < 0:
+                vol = 0
+        put(vol)
+    return out
+
+
+def decay_inputs(ts_ns: np.ndarray, mid: np.ndarray, state: Optional[FeatureState] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """(dt, prev_mid) per step, continuing from state's last_t / mid_prev."""
+    n = len(ts_ns)
+    ts = np.asarray(ts_ns, dtype=np.int64)
+    mid = np.asarray(mid, dtype=np.int64)
+    dt = np.zeros(n, dtype=np.int64)
+    prev_mid = np.zeros(n, dtype=np.int64)
+    if n > 1:
+        dt[1:] = np.maximum(ts[1:] - ts[:-1], 0)
+        prev_mid[1:] = mid[:-1]
+    if n and state is not None:
+        if state.last_t is not None:
+            dt[0] = max(0, int(ts[0]) - state.last_t)
+        prev_mid[0] = state.mid_prev
+    return dt, prev_mid
+
+
+def resync_decay(dt: np.ndarray, dp_q16: np.ndarray, burst: int, vol: int,
+                 spec_burst: np.ndarray, spec_vol: np.ndarray,
+                 tau_burst_ns: int, tau_vol_ns: int, block: int = 4096) -> Tuple[list, list]:
+    """
+    Burst/vol walked from the true start (burst, vol) over steps whose values
+    spec_* were walked from a guessed start. Both recurrences forget their
+    start, so the walks meet; from the first step where they agree spec_* is
+    exact. Returns the corrected (burst, vol) values before that step.
+    """
+    one = 1 << Q16
+    tb, tv = int(tau_burst_ns), int(tau_vol_ns)
+    ob, ov = [], []
+    for a in range(0, len(dt), block):
+        b = a + block
+        for d, x, sb, sv in zip(dt[a:b].tolist(), dp_q16[a:b].tolist(),
+                                spec_burst[a:b].tolist(), spec_vol[a:b].tolist()):
+            burst = burst - burst * d // tb + one
+            if burst > U32_MAX:
+                burst = U32_MAX
+            elif burst < 0:
+                burst = 0
+            if d:
+                vol = vol + (x - vol) * d // tv
+                if vol > U32_MAX:
+                    vol = U32_MAX
+                elif vol < 0:
+                    vol = 0
+            if burst == sb and vol == sv:
+                return ob, ov
+            ob.append(burst)
+            ov.append(vol)
+    return ob, ov
+
+
+def decay_state(ts_ns: np.ndarray, mid: np.ndarray, reset: Optional[np.ndarray] = None,
+                tau_burst_ns: int = 200_000, tau_vol_ns: int = 2_000_000,
+                state: Optional[FeatureState] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Burst and micro-vol (Q16.16) per step. dt is taken between consecutive
+    ts_ns (clamped at 0); reset[i] clears burst/vol/mid_prev and last_ts first.
+    state supplies burst/vol/mid_prev/last_t from before ts_ns[0] (not advanced).
+    """
+    if state is None:
+        state = FeatureState()
+    n = len(ts_ns)
+    mid = np.asarray(mid, dtype=np.int64)
+    dt, prev_mid = decay_inputs(ts_ns, mid, state)
+    bounds = [0, n]
+    if reset is not None:
+        dt[reset] = 0
+        prev_mid[reset] = 0
+        bounds = sorted(set([0, n] + np.flatnonzero(reset).tolist()))
+    # |mid - mid_prev| does not depend on the recurrences, so it is done up front
+    dp_q16 = np.abs(mid - prev_mid) << Q16
+
+    # Each reset restarts both walks from zero state; the leading segment continues the state
+    burst, vol = [], []
+    dt_l = dt.tolist()
+    dp_l = dp_q16.tolist()
+    for a, b in zip(bounds[:-1], bounds[1:]):
+        b0, v0 = (state.burst, state.vol) if a == 0 and not (reset is not None and n and reset[0]) else (0, 0)
+        burst += _burst_walk(dt_l[a:b], int(tau_burst_ns), b0)
+        vol += _vol_walk(dt_l[a:b], dp_l[a:b], int(tau_vol_ns), v0)
+    return np.array(burst, dtype=np.int64), np.array(vol, dtype=np.int64)
+
+
+def pack_features(ofi, imb, burst, vol) -> np.ndarray:
+    out = np.zeros(len(ofi), dtype=FEAT_DTYPE)
+    out["ofi"] = ofi
+    out["imb"] = imb
+    out["burst"] = burst
+    out["vol"] = vol
+    return out
+
+
+def _deep_levels(ev: np.ndarray, state: FeatureState) -> None:
+    """Replay book updates below level 0 into state (they never reach a feature)."""
+    deep = ev[(ev["level"] != 0) & (ev["level"] < N_LEVELS)]
+    if len(deep) == 0:
+        return
+    ofi = state.ofi
+    for p, q, lvl, s, a in zip(deep["price_ticks"].tolist(), deep["qty"].tolist(), deep["level"].tolist(),
+                               deep["side"].tolist(), deep["action"].tolist()):
+        state.apply_book(p, q, lvl, s, a)
+    state.ofi = ofi  # OFI over all levels is already in the vectorized column
+
+
+def _store(state: FeatureState, ev: np.ndarray, ofi, bq, bp, aq, app, mid, burst: int, vol: int) -> None:
+    _deep_levels(ev, state)
+    state.bid_q[0], state.bid_p[0] = int(bq[-1]), int(bp[-1])
+    state.ask_q[0], state.ask_p[0] = int(aq[-1]), int(app[-1])
+    state.ofi, state.burst, state.vol = int(ofi[-1]), int(burst), int(vol)
+    state.mid_prev, state.last_t = int(mid[-1]), int(ev["ts_ns"][-1])
+
+
+def features(ev: np.ndarray, tau_burst_ns: int = 200_000, tau_vol_ns: int = 2_000_000,
+             state: Optional[FeatureState] = None) -> np.ndarray:
+    """
+    Per-event FEAT_DTYPE snapshots, identical to features_ref.run(). With a
+    state, ev continues from it and the state is advanced in place, so a file
+    processed chunk by chunk gives the same bytes as one call.
+    """
+    if len(ev) == 0:
+        return np.zeros(0, dtype=FEAT_DTYPE)
+    ofi, bq, bp, aq, app = _book_columns(ev, np.zeros(len(ev), dtype=bool), state)
+    mid = (bp + app) // 2
+    burst, vol = decay_state(ev["ts_ns"], mid, tau_burst_ns=tau_burst_ns, tau_vol_ns=tau_vol_ns, state=state)
+    if state is not None:
+        _store(state, ev, ofi, bq, bp, aq, app, mid, burst[-1], vol[-1])
+    return pack_features(ofi, imbalance_q15(bq, aq), burst, vol)
+
+
+def book_checkpoints(ev: np.ndarray, bounds, state: FeatureState) -> Tuple[list, np.ndarray, np.ndarray]:
+    """
+    State-only pass for split runs: a FeatureState snapshot at each chunk start
+    bounds[:-1], state left at the end of ev. Book, OFI, last_t and mid_prev
+    are exact and fully vectorized; burst/vol are not walked (that recurrence
+    is sequential), so every snapshot after the first keeps state's starting
+    burst/vol. Also returns per-event (dt, dp_q16) for resync_decay().
+    """
+    ofi, bq, bp, aq, app = _book_columns(ev, np.zeros(len(ev), dtype=bool), state)
+    mid = (bp + app) // 2
+    dt, prev_mid = decay_inputs(ev["ts_ns"], mid, state)
+    dp_q16 = np.abs(mid - prev_mid) << Q16
+    snaps = []
+    for a, b in zip(bounds[:-1], bounds[1:]):
+        snaps.append(state.snapshot())
+        if b > a:
+            _store(state, ev[a:b], ofi[a:b], bq[a:b], bp[a:b], aq[a:b], app[a:b], mid[a:b], state.burst, state.vol)
+    return snaps, dt, dp_q16
+
+
+def packet_features(ev: np.ndarray, pkt_cnt: np.ndarray, pkt_ts_ns: np.ndarray,
+                    pkt_reset: Optional[np.ndarray] = None,
+                    tau_burst_ns: int = 200_000, tau_vol_ns: int = 2_000_000) -> np.ndarray:
+    """
+    Per-packet snapshots as the echo produces them: the book/OFI after each
+    packet's pkt_cnt events, burst/vol stepped once per packet on t_send dt.
+    pkt_reset[k] (flags bit15) clears all state before packet k.
+    """
+    pkt_cnt = np.asarray(pkt_cnt, dtype=np.int64)
+    n_pkt = len(pkt_cnt)
+    end = np.cumsum(pkt_cnt)
+    start = end - pkt_cnt
+    if pkt_reset is None:
+        pkt_reset = np.zeros(n_pkt, dtype=bool)
+    if int(end[-1] if n_pkt else 0) > len(ev):
+        raise ValueError(f"packets reference {int(end[-1])} events, only {len(ev)} available")
+    reset = np.zeros(len(ev), dtype=bool)
+    rs = start[pkt_reset]
+    reset[rs[rs < len(ev)]] = True
+    ofi, imb, mid = book_state(ev, reset)
+
+    # Snapshot = state after the packet's last event, unless a reset since then left it empty
+    last = end - 1
+    last_reset = np.maximum.accumulate(np.where(pkt_reset, start, -1))
+    valid = last >= last_reset
+    take = np.maximum(last, 0)
+
+    def snap(a):
+        return np.where(valid, a[take], 0) if len(a) else np.zeros(n_pkt, dtype=np.int64)
+
+    burst, vol = decay_state(pkt_ts_ns, snap(mid), pkt_reset, tau_burst_ns=tau_burst_ns, tau_vol_ns=tau_vol_ns)
+    return pack_features(snap(ofi), snap(imb), burst, vol)
+
+
+def run(csv_path: str, price_tick: float = 1.0,
+        tau_burst_ns: int = 200_000, tau_vol_ns: int = 2_000_000) -> Tuple[np.ndarray, np.ndarray]:
+    """Array form of features_ref.run(): returns (ts_ns, FEAT_DTYPE array)."""
+    ev = load_lobster_events(csv_path, price_tick=price_tick)
+    return ev["ts_ns"].copy(), features(ev, tau_burst_ns=tau_burst_ns, tau_vol_ns=tau_vol_ns)
+
+
+if __name__ == "__main__":
+    import argparse, pathlib
+    ap = argparse.ArgumentParser(description="Vectorized features.bin builder (same output as features_ref)")
+    ap.add_argument("--src", required=True, help="LOBSTER messages CSV")
+    ap.add_argument("--out", required=True, help="Output features.bin")
+    ap.add_argument("--price-tick", type=float, default=0.01)
+    args = ap.parse_args()
+    outp = pathlib.Path(args.out)
+    outp.parent.mkdir(parents=True, exist_ok=True)
+    _, feats = run(args.src, price_tick=args.price_tick)
+    outp.write_bytes(feats.tobytes())
+    print(f"Wrote {outp}")
@@ -12,9 +12,20 @@ REPO_ROOT = Path(__file__).resolve().parents[2]
 if str(REPO_ROOT) not in sys.path:
     sys.path.insert(0, str(REPO_ROOT))
 
+from models.cache import add_cache_args, cache_from_args  # noqa: E402
 from models.train.train_baselines import load_labels, load_features_bin, select_rows_by_indices  # noqa: E402
 
 
+def feature_matrix(feat: np.ndarray) -> np.ndarray:
+    """FEAT_DTYPE records -> float32 [N, 4], same scaling as load_features_bin()."""
+    X = np.empty((feat.shape[0], 4), dtype=np.float32)
+    X[:, 0] = feat["ofi"]
+    X[:, 1] = feat["imb"] / np.float32(1 << 15)
+    X[:, 2] = feat["burst"] / np.float32(1 << 16)
+    X[:, 3] = feat["vol"] / np.float32(1 << 16)
+    return X
+
+
 def emulate_logreg_int8(spec: dict, X: np.ndarray) -> np.ndarray:
     in_scale = float(spec["in_scale"])
     w = np.array(spec["w_int8"], dtype=np.int8)  # [1, D]
@@ -65,22 +76,38 @@ def emulate_mlp_int8(spec: dict, X: np.ndarray) -> np.ndarray:
 def main():
     ap = argparse.ArgumentParser(description="CPU parity: compare int8 emulation vs fp32 models.")
     ap.add_argument("--int8-json", required=True, help="mlp_int8.json or logreg_int8.json")
-    ap.add_argument("--features-bin", required=True, help="features.bin")
+    src = ap.add_mutually_exclusive_group(required=True)
+    src.add_argument("--features-bin", help="features.bin")
+    src.add_argument("--lobster-csv", help="LOBSTER messages CSV; features are built with features_vec")
     ap.add_argument("--labels-csv", required=True, help="labels CSV")
     ap.add_argument("--max", type=int, default=200000, help="Max samples to test")
+    ap.add_argument("--price-tick", type=float, default=0.01, help="With --lobster-csv")
+    ap.add_argument("--tau-burst-ns", type=int, default=200_000, help="With --lobster-csv")
+    ap.add_argument("--tau-vol-ns", type=int, default=2_000_000, help="With --lobster-csv")
+    add_cache_args(ap)
     args = ap.parse_args()
 
+    cache = cache_from_args(args)
     spec = json.loads(Path(args.int8_json).read_text())
-    feats = load_features_bin(Path(args.features_bin))
-    idxs, ys, ts_s = load_labels(Path(args.labels_csv))
+    if args.features_bin:
+        src_path, fparams = args.features_bin, {}
+        feats = cache.memo("features_bin", lambda: load_features_bin(Path(src_path)), files=[src_path])
+    else:
+        from models import features_vec
+        src_path = args.lobster_csv
+        fparams = {"price_tick": args.price_tick, "tau_burst_ns": args.tau_burst_ns, "tau_vol_ns": args.tau_vol_ns}
+        feats = cache.memo("features_vec",
+                           lambda: feature_matrix(features_vec.run(src_path, **fparams)[1]),
+                           files=[src_path], params=fparams)
+    labels = cache.memo("labels", lambda: np.stack(load_labels(Path(args.labels_csv))).T, files=[args.labels_csv])
+    idxs, ys, ts_s = labels[:, 0].astype(np.int64), labels[:, 1].astype(np.int8), labels[:, 2]
     X, y, t = select_rows_by_indices(feats, idxs, ys, ts_s)
     n = min(args.max, X.shape[0])
     X = X[:n]; y = y[:n]
 
-    if spec["type"] == "logreg":
-        logits = emulate_logreg_int8(spec, X)
-    else:
-        logits = emulate_mlp_int8(spec, X)
+    emulate = emulate_logreg_int8 if spec["type"] == "logreg" else emulate_mlp_int8
+    logits = cache.memo(f"logits_{spec['type']}", lambda: emulate(spec, X),
+                        files=[src_path, args.labels_csv], params={"n": int(n), **fparams}, spec=spec)
     # Simple metric: accuracy at 0 threshold and logit-y correlation
     preds = np.where(logits >= 0.0, 1, -1)
     acc = float(np.mean(preds == y))
@@ -92,6 +119,8 @@ def main():
     else:
         corr = float(np.corrcoef(logits, y01)[0, 1])
     print(json.dumps({"samples": int(n), "acc@0": acc, "corr": corr}, indent=2))
+    if cache.enabled:
+        print(cache.summary(), file=sys.stderr)
 
 
 if __name__ == "__main__":
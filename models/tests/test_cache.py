@@ -0,0 +1,85 @@
+import os
+import sys
+import tempfile
+import time
+import unittest
+from pathlib import Path
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from models.cache import NpyCache
+from models.tests.cpu_parity import feature_matrix
+from models.train.train_baselines import load_features_bin
+from models import features_vec
+
+
+class TestNpyCache(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.d = Path(self._tmp.name)
+        self.src = self.d / "in.bin"
+        self.src.write_bytes(b"abc")
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def test_hit_and_key_changes(self):
+        cache = NpyCache(self.d / "c")
+        calls = []
+
+        def compute():
+            calls.append(1)
+            return np.arange(5)
+
+        spec = {"type": "mlp", "in_scale": 0.5}
+        for _ in range(2):
+            out = cache.memo("x", compute, files=[self.src], params={"tau_vol_ns": 1}, spec=spec)
+        self.assertEqual(out.tolist(), list(range(5)))
+        self.assertEqual((len(calls), cache.hits, cache.misses), (1, 1, 1))
+
+        cache.memo("x", compute, files=[self.src], params={"tau_vol_ns": 2}, spec=spec)
+        cache.memo("x", compute, files=[self.src], params={"tau_vol_ns": 1}, spec={**spec, "in_scale": 0.25})
+        self.assertEqual(len(calls), 3)
+        # key order in the spec does not matter
+        cache.memo("x", compute, files=[self.src], params={"tau_vol_ns": 1}, spec=dict(reversed(spec.items())))
+        self.assertEqual(len(calls), 3)
+
+        self.src.write_bytes(b"abd")   # same size; content hash must still change
+        os.utime(self.src, ns=(0, 0))
+        cache.memo("x", compute, files=[self.src], params={"tau_vol_ns": 1}, spec=spec)
+        self.assertEqual(len(calls), 4)
+
+        off = NpyCache(self.d / "c", enabled=False)
+        off.memo("x", compute, files=[self.src], params={"tau_vol_ns": 1}, spec=spec)
+        self.assertEqual(len(calls), 5)
+
+    def test_lru_eviction(self):
+        cache = NpyCache(self.d / "c", max_bytes=3 * (8000 + 128))
+        for i in range(3):
+            cache.memo(f"a{i}", lambda: np.zeros(1000))
+            time.sleep(0.01)
+        cache.memo("a0", lambda: np.ones(1))          # hit refreshes a0
+        time.sleep(0.01)
+        cache.memo("a3", lambda: np.zeros(1000))      # evicts a1, the oldest
+        names = sorted(p.name.split("-")[0] for p in (self.d / "c").glob("*.npy"))
+        self.assertEqual(names, ["a0", "a2", "a3"])
+        self.assertEqual(cache.hits, 1)
+
+    def test_feature_matrix_matches_features_bin(self):
+        csv = self.d / "m.csv"
+        t = 34200.0
+        rows = []
+        for i in range(200):
+            t += 0.0001 * (1 + i % 7)
+            rows.append(f"{t:.9f},1,{i},{10 + i % 5},{10000 + 100 * (i % 9)},{1 if i % 2 else -1}")
+        csv.write_text("\n".join(rows) + "\n")
+        _, feat = features_vec.run(str(csv), price_tick=100.0)
+        fb = self.d / "features.bin"
+        fb.write_bytes(feat.tobytes())
+        self.assertTrue(np.array_equal(feature_matrix(feat), load_features_bin(fb)))
+
+
+if __name__ == '__main__':
+    unittest.main()
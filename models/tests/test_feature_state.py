@@ -0,0 +1,101 @@
+import os
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from models import features_ref, features_vec
+from models.feature_state import FeatureState
+from models import features_pipeline
+from models.features_pipeline import features_split
+from models.tests.test_features_vec import write_lobster_csv
+
+
+def random_events(n: int, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    ev = np.zeros(n, dtype=features_vec.EVENT_DTYPE)
+    ev["ts_ns"] = np.cumsum(rng.integers(0, 300_000, n))
+    ev["price_ticks"] = rng.integers(100, 110, n)
+    ev["qty"] = rng.integers(-300, 300, n)
+    ev["level"] = np.where(rng.random(n) < 0.7, 0, rng.integers(1, 16, n))
+    ev["side"] = rng.integers(0, 2, n)
+    ev["action"] = rng.choice([0, 1, 2, 3], n)
+    return ev
+
+
+class TestFeatureState(unittest.TestCase):
+    def test_step_matches_step_batch(self):
+        ev = random_events(3000)
+        scalar = FeatureState()
+        got = [scalar.step(tuple(e)) for e in ev.tolist()]
+        batch = FeatureState()
+        first = batch.step_batch(ev[:1234])
+        rest = batch.step_batch(ev[1234:])
+        vec = np.concatenate([first, rest])
+        self.assertEqual(got, list(zip(vec["ofi"].tolist(), vec["imb"].tolist(),
+                                       vec["burst"].tolist(), vec["vol"].tolist())))
+        self.assertEqual(scalar, batch)  # deeper levels included
+
+    def test_snapshot_restore_resumes_reference(self):
+        with tempfile.TemporaryDirectory() as d:
+            csv_path = Path(d) / "msgs.csv"
+            write_lobster_csv(csv_path, 2000, seed=3)
+            full = [feat for _, feat in features_ref.run(str(csv_path), price_tick=100.0)]
+            st = FeatureState()
+            gen = features_ref.run(str(csv_path), price_tick=100.0, state=st)
+            head = [next(gen)[1] for _ in range(700)]
+            snap = st.snapshot()
+            ev = features_vec.load_lobster_events(str(csv_path), price_tick=100.0)
+            resumed = features_vec.features(ev[700:], state=FeatureState.from_snapshot(snap))
+        self.assertEqual(b"".join(head), b"".join(full[:700]))
+        self.assertEqual(resumed.tobytes(), b"".join(full[700:]))
+
+    def test_split_from_checkpoints(self):
+        ev = random_events(5000, seed=4)
+        ref_state = FeatureState()
+        ref = features_vec.features(ev, state=ref_state)
+        st = FeatureState()
+        got = features_split(ev, workers=2, n_chunks=5, state=st)
+        self.assertEqual(got.tobytes(), ref.tobytes())
+        self.assertEqual(st, ref_state)
+        self.assertRaises(ValueError, st.restore, st.snapshot()[:-1])
+
+    def test_split_resyncs_wrong_guesses(self):
+        ev = random_events(6000, seed=6)
+        ev["ts_ns"] = np.cumsum(np.random.default_rng(6).integers(0, 3000, len(ev)))   # dt << tau: slow to forget
+        ref = features_vec.features(ev)
+        stats = {}
+        with mock.patch.object(features_pipeline, "WARMUP_EVENTS", 0):   # workers start from stale burst/vol
+            got = features_split(ev, workers=1, n_chunks=6, stats=stats)
+        self.assertEqual(got.tobytes(), ref.tobytes())
+        self.assertGreater(stats["resynced_steps"], 0)
+
+    def test_split_serial_part_is_small(self):
+        # Timing lives in host/strategy/perf_suite.py (features_vec vs features_split);
+        # here: one book checkpoint per chunk, and the serial resync only touches short prefixes
+        ev = random_events(40_000, seed=5)
+        ev["level"] = 0   # LOBSTER rows are all level 0
+        ref = features_vec.features(ev)
+        stats = {}
+        got = features_split(ev, workers=2, n_chunks=8, stats=stats)
+        self.assertEqual(got.tobytes(), ref.tobytes())
+        self.assertEqual(stats["chunks"], 8)
+        self.assertLess(stats["resynced_steps"], len(ev) // 20)
+
+        bounds = np.linspace(0, len(ev), 9).astype(np.int64).tolist()
+        snaps, _, _ = features_vec.book_checkpoints(ev, bounds, FeatureState())
+        self.assertEqual(len(snaps), 8)
+        for a, snap in zip(bounds[:-1], snaps):
+            serial = FeatureState()
+            features_vec.features(ev[:a], state=serial)
+            cp = FeatureState.from_snapshot(snap)
+            cp.burst, cp.vol = serial.burst, serial.vol   # not walked by the checkpoint pass
+            self.assertEqual(cp, serial)
+
+if __name__ == '__main__':
+    unittest.main()
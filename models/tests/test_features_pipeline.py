@@ -0,0 +1,29 @@
+import os
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from models import features_ref
+from models.features_pipeline import build_features
+from models.tests.test_features_vec import write_lobster_csv
+
+
+class TestFeaturesPipeline(unittest.TestCase):
+    def test_chunked_pipeline_matches_reference(self):
+        with tempfile.TemporaryDirectory() as d:
+            csv_path = Path(d) / "msgs.csv"
+            out = Path(d) / "features.bin"
+            write_lobster_csv(csv_path, 3000, seed=2)
+            ref = b"".join(feat for _, feat in features_ref.run(str(csv_path), price_tick=100.0))
+            # Small chunks: many boundaries, out-of-order parser completion
+            st = build_features(csv_path, out, price_tick=100.0, workers=3, chunk_bytes=4096)
+            self.assertGreater(st["chunks"], 10)
+            self.assertEqual(st["snapshots"] * 16, len(ref))
+            self.assertEqual(out.read_bytes(), ref)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,78 @@
+import os
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from models import features_ref, features_vec
+
+
+def write_lobster_csv(path: Path, n: int, seed: int = 0) -> None:
+    rng = np.random.default_rng(seed)
+    t = 34200.0 + np.cumsum(rng.exponential(2e-5, n) * (rng.random(n) < 0.7))
+    typ = rng.choice([1, 2, 3, 4, 5, 6, 7], n, p=[.4, .2, .1, .1, .1, .05, .05])
+    size = rng.integers(1, 500, n)
+    price = rng.integers(50_000, 50_100, n) * 100
+    side = rng.choice([1, -1], n)
+    with path.open("w") as f:
+        for i in range(n):
+            f.write(f"{t[i]:.9f},{typ[i]},{i},{size[i]},{price[i]},{side[i]}\n")
+
+
+class TestFeaturesVec(unittest.TestCase):
+    def test_matches_reference_on_lobster(self):
+        with tempfile.TemporaryDirectory() as d:
+            csv_path = Path(d) / "msgs.csv"
+            write_lobster_csv(csv_path, 5000)
+            ref = b"".join(feat for _, feat in features_ref.run(str(csv_path), price_tick=100.0))
+            _, vec = features_vec.run(str(csv_path), price_tick=100.0)
+        self.assertEqual(vec.tobytes(), ref)
+
+    def test_packet_snapshots_with_sets_and_resets(self):
+        rng = np.random.default_rng(1)
+        cnt = rng.integers(0, 5, 400)
+        n = int(cnt.sum())
+        ev = np.zeros(n, dtype=features_vec.EVENT_DTYPE)
+        ev["price_ticks"] = rng.integers(100, 110, n)
+        ev["qty"] = rng.integers(-300, 300, n)
+        ev["side"] = rng.integers(0, 2, n)
+        ev["action"] = rng.choice([0, 1, 2, 3], n)
+        ts = np.cumsum(rng.integers(0, 400_000, len(cnt)))
+        reset = rng.random(len(cnt)) < 0.05
+        got = features_vec.packet_features(ev, cnt, ts, reset)
+
+        # Scalar walk of the same semantics (level 0 only)
+        q = [0, 0]; p = [0, 0]; ofi = 0; burst = vol = mid_prev = 0; last = None; e = 0
+        for k, c in enumerate(cnt):
+            if reset[k]:
+                q = [0, 0]; p = [0, 0]; ofi = 0; burst = vol = mid_prev = 0; last = None
+            for _ in range(c):
+                s, a, qty = int(ev["side"][e]), int(ev["action"][e]), int(ev["qty"][e])
+                if a == 0:
+                    p[s], q[s] = int(ev["price_ticks"][e]), qty
+                elif a in (1, 2):
+                    q[s] += qty
+                    ofi += qty if s == 0 else -qty
+                else:
+                    q[s] = 0
+                q[s] = max(q[s], 0)
+                e += 1
+            den = q[0] + q[1]
+            num = (q[0] - q[1]) << 15
+            imb = 0 if den == 0 else (num // den if num >= 0 else -((-num) // den))
+            dt = 0 if last is None else max(0, int(ts[k]) - last)
+            last = int(ts[k])
+            burst = max(0, min(burst - burst * dt // 200_000 + 65536, 0xFFFFFFFF))
+            mid = (p[0] + p[1]) // 2
+            vol = max(0, min(vol + ((abs(mid - mid_prev) << 16) - vol) * dt // 2_000_000, 0xFFFFFFFF))
+            mid_prev = mid
+            self.assertEqual((int(got["ofi"][k]), int(got["imb"][k]), int(got["burst"][k]), int(got["vol"][k])),
+                             (ofi, max(min(imb, 32767), -32768), burst, vol), f"packet {k}")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,53 @@
+import json
+import os
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from models.exports.model_bundle import SECTION_ALIGN, load_bundle, pack_bundle, parse_bundle, write_bundle
+from models.exports.write_manifest import write_mem_int32
+
+MLP_JSON = Path(__file__).resolve().parents[1] / "exports" / "int8" / "mlp_int8.json"
+
+
+class TestModelBundle(unittest.TestCase):
+    def setUp(self):
+        self.spec = json.loads(MLP_JSON.read_text())
+
+    def test_roundtrip_mlp(self):
+        with tempfile.TemporaryDirectory() as d:
+            path = write_bundle(Path(d) / "model.bin", self.spec)
+            b = load_bundle(path)
+            self.assertEqual((b.model_type, b.in_dim, b.hidden, b.out_dim), ("mlp", 4, 32, 1))
+            np.testing.assert_array_equal(b.array("w0"), np.array(self.spec["w0_int8"], dtype=np.int8))
+            np.testing.assert_array_equal(b.array("b0"), np.array(self.spec["b0_int32"], dtype=np.int32))
+            np.testing.assert_array_equal(b.array("w1"), np.array(self.spec["w1_int8"], dtype=np.int8))
+            self.assertEqual(b.scales["act0_scale"], self.spec["act0_scale"])
+            for off, _ in b.sections.values():
+                self.assertEqual(off % SECTION_ALIGN, 0)
+            del b
+
+    def test_checksum_detects_corruption(self):
+        raw = bytearray(pack_bundle(self.spec))
+        raw[200] ^= 0x01
+        with self.assertRaises(ValueError):
+            parse_bundle(np.frombuffer(bytes(raw), dtype=np.uint8))
+
+    def test_mem_int32_matches_scalar_format(self):
+        vals = np.array([0, 1, -1, 0x12345678, -(1 << 31)], dtype=np.int32)
+        with tempfile.TemporaryDirectory() as d:
+            p = Path(d) / "b.mem"
+            write_mem_int32(p, vals, endian="big")
+            expect = "".join(
+                "".join(f"{(int(v) & 0xFFFFFFFF) >> s & 0xFF:02x}\n" for s in (24, 16, 8, 0)) for v in vals
+            )
+            self.assertEqual(p.read_text(), expect)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,81 @@
+import os
+import sys
+import tempfile
+import unittest
+from collections import defaultdict
+from pathlib import Path
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from models import features_ref, features_vec
+from models.datasets import synth_lobster
+
+
+class TestSynthLobster(unittest.TestCase):
+    def test_orders_are_consistent(self):
+        for arrivals in ("poisson", "hawkes"):
+            cfg = synth_lobster.SynthConfig(orders=20_000, seed=1, arrivals=arrivals, storm_rate_hz=20.0)
+            msg = synth_lobster.generate(cfg)
+            self.assertTrue(np.all(np.diff(msg["time_s"]) >= 0))
+            n_orders = cfg.orders + 2 * cfg.levels * cfg.ladder_orders   # + the initial ladder
+            self.assertEqual(int((msg["type"] == synth_lobster.SUBMIT).sum()), n_orders)
+            # every order is submitted first and never reduced below zero
+            signed = np.where(msg["type"] == synth_lobster.SUBMIT, msg["size"], -msg["size"])
+            self.assertTrue(np.all(np.bincount(msg["order_id"], weights=signed) >= 0))
+            _, idx = np.unique(msg["order_id"], return_index=True)
+            self.assertTrue(np.all(msg["type"][idx] == synth_lobster.SUBMIT))
+            for v in (synth_lobster.CANCEL, synth_lobster.DELETE, synth_lobster.EXECUTE):
+                self.assertGreater(int((msg["type"] == v).sum()), 0)
+        again = synth_lobster.generate(cfg)
+        self.assertTrue(all(np.array_equal(msg[k], again[k]) for k in msg))   # seeded
+
+    def test_hawkes_clusters(self):
+        rng = np.random.default_rng(0)
+        cv = {}
+        for b in (0.0, 0.8):
+            gaps = np.diff(synth_lobster.hawkes_times(50_000, 1000.0, b, 2000.0, rng))
+            cv[b] = gaps.std() / gaps.mean()
+        self.assertAlmostEqual(cv[0.0], 1.0, delta=0.05)   # Poisson
+        self.assertGreater(cv[0.8], 1.5)
+        with self.assertRaises(ValueError):
+            synth_lobster.hawkes_times(10, 1000.0, 1.0, 2000.0, rng)
+
+    def test_orderbook_matches_replay(self):
+        msg = synth_lobster.generate(synth_lobster.SynthConfig(orders=3000, seed=3, levels=8, cross_prob=0.02))
+        ob = synth_lobster.orderbook(msg, levels=5)
+        book = {1: defaultdict(int), -1: defaultdict(int)}
+        crossed = 0
+        for i in range(msg["time_s"].size):
+            side, p = int(msg["direction"][i]), int(msg["price"][i])
+            book[side][p] += int(msg["size"][i]) * (1 if msg["type"][i] == synth_lobster.SUBMIT else -1)
+            if book[side][p] == 0:
+                del book[side][p]
+            asks = sorted(book[-1].items())[:5]
+            bids = sorted(book[1].items(), reverse=True)[:5]
+            row = []
+            for k in range(5):
+                a = asks[k] if k < len(asks) else (synth_lobster.EMPTY_ASK, 0)
+                b = bids[k] if k < len(bids) else (synth_lobster.EMPTY_BID, 0)
+                row += [a[0], a[1], b[0], b[1]]
+            self.assertEqual(ob[i].tolist(), row, f"row {i}")
+            crossed += bool(asks and bids and bids[0][0] >= asks[0][0])
+        self.assertGreater(crossed, 0)
+
+    def test_files_feed_feature_builders(self):
+        msg = synth_lobster.generate(synth_lobster.SynthConfig(orders=2000, seed=4))
+        with tempfile.TemporaryDirectory() as d:
+            mp, op = Path(d) / "m.csv", Path(d) / "o.csv"
+            synth_lobster.write_messages(mp, msg)
+            synth_lobster.write_orderbook(op, synth_lobster.orderbook(msg))
+            self.assertEqual(np.loadtxt(op, delimiter=",", dtype=np.int64).tolist(),
+                             synth_lobster.orderbook(msg).tolist())
+            ref = b"".join(feat for _, feat in features_ref.run(str(mp), price_tick=100.0))
+            _, vec = features_vec.run(str(mp), price_tick=100.0)
+        self.assertEqual(len(ref), 16 * msg["time_s"].size)
+        self.assertEqual(vec.tobytes(), ref)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -104,7 +104,8 @@ def standardize(train_X: np.ndarray, X: np.ndarray) -> Tuple[np.ndarray, Dict[st
     return Xn, meta
 
 
-class TinyMLP(nn.Module):  # type: ignore[misc]
+# Without torch the loaders above still import (cpu_parity.py, quantize_models.py)
+class TinyMLP(nn.Module if nn is not None else object):  # type: ignore[misc]
     def __init__(self, in_dim: int, hidden: int = 32):
         super().__init__()
         self.net = nn.Sequential(
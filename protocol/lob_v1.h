@@ -13,7 +13,7 @@
 typedef struct {
     uint8_t  magic[4];      // 'L','O','B','1'
     uint8_t  version;       // 0x01
-    uint8_t  msg_type;      // 0=ping, 1=lob_deltas, 2=features
+    uint8_t  msg_type;      // 0=ping (reply appends lob_v1_ping_ts_t), 1=lob_deltas, 2=features
     uint16_t flags;         // DELTAS: bit15=reset, bits[14:0]=delta_count; FEATURES: echoed from request
     uint16_t hdr_len;       // 32
     uint32_t seq;           // be32
@@ -58,7 +58,8 @@ typedef struct {
 
 enum { LOB_V1_FEAT_SCORE_LEN = 20 };
 
-// Timing metadata trailer (40 bytes) - appended to FEATURES_WITH_TIMING response
+// Timing metadata trailer (40 bytes) - original FEATURES_WITH_TIMING trailer; the
+// echo servers now append lob_v1_soc_telem_t below instead
 #pragma pack(push, 1)
 typedef struct {
     uint64_t t2_rx_ns;       // PYNQ RX timestamp (after recvfrom)
@@ -70,7 +71,50 @@ typedef struct {
 #pragma pack(pop)
 
 enum { LOB_V1_TIMING_LEN = 40 };
-enum { LOB_V1_MSG_PING = 0, LOB_V1_MSG_DELTAS = 1, LOB_V1_MSG_FEATURES = 2, LOB_V1_MSG_FEAT_SCORE = 3, LOB_V1_MSG_FEATURES_WITH_TIMING = 4 };
+
+// PING reply trailer (16 bytes): server-side stamps for NTP-style clock sync.
+// Same clock as lob_v1_timing_t (PYNQ CLOCK_MONOTONIC_RAW). Together with the
+// host's send/receive stamps this gives the four timestamps of one exchange.
+#pragma pack(push, 1)
+typedef struct {
+    uint64_t t_rx_ns;        // after recvfrom (be64)
+    uint64_t t_tx_ns;        // before sendto (be64)
+} lob_v1_ping_ts_t;
+#pragma pack(pop)
+
+enum { LOB_V1_PING_TS_LEN = 16 };
+
+// SoC telemetry block (56 bytes) appended by feature_echo_mt.py to
+// FEATURES_WITH_TIMING replies (PYNQ CLOCK_MONOTONIC_RAW, be64/be32)
+#pragma pack(push, 1)
+typedef struct {
+    uint64_t t2_rx_ns;
+    uint64_t t3_dma_start_ns;
+    uint64_t t4_feat_done_ns;
+    uint64_t t5_score_done_ns;
+    uint64_t t_reflex_ns;     // ARM reflex lane decision
+    uint64_t t6_tx_ns;
+    uint32_t reflex_act;      // 0=NONE 1=CANCEL 2=TAKE 3=WIDEN
+    uint32_t mlp_score_q16_16;
+} lob_v1_soc_telem_t;
+#pragma pack(pop)
+
+enum { LOB_V1_SOC_TELEM_LEN = 56 };
+
+// Fabric cycle counters (16 bytes), after lob_v1_soc_telem_t in
+// FEATURES_WITH_FABRIC replies. Durations in 8 ns fabric cycles (125 MHz).
+#pragma pack(push, 1)
+typedef struct {
+    uint32_t mlp_cycles;      // latency_timer_0: hw_start -> MLP done_pulse
+    uint32_t feat_cycles;     // latency_timer_1: hw_start -> feature done_pulse
+    uint32_t feat_dbg_cycles; // feature_pipeline feat_dbg_cycles (kernel compute)
+    uint32_t valid;           // bit0 mlp_cycles, bit1 feat_cycles, bit2 feat_dbg_cycles
+} lob_v1_fabric_t;
+#pragma pack(pop)
+
+enum { LOB_V1_FABRIC_LEN = 16 };
+enum { LOB_V1_MSG_PING = 0, LOB_V1_MSG_DELTAS = 1, LOB_V1_MSG_FEATURES = 2, LOB_V1_MSG_FEAT_SCORE = 3, LOB_V1_MSG_FEATURES_WITH_TIMING = 4,
+       LOB_V1_MSG_FEATURES_WITH_FABRIC = 5 };  // features + lob_v1_soc_telem_t + lob_v1_fabric_t
 // Flags for DELTAS
 enum { LOB_V1_FLAG_RESET = 1u << 15 };
 enum { LOB_V1_FLAGS_COUNT_MASK = 0x7FFFu };
@@ -1,10 +1,22 @@
 #!/usr/bin/env python3
 import argparse
 import json
+import sys
 from pathlib import Path
 
 import numpy as np
 
+REPO_ROOT = Path(__file__).resolve().parents[1]
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+from models.cache import add_cache_args, cache_from_args  # noqa: E402
+
+# [seq][flags][t_send_ns][feat+score], big-endian, 34 bytes
+RX_DTYPE = np.dtype([("seq", ">u4"), ("flags", ">u2"), ("t_send_ns", ">u8"),
+                     ("ofi", ">i4"), ("imb", ">i2"), ("rsv", ">u2"), ("burst", ">u4"), ("vol", ">u4"),
+                     ("score_q16", ">i4")])
+
 
 def emulate_from_spec(spec: dict, ofi: int, imb: int, burst: int, vol: int) -> float:
     X = np.array([float(ofi), float(imb) / (1 << 15), float(burst) / (1 << 16), float(vol) / (1 << 16)], dtype=np.float32)
@@ -14,7 +26,7 @@ def emulate_from_spec(spec: dict, ofi: int, imb: int, burst: int, vol: int) -> f
         b = np.array(spec["b_int32"], dtype=np.int32)
         w_scale = float(spec["w_scale"])
         xi = np.clip(np.round(X / in_scale), -128, 127).astype(np.int32)
-        acc = int(xi @ w.T.astype(np.int32)) + int(b[0])
+        acc = (xi @ w.T.astype(np.int32)).item() + int(b[0])
         return float(acc) * (in_scale * w_scale)
     else:
         in_scale = float(spec["in_scale"])
@@ -29,7 +41,7 @@ def emulate_from_spec(spec: dict, ofi: int, imb: int, burst: int, vol: int) -> f
         acc0 = xi @ w0.T.astype(np.int32) + b0.astype(np.int32)
         y0 = np.maximum(acc0.astype(np.float32) * (in_scale * w0_scale), 0.0)
         y0i = np.clip(np.round(y0 / act0_scale), -128, 127).astype(np.int32)
-        acc1 = int(y0i @ w1.T.astype(np.int32)) + int(b1[0])
+        acc1 = (y0i @ w1.T.astype(np.int32)).item() + int(b1[0])
         return float(acc1) * (act0_scale * w1_scale)
 
 
@@ -39,32 +51,24 @@ def main():
     ap.add_argument("--int8-json", required=True, help="Quantized model spec (mlp_int8.json/logreg_int8.json)")
     ap.add_argument("--max", type=int, default=200000)
     ap.add_argument("--tol", type=float, default=1e-3, help="Allowed absolute difference in score units")
+    add_cache_args(ap)
     args = ap.parse_args()
+    cache = cache_from_args(args)
     spec = json.loads(Path(args.int8_json).read_text())
     data = Path(args.rx).read_bytes()
-    FEAT_LEN = 20
-    rec_len = 4 + 2 + 8 + FEAT_LEN
-    mism = 0
-    total = 0
-    pos = 0
-    while pos + rec_len <= len(data) and total < args.max:
-        seq = int.from_bytes(data[pos : pos + 4], "big"); pos += 4
-        flags = int.from_bytes(data[pos : pos + 2], "big"); pos += 2
-        t_send_ns = int.from_bytes(data[pos : pos + 8], "big"); pos += 8
-        feat = data[pos : pos + FEAT_LEN]; pos += FEAT_LEN
-        ofi = int.from_bytes(feat[0:4], "big", signed=True)
-        imb = int.from_bytes(feat[4:6], "big", signed=True)
-        burst = int.from_bytes(feat[8:12], "big", signed=False)
-        vol = int.from_bytes(feat[12:16], "big", signed=False)
-        score_hw_q = int.from_bytes(feat[16:20], "big", signed=True)
-        score_hw = float(score_hw_q) / float(1 << 16)  # interpret as Q16.16 for comparison scale
-        score_sw = emulate_from_spec(spec, ofi, imb, burst, vol)
-        diff = abs(score_hw - score_sw)
-        if diff > args.tol:
-            mism += 1
-        total += 1
+    total = min(len(data) // RX_DTYPE.itemsize, args.max)
+    rec = np.frombuffer(data, dtype=RX_DTYPE, count=total)
+    score_hw = rec["score_q16"] / float(1 << 16)  # interpret as Q16.16 for comparison scale
+    score_sw = cache.memo(
+        "score_sw",
+        lambda: np.array([emulate_from_spec(spec, *f) for f in zip(*(rec[k].tolist() for k in ("ofi", "imb", "burst", "vol")))],
+                         dtype=np.float64),
+        files=[args.rx], params={"n": int(total)}, spec=spec)
+    mism = int(np.count_nonzero(np.abs(score_hw - score_sw) > args.tol))
     ok = (mism == 0)
     print(("OK" if ok else "FAIL") + f": compared {total}, mismatches {mism}, tol {args.tol}")
+    if cache.enabled:
+        print(cache.summary(), file=sys.stderr)
 
 
 if __name__ == "__main__":
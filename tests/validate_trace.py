@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+Validate echoed features against the vectorized reference (models/features_vec.py).
+
+Replaces trace_compare.py, validate_features_offline.py and
+validate_features_off_packets.py. Dumps are decoded straight into NumPy
+structured arrays, so long captures check in seconds instead of re-walking the
+book per event in Python.
+
+Event sources (one of):
+  --csv  LOBSTER messages CSV (packets consume events in order by count)
+  --tx   replay-udp --dump-packets: [seq4][cnt2][cnt*16B delta]*  (matched by seq)
+
+Feature dump (--rx), --rx-format:
+  pkt  replay-udp --dump-features: [seq4][flags2][t_send8][16B feat]*  (default)
+  cnt  legacy: [cnt2][16B feat]*  (no t_send -> burst/vol not checked)
+
+Every mismatch is reported, grouped into contiguous packet-index ranges per field.
+
+  python3 tests/validate_trace.py --tx tx.bin --rx rx.bin
+  python3 tests/validate_trace.py --csv msgs.csv --rx rx.bin --price-tick 100
+"""
+import argparse
+import sys
+from pathlib import Path
+
+import numpy as np
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+from models.features_vec import (DELTA_DTYPE, FEAT_DTYPE, FEAT_FIELDS,  # noqa: E402
+                                 events_from_deltas, load_lobster_events, packet_features)
+
+RX_PKT_DTYPE = np.dtype([("seq", ">u4"), ("flags", ">u2"), ("t_send_ns", ">u8"), ("feat", FEAT_DTYPE)])
+RX_CNT_DTYPE = np.dtype([("cnt", ">u2"), ("feat", FEAT_DTYPE)])
+TX_HDR_LEN = 6
+FLAG_RESET = 0x8000
+COUNT_MASK = 0x7FFF
+
+
+def decode_rx(path: Path, fmt: str) -> np.ndarray:
+    buf = Path(path).read_bytes()
+    dt = RX_PKT_DTYPE if fmt == "pkt" else RX_CNT_DTYPE
+    if len(buf) % dt.itemsize != 0:
+        raise ValueError(f"rx length {len(buf)} not multiple of {dt.itemsize} ({fmt} format)")
+    return np.frombuffer(buf, dtype=dt)
+
+
+def decode_tx(path: Path):
+    """
+    Decode variable-length tx records into (seq, cnt, deltas). Records come in
+    runs of equal cnt (the replayer batch size), so each run is a fixed-stride
+    2D view; only cnt changes cost a Python step.
+    """
+    buf = np.frombuffer(Path(path).read_bytes(), dtype=np.uint8)
+    seqs, cnts, deltas = [], [], []
+    pos = 0
+    n = len(buf)
+    while pos + TX_HDR_LEN <= n:
+        cnt = int(buf[pos + 4]) << 8 | int(buf[pos + 5])
+        stride = TX_HDR_LEN + cnt * DELTA_DTYPE.itemsize
+        k = (n - pos) // stride
+        if k == 0:
+            break  # truncated tail record
+        run = buf[pos:pos + k * stride].reshape(k, stride)
+        run_cnt = run[:, 4].astype(np.int64) << 8 | run[:, 5]
+        bad = np.flatnonzero(run_cnt != cnt)
+        if len(bad):
+            k = int(bad[0])
+            run = run[:k]
+        seqs.append(run[:, :4].copy().view(">u4").reshape(-1))
+        cnts.append(np.full(k, cnt, dtype=np.int64))
+        deltas.append(run[:, TX_HDR_LEN:].copy().view(DELTA_DTYPE).reshape(-1))
+        pos += k * stride
+    if not seqs:
+        return np.zeros(0, ">u4"), np.zeros(0, np.int64), np.zeros(0, DELTA_DTYPE)
+    return np.concatenate(seqs), np.concatenate(cnts), np.concatenate(deltas)
+
+
+def events_for_rx(rx_seq: np.ndarray, rx_cnt: np.ndarray, tx_seq, tx_cnt, tx_deltas):
+    """Gather each rx packet's deltas from the tx record with the same seq."""
+    if len(tx_seq) == 0:
+        return events_from_deltas(tx_deltas), np.zeros(len(rx_seq), np.int64), np.zeros(len(rx_seq), bool)
+    order = np.argsort(tx_seq, kind="stable")
+    j = np.minimum(np.searchsorted(tx_seq[order], rx_seq), len(order) - 1)
+    rec = order[j]
+    found = tx_seq[rec] == rx_seq
+    tx_off = np.cumsum(tx_cnt) - tx_cnt
+    cnt = np.where(found, np.minimum(rx_cnt, tx_cnt[rec]), 0)
+    starts = np.cumsum(cnt) - cnt
+    src = np.repeat(tx_off[rec] - starts, cnt) + np.arange(int(cnt.sum()))
+    return events_from_deltas(tx_deltas[src]), cnt, found
+
+
+def ranges(mask: np.ndarray):
+    """[(start, end)] of contiguous True runs."""
+    if not mask.any():
+        return []
+    d = np.diff(np.concatenate(([0], mask.view(np.int8), [0])))
+    return list(zip(np.flatnonzero(d == 1).tolist(), np.flatnonzero(d == -1).tolist()))
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Vectorized rx/tx trace validator for echoed features.")
+    src = ap.add_mutually_exclusive_group(required=True)
+    src.add_argument("--csv", help="LOBSTER messages CSV used for the replay")
+    src.add_argument("--tx", help="Packet dump from replay-udp --dump-packets")
+    ap.add_argument("--rx", required=True, help="Feature dump from replay-udp --dump-features")
+    ap.add_argument("--rx-format", choices=["pkt", "cnt"], default="pkt")
+    ap.add_argument("--price-tick", type=float, default=0.01)
+    ap.add_argument("--tau-burst-ns", type=int, default=200_000)
+    ap.add_argument("--tau-vol-ns", type=int, default=2_000_000)
+    ap.add_argument("--fields", default=",".join(FEAT_FIELDS), help="Comma list of fields to check")
+    ap.add_argument("--max-ranges", type=int, default=10, help="Ranges printed per field (all are counted)")
+    args = ap.parse_args()
+
+    try:
+        rx = decode_rx(Path(args.rx), args.rx_format)
+    except ValueError as e:
+        print(f"error: {e}", file=sys.stderr)
+        sys.exit(1)
+    fields = [f for f in args.fields.split(",") if f]
+    if args.rx_format == "pkt":
+        rx_cnt = (rx["flags"] & COUNT_MASK).astype(np.int64)
+        reset = (rx["flags"] & FLAG_RESET) != 0
+        ts = rx["t_send_ns"].astype(np.int64)
+    else:
+        rx_cnt = rx["cnt"].astype(np.int64)
+        reset = None
+        ts = np.zeros(len(rx), dtype=np.int64)
+        dropped = [f for f in fields if f in ("burst", "vol")]
+        if dropped:
+            print(f"note: {args.rx_format} dumps carry no t_send; not checking {','.join(dropped)}")
+            fields = [f for f in fields if f not in dropped]
+
+    compare = np.ones(len(rx), dtype=bool)
+    if args.tx:
+        if args.rx_format != "pkt":
+            print("error: --tx matching needs seq numbers (--rx-format pkt)", file=sys.stderr)
+            sys.exit(1)
+        tx_seq, tx_cnt, tx_deltas = decode_tx(Path(args.tx))
+        ev, cnt, found = events_for_rx(rx["seq"], rx_cnt, tx_seq, tx_cnt, tx_deltas)
+        if not found.all():
+            print(f"warning: {int((~found).sum())} rx packets have no tx record; excluded from comparison")
+        compare = found
+    else:
+        ev = load_lobster_events(args.csv, price_tick=args.price_tick)
+        cnt = rx_cnt
+        covered = np.cumsum(cnt) <= len(ev)
+        if not covered.all():
+            print(f"warning: CSV exhausted at packet {int(np.argmin(covered))}; later packets not compared")
+            cnt = np.where(covered, cnt, 0)
+            compare = covered
+
+    exp = packet_features(ev, cnt, ts, reset, tau_burst_ns=args.tau_burst_ns, tau_vol_ns=args.tau_vol_ns)
+    got = rx["feat"]
+    n_cmp = int(compare.sum())
+    total_bad = np.zeros(len(rx), dtype=bool)
+    for f in fields:
+        bad = (exp[f] != got[f]) & compare
+        total_bad |= bad
+        rs = ranges(bad)
+        if not rs:
+            continue
+        print(f"{f}: {int(bad.sum())} mismatches in {len(rs)} ranges")
+        for a, b in rs[:args.max_ranges]:
+            seq = f" seq={int(rx['seq'][a])}" if args.rx_format == "pkt" else ""
+            print(f"  pkt[{a}:{b}){seq} first exp={int(exp[f][a])} got={int(got[f][a])}")
+        if len(rs) > args.max_ranges:
+            print(f"  ... {len(rs) - args.max_ranges} more ranges")
+
+    if not total_bad.any():
+        print(f"OK: {n_cmp} packets matched ({','.join(fields)})")
+        sys.exit(0)
+    print(f"FAIL: {int(total_bad.sum())} packet mismatches of {n_cmp}")
+    sys.exit(2)
+
+
+if __name__ == "__main__":
+    main()